@@ -6,11 +6,18 @@ import streamlit as st
 import os
 import traceback
 import time
-from datetime import datetime
-from utils.supabase_client import save_conversation_with_summary, generate_session_id
-from utils.openai_client import get_chat_response, create_messages_with_system_prompt
-from utils.logger import ErrorLogger, logger
-from config import APP_TITLE, APP_DESCRIPTION
+from datetime import datetime, timezone
+from utils.supabase_client import (
+    save_conversation, save_conversation_with_summary, generate_session_id,
+    start_conversation_workers, enqueue_conversation_with_summary, get_conversation_job_status,
+    start_message_writer, persist_message, flush_conversation_messages
+)
+from utils.conversation_stats import is_completion_message
+from utils.openai_client import get_chat_response, stream_chat_response, create_messages_with_system_prompt
+from utils.logger import ErrorLogger, logger, log_function_call
+from utils.tracing import start_trace_exporter, bind_session_id, span, SpanAccumulator
+from utils.metrics import start_metrics_exporter
+from config import APP_TITLE, APP_DESCRIPTION, OPENAI_STREAMING, END_CONVERSATION_IN_BACKGROUND, PERSIST_MESSAGES_PER_TURN
 
 
 # Page configuration (MUST BE FIRST Streamlit command)
@@ -52,6 +59,7 @@ st.markdown("""
 """, unsafe_allow_html=True)
 
 # Initialize session state with proper error handling
+@log_function_call("session_state_setup")
 def initialize_session_state():
     """Initialize session state with error handling."""
     try:
@@ -64,14 +72,14 @@ def initialize_session_state():
             for attempt in range(max_retries):
                 try:
                     st.session_state.session_id = generate_session_id()
-                    logger.info(f"Generated session ID: {st.session_state.session_id}")
+                    logger.info("Generated session ID: %s", st.session_state.session_id)
                     break
                 except Exception as e:
                     ErrorLogger.log_error(e, f"Session ID generation attempt {attempt + 1}")
                     if attempt == max_retries - 1:
                         # Final fallback
                         st.session_state.session_id = f"fallback_{int(time.time())}"
-                        logger.warning(f"Using fallback session ID: {st.session_state.session_id}")
+                        logger.warning("Using fallback session ID: %s", st.session_state.session_id)
                     else:
                         time.sleep(1)  # Wait before retry
         
@@ -82,12 +90,24 @@ def initialize_session_state():
         if "interview_complete" not in st.session_state:
             st.session_state.interview_complete = False
             logger.info("Initialized interview_complete in session state")
+        
+        if "end_job_id" not in st.session_state:
+            st.session_state.end_job_id = None
+        
+        if "started_at" not in st.session_state:
+            st.session_state.started_at = datetime.now(timezone.utc).isoformat()
+        
+        # Spans recorded during this script run carry the session ID
+        bind_session_id(st.session_state.session_id)
           
     except Exception as e:
         ErrorLogger.log_error(e, "Session state initialization")
         st.error("Failed to initialize application. Please refresh the page.")
         st.stop()
 
+# Tracing is process-wide; this is a no-op after the first run
+start_trace_exporter()
+
 # Initialize session state
 initialize_session_state()
 
@@ -99,12 +119,23 @@ def start_new_conversation():
         st.session_state.session_id = generate_session_id()
         st.session_state.conversation_ended = False
         st.session_state.interview_complete = False
-        logger.info(f"New conversation started with session ID: {st.session_state.session_id}")
+        st.session_state.end_job_id = None
+        st.session_state.started_at = datetime.now(timezone.utc).isoformat()
+        logger.info("New conversation started with session ID: %s", st.session_state.session_id)
         st.rerun()
     except Exception as e:
         ErrorLogger.log_error(e, "Start new conversation")
         st.error("Unable to start new conversation. Please try again.")
 
+def add_message(role: str, content: str):
+    """Append a message to the session and queue it for per-turn persistence."""
+    message = {"role": role, "content": content}
+    st.session_state.messages.append(message)
+    if PERSIST_MESSAGES_PER_TURN:
+        # Non-blocking: the row is written by the background writer
+        persist_message(st.session_state.session_id, len(st.session_state.messages) - 1, message)
+
+@log_function_call("end_conversation")
 def end_conversation(openai_api_key: str, supabase_url: str, supabase_key: str):
     """End the current conversation and save to database with summary generation."""
     try:
@@ -113,7 +144,36 @@ def end_conversation(openai_api_key: str, supabase_url: str, supabase_key: str):
             st.warning("No conversation to end.")
             return
         
-        logger.info(f"Ending conversation with {len(st.session_state.messages)} messages")
+        logger.info("Ending conversation with %s messages", len(st.session_state.messages))
+        
+        # Captured once, so a retried or fallback save stores the same end time
+        ended_at = datetime.now(timezone.utc).isoformat()
+        
+        if PERSIST_MESSAGES_PER_TURN:
+            # Make sure every per-turn row is written before the session is finalized
+            flush_conversation_messages(st.session_state.session_id)
+        
+        if END_CONVERSATION_IN_BACKGROUND:
+            # Store the transcript now, then durably queue only the summary and evaluation
+            saved = save_conversation(
+                st.session_state.session_id,
+                st.session_state.messages,
+                supabase_url,
+                supabase_key,
+                ended_at=ended_at,
+                started_at=st.session_state.started_at
+            )
+            job_id = enqueue_conversation_with_summary(st.session_state.session_id, st.session_state.messages) if saved else None
+            if job_id:
+                st.session_state.end_job_id = job_id
+                st.session_state.conversation_ended = True
+                logger.info("Conversation saved and queued for summary: job %s, session %s", job_id, st.session_state.session_id)
+                st.rerun()  # Trigger re-render to update button state
+                return
+            ErrorLogger.log_warning("Failed to save or queue conversation, processing inline", "End conversation", {
+                "session_id": st.session_state.session_id,
+                "transcript_saved": saved
+            })
         
         # Show waiting message
         st.info("🔄 Please wait while we process your interview...")
@@ -124,12 +184,14 @@ def end_conversation(openai_api_key: str, supabase_url: str, supabase_key: str):
             st.session_state.messages,
             supabase_url,
             supabase_key,
-            openai_api_key
+            openai_api_key,
+            ended_at=ended_at,
+            started_at=st.session_state.started_at
         )
         
         if success:
             st.session_state.conversation_ended = True
-            logger.info(f"Conversation ended and saved successfully for session: {st.session_state.session_id}")
+            logger.info("Conversation ended and saved successfully for session: %s", st.session_state.session_id)
             st.success("Conversation saved successfully! You can close this window now.")
             st.rerun()  # Trigger re-render to update button state
         else:
@@ -163,6 +225,68 @@ def display_chat_message(role: str, content: str):
         # Fallback display
         st.write(f"**{role.title()}:** {content or '[Error displaying message]'}")
 
+@log_function_call("chat_turn")
+def handle_chat_turn(prompt: str, test_mode: bool, openai_api_key: str):
+    """Record the founder's message, then generate, render and store the assistant reply."""
+    logger.info("User input received: %s...", prompt[:50])
+    
+    # Add user message to session state
+    try:
+        add_message("user", prompt)
+        display_chat_message("user", prompt)
+    except Exception as e:
+        ErrorLogger.log_error(e, "Add user message to session state")
+        st.error("Unable to process your message. Please try again.")
+        return
+    
+    # Generate and display assistant response
+    try:
+        # Prepare messages with system prompt
+        messages_with_system = create_messages_with_system_prompt(st.session_state.messages, test_mode)
+        logger.info("Created messages with system prompt: %d total messages", len(messages_with_system))
+        
+        if OPENAI_STREAMING:
+            # Render the response progressively as tokens arrive
+            full_response = ""
+            timings = {}
+            with st.chat_message("assistant"):
+                response_placeholder = st.empty()
+                # Rendering happens between chunks, so it is summed into one child of the OpenAI span
+                render = SpanAccumulator("render")
+                with span("openai_call", streaming=True):
+                    for delta in stream_chat_response(messages_with_system, openai_api_key, timings):
+                        full_response += delta
+                        with render:
+                            response_placeholder.markdown(full_response + "▌")
+                    with render:
+                        response_placeholder.markdown(full_response)
+                    render.record()
+            logger.info("Assistant response timings: %s", timings)
+        else:
+            # Get complete response from OpenAI
+            full_response = get_chat_response(messages_with_system, openai_api_key)
+            
+            # Display the response
+            with span("render"):
+                with st.chat_message("assistant"):
+                    st.markdown(full_response)
+        
+        # Add assistant response to session state
+        add_message("assistant", full_response)
+        logger.info("Added assistant response to session state: %d characters", len(full_response))
+        
+        # Check if the interview is complete based on LLM response
+        if not st.session_state.interview_complete:
+            if is_completion_message(full_response):
+                st.session_state.interview_complete = True
+                logger.info("Interview completion detected in assistant response")
+                st.success("🎉 Interview Complete! Please click End Conversation to save your interview.")
+                st.rerun()  # Trigger immediate UI update
+                
+    except Exception as e:
+        ErrorLogger.log_error(e, "Assistant response generation")
+        st.error("Unable to generate response. Please try again.")
+
 def validate_environment(openai_key, supabase_url, supabase_key):
     """Validate required environment variables."""
     missing_vars = []
@@ -188,6 +312,9 @@ def main():
     try:
         logger.info("Starting main application")
         
+        # Metrics exporters are process-wide; this is a no-op after the first run
+        start_metrics_exporter()
+        
         # Load configuration from secrets
         try:
             TEST_MODE = st.secrets["general"]["TEST_MODE"]
@@ -198,6 +325,12 @@ def main():
             st.error("Configuration error. Please check your secrets.")
             st.stop()
         
+        # Background workers for end-of-interview processing (no-op after the first run)
+        if END_CONVERSATION_IN_BACKGROUND:
+            start_conversation_workers(SUPABASE_URL, SUPABASE_KEY, OPENAI_API_KEY)
+        if PERSIST_MESSAGES_PER_TURN:
+            start_message_writer(SUPABASE_URL, SUPABASE_KEY)
+        
         # Header
         st.title(APP_TITLE)
         st.markdown(APP_DESCRIPTION)
@@ -235,7 +368,7 @@ def main():
                         initial_message = "Hello! I'm The Unfair Advantage Scout. I'm here to help you identify your unique strengths and insights that could serve as your unfair advantage when building a startup. Let's start with your name and a description of your main professional experiences over the past five years, including organizations and roles."
                     
                     # Add initial message to session state
-                    st.session_state.messages.append({"role": "assistant", "content": initial_message})
+                    add_message("assistant", initial_message)
                     display_chat_message("assistant", initial_message)
                     logger.info("Sent initial greeting message")
                 except Exception as e:
@@ -270,7 +403,18 @@ def main():
             st.markdown("---")
             st.markdown(f"**Session ID:** `{st.session_state.session_id}`")
             
-            if st.session_state.conversation_ended:
+            if st.session_state.conversation_ended and st.session_state.end_job_id:
+                job_status = get_conversation_job_status(st.session_state.end_job_id)
+                status = job_status["status"] if job_status else "unknown"
+                if status == "succeeded":
+                    st.success("Conversation ended and saved")
+                elif status == "failed":
+                    st.error("Your interview was saved, but the summary failed. Please contact support with your session ID.")
+                else:
+                    st.info(f"Conversation saved - summarizing in the background ({status})")
+                    if st.button("Refresh status", use_container_width=True):
+                        st.rerun()
+            elif st.session_state.conversation_ended:
                 st.success("Conversation ended and saved")
             elif st.session_state.interview_complete:
                 st.success("Interview complete - ready to end")
@@ -291,46 +435,8 @@ def main():
                         st.warning("Please enter a message.")
                         return
                     
-                    logger.info(f"User input received: {prompt[:50]}...")
-                    
-                    # Add user message to session state
-                    try:
-                        st.session_state.messages.append({"role": "user", "content": prompt})
-                        display_chat_message("user", prompt)
-                    except Exception as e:
-                        ErrorLogger.log_error(e, "Add user message to session state")
-                        st.error("Unable to process your message. Please try again.")
-                        return
-                    
-                    # Generate and display assistant response
-                    try:
-                        # Prepare messages with system prompt
-                        messages_with_system = create_messages_with_system_prompt(st.session_state.messages, TEST_MODE)
-                        logger.info(f"Created messages with system prompt: {len(messages_with_system)} total messages")
-                        
-                        # Get complete response from OpenAI
-                        full_response = get_chat_response(messages_with_system, OPENAI_API_KEY)
-                        
-                        # Display the response
-                        with st.chat_message("assistant"):
-                            st.markdown(full_response)
-                        
-                        # Add assistant response to session state
-                        st.session_state.messages.append({"role": "assistant", "content": full_response})
-                        logger.info(f"Added assistant response to session state: {len(full_response)} characters")
-                        
-                        # Check if the interview is complete based on LLM response
-                        if not st.session_state.interview_complete:
-                            if "INTERVIEW COMPLETE" in full_response.upper():
-                                st.session_state.interview_complete = True
-                                logger.info("Interview completion detected in assistant response")
-                                st.success("🎉 Interview Complete! Please click End Conversation to save your interview.")
-                                st.rerun()  # Trigger immediate UI update
-                                
-                    except Exception as e:
-                        ErrorLogger.log_error(e, "Assistant response generation")
-                        st.error("Unable to generate response. Please try again.")
-                        
+                    handle_chat_turn(prompt, TEST_MODE, OPENAI_API_KEY)
+                
             except Exception as e:
                 ErrorLogger.log_error(e, "Chat input processing")
                 st.error("Unable to process your input. Please try again.")
@@ -338,7 +444,10 @@ def main():
         else:
             # Conversation ended state
             st.markdown("### Conversation Ended")
-            st.markdown("This conversation has been saved and summarized.")
+            if st.session_state.end_job_id:
+                st.markdown("Your interview has been saved and is being summarized. You can close this window now.")
+            else:
+                st.markdown("This conversation has been saved and summarized.")
         
         logger.info("Main application completed successfully")
         
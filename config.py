@@ -10,6 +10,45 @@ OPENAI_MAX_TOKENS = 700
 OPENAI_TOP_P = 1.0
 OPENAI_PRESENCE_PENALTY = 0.0
 OPENAI_FREQUENCY_PENALTY = 0.2
+OPENAI_STREAMING = True  # Render chat replies token by token
+
+# Hedged Chat Requests (tail-latency protection for each founder turn)
+OPENAI_CHAT_TURN_DEADLINE = 30.0  # Seconds a chat turn may take, including retries and hedging
+OPENAI_HEDGE_ENABLED = False  # A hedged blocking request that loses still runs to completion and uses RPM/TPM quota; enable once measured
+OPENAI_HEDGE_PERCENTILE = 95  # Hedge once the primary is slower than this percentile of recent turns
+OPENAI_HEDGE_MIN_SAMPLES = 20  # Recent latencies needed before the percentile is used
+OPENAI_HEDGE_DEFAULT_DELAY = 3.0  # Seconds before hedging while there are too few samples
+OPENAI_HEDGE_MIN_DELAY = 0.5  # Never hedge sooner than this
+OPENAI_HEDGE_WINDOW = 500  # Recent latencies kept per call type
+OPENAI_HEDGE_FALLBACK_MODEL = None  # Faster model for the hedged request (None re-sends to OPENAI_MODEL)
+OPENAI_HEDGE_MAX_THREADS = 128  # Threads shared by all hedged calls (at most two per chat turn in flight)
+
+# OpenAI Rate Limits (process-wide buckets shared by all sessions; match the account tier)
+OPENAI_RATE_LIMIT_RPM = 500  # Requests per minute (0 disables the request bucket)
+OPENAI_RATE_LIMIT_TPM = 200000  # Tokens per minute (0 disables the token bucket)
+OPENAI_RATE_LIMIT_MAX_WAIT = 20.0  # Longest a call waits for capacity before failing
+
+# Priority Scheduling (interactive chat turns ahead of summary/evaluation batch work)
+SCHEDULER_MAX_IN_FLIGHT = 64  # OpenAI requests in flight per process
+SCHEDULER_INTERACTIVE_CONCURRENCY = 64
+SCHEDULER_BATCH_CONCURRENCY = 8
+SCHEDULER_BATCH_RESERVED_FRACTION = 0.2  # Share of the rate limit budget batch calls leave for chat turns
+SCHEDULER_BATCH_MAX_WAIT = 10.0  # Seconds after which waiting batch calls stop yielding (starvation protection)
+
+# Context Window Configuration (prompt token budget per chat turn)
+CONTEXT_TOKEN_BUDGET = 6000  # 0 disables compaction; estimated at ~4 chars/token without tiktoken
+CONTEXT_KEEP_RECENT_MESSAGES = 6  # Most recent messages always sent verbatim
+CONTEXT_CONDENSED_MESSAGE_CHARS = 400  # Excerpt length per older message
+CONTEXT_MIN_CONDENSED_MESSAGE_CHARS = 100
+
+# OpenAI HTTP Transport (shared connection pools per API key/base URL)
+OPENAI_BASE_URL = None  # None uses the SDK default
+OPENAI_POOL_MAX_CONNECTIONS = 100
+OPENAI_POOL_MAX_KEEPALIVE_CONNECTIONS = 20
+OPENAI_POOL_KEEPALIVE_EXPIRY = 30.0  # Seconds an idle connection is kept open
+OPENAI_CONNECT_TIMEOUT = 5.0
+OPENAI_READ_TIMEOUT = 60.0
+OPENAI_HTTP2 = True  # Used when the optional h2 package is installed
 
 # Summary Configuration (stable, accurate restatement)
 OPENAI_SUMMARY_MODEL = "gpt-4o-mini"
@@ -27,6 +66,117 @@ OPENAI_EVALUATION_TOP_P = 1.0
 OPENAI_EVALUATION_PRESENCE_PENALTY = 0.0
 OPENAI_EVALUATION_FREQUENCY_PENALTY = 0.3
 
+# Combined Summary + Evaluation Configuration (single structured call)
+# When enabled, one JSON-mode request produces both outputs; unparseable
+# responses fall back to the separate summary and evaluation calls.
+OPENAI_COMBINED_SUMMARY_EVALUATION = False
+OPENAI_COMBINED_MODEL = "gpt-4o-mini"
+OPENAI_COMBINED_TEMPERATURE = 0.3
+OPENAI_COMBINED_MAX_TOKENS = 2400
+OPENAI_COMBINED_TOP_P = 1.0
+OPENAI_COMBINED_PRESENCE_PENALTY = 0.0
+OPENAI_COMBINED_FREQUENCY_PENALTY = 0.2
+
+# Retry Policy (shared by OpenAI and Supabase calls)
+RETRY_MAX_ATTEMPTS = 3
+RETRY_BASE_DELAY = 0.5  # Seconds; full-jitter exponential backoff
+RETRY_MAX_DELAY = 8.0
+RETRY_DEADLINE = 40.0  # Total seconds per call, including retries
+CIRCUIT_BREAKER_FAILURE_THRESHOLD = 5  # Consecutive retryable failures before failing fast
+CIRCUIT_BREAKER_RECOVERY_TIMEOUT = 30.0  # Seconds before a trial call is allowed
+
+# Result Cache (summary/evaluation results keyed by transcript + prompt + params)
+RESULT_CACHE_MAX_ENTRIES = 256
+RESULT_CACHE_TTL = 24 * 60 * 60  # Seconds
+RESULT_CACHE_DIR = None  # e.g. ".cache/results" to enable the on-disk tier
+
+# Metrics (Prometheus text format)
+METRICS_HTTP_PORT = None  # e.g. 9464 to serve http://127.0.0.1:9464/metrics
+METRICS_FILE_PATH = None  # e.g. "metrics.prom" for a textfile collector
+METRICS_FILE_INTERVAL = 15  # Seconds between file exports
+# USD per million tokens, used to estimate cost per call type
+OPENAI_PRICING_PER_MILLION_TOKENS = {
+    "gpt-4o-mini": {"prompt": 0.15, "completion": 0.60}
+}
+
+# Logging
+LOG_FORMAT = "text"  # "text" lines or "json" (one object per record, for log pipelines)
+LOG_ASYNC = True  # Request threads only enqueue records; a listener thread formats and writes them
+LOG_QUEUE_MAX_RECORDS = 10000  # Records waiting for the listener; further records are dropped and counted
+LOG_INFO_RATE_PER_SECOND = 20  # INFO records per second per call site before sampling (0 disables)
+LOG_INFO_BURST = 100  # INFO records a call site may log at once before the rate applies
+
+# Tracing (nested spans with wall/CPU time per pipeline stage, exported as OTLP JSON; nothing is recorded without a target)
+TRACE_FILE_PATH = None  # e.g. ".traces/spans.jsonl"; read by tools/traces.py
+TRACE_OTLP_ENDPOINT = None  # e.g. "http://127.0.0.1:4318/v1/traces" (OTLP/HTTP JSON collector)
+TRACE_EXPORT_INTERVAL = 5.0  # Seconds between batched exports
+TRACE_MAX_PENDING_SPANS = 10000  # Finished spans waiting for export; further spans are dropped and counted
+TRACE_SERVICE_NAME = "newco-ai-agent"
+
+# End-of-interview processing
+END_CONVERSATION_LLM_TIMEOUT = 45  # Seconds to wait for the parallel summary/evaluation calls
+END_CONVERSATION_IN_BACKGROUND = False  # Save the transcript, then queue summary/evaluation as a durable background job
+
+# Background Job Queue (SQLite-backed)
+JOB_QUEUE_DB_PATH = ".jobs/jobs.sqlite3"
+JOB_WORKERS = 2
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE_DELAY = 5.0  # Seconds; doubled after each failed attempt
+JOB_POLL_INTERVAL = 0.5  # Seconds an idle worker waits before polling again
+JOB_LEASE_SECONDS = 300  # A running job whose worker died is picked up again after this
+JOB_SUCCEEDED_RETENTION_SECONDS = 3600  # Succeeded jobs (payload cleared on success) are kept this long for status lookups
+JOB_FAILED_RETENTION_SECONDS = 7 * 24 * 3600  # Failed jobs keep their payload (the transcript) this long for inspection
+JOB_PURGE_INTERVAL = 600  # Seconds between purges of expired jobs
+
+# Storage Backend
+# "supabase": write and read Supabase directly
+# "sqlite": local SQLite file only (offline use and tests)
+# "outbox": commit to SQLite first, then drain to Supabase in the background. A save counts as done
+#   once it is on the local disk, so only use it where that disk outlives the process (not on
+#   Streamlit Cloud, whose disk is wiped on restart and would lose writes not yet drained)
+STORAGE_BACKEND = "supabase"
+STORAGE_SQLITE_PATH = ".data/conversations.sqlite3"
+OUTBOX_DRAIN_BATCH_SIZE = 50  # Operations read per drain pass
+OUTBOX_DRAIN_INTERVAL = 1.0  # Seconds between drain passes when idle; also the base retry delay
+OUTBOX_MAX_BACKOFF = 60.0  # Longest delay between retries while Supabase is unavailable
+OUTBOX_MAX_FATAL_ATTEMPTS = 5  # Non-retryable failures before an operation is parked as dead
+
+# Conversation Read Cache (read-through cache in front of get_conversation; per process)
+CONVERSATION_CACHE_ENABLED = True
+CONVERSATION_CACHE_MAX_ENTRIES = 500
+CONVERSATION_CACHE_MAX_BYTES = 50 * 1024 * 1024  # Approximate JSON size of the cached rows
+CONVERSATION_CACHE_TTL = 300  # Seconds; also bounds staleness for writes made by other processes
+CONVERSATION_CACHE_NEGATIVE_TTL = 30  # Seconds a missing session is remembered (0 disables negative caching)
+
+# Paged Conversation Reads (keyset pagination on (created_at, id))
+CONVERSATION_PAGE_SIZE = 100  # Rows per request
+CONVERSATION_PREFETCH_PAGES = 1  # Pages fetched ahead in the background while the caller works (0 disables)
+
+# Conversation Stats (turns, characters, tokens, duration and completion stored as columns at save time)
+CONVERSATION_STATS_ENABLED = False  # Needs the stats columns in Supabase (see README); saves drop them if the table lacks them
+
+# Local Search Index (BM25 over summaries, evaluations and founder messages; built by tools/search.py)
+SEARCH_INDEX_DIR = ".search"
+SEARCH_INDEX_MAX_SEGMENTS = 8  # Segments are merged into one above this count
+SEARCH_BM25_K1 = 1.2  # Term frequency saturation
+SEARCH_BM25_B = 0.75  # Document length normalization
+SEARCH_SNIPPET_CHARS = 160
+
+# Profile Vectors (hashed TF-IDF of summaries/evaluations for similarity and clustering; tools/profiles.py)
+PROFILE_VECTOR_DIR = ".vectors"
+PROFILE_VECTOR_FEATURES = 2 ** 18  # Hashed feature space of unigrams and bigrams
+PROFILE_VECTOR_DIM = 256  # Dense random projection used for similarity and k-means
+PROFILE_VECTOR_MAX_CHUNKS = 16  # Chunks are merged into one above this count
+PROFILE_VECTOR_RERANK_FACTOR = 10  # Dense candidates per requested neighbour, re-ranked with the exact TF-IDF cosine
+
+# Per-turn Persistence (each message is also written to conversation_messages as it happens)
+PERSIST_MESSAGES_PER_TURN = False  # Needs the conversation_messages table in Supabase (see README)
+WRITE_BEHIND_MAX_PENDING = 5000  # Queued rows before new ones are dropped (the final save still has the full transcript)
+WRITE_BEHIND_BATCH_SIZE = 100  # Rows per database write
+WRITE_BEHIND_FLUSH_INTERVAL = 1.0  # Seconds between background flushes of a partial batch
+WRITE_BEHIND_MAX_FATAL_ATTEMPTS = 3  # Consecutive non-retryable failures (e.g. missing table) before a batch is dropped
+WRITE_BEHIND_SESSION_END_TIMEOUT = 5.0  # Seconds ending a conversation waits for its queued rows
+
 # App Configuration
 APP_TITLE = "The Unfair Advantage Scout"
 APP_DESCRIPTION = "Expert mentor and interviewer for aspiring startup founders."
@@ -0,0 +1,71 @@
+"""Tests for fitting per-turn chat prompts into the token budget."""
+
+from utils.context_manager import (
+    _condense_messages, count_message_tokens, count_messages_tokens, fit_messages_to_budget
+)
+from config import CONTEXT_MIN_CONDENSED_MESSAGE_CHARS
+
+SYSTEM = {"role": "system", "content": "You are an interviewer for an early-stage investor."}
+FILLER = "and here is a long stretch of detail about the company and its market " * 6
+
+def interview(turns: int):
+    """A system prompt followed by alternating interviewer/founder messages."""
+    messages = [SYSTEM]
+    for turn in range(1, turns + 1):
+        messages.append({"role": "assistant", "content": f"Question {turn}: tell me more {FILLER}"})
+        messages.append({"role": "user", "content": f"Answer {turn}: sure, {FILLER}"})
+    return messages
+
+def condensed_block(result):
+    blocks = [msg for msg in result[1:] if msg["role"] == "system"]
+    return blocks[0]["content"] if blocks else None
+
+def test_prompt_under_budget_is_sent_unchanged():
+    messages = interview(3)
+    result, stats = fit_messages_to_budget(messages, budget=count_messages_tokens(messages), keep_recent=2)
+
+    assert result is messages
+    assert stats["tokens_after"] == stats["tokens_before"]
+    assert stats["compacted_messages"] == 0
+
+def test_zero_budget_disables_compaction():
+    messages = interview(10)
+    result, _ = fit_messages_to_budget(messages, budget=0, keep_recent=2)
+    assert result is messages
+
+def test_system_prompt_and_recent_messages_are_kept_verbatim():
+    messages = interview(10)
+    result, stats = fit_messages_to_budget(messages, budget=count_messages_tokens(messages) // 2, keep_recent=4)
+
+    assert result[0] == SYSTEM
+    assert result[-4:] == messages[-4:]
+    assert len(result) == 6
+    assert stats["compacted_messages"] == len(messages) - 1 - 4
+    assert stats["tokens_after"] <= stats["budget"] < stats["tokens_before"]
+
+def test_condensed_block_counts_the_interviewer_messages():
+    messages = interview(10)
+    result, _ = fit_messages_to_budget(messages, budget=count_messages_tokens(messages) // 2, keep_recent=4)
+
+    block = condensed_block(result)
+    # 20 conversation messages minus the 4 recent ones leaves 8 interviewer questions
+    assert "Interviewer messages so far (excluding the recent exchanges below): 8" in block
+    assert "Assistant: Question 1:" in block and "User: Answer 8:" in block
+
+def test_tight_budget_drops_the_oldest_turns():
+    messages = interview(10)
+    keep_recent = 4
+    older, recent = messages[1:-keep_recent], messages[-keep_recent:]
+    # Room for the recent messages plus the two newest condensed turns at the shortest excerpt length
+    budget = (
+        count_messages_tokens([SYSTEM] + recent)
+        + count_message_tokens(_condense_messages(older[-2:], CONTEXT_MIN_CONDENSED_MESSAGE_CHARS, 8))
+    )
+    result, stats = fit_messages_to_budget(messages, budget=budget, keep_recent=keep_recent)
+
+    block = condensed_block(result)
+    assert "Question 1:" not in block
+    assert "Question 8:" in block and "Answer 8:" in block
+    # The count covers every older turn, including the dropped ones
+    assert "Interviewer messages so far (excluding the recent exchanges below): 8" in block
+    assert stats["tokens_after"] <= budget
@@ -0,0 +1,137 @@
+"""Tests for the conversation read cache and its invalidation on writes."""
+
+import os
+import threading
+import time
+
+import pytest
+
+import utils.conversation_cache as conversation_cache
+import utils.supabase_client as supabase_client
+from utils.conversation_cache import ConversationCache
+from utils.storage import SQLiteBackend
+
+MESSAGES = [{"role": "user", "content": "We build tools."}]
+
+class CountingLoader:
+    def __init__(self, value):
+        self.value = value
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        return self.value
+
+def test_hits_are_served_from_memory_as_copies():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+    loader = CountingLoader({"session_id": "s1", "messages": list(MESSAGES)})
+    first = cache.get_or_load("s1", loader)
+    first["messages"].append({"role": "user", "content": "mutated"})
+    assert cache.get_or_load("s1", loader)["messages"] == MESSAGES
+    assert loader.calls == 1
+
+def test_entries_expire_after_ttl():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=0.05, negative_ttl=0.05)
+    loader = CountingLoader({"session_id": "s1"})
+    cache.get_or_load("s1", loader)
+    time.sleep(0.1)
+    cache.get_or_load("s1", loader)
+    assert loader.calls == 2
+
+def test_missing_sessions_are_cached_only_with_negative_ttl():
+    loader = CountingLoader(None)
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+    assert cache.get_or_load("gone", loader) is None
+    assert cache.get_or_load("gone", loader) is None
+    assert loader.calls == 1
+
+    uncached = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=0)
+    uncached.get_or_load("gone", loader)
+    uncached.get_or_load("gone", loader)
+    assert loader.calls == 3
+
+def test_errors_reach_the_caller_and_are_not_cached():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+
+    def failing():
+        raise TimeoutError("database timeout")
+
+    with pytest.raises(TimeoutError):
+        cache.get_or_load("s1", failing)
+    assert cache.get_or_load("s1", CountingLoader({"session_id": "s1"})) == {"session_id": "s1"}
+
+def test_evicts_by_entry_count_and_bytes():
+    cache = ConversationCache(max_entries=2, max_bytes=10000, ttl=60, negative_ttl=60)
+    for key in ("a", "b", "c"):
+        cache.get_or_load(key, CountingLoader({"session_id": key}))
+    assert cache.stats()["size"] == 2 and cache.stats()["evictions"] == 1
+
+    small = ConversationCache(max_entries=10, max_bytes=60, ttl=60, negative_ttl=60)
+    small.get_or_load("a", CountingLoader({"summary": "x" * 30}))
+    small.get_or_load("b", CountingLoader({"summary": "y" * 30}))
+    assert small.stats()["size"] == 1 and small.stats()["bytes"] <= 60
+
+def test_concurrent_misses_share_one_load():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+    release = threading.Event()
+    calls = []
+
+    def slow_loader():
+        calls.append(None)
+        release.wait(2.0)
+        return {"session_id": "s1"}
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.get_or_load("s1", slow_loader))) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + 2.0
+    while cache.stats()["coalesced"] < 4 and time.monotonic() < deadline:
+        time.sleep(0.005)
+    release.set()
+    for thread in threads:
+        thread.join(2.0)
+    assert len(calls) == 1
+    assert results == [{"session_id": "s1"}] * 5
+
+def test_invalidate_drops_entry():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+    loader = CountingLoader({"session_id": "s1"})
+    cache.get_or_load("s1", loader)
+    cache.invalidate("s1")
+    cache.get_or_load("s1", loader)
+    assert loader.calls == 2
+
+def test_invalidate_during_load_discards_stale_result():
+    cache = ConversationCache(max_entries=10, max_bytes=10000, ttl=60, negative_ttl=60)
+
+    def loader_racing_a_write():
+        # A write lands after the read but before the result is cached
+        cache.invalidate("s1")
+        return {"summary": "old"}
+
+    assert cache.get_or_load("s1", loader_racing_a_write) == {"summary": "old"}
+    assert cache.get_or_load("s1", CountingLoader({"summary": "new"})) == {"summary": "new"}
+
+@pytest.fixture
+def cached_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(supabase_client, "CONVERSATION_CACHE_ENABLED", True)
+    monkeypatch.setattr(conversation_cache, "_conversation_cache", ConversationCache(10, 100000, 60, 60))
+    backend = SQLiteBackend(os.path.join(str(tmp_path), "conversations.sqlite3"))
+    supabase_client.configure_storage_backend(backend)
+    yield backend
+    supabase_client.configure_storage_backend(None)
+
+def test_saves_and_updates_invalidate_cached_reads(cached_backend):
+    assert supabase_client.get_conversation("s1", "", "") is None
+    assert supabase_client.save_conversation("s1", MESSAGES, "", "")
+    assert supabase_client.get_conversation("s1", "", "")["messages"] == MESSAGES
+
+    assert supabase_client.update_conversation_fields("s1", "", "", summary="Builds tools")
+    assert supabase_client.get_conversation("s1", "", "")["summary"] == "Builds tools"
+
+def test_writes_bypassing_the_cache_stay_hidden_until_ttl(cached_backend):
+    supabase_client.save_conversation("s1", MESSAGES, "", "")
+    supabase_client.get_conversation("s1", "", "")
+    cached_backend.update_conversation("s1", {"summary": "written by another process"})
+    assert supabase_client.get_conversation("s1", "", "").get("summary") is None
@@ -0,0 +1,83 @@
+"""Tests for per-conversation stats and saving them to tables without the stats columns."""
+
+from postgrest.exceptions import APIError as PostgrestAPIError
+
+from utils.conversation_stats import STATS_COLUMNS, compute_conversation_stats, summarize_conversation_stats
+from utils.storage import SupabaseBackend
+
+MESSAGES = [
+    {"role": "system", "content": "You are an interviewer."},
+    {"role": "assistant", "content": "What are you building?"},
+    {"role": "user", "content": "Tools."},
+    {"role": "assistant", "content": "Thanks! INTERVIEW COMPLETE"}
+]
+
+def test_compute_counts_turns_chars_and_completion():
+    stats = compute_conversation_stats(MESSAGES, "2026-01-01T10:00:00Z", "2026-01-01T10:05:30+00:00")
+    assert set(stats) == set(STATS_COLUMNS)
+    assert stats["founder_turns"] == 1 and stats["assistant_turns"] == 2
+    assert stats["founder_chars"] == len("Tools.")
+    assert stats["founder_tokens"] > 0
+    assert stats["duration_seconds"] == 330.0
+    assert stats["completion_detected"] is True
+
+def test_compute_without_timestamps_leaves_duration_empty():
+    stats = compute_conversation_stats(MESSAGES[:3])
+    assert stats["duration_seconds"] is None
+    assert stats["completion_detected"] is False
+
+def test_summary_counts_rows_without_stats_separately():
+    rows = [
+        compute_conversation_stats(MESSAGES, "2026-01-01T10:00:00Z", "2026-01-01T10:01:00Z"),
+        compute_conversation_stats(MESSAGES[:3]),
+        {"session_id": "saved before the stats columns existed"}
+    ]
+    summary = summarize_conversation_stats(rows)
+    assert summary["conversations"] == 3 and summary["with_stats"] == 2
+    assert summary["completion_rate"] == 0.5
+    assert summary["avg_duration_seconds"] == 60.0
+
+class FakeTable:
+    def __init__(self, client):
+        self.client = client
+        self.rows = None
+
+    def upsert(self, rows, on_conflict):
+        self.rows = rows
+        return self
+
+    def execute(self):
+        self.client.requests.append(self.rows)
+        if self.client.missing_columns and any(column in row for row in self.rows for column in STATS_COLUMNS):
+            raise PostgrestAPIError({"code": "PGRST204", "message": "Could not find the 'founder_turns' column"})
+        return type("Response", (), {"data": self.rows})()
+
+class FakeClient:
+    """Just enough of the Supabase client for SupabaseBackend.upsert_conversations."""
+
+    def __init__(self, missing_columns: bool):
+        self.missing_columns = missing_columns
+        self.requests = []
+
+    def table(self, name):
+        return FakeTable(self)
+
+def row_with_stats():
+    return dict(compute_conversation_stats(MESSAGES), session_id="s1", messages=MESSAGES)
+
+def test_upsert_without_stats_columns_retries_once_and_remembers():
+    client = FakeClient(missing_columns=True)
+    backend = SupabaseBackend(client)
+    assert backend.upsert_conversations([row_with_stats()]) == 1
+    assert len(client.requests) == 2
+    assert not any(column in client.requests[1][0] for column in STATS_COLUMNS)
+    assert client.requests[1][0]["messages"] == MESSAGES
+
+    # Later saves leave the columns out without the failing request
+    assert backend.upsert_conversations([row_with_stats()]) == 1
+    assert len(client.requests) == 3
+
+def test_upsert_with_stats_columns_sends_them():
+    client = FakeClient(missing_columns=False)
+    assert SupabaseBackend(client).upsert_conversations([row_with_stats()]) == 1
+    assert client.requests[0][0]["founder_turns"] == 1
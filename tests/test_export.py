@@ -0,0 +1,77 @@
+"""Tests for the incremental conversation export and its ended_at watermark."""
+
+import argparse
+import gzip
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import tools.export as export
+import utils.supabase_client as supabase_client
+from utils.storage import SQLiteBackend
+
+MESSAGES = [{"role": "assistant", "content": "Tell me about your startup."}, {"role": "user", "content": "We build tools."}]
+T0 = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+
+class SteppingClock(datetime):
+    """datetime whose now() returns the queued run start times in order."""
+    times = []
+
+    @classmethod
+    def now(cls, tz=None):
+        return cls.times.pop(0)
+
+@pytest.fixture
+def backend(tmp_path, monkeypatch):
+    backend = SQLiteBackend(os.path.join(str(tmp_path), "conversations.sqlite3"))
+    supabase_client.configure_storage_backend(backend)
+    backend.upsert_conversations([
+        {"session_id": "ended-1h-before", "messages": MESSAGES, "ended_at": (T0 - timedelta(hours=1)).isoformat()},
+        {"session_id": "ended-10m-before", "messages": MESSAGES, "ended_at": (T0 - timedelta(minutes=10)).isoformat()},
+        {"session_id": "ended-30m-after", "messages": MESSAGES, "ended_at": (T0 + timedelta(minutes=30)).isoformat()},
+        {"session_id": "still-open", "messages": MESSAGES}
+    ])
+    monkeypatch.setattr(export, "datetime", SteppingClock)
+    yield backend
+    supabase_client.configure_storage_backend(None)
+
+def run(output: str, start: datetime, **overrides):
+    SteppingClock.times = [start]
+    options = dict(
+        output=output, compression="gzip", table_format="csv", chunk_rows=5000, page_size=2,
+        settle_seconds=900.0, full=False
+    )
+    options.update(overrides)
+    return export.run_export(argparse.Namespace(**options), "", "")
+
+def exported_sessions(report):
+    with gzip.open(os.path.join(report["directory"], "conversations-00000.jsonl.gz"), "rt", encoding="utf-8") as f:
+        return [json.loads(line)["session_id"] for line in f]
+
+def test_runs_export_only_conversations_ended_since_the_watermark(backend, tmp_path):
+    output = os.path.join(str(tmp_path), "exports")
+
+    first = run(output, T0)
+    # Conversations inside the settle window wait for the next run
+    assert exported_sessions(first) == ["ended-1h-before"]
+
+    second = run(output, T0 + timedelta(hours=1))
+    assert second["ended_after"] == first["ended_until"]
+    assert sorted(exported_sessions(second)) == ["ended-10m-before", "ended-30m-after"]
+    assert second["messages"] == 4
+
+    third = run(output, T0 + timedelta(hours=2))
+    assert third["conversations"] == 0 and third["directory"] is None
+    assert not any(name.endswith(".partial") for name in os.listdir(output))
+    with open(os.path.join(output, export.STATE_FILE), "r", encoding="utf-8") as f:
+        assert json.load(f)["ended_until"] == third["ended_until"]
+
+def test_full_run_ignores_the_watermark(backend, tmp_path):
+    output = os.path.join(str(tmp_path), "exports")
+    run(output, T0)
+
+    report = run(output, T0 + timedelta(hours=1), full=True)
+    assert report["ended_after"] is None
+    assert len(exported_sessions(report)) == 3
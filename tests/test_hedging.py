@@ -0,0 +1,91 @@
+"""Tests for hedged calls: winner selection, loser release and the turn deadline."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.hedging as hedging
+from utils.hedging import TurnDeadlineExceeded, hedged_call
+
+@pytest.fixture(autouse=True)
+def fast_hedge(monkeypatch):
+    monkeypatch.setattr(hedging, "OPENAI_HEDGE_ENABLED", True)
+    monkeypatch.setattr(hedging, "OPENAI_HEDGE_DEFAULT_DELAY", 0.05)
+    monkeypatch.setattr(hedging, "OPENAI_HEDGE_MIN_SAMPLES", 10 ** 6)
+
+def sleeping_operation(delays):
+    def operation(model, remaining):
+        time.sleep(delays[model])
+        return f"reply from {model}"
+    return operation
+
+def test_fast_primary_is_not_hedged():
+    calls = []
+
+    def operation(model, remaining):
+        calls.append(model)
+        return "reply"
+
+    assert hedged_call(operation, "test_fast", "primary", "fallback", deadline=1.0) == ("reply", "primary")
+    assert calls == ["primary"]
+
+def test_slow_primary_loses_to_hedge_and_is_released():
+    released = []
+    done = threading.Event()
+
+    def cancel(result):
+        released.append(result)
+        done.set()
+
+    result = hedged_call(
+        sleeping_operation({"primary": 0.3, "fallback": 0.0}), "test_slow", "primary", "fallback", deadline=2.0, cancel=cancel
+    )
+    assert result == ("reply from fallback", "fallback")
+    # The losing primary is released as soon as it finishes
+    assert done.wait(1.0)
+    assert released == ["reply from primary"]
+
+def test_hedging_disabled_runs_the_primary_on_the_calling_thread(monkeypatch):
+    monkeypatch.setattr(hedging, "OPENAI_HEDGE_ENABLED", False)
+    threads = []
+
+    def operation(model, remaining):
+        threads.append(threading.current_thread())
+        assert remaining == 1.0
+        return f"reply from {model}"
+
+    assert hedged_call(operation, "test_off", "primary", "fallback", deadline=1.0) == ("reply from primary", "primary")
+    assert threads == [threading.current_thread()]
+
+def test_attempt_queued_past_the_deadline_is_not_started(monkeypatch):
+    monkeypatch.setattr(hedging, "_executor", ThreadPoolExecutor(max_workers=1))
+    busy = threading.Event()
+    hedging._executor.submit(busy.wait, 0.3)
+    calls = []
+
+    with pytest.raises(TurnDeadlineExceeded):
+        hedged_call(lambda model, remaining: calls.append(model), "test_queued", "primary", "fallback", deadline=0.1)
+    busy.set()
+    hedging._executor.shutdown(wait=True)
+    assert calls == []
+
+def test_deadline_bounds_the_call():
+    started = time.monotonic()
+    with pytest.raises(TurnDeadlineExceeded):
+        hedged_call(sleeping_operation({"primary": 0.5, "fallback": 0.5}), "test_deadline", "primary", "fallback", deadline=0.15)
+    assert time.monotonic() - started < 0.4
+
+def test_last_error_is_raised_when_every_attempt_fails():
+    def operation(model, remaining):
+        time.sleep(0.1 if model == "primary" else 0.0)
+        raise ValueError(f"{model} failed")
+
+    with pytest.raises(ValueError):
+        hedged_call(operation, "test_errors", "primary", "fallback", deadline=1.0)
+
+def test_calls_share_one_executor():
+    before = hedging._executor
+    hedged_call(lambda model, remaining: "reply", "test_executor", "primary", "fallback", deadline=1.0)
+    assert hedging._executor is before
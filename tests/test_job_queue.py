@@ -0,0 +1,129 @@
+"""Tests for the SQLite job queue: claiming, leases, retries, exhaustion and retention."""
+
+import os
+import time
+
+import pytest
+
+import utils.job_queue as job_queue
+from utils.job_queue import (
+    JOB_STATUS_FAILED, JOB_STATUS_QUEUED, JOB_STATUS_RUNNING, JOB_STATUS_SUCCEEDED, JobQueue, JobWorkerPool
+)
+
+@pytest.fixture
+def queue(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_DELAY", 0.0)
+    return JobQueue(os.path.join(str(tmp_path), "jobs.sqlite3"))
+
+def test_claim_takes_oldest_job_once(queue):
+    first = queue.enqueue("finalize", {"n": 1}, session_id="s1")
+    second = queue.enqueue("finalize", {"n": 2}, session_id="s2")
+
+    job = queue.claim(["finalize"])
+    assert job["id"] == first
+    assert job["payload"] == {"n": 1}
+    assert job["status"] == JOB_STATUS_RUNNING and job["attempts"] == 1
+    assert queue.claim(["finalize"])["id"] == second
+    assert queue.claim(["finalize"]) is None
+
+def test_claim_only_matches_registered_kinds(queue):
+    queue.enqueue("other", {})
+    assert queue.claim(["finalize"]) is None
+
+def test_expired_lease_is_claimed_again(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0.05)
+    job_id = queue.enqueue("finalize", {})
+    assert queue.claim(["finalize"])["id"] == job_id
+    assert queue.claim(["finalize"]) is None
+
+    time.sleep(0.1)
+    reclaimed = queue.claim(["finalize"])
+    assert reclaimed["id"] == job_id
+    assert reclaimed["attempts"] == 2
+
+def test_expired_final_attempt_is_marked_failed_not_rerun(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0.05)
+    job_id = queue.enqueue("finalize", {}, max_attempts=1)
+    queue.claim(["finalize"])
+
+    time.sleep(0.1)
+    assert queue.claim(["finalize"]) is None
+    job = queue.get(job_id)
+    assert job["status"] == JOB_STATUS_FAILED and job["attempts"] == 1
+    assert job["last_error"] == "Lease expired on the final attempt"
+
+def test_stale_worker_cannot_record_an_outcome(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_LEASE_SECONDS", 0.05)
+    job_id = queue.enqueue("finalize", {"messages": ["transcript"]})
+    stale = queue.claim(["finalize"])
+
+    time.sleep(0.1)
+    current = queue.claim(["finalize"])
+    assert not queue.complete(stale, {"saved": True})
+    assert not queue.fail(stale, RuntimeError("late"))
+    assert queue.get(job_id)["status"] == JOB_STATUS_RUNNING
+
+    assert queue.complete(current, {"saved": True})
+    assert queue.get(job_id)["status"] == JOB_STATUS_SUCCEEDED
+    assert not queue.fail(current, RuntimeError("after completion"))
+
+def test_failed_attempts_retry_until_exhausted(queue):
+    job_id = queue.enqueue("finalize", {}, max_attempts=2)
+
+    queue.fail(queue.claim(["finalize"]), RuntimeError("first"))
+    job = queue.get(job_id)
+    assert job["status"] == JOB_STATUS_QUEUED
+    assert job["last_error"] == "RuntimeError: first"
+
+    queue.fail(queue.claim(["finalize"]), RuntimeError("second"))
+    job = queue.get(job_id)
+    assert job["status"] == JOB_STATUS_FAILED and job["attempts"] == 2
+    assert queue.claim(["finalize"]) is None
+
+def test_retry_waits_for_backoff(queue, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_RETRY_BASE_DELAY", 60.0)
+    queue.enqueue("finalize", {})
+    queue.fail(queue.claim(["finalize"]), RuntimeError("later"))
+    assert queue.claim(["finalize"]) is None
+
+def test_worker_completes_and_clears_payload(queue):
+    job_id = queue.enqueue("finalize", {"messages": ["transcript"]})
+    pool = JobWorkerPool(queue, workers=1)
+    pool.register("finalize", lambda payload: {"saved": True})
+
+    assert pool.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == JOB_STATUS_SUCCEEDED
+    assert job["result"] == {"saved": True}
+    assert job["payload"] is None
+    assert not pool.run_once()
+
+def test_worker_records_handler_errors(queue):
+    job_id = queue.enqueue("finalize", {"messages": ["transcript"]}, max_attempts=1)
+    pool = JobWorkerPool(queue, workers=1)
+
+    def handler(payload):
+        raise RuntimeError("summary missing")
+
+    pool.register("finalize", handler)
+    assert pool.run_once()
+    job = queue.get(job_id)
+    assert job["status"] == JOB_STATUS_FAILED
+    assert job["last_error"] == "RuntimeError: summary missing"
+    # Failed jobs keep their payload for inspection until purged
+    assert job["payload"] == {"messages": ["transcript"]}
+
+def test_purge_applies_retention_per_status(queue):
+    succeeded = queue.enqueue("finalize", {})
+    queue.complete(queue.claim(["finalize"]))
+    failed = queue.enqueue("finalize", {}, max_attempts=1)
+    queue.fail(queue.claim(["finalize"]), RuntimeError("boom"))
+    pending = queue.enqueue("finalize", {})
+
+    assert queue.purge(succeeded_retention=0, failed_retention=3600) == 1
+    assert queue.get(succeeded) is None
+    assert queue.get(failed) is not None
+
+    assert queue.purge(succeeded_retention=0, failed_retention=0) == 1
+    assert queue.get(failed) is None
+    assert queue.get(pending)["status"] == JOB_STATUS_QUEUED
@@ -0,0 +1,69 @@
+"""Tests for INFO sampling, the non-blocking queue handler and the formatters."""
+
+import json
+import logging
+import queue
+import time
+
+from utils.logger import InfoSampler, JsonFormatter, NonBlockingQueueHandler, TextFormatter
+
+def make_record(message: str = "turn done in %.3fs", args=(0.25,), level: int = logging.INFO, lineno: int = 10) -> logging.LogRecord:
+    return logging.LogRecord("utils.logger", level, "utils/openai_client.py", lineno, message, args, None)
+
+def test_sampler_limits_each_call_site_and_reports_suppressed_records():
+    sampler = InfoSampler(rate=20, burst=2)
+    passed = [sampler.filter(make_record()) for _ in range(5)]
+    assert passed == [True, True, False, False, False]
+
+    # Another call site has its own bucket
+    assert sampler.filter(make_record(lineno=11))
+
+    time.sleep(0.1)
+    record = make_record()
+    assert sampler.filter(record)
+    assert record.suppressed == 3
+
+def test_sampler_always_passes_warnings():
+    sampler = InfoSampler(rate=0.001, burst=1)
+    assert all(sampler.filter(make_record(level=logging.WARNING)) for _ in range(5))
+
+def test_queue_handler_defers_formatting_of_immutable_arguments():
+    handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_records=10)
+    handler.emit(make_record())
+    record = handler.queue.get_nowait()
+
+    assert record.msg == "turn done in %.3fs" and record.args == (0.25,)
+    assert record.getMessage() == "turn done in 0.250s"
+
+def test_queue_handler_renders_mutable_arguments_before_queueing():
+    handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_records=10)
+    messages = ["first"]
+    handler.emit(make_record("messages: %s", (messages,)))
+    messages.append("added later")
+
+    record = handler.queue.get_nowait()
+    assert record.getMessage() == "messages: ['first']"
+
+def test_full_queue_drops_records_and_reports_the_count():
+    handler = NonBlockingQueueHandler(queue.SimpleQueue(), max_records=2)
+    for _ in range(5):
+        handler.emit(make_record())
+    assert handler.queue.qsize() == 2
+
+    handler.queue.get_nowait()
+    handler.queue.get_nowait()
+    handler.emit(make_record())
+    assert handler.queue.get_nowait().dropped == 3
+
+def test_formatters_carry_structured_fields():
+    record = make_record()
+    record.data = {"session_id": "s1"}
+    record.suppressed = 2
+
+    entry = json.loads(JsonFormatter().format(record))
+    assert entry["message"] == "turn done in 0.250s"
+    assert entry["data"] == {"session_id": "s1"} and entry["suppressed"] == 2
+
+    line = TextFormatter("%(levelname)s %(message)s").format(record)
+    assert line.startswith("INFO turn done in 0.250s [2 similar messages suppressed]")
+    assert 'Additional data: {"session_id": "s1"}' in line
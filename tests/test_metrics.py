@@ -0,0 +1,76 @@
+"""Tests for the in-process metrics and their Prometheus text exposition."""
+
+import pytest
+
+from utils.metrics import (
+    LLM_COST, LLM_ERRORS, LLM_REQUESTS, LLM_TOKENS, Counter, Gauge, Histogram, MetricsRegistry,
+    observe_llm_call, record_llm_call
+)
+
+def test_counter_renders_labelled_series_in_order():
+    counter = Counter("test_requests_total", "Requests by outcome", ("call_type", "outcome"))
+    counter.inc(call_type="chat", outcome="success")
+    counter.inc(2, call_type="chat", outcome="success")
+    counter.inc(0.5, call_type="summary", outcome="error")
+
+    assert counter.render() == [
+        "# HELP test_requests_total Requests by outcome",
+        "# TYPE test_requests_total counter",
+        'test_requests_total{call_type="chat",outcome="success"} 3',
+        'test_requests_total{call_type="summary",outcome="error"} 0.5'
+    ]
+    assert counter.total(call_type="chat") == 3
+
+def test_label_values_are_escaped():
+    counter = Counter("test_escaped_total", "Escaping", ("model",))
+    counter.inc(model='a"b\\c\nd')
+    assert counter.render()[-1] == 'test_escaped_total{model="a\\"b\\\\c\\nd"} 1'
+
+def test_histogram_renders_cumulative_buckets_sum_and_count():
+    histogram = Histogram("test_duration_seconds", "Latency", ("operation",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.7, 3.0):
+        histogram.observe(value, operation="read")
+
+    assert histogram.render()[2:] == [
+        'test_duration_seconds_bucket{operation="read",le="0.1"} 1',
+        'test_duration_seconds_bucket{operation="read",le="1"} 3',
+        'test_duration_seconds_bucket{operation="read",le="+Inf"} 4',
+        'test_duration_seconds_sum{operation="read"} 4.25',
+        'test_duration_seconds_count{operation="read"} 4'
+    ]
+
+def test_gauge_samples_its_function_at_render_time():
+    gauge = Gauge("test_pending", "Pending records", ("buffer",))
+    gauge.set(1, buffer="messages")
+    pending = {"outbox": 4}
+    gauge.set_function(lambda: {(name,): value for name, value in pending.items()})
+    pending["outbox"] = 7
+
+    assert gauge.render()[2:] == ['test_pending{buffer="messages"} 1', 'test_pending{buffer="outbox"} 7']
+
+def test_registry_renders_metrics_in_registration_order():
+    registry = MetricsRegistry()
+    registry.register(Counter("test_b_total", "Second"))
+    registry.register(Gauge("test_a", "First"))
+    text = registry.render()
+
+    assert text.index("# TYPE test_b_total counter") < text.index("# TYPE test_a gauge")
+    assert text.endswith("\n")
+
+def test_llm_call_records_tokens_and_cost():
+    record_llm_call("test_call", "gpt-4o-mini", 0.2, usage={
+        "prompt_tokens": 1000, "completion_tokens": 500, "prompt_tokens_details": {"cached_tokens": 200}
+    })
+
+    assert LLM_REQUESTS.value(call_type="test_call", model="gpt-4o-mini", outcome="success") == 1
+    assert LLM_TOKENS.value(call_type="test_call", model="gpt-4o-mini", kind="prompt") == 1000
+    assert LLM_TOKENS.value(call_type="test_call", model="gpt-4o-mini", kind="cached") == 200
+    assert LLM_COST.value(call_type="test_call", model="gpt-4o-mini") == pytest.approx((1000 * 0.15 + 500 * 0.60) / 1_000_000)
+
+def test_observed_llm_call_records_errors_and_reraises():
+    with pytest.raises(TimeoutError):
+        with observe_llm_call("test_failing", "gpt-4o-mini"):
+            raise TimeoutError()
+
+    assert LLM_REQUESTS.value(call_type="test_failing", model="gpt-4o-mini", outcome="error") == 1
+    assert LLM_ERRORS.value(call_type="test_failing", model="gpt-4o-mini", error_class="TimeoutError") == 1
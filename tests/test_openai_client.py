@@ -0,0 +1,178 @@
+"""Tests for the OpenAI client against the local OpenAI stub server."""
+
+import asyncio
+
+import pytest
+
+import utils.openai_client as openai_client
+import utils.retry as retry
+from tools.stub_servers import LatencyProfile, OpenAIStubHandler, StubServer, start_openai_stub
+from config import OPENAI_MODEL
+from utils.conversation_stats import INTERVIEW_COMPLETE_MARKER
+from utils.metrics import LLM_TOKENS, RETRIES
+from utils.retry import RetryPolicy
+
+API_KEY = "sk-test"
+MESSAGES = [
+    {"role": "system", "content": "You are an interviewer."},
+    {"role": "assistant", "content": "Tell me about your startup."},
+    {"role": "user", "content": "We build tools for founders."}
+]
+
+class FlakyOpenAIStub(OpenAIStubHandler):
+    """Fails the first requests with a 500, then answers like the regular stub."""
+    profile = LatencyProfile(median_ms=0)
+    failures_left = 0
+    requests = 0
+
+    def do_POST(self):
+        type(self).requests += 1
+        if type(self).failures_left > 0:
+            type(self).failures_left -= 1
+            self._read_json()
+            self._send_json(500, {"error": {"message": "Internal server error (stub)", "type": "server_error"}})
+            return
+        super().do_POST()
+
+class InterruptedOpenAIStub(OpenAIStubHandler):
+    """Sends one content chunk and then drops the connection mid-stream."""
+    requests = 0
+
+    def do_POST(self):
+        type(self).requests += 1
+        self._read_json()
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        chunk = (
+            '{"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": 0, "model": "stub", '
+            '"choices": [{"index": 0, "delta": {"content": "Thanks "}, "finish_reason": null}]}'
+        )
+        self._write_chunk(f"data: {chunk}\n\n".encode("utf-8"))
+        self.close_connection = True
+
+class NoUsageOpenAIStub(OpenAIStubHandler):
+    """Streams replies but ignores stream_options, like endpoints that never report streamed usage."""
+    profile = LatencyProfile(median_ms=0)
+
+    def _stream_words(self, request, content, usage):
+        super()._stream_words(dict(request, stream_options=None), content, usage)
+
+def chat_tokens(kind: str) -> float:
+    return LLM_TOKENS.value(call_type="chat", model=OPENAI_MODEL, kind=kind)
+
+@pytest.fixture(autouse=True)
+def no_wait_retries(monkeypatch):
+    monkeypatch.setattr(retry, "_circuit_breakers", {})
+    monkeypatch.setattr(openai_client, "DEFAULT_RETRY_POLICY", RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=10.0))
+
+def serve(monkeypatch, server: StubServer) -> StubServer:
+    """Point the chat calls at a stub server."""
+    get_client = openai_client.get_openai_client
+    monkeypatch.setattr(openai_client, "get_openai_client", lambda api_key: get_client(api_key, server.url + "/v1"))
+    return server
+
+@pytest.fixture
+def stub(monkeypatch):
+    server = serve(monkeypatch, start_openai_stub(LatencyProfile(median_ms=0), turns_to_complete=2))
+    yield server
+    server.stop()
+
+def test_stream_yields_the_reply_progressively(stub):
+    timings = {}
+    deltas = list(openai_client.stream_chat_response(MESSAGES, API_KEY, timings))
+
+    assert len(deltas) > 1
+    assert "".join(deltas).startswith("Thanks for sharing. Question 2:")
+    assert 0 < timings["time_to_first_token"] <= timings["total_latency"]
+
+def test_assembled_stream_carries_the_completion_sentinel(stub):
+    messages = MESSAGES + [
+        {"role": "assistant", "content": "What problem do you solve?"},
+        {"role": "user", "content": "Hiring."}
+    ]
+    deltas = list(openai_client.stream_chat_response(messages, API_KEY))
+
+    # The marker spans several deltas, so only the assembled text can be checked
+    assert not any(INTERVIEW_COMPLETE_MARKER in delta for delta in deltas)
+    assert INTERVIEW_COMPLETE_MARKER in "".join(deltas)
+
+def test_failures_before_the_first_token_are_retried(monkeypatch):
+    handler = type("FlakyStub", (FlakyOpenAIStub,), {"failures_left": 2, "requests": 0})
+    server = serve(monkeypatch, StubServer(handler).start())
+    retries_before = RETRIES.total(upstream="openai", call_type="chat", model=OPENAI_MODEL)
+    try:
+        reply = "".join(openai_client.stream_chat_response(MESSAGES, API_KEY))
+    finally:
+        server.stop()
+
+    assert reply.startswith("Thanks for sharing.")
+    assert handler.requests == 3
+    assert RETRIES.total(upstream="openai", call_type="chat", model=OPENAI_MODEL) == retries_before + 2
+
+def test_stream_records_the_reported_usage(stub):
+    before = chat_tokens("completion"), chat_tokens("completion_estimated")
+    reply = "".join(openai_client.stream_chat_response(MESSAGES, API_KEY))
+
+    # The stub reports len(content) // 4 completion tokens in its final usage chunk
+    assert chat_tokens("completion") == before[0] + len(reply) // 4
+    assert chat_tokens("completion_estimated") == before[1]
+
+def test_stream_without_usage_records_an_estimate(monkeypatch):
+    server = serve(monkeypatch, StubServer(NoUsageOpenAIStub).start())
+    before = chat_tokens("completion"), chat_tokens("prompt_estimated"), chat_tokens("completion_estimated")
+    try:
+        deltas = list(openai_client.stream_chat_response(MESSAGES, API_KEY))
+    finally:
+        server.stop()
+
+    assert chat_tokens("completion") == before[0]
+    assert chat_tokens("prompt_estimated") == before[1] + openai_client.count_messages_tokens(MESSAGES)
+    # One token per content chunk
+    assert chat_tokens("completion_estimated") == before[2] + len(deltas)
+
+def test_failure_after_the_first_token_is_raised_not_restarted(monkeypatch):
+    handler = type("InterruptedStub", (InterruptedOpenAIStub,), {"requests": 0})
+    server = serve(monkeypatch, StubServer(handler).start())
+    received = []
+    try:
+        with pytest.raises(Exception, match="interrupted"):
+            for delta in openai_client.stream_chat_response(MESSAGES, API_KEY):
+                received.append(delta)
+    finally:
+        server.stop()
+
+    assert received == ["Thanks "]
+    assert handler.requests == 1
+
+def test_sync_clients_are_shared_per_credentials():
+    client = openai_client.get_openai_client("sk-registry-a", "http://127.0.0.1:9/v1")
+
+    assert openai_client.get_openai_client("sk-registry-a", "http://127.0.0.1:9/v1") is client
+    assert openai_client.get_openai_client("sk-registry-b", "http://127.0.0.1:9/v1") is not client
+    assert openai_client.get_openai_client("sk-registry-a", "http://127.0.0.2:9/v1") is not client
+    # Registry keys hold a hash of the API key, never the key itself
+    assert "sk-registry-a" not in repr(list(openai_client._client_registry))
+
+def test_async_clients_are_bound_to_their_event_loop():
+    async def get_twice():
+        first = openai_client.get_async_openai_client("sk-registry-async", "http://127.0.0.1:9/v1")
+        second = openai_client.get_async_openai_client("sk-registry-async", "http://127.0.0.1:9/v1")
+        await openai_client.close_async_openai_clients()
+        return first, second
+
+    first, second = asyncio.run(get_twice())
+    other_loop, _ = asyncio.run(get_twice())
+
+    assert first is second
+    assert other_loop is not first
+
+def test_async_clients_are_closed_when_their_loop_shuts_down():
+    async def get_client():
+        return openai_client.get_async_openai_client("sk-registry-async", "http://127.0.0.1:9/v1")
+
+    client = asyncio.run(get_client())
+
+    assert client.is_closed()
+    assert not any(loop.is_closed() for loop in openai_client._async_client_registry)
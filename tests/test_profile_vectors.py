@@ -0,0 +1,65 @@
+"""Tests for profile vectors: nearest neighbours and k-means on a tiny corpus."""
+
+import os
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from utils.profile_vectors import ProfileVectorStore, hash_features
+
+TOPICS = {
+    "payments": "payments card processing merchants checkout fraud payments api",
+    "climate": "climate carbon capture emissions solar energy climate grid",
+    "hiring": "hiring recruiting engineers interviews talent marketplace hiring"
+}
+
+def rows():
+    """Three profiles per topic, each with its own extra words."""
+    return [
+        {
+            "session_id": f"{topic}-{i}",
+            "summary": f"{text} variant{i} founder{i}",
+            "evaluation": {"status": "success", "evaluation_text": f"Founder focused on {topic} team{i}"}
+        }
+        for topic, text in TOPICS.items()
+        for i in range(3)
+    ]
+
+@pytest.fixture
+def store(tmp_path):
+    store = ProfileVectorStore(os.path.join(str(tmp_path), "vectors"), features=2 ** 14, dim=64)
+    store.add(rows())
+    return store
+
+def test_hashed_features_are_sorted_and_deterministic():
+    columns, values = hash_features("payments api payments", features=2 ** 14)
+    again, _ = hash_features("payments api payments", features=2 ** 14)
+    assert list(columns) == sorted(columns) == list(again)
+    assert len(columns) == 4  # two unigrams and two bigrams (barring a hash collision)
+
+def test_nearest_profiles_share_the_topic(store):
+    neighbours = store.nearest(["payments-0", "climate-1", "unknown"], k=2)
+
+    assert set(neighbours) == {"payments-0", "climate-1"}
+    assert {session_id for session_id, _ in neighbours["payments-0"]} == {"payments-1", "payments-2"}
+    assert {session_id for session_id, _ in neighbours["climate-1"]} == {"climate-0", "climate-2"}
+    scores = [score for _, score in neighbours["payments-0"]]
+    assert scores == sorted(scores, reverse=True) and 0 < scores[-1] <= 1
+
+def test_kmeans_separates_the_topics(store):
+    labels, centroids = store.kmeans(3, seed=1)
+
+    by_topic = {topic: {int(labels[i]) for i, session_id in enumerate(store.session_ids) if session_id.startswith(topic)} for topic in TOPICS}
+    assert all(len(cluster) == 1 for cluster in by_topic.values())
+    assert len(set.union(*by_topic.values())) == 3
+    assert centroids.shape == (3, 64)
+
+def test_readded_sessions_replace_their_vectors_and_survive_reopening(store):
+    store.add([{"session_id": "payments-0", "summary": TOPICS["climate"], "evaluation": None}], watermark="2026-01-01")
+    assert len(store) == 9
+    assert "climate" in store.nearest(["payments-0"], k=1)["payments-0"][0][0]
+
+    reopened = ProfileVectorStore(store.directory)
+    assert len(reopened) == 9
+    assert reopened.watermark == "2026-01-01"
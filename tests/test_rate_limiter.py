@@ -0,0 +1,87 @@
+"""Tests for the RPM/TPM token buckets behind the OpenAI rate limiter."""
+
+import asyncio
+
+import pytest
+
+from utils.rate_limiter import RateLimiter, RateLimitWaitExceeded, TokenBucket
+
+def test_bucket_refills_at_per_minute_rate_up_to_capacity():
+    bucket = TokenBucket(60)
+    now = bucket.updated_at
+    assert bucket.take(60) == 0.0
+    bucket.refill(now + 10)
+    assert bucket.level == pytest.approx(10)
+    bucket.refill(now + 600)
+    assert bucket.level == 60
+
+def test_bucket_debt_is_repaid_in_arrival_order():
+    bucket = TokenBucket(60)
+    bucket.take(60)
+    assert bucket.take(1) == pytest.approx(1.0)
+    assert bucket.take(1) == pytest.approx(2.0)
+
+def test_acquire_within_capacity_does_not_wait():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=6000)
+    reservation = limiter.acquire(100, 50, max_wait=1.0)
+    assert reservation.tokens == 150 and reservation.prompt_tokens == 100
+    assert reservation.waited < 0.05
+
+def test_acquire_waits_for_tokens_to_refill():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(500, 100, max_wait=1.0)
+    reservation = limiter.acquire(3, 0, max_wait=1.0)
+    assert 0.2 <= reservation.waited < 0.6
+
+def test_acquire_fails_fast_and_undoes_reservation_when_wait_is_too_long():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(600, 0, max_wait=1.0)
+    with pytest.raises(RateLimitWaitExceeded):
+        limiter.acquire(300, 0, max_wait=1.0)
+    # The rejected request left no debt behind
+    assert limiter.acquire(5, 0, max_wait=1.0).waited < 0.8
+
+def test_request_bucket_limits_call_count():
+    limiter = RateLimiter(requests_per_minute=60, tokens_per_minute=0)
+    for _ in range(60):
+        assert limiter.acquire(0, 0, max_wait=0.5).waited < 0.05
+    with pytest.raises(RateLimitWaitExceeded):
+        limiter.acquire(0, 0, max_wait=0.5)
+
+def test_reconcile_returns_unused_tokens():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    reservation = limiter.acquire(100, 500, max_wait=1.0)
+    limiter.reconcile(reservation, 150)
+    assert limiter.utilization()["tokens"] == pytest.approx(0.25, abs=0.01)
+
+def test_headroom_holds_back_low_priority_calls_until_timeout():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(200, 0, max_wait=1.0, headroom=0.5)
+    with pytest.raises(RateLimitWaitExceeded):
+        limiter.acquire(200, 0, max_wait=0.1, headroom=0.5, headroom_timeout=10.0)
+    # Starvation protection: the headroom is dropped after headroom_timeout
+    reservation = limiter.acquire(200, 0, max_wait=1.0, headroom=0.5, headroom_timeout=0.05)
+    assert 0.04 <= reservation.waited < 0.5
+
+def test_acquire_async_waits_without_blocking_the_loop():
+    limiter = RateLimiter(requests_per_minute=0, tokens_per_minute=600)
+    limiter.acquire(600, 0, max_wait=1.0)
+    ticks = []
+
+    async def ticker():
+        for _ in range(5):
+            ticks.append(None)
+            await asyncio.sleep(0.02)
+
+    async def main():
+        reservation, _ = await asyncio.gather(limiter.acquire_async(2, 0, max_wait=1.0), ticker())
+        return reservation
+
+    reservation = asyncio.run(main())
+    assert reservation.waited >= 0.15
+    assert len(ticks) == 5
+
+def test_utilization_reports_waiting_callers_and_disabled_buckets():
+    limiter = RateLimiter(requests_per_minute=600, tokens_per_minute=0)
+    stats = limiter.utilization()
+    assert stats == {"waiting": 0, "requests": 0.0}
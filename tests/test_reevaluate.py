@@ -0,0 +1,91 @@
+"""Tests for the resumable bulk re-evaluation against the PostgREST stub."""
+
+import argparse
+import json
+import os
+
+import pytest
+from supabase import create_client
+
+import tools.reevaluate as reevaluate
+import utils.supabase_client as supabase_client
+from tools.stub_servers import LatencyProfile, start_postgrest_stub
+from utils.openai_client import PROMPT_VERSION
+from utils.storage import SupabaseBackend
+
+MESSAGES = [{"role": "assistant", "content": "Tell me about your startup."}, {"role": "user", "content": "We build tools."}]
+EVALUATION = {"evaluation_text": "Strong founder.", "type": "text_evaluation", "status": "success"}
+
+@pytest.fixture
+def conversations(monkeypatch):
+    """Five ended conversations in the PostgREST stub, one of them already current."""
+    server = start_postgrest_stub(LatencyProfile(median_ms=0))
+    client = create_client(server.url, "stub.stub.stub")
+    supabase_client.configure_storage_backend(SupabaseBackend(client))
+    monkeypatch.setattr(reevaluate, "get_supabase_client", lambda url, key: client)
+    rows = [
+        {
+            "id": f"id-{i}",
+            "created_at": f"2026-01-0{i + 1}T00:00:00+00:00",
+            "session_id": f"session-{i}",
+            "ended_at": "2026-02-01T00:00:00+00:00",
+            "messages": MESSAGES,
+            "summary": None,
+            "evaluation": None
+        }
+        for i in range(5)
+    ]
+    rows[1].update(summary="Current", evaluation=dict(EVALUATION, prompt_version=PROMPT_VERSION))
+    server.httpd.RequestHandlerClass.tables["conversations"] = rows
+    yield rows
+    supabase_client.configure_storage_backend(None)
+    server.stop()
+
+@pytest.fixture
+def regenerated(monkeypatch):
+    """Session IDs passed to the (faked) LLM calls, in call order."""
+    calls = []
+
+    def generate(session_id, messages, api_key):
+        calls.append(session_id)
+        return f"Summary of {session_id}", dict(EVALUATION)
+
+    monkeypatch.setattr(reevaluate, "generate_summary_and_evaluation", generate)
+    return calls
+
+def run(tmp_path, **overrides):
+    options = dict(
+        page_size=2, concurrency=2, max_rpm=0.0, max_rows=0, restart=False, dry_run=False,
+        checkpoint=os.path.join(str(tmp_path), "checkpoint.json")
+    )
+    options.update(overrides)
+    return reevaluate.run_reevaluation(argparse.Namespace(**options), "", "", "sk-test")
+
+def test_interrupted_run_resumes_after_the_last_written_page(conversations, regenerated, tmp_path):
+    first = run(tmp_path, max_rows=2)
+    assert first["scanned"] == 2 and first["regenerated"] == 1
+    with open(os.path.join(str(tmp_path), "checkpoint.json"), "r", encoding="utf-8") as f:
+        assert json.load(f)["cursor"] == {"created_at": "2026-01-02T00:00:00+00:00", "id": "id-1"}
+
+    second = run(tmp_path)
+
+    # Every stale row is regenerated exactly once across the two runs
+    assert regenerated == ["session-0", "session-2", "session-3", "session-4"]
+    assert second["scanned"] == 5 and second["regenerated"] == 4 and second["already_current"] == 1
+    assert all(row["summary"] and row["evaluation"]["prompt_version"] == PROMPT_VERSION for row in conversations)
+
+def test_checkpoint_for_other_prompts_is_ignored(conversations, regenerated, tmp_path):
+    with open(os.path.join(str(tmp_path), "checkpoint.json"), "w", encoding="utf-8") as f:
+        json.dump({"prompt_version": "outdated", "cursor": {"created_at": "2026-01-05T00:00:00+00:00", "id": "id-4"}}, f)
+
+    report = run(tmp_path)
+    assert report["scanned"] == 5
+    assert len(regenerated) == 4
+
+def test_dry_run_writes_nothing(conversations, regenerated, tmp_path):
+    report = run(tmp_path, dry_run=True)
+
+    assert report["scanned"] == 5 and report["regenerated"] == 0
+    assert regenerated == []
+    assert not os.path.exists(os.path.join(str(tmp_path), "checkpoint.json"))
+    assert conversations[0]["summary"] is None
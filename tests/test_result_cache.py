@@ -0,0 +1,68 @@
+"""Tests for the content-addressed result cache key and its memory/disk tiers."""
+
+import json
+import os
+import time
+
+from utils.result_cache import ResultCache, make_cache_key
+
+PARAMS = {"model": "gpt-4o-mini", "temperature": 0.3, "max_tokens": 500}
+
+def test_cache_key_is_stable_and_ignores_param_order():
+    key = make_cache_key("summary", "Founder: hi", "Summarize: {conversation}", PARAMS)
+    reordered = dict(reversed(list(PARAMS.items())))
+    assert key == make_cache_key("summary", "Founder: hi", "Summarize: {conversation}", reordered)
+    assert len(key) == 64
+
+def test_cache_key_changes_with_every_input():
+    key = make_cache_key("summary", "Founder: hi", "Summarize: {conversation}", PARAMS)
+    assert key != make_cache_key("evaluation", "Founder: hi", "Summarize: {conversation}", PARAMS)
+    assert key != make_cache_key("summary", "Founder: hello", "Summarize: {conversation}", PARAMS)
+    assert key != make_cache_key("summary", "Founder: hi", "Summarize briefly: {conversation}", PARAMS)
+    assert key != make_cache_key("summary", "Founder: hi", "Summarize: {conversation}", dict(PARAMS, temperature=0.0))
+
+def test_cached_values_are_isolated_from_callers():
+    cache = ResultCache(ttl=60, disk_dir=None)
+    evaluation = {"evaluation_text": "Strong founder.", "status": "success"}
+    cache.set("a", evaluation)
+    evaluation["session_id"] = "s1"
+
+    hit = cache.get("a")
+    hit["prompt_version"] = "v2"
+    assert cache.get("a") == {"evaluation_text": "Strong founder.", "status": "success"}
+
+def test_memory_tier_evicts_least_recently_used():
+    cache = ResultCache(max_entries=2, ttl=60, disk_dir=None)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats()["evictions"] == 1
+
+def test_expired_entries_are_misses(monkeypatch):
+    cache = ResultCache(max_entries=10, ttl=60, disk_dir=None)
+    cache.set("a", {"status": "success"})
+    now = time.time()
+    monkeypatch.setattr("utils.result_cache.time.time", lambda: now + 61)
+    assert cache.get("a") is None
+    stats = cache.stats()
+    assert stats["misses"] == 1 and stats["size"] == 0
+
+def test_disk_tier_survives_a_new_process(tmp_path):
+    ResultCache(max_entries=10, ttl=60, disk_dir=str(tmp_path)).set("a", {"summary": "text"})
+    fresh = ResultCache(max_entries=10, ttl=60, disk_dir=str(tmp_path))
+    assert fresh.get("a") == {"summary": "text"}
+    assert fresh.get("a") == {"summary": "text"}
+    stats = fresh.stats()
+    assert stats["disk_hits"] == 1 and stats["memory_hits"] == 1
+
+def test_expired_disk_entries_are_removed(tmp_path):
+    path = os.path.join(str(tmp_path), "a.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"stored_at": 0, "value": "old"}, f)
+    cache = ResultCache(max_entries=10, ttl=60, disk_dir=str(tmp_path))
+    assert cache.get("a") is None
+    assert not os.path.exists(path)
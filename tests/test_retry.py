@@ -0,0 +1,171 @@
+"""Tests for error classification, circuit breakers and call_with_retry."""
+
+import time
+
+import httpx
+import openai
+import pytest
+from postgrest.exceptions import APIError as PostgrestAPIError
+
+from utils.retry import (
+    CircuitBreaker, CircuitOpenError, RetryPolicy, call_with_retry, get_retry_after, is_rate_limit_error,
+    is_retryable_error
+)
+
+REQUEST = httpx.Request("POST", "https://api.example.test/v1/chat/completions")
+
+def status_error(error_class, status_code: int, headers=None):
+    response = httpx.Response(status_code, request=REQUEST, headers=headers)
+    return error_class("error", response=response, body=None)
+
+NO_WAIT_POLICY = RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=5.0)
+
+@pytest.mark.parametrize("error", [
+    openai.APITimeoutError(request=REQUEST),
+    openai.APIConnectionError(request=REQUEST),
+    status_error(openai.RateLimitError, 429),
+    status_error(openai.InternalServerError, 503),
+    httpx.ConnectError("connection refused", request=REQUEST),
+    httpx.ReadTimeout("timed out", request=REQUEST),
+    PostgrestAPIError({"code": "40001", "message": "serialization failure"}),
+    PostgrestAPIError({"code": "08006", "message": "connection failure"}),
+    PostgrestAPIError({"code": "PGRST002", "message": "schema cache not ready"}),
+    TimeoutError(),
+    ConnectionResetError()
+])
+def test_transient_errors_are_retryable(error):
+    assert is_retryable_error(error)
+
+@pytest.mark.parametrize("error", [
+    status_error(openai.BadRequestError, 400),
+    status_error(openai.AuthenticationError, 401),
+    PostgrestAPIError({"code": "PGRST204", "message": "Could not find the column"}),
+    PostgrestAPIError({"code": "23505", "message": "duplicate key"}),
+    PostgrestAPIError({"message": "no code"}),
+    ValueError("bad input")
+])
+def test_permanent_errors_are_fatal(error):
+    assert not is_retryable_error(error)
+
+def test_retry_after_headers():
+    assert get_retry_after(status_error(openai.RateLimitError, 429, {"retry-after-ms": "1500"})) == 1.5
+    assert get_retry_after(status_error(openai.RateLimitError, 429, {"retry-after": "2"})) == 2.0
+    assert get_retry_after(status_error(openai.RateLimitError, 429)) is None
+    assert get_retry_after(ValueError()) is None
+
+def test_breaker_opens_at_threshold_and_fails_fast():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+def test_breaker_success_resets_failure_count():
+    breaker = CircuitBreaker("test", failure_threshold=2, recovery_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+
+def test_breaker_half_open_allows_one_trial():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    assert breaker.state == "half_open"
+    breaker.before_call()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+def test_breaker_failed_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+def test_breaker_failures_while_open_do_not_extend_the_recovery_timeout():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.03)
+    # A call started before the circuit opened fails late
+    breaker.record_failure()
+    time.sleep(0.03)
+    assert breaker.state == "half_open"
+
+def test_breaker_release_frees_trial_without_closing():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=0.01)
+    breaker.record_failure()
+    time.sleep(0.02)
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+def test_call_with_retry_retries_transient_errors():
+    calls = []
+
+    def operation(timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise TimeoutError()
+        return "ok"
+
+    breaker = CircuitBreaker("test", failure_threshold=5)
+    assert call_with_retry(operation, "test", breaker, NO_WAIT_POLICY) == "ok"
+    assert len(calls) == 3
+    assert all(0 < timeout <= NO_WAIT_POLICY.deadline for timeout in calls)
+    assert breaker.state == "closed"
+
+def test_call_with_retry_does_not_retry_fatal_errors():
+    calls = []
+
+    def operation(timeout):
+        calls.append(timeout)
+        raise ValueError("bad input")
+
+    breaker = CircuitBreaker("test", failure_threshold=1)
+    with pytest.raises(ValueError):
+        call_with_retry(operation, "test", breaker, NO_WAIT_POLICY)
+    assert len(calls) == 1
+    # Fatal errors say nothing about the upstream's health
+    assert breaker.state == "closed"
+
+def test_call_with_retry_raises_last_error_after_max_attempts():
+    calls = []
+
+    def operation(timeout):
+        calls.append(timeout)
+        raise TimeoutError(f"attempt {len(calls)}")
+
+    with pytest.raises(TimeoutError, match="attempt 3"):
+        call_with_retry(operation, "test", None, NO_WAIT_POLICY)
+    assert len(calls) == 3
+
+def test_call_with_retry_fails_fast_when_circuit_is_open():
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        call_with_retry(lambda timeout: "ok", "test", breaker, NO_WAIT_POLICY)
+
+def test_rate_limits_are_retried_without_opening_the_circuit():
+    calls = []
+
+    def operation(timeout):
+        calls.append(timeout)
+        if len(calls) < 3:
+            raise status_error(openai.RateLimitError, 429, {"retry-after-ms": "0"})
+        return "ok"
+
+    breaker = CircuitBreaker("test", failure_threshold=1, recovery_timeout=60)
+    assert is_rate_limit_error(status_error(openai.RateLimitError, 429))
+    assert not is_rate_limit_error(status_error(openai.InternalServerError, 503))
+    assert call_with_retry(operation, "test", breaker, NO_WAIT_POLICY) == "ok"
+    assert len(calls) == 3
+    assert breaker.state == "closed"
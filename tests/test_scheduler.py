@@ -0,0 +1,87 @@
+"""Tests for the priority scheduler in front of OpenAI calls."""
+
+import threading
+import time
+
+import pytest
+
+import utils.rate_limiter as rate_limiter
+import utils.scheduler as scheduler
+from utils.rate_limiter import RateLimiter, RateLimitWaitExceeded
+from utils.scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, PriorityScheduler, SchedulerWaitExceeded
+
+@pytest.fixture(autouse=True)
+def unlimited_rate_limiter(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", RateLimiter(0, 0))
+
+def admit_in_thread(instance, priority, order, max_wait=5.0):
+    def run():
+        admission = instance.admit(priority, 10, 10, max_wait=max_wait)
+        order.append(priority)
+        instance.finish(admission, 20)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+def wait_until_queued(instance, priority, count=1):
+    deadline = time.monotonic() + 2.0
+    while instance.stats()[priority]["queued"] < count:
+        assert time.monotonic() < deadline, f"{priority} call was never queued"
+        time.sleep(0.005)
+
+def test_admit_and_finish_track_in_flight_calls():
+    instance = PriorityScheduler(max_in_flight=4, interactive_concurrency=2, batch_concurrency=1)
+    admission = instance.admit(PRIORITY_INTERACTIVE, 10, 10, max_wait=1.0)
+    assert instance.stats()[PRIORITY_INTERACTIVE]["in_flight"] == 1
+    instance.finish(admission, 15)
+    instance.finish(admission, 15)
+    assert instance.stats()[PRIORITY_INTERACTIVE]["in_flight"] == 0
+
+def test_class_limit_times_out_and_leaves_the_queue():
+    instance = PriorityScheduler(max_in_flight=4, interactive_concurrency=2, batch_concurrency=1)
+    held = instance.admit(PRIORITY_BATCH, 10, 10, max_wait=1.0)
+    with pytest.raises(SchedulerWaitExceeded):
+        instance.admit(PRIORITY_BATCH, 10, 10, max_wait=0.05)
+    assert instance.stats()[PRIORITY_BATCH] == {"in_flight": 1, "queued": 0, "limit": 1}
+    # Interactive calls have their own cap
+    instance.finish(instance.admit(PRIORITY_INTERACTIVE, 10, 10, max_wait=0.05), 20)
+    instance.finish(held, 20)
+
+def test_interactive_calls_go_ahead_of_queued_batch_calls():
+    instance = PriorityScheduler(max_in_flight=1, interactive_concurrency=1, batch_concurrency=1)
+    held = instance.admit(PRIORITY_INTERACTIVE, 10, 10, max_wait=1.0)
+    order = []
+    batch = admit_in_thread(instance, PRIORITY_BATCH, order)
+    wait_until_queued(instance, PRIORITY_BATCH)
+    interactive = admit_in_thread(instance, PRIORITY_INTERACTIVE, order)
+    wait_until_queued(instance, PRIORITY_INTERACTIVE)
+
+    instance.finish(held, 20)
+    interactive.join(2.0)
+    batch.join(2.0)
+    assert order == [PRIORITY_INTERACTIVE, PRIORITY_BATCH]
+
+def test_batch_call_stops_yielding_after_max_wait(monkeypatch):
+    monkeypatch.setattr(scheduler, "SCHEDULER_BATCH_MAX_WAIT", 0.1)
+    instance = PriorityScheduler(max_in_flight=2, interactive_concurrency=1, batch_concurrency=1)
+    held = instance.admit(PRIORITY_INTERACTIVE, 10, 10, max_wait=1.0)
+    order = []
+    waiting_interactive = admit_in_thread(instance, PRIORITY_INTERACTIVE, order)
+    wait_until_queued(instance, PRIORITY_INTERACTIVE)
+
+    admission = instance.admit(PRIORITY_BATCH, 10, 10, max_wait=2.0)
+    assert admission.reservation.waited >= 0.1
+    assert order == []
+
+    instance.finish(admission, 20)
+    instance.finish(held, 20)
+    waiting_interactive.join(2.0)
+    assert order == [PRIORITY_INTERACTIVE]
+
+def test_slot_is_released_when_rate_limiter_rejects(monkeypatch):
+    monkeypatch.setattr(rate_limiter, "_rate_limiter", RateLimiter(0, 600))
+    instance = PriorityScheduler(max_in_flight=4, interactive_concurrency=1, batch_concurrency=1)
+    with pytest.raises(RateLimitWaitExceeded):
+        instance.admit(PRIORITY_INTERACTIVE, 5000, 500, max_wait=0.5)
+    assert instance.stats()[PRIORITY_INTERACTIVE]["in_flight"] == 0
@@ -0,0 +1,88 @@
+"""Tests for the BM25 search index: ranking, superseded sessions and compaction."""
+
+import os
+
+import pytest
+
+import utils.search_index as search_index
+from utils.search_index import SearchIndex, conversation_document, tokenize
+
+def row(session_id: str, summary: str = "", founder: str = "", evaluation: str = ""):
+    return {
+        "session_id": session_id,
+        "summary": summary,
+        "evaluation": {"status": "success", "evaluation_text": evaluation},
+        "messages": [{"role": "assistant", "content": "What are you building?"}, {"role": "user", "content": founder}]
+    }
+
+@pytest.fixture
+def index(tmp_path):
+    index = SearchIndex(os.path.join(str(tmp_path), "search"))
+    yield index
+    index.close()
+
+def test_tokenize_drops_stopwords_and_single_characters():
+    assert tokenize("The founder and I built a Payments API in 2024") == ["founder", "built", "payments", "api", "2024"]
+
+def test_documents_skip_failed_evaluations_and_assistant_messages():
+    document = conversation_document(dict(row("s1", founder="We sell payments"), evaluation={"status": "error", "evaluation_text": "boom"}))
+    assert document["evaluation"] == ""
+    assert document["founder"] == "We sell payments"
+
+def test_bm25_ranks_more_and_rarer_matches_higher(index):
+    index.add_documents([conversation_document(r) for r in (
+        row("payments", summary="Payments infrastructure for payments teams", founder="We process card payments"),
+        row("payments-once", summary="Logistics software", founder="Payments are a side feature"),
+        row("logistics", summary="Logistics software for trucking fleets"),
+        row("hiring", summary="Hiring marketplace", founder="We match engineers with startups")
+    )])
+
+    hits = index.search("payments")
+    assert [hit.session_id for hit in hits] == ["payments", "payments-once"]
+    assert hits[0].score > hits[1].score
+    assert "**Payments**" in hits[0].snippet
+
+    # A term found in one document outweighs one found in several
+    assert index.search("logistics trucking")[0].session_id == "logistics"
+    assert index.search("the and of") == []
+
+def test_hits_report_the_best_matching_field(index):
+    index.add_documents([conversation_document(row("s1", summary="Climate startup", evaluation="Strong technical founder"))])
+    hit = index.search("technical founder")[0]
+    assert hit.field == "evaluation"
+    assert hit.snippet == "Strong **technical** **founder**"
+
+def test_reindexed_session_supersedes_its_older_copy(index):
+    index.add_documents([conversation_document(row("s1", summary="Early draft about robotics"))])
+    index.add_documents([conversation_document(row("s1", summary="Final summary about biotech"))], watermark="2026-01-01")
+
+    assert index.search("robotics") == []
+    assert [hit.session_id for hit in index.search("biotech")] == ["s1"]
+    assert index.stats()["documents"] == 1
+    assert index.watermark == "2026-01-01"
+
+def test_compact_merges_segments_and_drops_superseded_copies(index):
+    index.add_documents([conversation_document(row("s1", summary="robotics"))])
+    index.add_documents([conversation_document(row("s2", summary="robotics arms"))])
+    index.add_documents([conversation_document(row("s1", summary="biotech"))])
+    assert index.stats()["segments"] == 3
+
+    index.compact()
+    assert index.stats()["segments"] == 1
+    assert len([name for name in os.listdir(index.directory) if name.endswith(".bm25")]) == 1
+    assert [hit.session_id for hit in index.search("robotics")] == ["s2"]
+
+    # The compacted index is what a new process opens
+    reopened = SearchIndex(index.directory)
+    try:
+        assert reopened.stats()["documents"] == 2
+        assert [hit.session_id for hit in reopened.search("biotech")] == ["s1"]
+    finally:
+        reopened.close()
+
+def test_segments_are_merged_automatically_past_the_limit(index, monkeypatch):
+    monkeypatch.setattr(search_index, "SEARCH_INDEX_MAX_SEGMENTS", 2)
+    for i in range(3):
+        index.add_documents([conversation_document(row(f"s{i}", summary="robotics"))])
+    assert index.stats()["segments"] == 1
+    assert index.stats()["documents"] == 3
@@ -0,0 +1,210 @@
+"""Tests for the SQLite backend and its outbox drain to an upstream backend."""
+
+import os
+
+import pytest
+
+import utils.storage as storage
+from utils.storage import OUTBOX_STATUS_DEAD, OUTBOX_STATUS_PENDING, SQLiteBackend, StorageBackend
+
+MESSAGES = [{"role": "user", "content": "We build tools."}]
+
+class FakeUpstream(StorageBackend):
+    """Records applied writes; sessions listed in failures raise that error."""
+
+    def __init__(self):
+        self.applied = []
+        self.requests = []
+        self.failures = {}
+        self.rows = {}
+
+    def _check(self, session_ids):
+        for session_id in session_ids:
+            if session_id in self.failures:
+                raise self.failures[session_id]
+
+    def upsert_conversations(self, rows):
+        self.requests.append([row["session_id"] for row in rows])
+        self._check(row["session_id"] for row in rows)
+        for row in rows:
+            self.applied.append(("upsert", row["session_id"]))
+            self.rows.setdefault(row["session_id"], {}).update(row)
+        return len(rows)
+
+    def update_conversation(self, session_id, fields):
+        self._check([session_id])
+        if session_id not in self.rows:
+            return False
+        self.applied.append(("update", session_id))
+        self.rows[session_id].update(fields)
+        return True
+
+    def get_conversation(self, session_id):
+        return self.rows.get(session_id)
+
+    def fetch_conversations_page(self, columns, page_size, conversation_filter, after):
+        return list(self.rows.values())[:page_size] if after is None else []
+
+    def count_conversations(self, conversation_filter, after):
+        return len(self.rows) if after is None else 0
+
+    def list_conversations(self, limit):
+        return list(reversed(list(self.rows.values())))[:limit]
+
+    def upsert_messages(self, rows):
+        self._check(row["session_id"] for row in rows)
+        self.applied.append(("messages", len(rows)))
+
+    def get_messages(self, session_id):
+        return []
+
+@pytest.fixture
+def upstream():
+    return FakeUpstream()
+
+@pytest.fixture
+def outbox(tmp_path, upstream, monkeypatch):
+    # Failed operations become available again immediately
+    monkeypatch.setattr(storage, "OUTBOX_DRAIN_INTERVAL", 0.0)
+    monkeypatch.setattr(storage, "OUTBOX_MAX_FATAL_ATTEMPTS", 2)
+    return SQLiteBackend(os.path.join(str(tmp_path), "outbox.sqlite3"), upstream=upstream)
+
+def outbox_rows(backend):
+    with backend._connection() as conn:
+        return [dict(row) for row in conn.execute("SELECT * FROM outbox ORDER BY id")]
+
+def test_backends_must_implement_the_whole_interface():
+    class PartialBackend(StorageBackend):
+        def upsert_conversations(self, rows):
+            return len(rows)
+
+    with pytest.raises(TypeError):
+        PartialBackend()
+
+def test_local_store_round_trip(tmp_path):
+    backend = SQLiteBackend(os.path.join(str(tmp_path), "local.sqlite3"))
+    assert backend.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}]) == 1
+    assert backend.update_conversation("s1", {"summary": "Builds tools", "evaluation": {"status": "success"}})
+    row = backend.get_conversation("s1")
+    assert row["messages"] == MESSAGES
+    assert row["evaluation"] == {"status": "success"}
+    assert not backend.update_conversation("missing", {"summary": "x"})
+    assert outbox_rows(backend) == []
+
+def test_drain_applies_writes_in_order_and_empties_outbox(outbox, upstream):
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.update_conversation("s1", {"summary": "Builds tools"})
+    outbox.upsert_conversations([{"session_id": "s2", "messages": MESSAGES}])
+    assert outbox.has_pending("s1")
+
+    assert outbox.drain_once() == 3
+    assert upstream.applied == [("upsert", "s1"), ("update", "s1"), ("upsert", "s2")]
+    assert outbox.backlog() == {}
+    assert not outbox.has_pending("s1")
+
+def test_consecutive_upserts_are_sent_as_one_request(outbox, upstream):
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.upsert_conversations([{"session_id": "s2", "messages": MESSAGES}])
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES + MESSAGES}])
+
+    assert outbox.drain_once() == 3
+    # Only the latest write per session is sent
+    assert upstream.requests == [["s1", "s2"]]
+    assert len(upstream.rows["s1"]["messages"]) == 2
+
+def test_retryable_error_keeps_operations_and_ends_the_pass(outbox, upstream, monkeypatch):
+    monkeypatch.setattr(storage, "OUTBOX_DRAIN_INTERVAL", 60.0)
+    upstream.failures["s1"] = TimeoutError("upstream timeout")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.update_conversation("s1", {"summary": "Builds tools"})
+
+    assert outbox.drain_once() == 0
+    rows = outbox_rows(outbox)
+    assert [row["status"] for row in rows] == [OUTBOX_STATUS_PENDING] * 2
+    assert rows[0]["attempts"] == 1 and "upstream timeout" in rows[0]["last_error"]
+    # Backing off: nothing is retried before available_at
+    assert outbox.drain_once() == 0
+    assert upstream.applied == []
+
+def test_session_backing_off_does_not_block_other_sessions(outbox, upstream, monkeypatch):
+    monkeypatch.setattr(storage, "OUTBOX_DRAIN_INTERVAL", 60.0)
+    upstream.failures["s1"] = ValueError("rejected")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.update_conversation("s1", {"summary": "Builds tools"})
+    outbox.upsert_conversations([{"session_id": "s2", "messages": MESSAGES}])
+    outbox.update_conversation("s2", {"summary": "Sells tools"})
+
+    assert outbox.drain_once() == 2
+    assert upstream.applied == [("upsert", "s2"), ("update", "s2")]
+    # The later update of s1 waits behind its failed upsert
+    assert outbox.drain_once() == 0
+    assert [row["session_id"] for row in outbox_rows(outbox)] == ["s1", "s1"]
+
+def test_recovered_session_drains_in_order(outbox, upstream):
+    upstream.failures["s1"] = ValueError("rejected once")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.update_conversation("s1", {"summary": "Builds tools"})
+    assert outbox.drain_once() == 0
+
+    del upstream.failures["s1"]
+    assert outbox.drain_once() == 2
+    assert upstream.applied == [("upsert", "s1"), ("update", "s1")]
+
+def test_fatal_group_is_parked_dead_with_later_operations_of_its_session(outbox, upstream):
+    upstream.failures["s1"] = ValueError("rejected")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.update_conversation("s1", {"summary": "Builds tools"})
+    outbox.upsert_conversations([{"session_id": "s2", "messages": MESSAGES}])
+
+    outbox.drain_once()
+    outbox.drain_once()
+    assert outbox.backlog() == {OUTBOX_STATUS_DEAD: 2}
+    assert upstream.applied == [("upsert", "s2")]
+
+    # Writes made after the session's operations were parked are drained again
+    del upstream.failures["s1"]
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    assert outbox.drain_once() == 1
+    assert outbox.backlog() == {OUTBOX_STATUS_DEAD: 2}
+
+def test_rejected_bulk_upsert_is_retried_per_operation(outbox, upstream):
+    upstream.failures["s1"] = ValueError("bad row")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.upsert_conversations([{"session_id": "s2", "messages": MESSAGES}])
+
+    assert outbox.drain_once() == 1
+    assert upstream.requests == [["s1", "s2"], ["s1"], ["s2"]]
+    assert [row["session_id"] for row in outbox_rows(outbox)] == ["s1"]
+
+def test_message_rows_drain_independently_of_sessions(outbox, upstream, monkeypatch):
+    monkeypatch.setattr(storage, "OUTBOX_DRAIN_INTERVAL", 60.0)
+    upstream.failures["s1"] = ValueError("rejected")
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    outbox.upsert_messages([{"session_id": "s2", "seq": 0, "role": "user", "content": "hi"}])
+
+    assert outbox.drain_once() == 1
+    assert upstream.applied == [("messages", 1)]
+
+def test_update_reports_only_applied_patches(outbox, upstream):
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    assert outbox.update_conversation("s1", {"summary": "Builds tools"})
+    assert [row["operation"] for row in outbox_rows(outbox)] == ["upsert_conversation", "update_conversation"]
+
+    # Unknown locally: the patch goes upstream directly and its result is returned
+    assert not outbox.update_conversation("missing", {"summary": "x"})
+    upstream.rows["remote"] = {"session_id": "remote"}
+    assert outbox.update_conversation("remote", {"summary": "Remote"})
+    assert upstream.rows["remote"]["summary"] == "Remote"
+    assert len(outbox_rows(outbox)) == 2
+
+def test_pending_sessions_are_read_locally(outbox, upstream):
+    outbox.upsert_conversations([{"session_id": "s1", "messages": MESSAGES}])
+    assert outbox.get_conversation("s1")["messages"] == MESSAGES
+    assert upstream.applied == []
+
+def test_flush_drains_everything(outbox, upstream):
+    for i in range(5):
+        outbox.upsert_conversations([{"session_id": f"s{i}", "messages": MESSAGES}])
+        outbox.update_conversation(f"s{i}", {"summary": f"Summary {i}"})
+    assert outbox.flush(2.0)
+    assert len(upstream.applied) == 10
@@ -0,0 +1,86 @@
+"""Tests for generating the end-of-interview summary and evaluation."""
+
+import threading
+import time
+
+import pytest
+
+import utils.openai_client as openai_client
+import utils.supabase_client as supabase_client
+from tools.stub_servers import LatencyProfile, start_openai_stub
+from utils.result_cache import ResultCache
+
+MESSAGES = [{"role": "assistant", "content": "Tell me about your startup."}, {"role": "user", "content": "We build tools."}]
+EVALUATION = {"evaluation_text": "Strong founder.", "type": "text_evaluation", "status": "success"}
+
+def fake_calls(monkeypatch, summary, evaluation):
+    """Replace the two LLM calls with fakes; each argument is a callable run on the worker thread."""
+    monkeypatch.setattr(supabase_client, "OPENAI_COMBINED_SUMMARY_EVALUATION", False)
+    monkeypatch.setattr(supabase_client, "generate_summary", lambda messages, api_key: summary())
+    monkeypatch.setattr(supabase_client, "generate_evaluation", lambda messages, api_key: evaluation())
+
+def test_summary_and_evaluation_run_concurrently(monkeypatch):
+    both_started = threading.Barrier(2, timeout=2.0)
+
+    def summary():
+        both_started.wait()
+        return "A summary"
+
+    def evaluation():
+        both_started.wait()
+        return EVALUATION
+
+    fake_calls(monkeypatch, summary, evaluation)
+    # Each fake only returns once the other has started, so a sequential run would break the barrier
+    assert supabase_client.generate_summary_and_evaluation("session-1", MESSAGES, "") == ("A summary", EVALUATION)
+
+def test_failed_call_does_not_affect_the_other(monkeypatch):
+    def evaluation():
+        raise RuntimeError("evaluation failed")
+
+    fake_calls(monkeypatch, lambda: "A summary", evaluation)
+    assert supabase_client.generate_summary_and_evaluation("session-1", MESSAGES, "") == ("A summary", None)
+
+def test_timed_out_call_leaves_none_without_waiting_for_it(monkeypatch):
+    release = threading.Event()
+    monkeypatch.setattr(supabase_client, "END_CONVERSATION_LLM_TIMEOUT", 0.2)
+    fake_calls(monkeypatch, lambda: release.wait(5.0) and "late summary", lambda: EVALUATION)
+
+    start = time.monotonic()
+    try:
+        assert supabase_client.generate_summary_and_evaluation("session-1", MESSAGES, "") == (None, EVALUATION)
+        assert time.monotonic() - start < 1.0
+    finally:
+        release.set()
+
+def test_combined_mode_skips_the_separate_calls(monkeypatch):
+    monkeypatch.setattr(supabase_client, "OPENAI_COMBINED_SUMMARY_EVALUATION", True)
+    monkeypatch.setattr(supabase_client, "generate_combined_summary_evaluation", lambda messages, api_key: ("Combined", EVALUATION))
+    monkeypatch.setattr(supabase_client, "generate_summary", lambda messages, api_key: pytest.fail("separate call made"))
+
+    assert supabase_client.generate_summary_and_evaluation("session-1", MESSAGES, "") == ("Combined", EVALUATION)
+
+def test_failed_combined_call_falls_back_to_separate_calls(monkeypatch):
+    fake_calls(monkeypatch, lambda: "A summary", lambda: EVALUATION)
+    monkeypatch.setattr(supabase_client, "OPENAI_COMBINED_SUMMARY_EVALUATION", True)
+    monkeypatch.setattr(supabase_client, "generate_combined_summary_evaluation", lambda messages, api_key: None)
+
+    assert supabase_client.generate_summary_and_evaluation("session-1", MESSAGES, "") == ("A summary", EVALUATION)
+
+def test_combined_call_parses_the_json_reply(monkeypatch):
+    server = start_openai_stub(LatencyProfile(median_ms=0))
+    get_client = openai_client.get_openai_client
+    monkeypatch.setattr(openai_client, "get_openai_client", lambda api_key: get_client(api_key, server.url + "/v1"))
+    monkeypatch.setattr(openai_client, "get_result_cache", lambda: ResultCache(disk_dir=None))
+    try:
+        summary, evaluation = openai_client.generate_combined_summary_evaluation(MESSAGES, "sk-test")
+    finally:
+        server.stop()
+
+    assert summary == "Stub summary of the founder interview."
+    assert evaluation["evaluation_text"] == "Stub evaluation of the founder."
+    assert evaluation["status"] == "success"
+    assert evaluation["prompt_version"] == openai_client.PROMPT_VERSION
+
+def test_combined_call_without_content_is_not_attempted():
+    assert openai_client.generate_combined_summary_evaluation([{"role": "user", "content": "  "}], "sk-test") is None
@@ -0,0 +1,141 @@
+"""Tests for the conversation save path against local SQLite and PostgREST stub backends."""
+
+import os
+
+import pytest
+from supabase import create_client
+
+import utils.supabase_client as supabase_client
+from tools.stub_servers import LatencyProfile, start_postgrest_stub
+from utils.openai_client import SUMMARY_ERROR_TEXT
+from utils.storage import ConversationFilter, SQLiteBackend, SupabaseBackend
+
+STUB_KEY = "stub.stub.stub"
+
+MESSAGES = [{"role": "assistant", "content": "Tell me about your startup."}, {"role": "user", "content": "We build tools."}]
+EVALUATION = {"status": "success", "score": 7}
+
+@pytest.fixture
+def backend(tmp_path):
+    backend = SQLiteBackend(os.path.join(str(tmp_path), "conversations.sqlite3"))
+    supabase_client.configure_storage_backend(backend)
+    yield backend
+    supabase_client.configure_storage_backend(None)
+
+def fake_results(monkeypatch, summary, evaluation):
+    monkeypatch.setattr(supabase_client, "generate_summary_and_evaluation", lambda *args: (summary, evaluation))
+
+def finalize_with(monkeypatch, summary, evaluation):
+    """Save the transcript like the app does, then run the finalize job's step."""
+    fake_results(monkeypatch, summary, evaluation)
+    assert supabase_client.save_conversation("session-1", MESSAGES, "", "")
+    return supabase_client.add_summary_and_evaluation("session-1", MESSAGES, "", "", "", require_complete=True)
+
+def test_complete_results_finalize_the_conversation(backend, monkeypatch):
+    assert finalize_with(monkeypatch, "A summary", EVALUATION)
+    row = backend.get_conversation("session-1")
+    assert row["summary"] == "A summary" and row["evaluation"] == EVALUATION
+    assert row["messages"] == MESSAGES
+
+@pytest.mark.parametrize("summary, evaluation", [
+    (None, None),
+    (None, EVALUATION),
+    (SUMMARY_ERROR_TEXT, EVALUATION),
+    ("A summary", {"status": "error"})
+])
+def test_incomplete_results_fail_the_finalize_job(backend, monkeypatch, summary, evaluation):
+    assert not finalize_with(monkeypatch, summary, evaluation)
+    # The transcript is stored either way
+    assert backend.get_conversation("session-1")["messages"] == MESSAGES
+
+def test_finalize_job_needs_the_saved_transcript(backend, monkeypatch):
+    fake_results(monkeypatch, "A summary", EVALUATION)
+    assert not supabase_client.add_summary_and_evaluation("session-1", MESSAGES, "", "", "", require_complete=True)
+
+def test_saved_transcript_counts_as_success_without_llm_results(backend, monkeypatch):
+    fake_results(monkeypatch, None, None)
+    assert supabase_client.save_conversation_with_summary("session-1", MESSAGES, "", "", "")
+    row = backend.get_conversation("session-1")
+    assert row["messages"] == MESSAGES and row["summary"] is None
+
+    fake_results(monkeypatch, SUMMARY_ERROR_TEXT, None)
+    assert supabase_client.save_conversation_with_summary("session-1", MESSAGES, "", "", "")
+
+def test_ended_at_is_kept_as_given(backend, monkeypatch):
+    fake_results(monkeypatch, "A summary", EVALUATION)
+    ended_at = "2024-05-01T12:00:00+00:00"
+    assert supabase_client.save_conversation_with_summary("session-1", MESSAGES, "", "", "", ended_at=ended_at)
+    assert supabase_client.save_conversation("session-1", MESSAGES, "", "", ended_at=ended_at)
+    assert backend.get_conversation("session-1")["ended_at"] == ended_at
+
+@pytest.fixture
+def postgrest(monkeypatch):
+    """A SupabaseBackend talking to the local PostgREST stub."""
+    server = start_postgrest_stub(LatencyProfile(median_ms=0))
+    supabase_client.configure_storage_backend(SupabaseBackend(create_client(server.url, STUB_KEY)))
+    monkeypatch.setattr(supabase_client, "CONVERSATION_CACHE_ENABLED", False)
+    yield server.httpd.RequestHandlerClass.tables
+    supabase_client.configure_storage_backend(None)
+    server.stop()
+
+def test_repeated_save_upserts_one_row_and_keeps_created_at(postgrest):
+    assert supabase_client.save_conversation("session-1", MESSAGES, "", "")
+    created_at = postgrest["conversations"][0]["created_at"]
+    assert supabase_client.save_conversation("session-1", MESSAGES + MESSAGES, "", "")
+
+    rows = postgrest["conversations"]
+    assert len(rows) == 1
+    assert rows[0]["created_at"] == created_at
+    assert len(rows[0]["messages"]) == 4
+
+def test_update_patches_only_given_columns(postgrest):
+    supabase_client.save_conversation("session-1", MESSAGES, "", "", ended_at="2026-01-01T00:00:00+00:00")
+    assert supabase_client.update_conversation_fields("session-1", "", "", summary="A summary")
+
+    row = postgrest["conversations"][0]
+    assert row["summary"] == "A summary"
+    assert row["ended_at"] == "2026-01-01T00:00:00+00:00"
+    assert row["messages"] == MESSAGES
+    assert not supabase_client.update_conversation_fields("missing", "", "", summary="A summary")
+
+def seed_conversations(tables, count: int):
+    """Rows with pairwise-tied created_at values, so the cursor must break ties on id."""
+    tables["conversations"] = [
+        {
+            "id": f"id-{i:02d}",
+            "created_at": f"2026-01-0{1 + i // 2}T00:00:00+00:00",
+            "session_id": f"session-{i:02d}",
+            "ended_at": "2026-02-01T00:00:00+00:00" if i % 3 else None,
+            "messages": MESSAGES
+        }
+        for i in reversed(range(count))
+    ]
+
+def test_keyset_cursor_continues_after_the_last_row():
+    backend = SupabaseBackend(create_client("http://127.0.0.1:9", STUB_KEY))
+    query = backend._conversations_query("session_id", None, {"created_at": "2026-01-01T00:00:00+00:00", "id": "id-03"})
+    params = dict(query.params.multi_items())
+
+    assert params["or"] == '(created_at.gt."2026-01-01T00:00:00+00:00",and(created_at.eq."2026-01-01T00:00:00+00:00",id.gt.id-03))'
+    assert params["order"] == "created_at.asc,id.asc"
+
+@pytest.mark.parametrize("prefetch", [0, 2])
+def test_pages_walk_every_row_once_in_keyset_order(postgrest, prefetch):
+    seed_conversations(postgrest, 7)
+    pages = list(supabase_client.iter_conversation_pages("", "", "session_id", page_size=2, prefetch=prefetch))
+
+    assert [len(page) for page in pages] == [2, 2, 2, 1]
+    assert [row["session_id"] for page in pages for row in page] == [f"session-{i:02d}" for i in range(7)]
+    # The projection always carries the cursor columns
+    assert set(pages[0][0]) == {"session_id", "created_at", "id"}
+
+def test_pages_resume_from_a_cursor_with_filters(postgrest):
+    seed_conversations(postgrest, 7)
+    first = supabase_client.fetch_conversations_page("", "", "session_id", page_size=2, conversation_filter=ConversationFilter(ended=True))
+    rest = list(supabase_client.iter_conversations(
+        "", "", "session_id", page_size=2, conversation_filter=ConversationFilter(ended=True),
+        after=supabase_client.page_cursor(first), prefetch=0
+    ))
+
+    assert [row["session_id"] for row in first + rest] == ["session-01", "session-02", "session-04", "session-05"]
+    assert supabase_client.count_conversations("", "", ConversationFilter(ended=True), supabase_client.page_cursor(first)) == 2
@@ -0,0 +1,86 @@
+"""Tests for span nesting, session attribution, cross-thread propagation and the OTLP file export."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import utils.tracing as tracing
+from utils.tracing import TraceExporter, iter_trace_file, propagate, session_context, span
+
+@pytest.fixture
+def exporter(tmp_path, monkeypatch):
+    """A recording exporter without its background thread; spans are read from its file after flush()."""
+    exporter = TraceExporter(file_path=os.path.join(str(tmp_path), "traces.jsonl"))
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    return exporter
+
+def exported(exporter):
+    exporter.flush()
+    return {record["name"]: record for record in iter_trace_file(exporter.file_path)}
+
+def test_spans_are_noops_while_tracing_is_off(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporter", None)
+    with span("turn") as current:
+        assert current is None
+
+def test_nested_spans_share_the_trace_and_link_to_their_parent(exporter):
+    with span("turn", turn=3):
+        with span("llm"):
+            pass
+    with span("next_turn"):
+        pass
+
+    spans = exported(exporter)
+    assert spans["llm"]["trace_id"] == spans["turn"]["trace_id"]
+    assert spans["llm"]["parent_span_id"] == spans["turn"]["span_id"]
+    assert spans["turn"]["parent_span_id"] is None
+    assert spans["next_turn"]["trace_id"] != spans["turn"]["trace_id"]
+    assert spans["turn"]["attributes"]["turn"] == 3
+    assert spans["turn"]["start_ns"] <= spans["llm"]["start_ns"] <= spans["llm"]["end_ns"] <= spans["turn"]["end_ns"]
+
+def test_failed_span_records_the_error_and_reraises(exporter):
+    with pytest.raises(ValueError):
+        with span("save"):
+            raise ValueError("bad row")
+    assert exported(exporter)["save"]["error"] == "ValueError: bad row"
+
+def test_session_id_is_attached_to_spans_in_its_context(exporter):
+    with session_context("session-1"):
+        with span("job"):
+            pass
+    with span("unbound"):
+        pass
+
+    spans = exported(exporter)
+    assert spans["job"]["session_id"] == "session-1"
+    assert spans["unbound"]["session_id"] is None
+
+def test_propagate_carries_span_and_session_to_worker_threads(exporter):
+    def work(name):
+        with span(name):
+            return threading.current_thread().name
+
+    with session_context("session-1"):
+        with span("end_conversation"):
+            with ThreadPoolExecutor(max_workers=1, thread_name_prefix="worker") as executor:
+                worker_thread = executor.submit(propagate(work), "summary").result()
+                executor.submit(work, "detached").result()
+
+    spans = exported(exporter)
+    assert worker_thread.startswith("worker")
+    assert spans["summary"]["parent_span_id"] == spans["end_conversation"]["span_id"]
+    assert spans["summary"]["session_id"] == "session-1"
+    assert spans["summary"]["attributes"]["thread.name"] == worker_thread
+    # Without propagate the worker starts from an empty context
+    assert spans["detached"]["parent_span_id"] is None
+    assert spans["detached"]["session_id"] is None
+
+def test_full_buffer_drops_spans(exporter):
+    exporter.max_pending = 2
+    for name in ("a", "b", "c"):
+        with span(name):
+            pass
+    assert exporter.dropped == 1
+    assert set(exported(exporter)) == {"a", "b"}
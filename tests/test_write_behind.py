@@ -0,0 +1,74 @@
+"""Tests for the write-behind buffer with healthy, flaky and failing writers."""
+
+import threading
+
+from utils.write_behind import WriteBehindBuffer
+
+def make_buffer(writer, **options):
+    options.setdefault("flush_interval", 0.01)
+    return WriteBehindBuffer("test", writer, **options)
+
+def test_records_are_written_in_order_and_in_batches():
+    batches = []
+    buffer = make_buffer(batches.append, batch_size=3).start()
+    for i in range(7):
+        assert buffer.put({"seq": i})
+    assert buffer.flush(2.0)
+    assert [record["seq"] for batch in batches for record in batch] == list(range(7))
+    assert max(len(batch) for batch in batches) <= 3
+    buffer.stop(1.0)
+
+def test_full_buffer_drops_new_records():
+    release = threading.Event()
+    buffer = make_buffer(lambda batch: release.wait(2.0), max_pending=2, batch_size=1)
+    assert buffer.put({"seq": 0})
+    assert buffer.put({"seq": 1})
+    assert not buffer.put({"seq": 2})
+    release.set()
+
+def test_transient_failures_are_retried_until_written():
+    attempts = []
+    written = []
+
+    def writer(batch):
+        attempts.append(len(batch))
+        if len(attempts) < 3:
+            raise ConnectionError("database unavailable")
+        written.extend(batch)
+
+    buffer = make_buffer(writer, max_fatal_attempts=2).start()
+    buffer.put({"seq": 0})
+    buffer.put({"seq": 1})
+    assert buffer.flush(5.0)
+    assert len(attempts) == 3
+    assert written == [{"seq": 0}, {"seq": 1}]
+    buffer.stop(1.0)
+
+def test_batch_failing_fatally_is_dropped_after_max_attempts():
+    attempts = []
+
+    def writer(batch):
+        attempts.append(len(batch))
+        raise ValueError('relation "conversation_messages" does not exist')
+
+    buffer = make_buffer(writer, max_fatal_attempts=3).start()
+    buffer.put({"seq": 0})
+    # The flush settles once the batch is given up on instead of waiting out the timeout
+    assert buffer.flush(2.0)
+    assert attempts == [1, 1, 1]
+
+    later = []
+    buffer.writer = later.append
+    buffer.put({"seq": 1})
+    assert buffer.flush(2.0)
+    assert later == [[{"seq": 1}]]
+    buffer.stop(1.0)
+
+def test_flush_times_out_while_writer_keeps_failing():
+    def writer(batch):
+        raise TimeoutError()
+
+    buffer = make_buffer(writer, flush_interval=0.05).start()
+    buffer.put({"seq": 0})
+    assert not buffer.flush(0.2)
+    buffer.stop(0.1)
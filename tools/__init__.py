@@ -0,0 +1 @@
+# Operational tools (load testing, batch jobs) for the LLM Chat Agent
@@ -0,0 +1,37 @@
+"""
+Credential lookup for command-line tools.
+Values come from command-line flags, then environment variables, then the
+Streamlit secrets file used by the app.
+"""
+
+import os
+from typing import Any, Dict, Optional
+
+SECRETS_PATH = ".streamlit/secrets.toml"
+
+def load_secrets(path: str = SECRETS_PATH) -> Dict[str, Any]:
+    """Parse the Streamlit secrets file, or return an empty dict if it does not exist."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        import tomllib
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except ImportError:
+        import toml
+        return toml.load(path)
+
+def resolve_credential(flag_value: Optional[str], name: str, section: str, secrets: Dict[str, Any]) -> Optional[str]:
+    """
+    Resolve one credential.
+
+    Args:
+        flag_value: Value passed on the command line, if any
+        name: Environment variable and secrets key (e.g. 'SUPABASE_URL')
+        section: Section of the secrets file holding the key (e.g. 'database')
+        secrets: Parsed secrets from load_secrets()
+
+    Returns:
+        str: The first value found, or None
+    """
+    return flag_value or os.environ.get(name) or secrets.get(section, {}).get(name)
@@ -0,0 +1,309 @@
+"""
+Bulk export of stored conversations to compressed files.
+
+Streams ended conversations page by page and writes, per chunk of rows:
+  - conversations-NNNNN.jsonl.gz|.zst  full rows, one JSON object per line
+  - messages-NNNNN.csv.gz|.csv.zst|.parquet  one row per message
+    (session_id, turn_index, role, length, content)
+  - sessions-NNNNN.csv.gz|.csv.zst|.parquet  one row per conversation with
+    message counts and evaluation status
+
+Each run writes into its own directory, which is renamed from <run>.partial
+once complete. Repeated runs are incremental: only conversations whose
+ended_at falls after the previous run's watermark are exported.
+
+Usage:
+    python -m tools.export --output exports
+    python -m tools.export --output exports --compression zstd --table-format parquet
+    python -m tools.export --output exports --full
+"""
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import sys
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, IO, List, Optional, Tuple
+
+from tools.credentials import load_secrets, resolve_credential
+from utils.supabase_client import ConversationFilter, iter_conversation_pages
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency - only needed for --compression zstd
+    zstandard = None
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:  # Optional dependency - only needed for --table-format parquet
+    pyarrow = None
+
+STATE_FILE = "export-state.json"
+EXPORT_COLUMNS = "id,session_id,created_at,ended_at,messages,summary,evaluation"
+MESSAGE_COLUMNS = ("session_id", "turn_index", "role", "length", "content")
+SESSION_COLUMNS = (
+    "session_id", "created_at", "ended_at", "message_count", "founder_message_count",
+    "founder_chars", "assistant_chars", "has_summary", "evaluation_status", "prompt_version"
+)
+# Parquet column types (everything else is a string)
+INTEGER_COLUMNS = {"turn_index", "length", "message_count", "founder_message_count", "founder_chars", "assistant_chars"}
+BOOLEAN_COLUMNS = {"has_summary"}
+COMPRESSION_LEVELS = {"gzip": 6, "zstd": 10}
+EXTENSIONS = {"gzip": ".gz", "zstd": ".zst"}
+
+def open_compressed(path: str, compression: str) -> IO[str]:
+    """Open a text stream that compresses to path as it is written."""
+    if compression == "gzip":
+        return gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=COMPRESSION_LEVELS["gzip"])
+    writer = zstandard.ZstdCompressor(level=COMPRESSION_LEVELS["zstd"]).stream_writer(open(path, "wb"))
+    return io.TextIOWrapper(writer, encoding="utf-8", newline="")
+
+def message_rows(row: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Flatten a conversation into one row per message."""
+    return [
+        {
+            "session_id": row["session_id"],
+            "turn_index": index,
+            "role": message.get("role"),
+            "length": len(message.get("content") or ""),
+            "content": message.get("content") or ""
+        }
+        for index, message in enumerate(row.get("messages") or [])
+    ]
+
+def session_row(row: Dict[str, Any]) -> Dict[str, Any]:
+    """Per-conversation summary row."""
+    messages = row.get("messages") or []
+    founder = [message.get("content") or "" for message in messages if message.get("role") == "user"]
+    assistant = [message.get("content") or "" for message in messages if message.get("role") == "assistant"]
+    evaluation = row.get("evaluation") if isinstance(row.get("evaluation"), dict) else {}
+    return {
+        "session_id": row["session_id"],
+        "created_at": row.get("created_at"),
+        "ended_at": row.get("ended_at"),
+        "message_count": len(messages),
+        "founder_message_count": len(founder),
+        "founder_chars": sum(len(content) for content in founder),
+        "assistant_chars": sum(len(content) for content in assistant),
+        "has_summary": bool(row.get("summary")),
+        "evaluation_status": evaluation.get("status"),
+        "prompt_version": evaluation.get("prompt_version")
+    }
+
+class CsvTableWriter:
+    """Compressed CSV table."""
+
+    extension = ".csv"
+
+    def __init__(self, path: str, columns: Tuple[str, ...], compression: str):
+        self.path = path + self.extension + EXTENSIONS[compression]
+        self._file = open_compressed(self.path, compression)
+        self._writer = csv.DictWriter(self._file, fieldnames=columns)
+        self._writer.writeheader()
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._file.close()
+
+class ParquetTableWriter:
+    """Parquet table written in row groups, so only one group is held in memory."""
+
+    extension = ".parquet"
+    row_group_size = 10000
+
+    def __init__(self, path: str, columns: Tuple[str, ...], compression: str):
+        self.path = path + self.extension
+        # An explicit schema keeps columns that are null in the first row group typed
+        self.schema = pyarrow.schema([
+            (column, pyarrow.int64() if column in INTEGER_COLUMNS else pyarrow.bool_() if column in BOOLEAN_COLUMNS else pyarrow.string())
+            for column in columns
+        ])
+        self._writer = pyarrow.parquet.ParquetWriter(self.path, self.schema, compression=compression)
+        self._buffer: List[Dict[str, Any]] = []
+
+    def write(self, rows: List[Dict[str, Any]]):
+        self._buffer.extend(rows)
+        if len(self._buffer) >= self.row_group_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._buffer:
+            return
+        self._writer.write_table(pyarrow.Table.from_pylist(self._buffer, schema=self.schema))
+        self._buffer = []
+
+    def close(self):
+        self._flush()
+        self._writer.close()
+
+class ExportChunk:
+    """The three output files of one chunk."""
+
+    def __init__(self, directory: str, index: int, compression: str, table_format: str):
+        table_class = ParquetTableWriter if table_format == "parquet" else CsvTableWriter
+        suffix = f"{index:05d}"
+        self.conversations_path = os.path.join(directory, f"conversations-{suffix}.jsonl{EXTENSIONS[compression]}")
+        self._conversations = open_compressed(self.conversations_path, compression)
+        self._messages = table_class(os.path.join(directory, f"messages-{suffix}"), MESSAGE_COLUMNS, compression)
+        self._sessions = table_class(os.path.join(directory, f"sessions-{suffix}"), SESSION_COLUMNS, compression)
+        self.rows = 0
+        self.messages = 0
+
+    def write(self, row: Dict[str, Any]):
+        self._conversations.write(json.dumps(row, ensure_ascii=False) + "\n")
+        messages = message_rows(row)
+        self._messages.write(messages)
+        self._sessions.write([session_row(row)])
+        self.rows += 1
+        self.messages += len(messages)
+
+    def close(self) -> List[str]:
+        self._conversations.close()
+        self._messages.close()
+        self._sessions.close()
+        return [self.conversations_path, self._messages.path, self._sessions.path]
+
+def load_state(output: str) -> Dict[str, Any]:
+    try:
+        with open(os.path.join(output, STATE_FILE), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+def save_state(output: str, state: Dict[str, Any]):
+    """Atomically persist the watermark (written only after a run completed)."""
+    path = os.path.join(output, STATE_FILE)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, path)
+
+def run_export(args: argparse.Namespace, supabase_url: str, supabase_key: str) -> Dict[str, Any]:
+    """
+    Export conversations that ended since the last run.
+
+    Args:
+        args: Parsed command-line options
+        supabase_url: Supabase project URL
+        supabase_key: Supabase key with read access to conversations
+
+    Returns:
+        Dict: Report with the export window, counts, output files and throughput
+    """
+    os.makedirs(args.output, exist_ok=True)
+    state = {} if args.full else load_state(args.output)
+    started = datetime.now(timezone.utc)
+    # Rows that ended within the settle window may still receive their summary/evaluation
+    ended_after = state.get("ended_until")
+    ended_until = (started - timedelta(seconds=args.settle_seconds)).isoformat()
+    run_id = started.strftime("%Y%m%dT%H%M%SZ")
+    partial_dir = os.path.join(args.output, f"{run_id}.partial")
+    os.makedirs(partial_dir, exist_ok=True)
+
+    files: List[str] = []
+    rows = messages = chunks = 0
+    chunk = None
+    run_start = time.perf_counter()
+    pages = iter_conversation_pages(
+        supabase_url, supabase_key, EXPORT_COLUMNS, args.page_size,
+        ConversationFilter(ended_after=ended_after, ended_until=ended_until)
+    )
+    with closing(pages):
+        for page in pages:
+            for row in page:
+                if chunk is None:
+                    chunk = ExportChunk(partial_dir, chunks, args.compression, args.table_format)
+                    chunks += 1
+                chunk.write(row)
+                if chunk.rows >= args.chunk_rows:
+                    files.extend(chunk.close())
+                    rows, messages, chunk = rows + chunk.rows, messages + chunk.messages, None
+                    print(f"chunk done: {rows} conversations exported", file=sys.stderr)
+    if chunk is not None:
+        files.extend(chunk.close())
+        rows, messages = rows + chunk.rows, messages + chunk.messages
+    elapsed = time.perf_counter() - run_start
+
+    run_dir = os.path.join(args.output, run_id) if rows else None
+    files = [os.path.join(run_dir, os.path.basename(path)) for path in files] if rows else []
+    manifest = {
+        "run_id": run_id,
+        "ended_after": ended_after,
+        "ended_until": ended_until,
+        "conversations": rows,
+        "messages": messages,
+        "chunks": chunks,
+        "compression": args.compression,
+        "table_format": args.table_format,
+        "files": [os.path.basename(path) for path in files]
+    }
+    if rows:
+        with open(os.path.join(partial_dir, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(partial_dir, run_dir)
+    else:
+        # Nothing new: advance the watermark without leaving an empty run directory
+        os.rmdir(partial_dir)
+    save_state(args.output, {"ended_until": ended_until, "last_run_id": run_id})
+
+    report = dict(manifest, directory=run_dir)
+    report["bytes"] = sum(os.path.getsize(path) for path in files)
+    report["elapsed_seconds"] = round(elapsed, 3)
+    report["conversations_per_second"] = round(rows / elapsed, 3) if elapsed else 0.0
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Export ended conversations to compressed JSONL and table files.")
+    parser.add_argument("--output", default="exports", help="Directory holding run directories and the watermark")
+    parser.add_argument("--compression", choices=("gzip", "zstd"), default="gzip", help="zstd needs the zstandard package")
+    parser.add_argument("--table-format", choices=("csv", "parquet"), default="csv", help="parquet needs the pyarrow package")
+    parser.add_argument("--chunk-rows", type=int, default=5000, help="Conversations per output chunk")
+    parser.add_argument("--page-size", type=int, default=200, help="Conversations fetched per request")
+    parser.add_argument("--settle-seconds", type=float, default=900.0,
+                        help="Skip conversations that ended more recently than this, so their summary/evaluation is in place")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export every ended conversation")
+    parser.add_argument("--supabase-url", help="Supabase project URL (default: SUPABASE_URL or secrets.toml)")
+    parser.add_argument("--supabase-key", help="Supabase key (default: SUPABASE_KEY or secrets.toml)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-call INFO logging")
+    args = parser.parse_args(argv)
+    if args.compression == "zstd" and zstandard is None:
+        parser.error("--compression zstd requires the zstandard package")
+    if args.table_format == "parquet" and pyarrow is None:
+        parser.error("--table-format parquet requires the pyarrow package")
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    secrets = load_secrets()
+    supabase_url = resolve_credential(args.supabase_url, "SUPABASE_URL", "database", secrets)
+    supabase_key = resolve_credential(args.supabase_key, "SUPABASE_KEY", "database", secrets)
+    if not supabase_url or not supabase_key:
+        raise SystemExit("Missing credentials: pass flags, set SUPABASE_URL/SUPABASE_KEY or configure .streamlit/secrets.toml")
+
+    if not args.verbose:
+        # Per-page INFO logging would drown the chunk progress
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    report = run_export(args, supabase_url, supabase_key)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Export report")
+    for key, value in report.items():
+        if key != "files":
+            print(f"  {key:<26} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""
+End-to-end load test with simulated founders and stub backends.
+
+Runs N simulated founders concurrently through the real code path
+(create_messages_with_system_prompt -> get_chat_response -> completion
+detection -> save_conversation_with_summary) against local OpenAI and
+Supabase/PostgREST stubs, then reports throughput, turn latency
+percentiles, end-of-interview latency and peak memory.
+
+With --trace-file, every turn and end-of-interview save is traced (see
+utils/tracing.py); `python -m tools.traces breakdown <file>` then shows
+where the time went.
+
+Usage:
+    python -m tools.load_test --founders 50 --openai-latency-ms 800 --openai-error-rate 0.02
+    python -m tools.load_test --founders 50 --trace-file /tmp/load-test-spans.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import resource
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from tools.stub_servers import LatencyProfile, start_openai_stub, start_postgrest_stub
+from utils.rate_limiter import configure_rate_limiter
+from utils.openai_client import get_chat_response, create_messages_with_system_prompt
+from utils.conversation_stats import is_completion_message
+from utils.storage import SQLiteBackend, SupabaseBackend
+from utils.tracing import session_context, span, start_trace_exporter, stop_trace_exporter
+from utils.supabase_client import (
+    save_conversation_with_summary, generate_session_id, get_supabase_client, configure_storage_backend
+)
+
+# Any JWT-shaped string passes the supabase client's key check
+STUB_SUPABASE_KEY = "stub.stub.stub"
+STUB_OPENAI_KEY = "sk-stub"
+GREETING = "Hello! I'm The Unfair Advantage Scout. Let's start with your name and a description of your main professional experiences over the past five years."
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def founder_answer(founder: int, turn: int, words: int) -> str:
+    """Generate a distinct founder answer so transcripts never collide in caches."""
+    vocabulary = ["product", "customers", "team", "market", "built", "led", "platform", "growth", "research", "sales", "data", "operations"]
+    body = " ".join(random.choice(vocabulary) for _ in range(words))
+    return f"Founder {founder}, answer {turn}: {body}."
+
+def run_founder(founder: int, args: argparse.Namespace, supabase_url: str, results: Dict[str, List[Any]], lock: threading.Lock):
+    """Drive one simulated founder through a full interview and end-of-interview save."""
+    session_id = generate_session_id()
+    messages = [{"role": "assistant", "content": GREETING}]
+    turn_latencies = []
+    completed = False
+
+    try:
+        for turn in range(args.max_turns):
+            time.sleep(random.uniform(0, args.think_time))
+            messages.append({"role": "user", "content": founder_answer(founder, turn, args.answer_words)})
+
+            start_time = time.perf_counter()
+            with session_context(session_id), span("chat_turn"):
+                messages_with_system = create_messages_with_system_prompt(messages)
+                response = get_chat_response(messages_with_system, STUB_OPENAI_KEY)
+            turn_latencies.append(time.perf_counter() - start_time)
+
+            messages.append({"role": "assistant", "content": response})
+            if is_completion_message(response):
+                completed = True
+                break
+
+        start_time = time.perf_counter()
+        with session_context(session_id):
+            saved = save_conversation_with_summary(session_id, messages, supabase_url, STUB_SUPABASE_KEY, STUB_OPENAI_KEY)
+        end_latency = time.perf_counter() - start_time
+        error = None
+    except Exception as e:
+        saved = False
+        end_latency = None
+        error = f"{type(e).__name__}: {e}"
+
+    with lock:
+        results["turn_latencies"].extend(turn_latencies)
+        if end_latency is not None:
+            results["end_latencies"].append(end_latency)
+        results["completed"].append(completed)
+        results["saved"].append(saved)
+        if error:
+            results["errors"].append(error)
+
+def run_load_test(args: argparse.Namespace) -> Dict[str, Any]:
+    """
+    Run the load test and return the report.
+
+    Args:
+        args: Parsed command-line options
+
+    Returns:
+        Dict: Report with throughput, latency percentiles and peak memory
+    """
+    openai_stub = start_openai_stub(
+        LatencyProfile(args.openai_latency_ms, args.openai_latency_sigma, args.openai_error_rate),
+        turns_to_complete=args.turns
+    )
+    postgrest_stub = start_postgrest_stub(
+        LatencyProfile(args.db_latency_ms, args.db_latency_sigma, args.db_error_rate)
+    )
+    # The stubs have no quota, so the client-side limiter only applies when asked for
+    configure_rate_limiter(args.rate_limit_rpm, args.rate_limit_tpm)
+    # The OpenAI SDK reads OPENAI_BASE_URL when no base_url is passed
+    os.environ["OPENAI_BASE_URL"] = f"{openai_stub.url}/v1"
+    # The outbox goes to a throwaway file, never the application's local store
+    upstream = SupabaseBackend(get_supabase_client(postgrest_stub.url, STUB_SUPABASE_KEY))
+    outbox_dir = None
+    if args.storage_backend == "outbox":
+        outbox_dir = tempfile.TemporaryDirectory(prefix="load-test-outbox-")
+        backend = SQLiteBackend(os.path.join(outbox_dir.name, "conversations.sqlite3"), upstream=upstream)
+        backend.start_drainer()
+        configure_storage_backend(backend)
+    else:
+        configure_storage_backend(upstream)
+
+    if args.trace_file:
+        start_trace_exporter(file_path=args.trace_file, endpoint=None)
+
+    results = {"turn_latencies": [], "end_latencies": [], "completed": [], "saved": [], "errors": []}
+    lock = threading.Lock()
+
+    start_time = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency or args.founders) as executor:
+            for founder in range(args.founders):
+                executor.submit(run_founder, founder, args, postgrest_stub.url, results, lock)
+        elapsed = time.perf_counter() - start_time
+        # Time until everything acknowledged locally has also reached the database
+        drain_start = time.perf_counter()
+        drained = backend.flush(60.0) if outbox_dir is not None else True
+        drain_seconds = time.perf_counter() - drain_start
+    finally:
+        openai_stub.stop()
+        postgrest_stub.stop()
+        configure_storage_backend(None)
+        if outbox_dir is not None:
+            backend.stop_drainer()
+            outbox_dir.cleanup()
+        if args.trace_file:
+            stop_trace_exporter()
+
+    turns = results["turn_latencies"]
+    ends = results["end_latencies"]
+    # ru_maxrss is reported in kilobytes on Linux and bytes on macOS
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    peak_rss_mb = peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024
+
+    return {
+        "founders": args.founders,
+        "elapsed_seconds": round(elapsed, 3),
+        "interviews_per_second": round(args.founders / elapsed, 3) if elapsed else 0.0,
+        "turns_per_second": round(len(turns) / elapsed, 3) if elapsed else 0.0,
+        "turns": len(turns),
+        "turn_latency_p50": round(percentile(turns, 50), 4),
+        "turn_latency_p95": round(percentile(turns, 95), 4),
+        "turn_latency_p99": round(percentile(turns, 99), 4),
+        "end_latency_p50": round(percentile(ends, 50), 4),
+        "end_latency_p95": round(percentile(ends, 95), 4),
+        "end_latency_p99": round(percentile(ends, 99), 4),
+        "interviews_completed": sum(results["completed"]),
+        "interviews_saved": sum(results["saved"]),
+        "storage_backend": args.storage_backend,
+        "outbox_drain_seconds": round(drain_seconds, 3),
+        "outbox_drained": drained,
+        "trace_file": args.trace_file,
+        "errors": len(results["errors"]),
+        "error_samples": results["errors"][:5],
+        "peak_rss_mb": round(peak_rss_mb, 1)
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Load-test the interview pipeline against local stub backends.")
+    parser.add_argument("--founders", type=int, default=20, help="Number of simulated founders")
+    parser.add_argument("--concurrency", type=int, default=0, help="Concurrent founders (default: all at once)")
+    parser.add_argument("--turns", type=int, default=7, help="Founder answers before the stub signals completion")
+    parser.add_argument("--max-turns", type=int, default=12, help="Safety cap on turns per founder")
+    parser.add_argument("--answer-words", type=int, default=120, help="Words per founder answer")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Max random pause before each founder answer (s)")
+    parser.add_argument("--openai-latency-ms", type=float, default=800.0, help="Median OpenAI stub latency")
+    parser.add_argument("--openai-latency-sigma", type=float, default=0.5, help="Lognormal sigma of OpenAI stub latency")
+    parser.add_argument("--openai-error-rate", type=float, default=0.0, help="Fraction of OpenAI stub requests that fail")
+    parser.add_argument("--db-latency-ms", type=float, default=30.0, help="Median PostgREST stub latency")
+    parser.add_argument("--db-latency-sigma", type=float, default=0.3, help="Lognormal sigma of PostgREST stub latency")
+    parser.add_argument("--db-error-rate", type=float, default=0.0, help="Fraction of PostgREST stub requests that fail")
+    parser.add_argument("--storage-backend", choices=["supabase", "outbox"], default="supabase",
+                        help="Write through to the PostgREST stub, or through a temporary local outbox")
+    parser.add_argument("--rate-limit-rpm", type=float, default=0.0, help="Client-side OpenAI requests per minute (0 disables)")
+    parser.add_argument("--rate-limit-tpm", type=float, default=0.0, help="Client-side OpenAI tokens per minute (0 disables)")
+    parser.add_argument("--trace-file", help="Record trace spans to this OTLP JSON lines file")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--output", help="Also write the JSON report to this file")
+    parser.add_argument("--verbose", action="store_true", help="Keep application INFO logging")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    if not args.verbose:
+        # Per-turn INFO logging would dominate the output and the measurements
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    report = run_load_test(args)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Load test report")
+    for key, value in report.items():
+        print(f"  {key:<24} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""
+Founder profile similarity and clustering.
+
+`update` adds conversations that ended since the previous update to the
+vector store in PROFILE_VECTOR_DIR; `similar` lists the closest profiles to
+given sessions; `cluster` groups all profiles with k-means; `benchmark`
+measures every stage on a synthetic corpus without touching the database.
+
+Usage:
+    python -m tools.profiles update
+    python -m tools.profiles similar <session_id> [<session_id> ...] --k 10
+    python -m tools.profiles cluster --clusters 20
+    python -m tools.profiles benchmark --rows 100000
+"""
+
+import argparse
+import json
+import logging
+import random
+import resource
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from config import PROFILE_VECTOR_DIR
+from tools.credentials import load_secrets, resolve_credential
+from utils.profile_vectors import ProfileVectorStore, np
+from utils.supabase_client import ConversationFilter, iter_conversation_pages
+
+PROFILE_COLUMNS = "session_id,ended_at,summary,evaluation"
+
+def run_update(args: argparse.Namespace, supabase_url: str, supabase_key: str) -> Dict[str, Any]:
+    """
+    Add conversations that ended since the last update.
+
+    Args:
+        args: Parsed command-line options
+        supabase_url: Supabase project URL
+        supabase_key: Supabase key with read access to conversations
+
+    Returns:
+        Dict: Report with the window, counts and timing
+    """
+    store = ProfileVectorStore(args.vector_dir)
+    # Rows that ended within the settle window may still receive their summary/evaluation
+    ended_after = None if args.full else store.watermark
+    ended_until = (datetime.now(timezone.utc) - timedelta(seconds=args.settle_seconds)).isoformat()
+    run_start = time.perf_counter()
+    added = 0
+    pages = iter_conversation_pages(
+        supabase_url, supabase_key, PROFILE_COLUMNS, args.page_size,
+        ConversationFilter(ended_after=ended_after, ended_until=ended_until)
+    )
+    with closing(pages):
+        for page in pages:
+            # Each page is its own chunk; the watermark only moves once the whole window is stored
+            added += store.add(page)
+    store.add([], watermark=ended_until)
+    return {
+        "ended_after": ended_after,
+        "ended_until": ended_until,
+        "added": added,
+        "profiles": len(store),
+        "chunks": len(store.state["chunks"]),
+        "elapsed_seconds": round(time.perf_counter() - run_start, 3)
+    }
+
+def run_similar(args: argparse.Namespace) -> Dict[str, Any]:
+    store = ProfileVectorStore(args.vector_dir)
+    start_time = time.perf_counter()
+    neighbours = store.nearest(args.session_ids, args.k)
+    return {
+        "milliseconds": round((time.perf_counter() - start_time) * 1000, 2),
+        "missing": [session_id for session_id in args.session_ids if session_id not in neighbours],
+        "neighbours": neighbours
+    }
+
+def run_cluster(args: argparse.Namespace) -> Dict[str, Any]:
+    store = ProfileVectorStore(args.vector_dir)
+    start_time = time.perf_counter()
+    labels, centroids = store.kmeans(args.clusters, args.iterations, args.seed)
+    elapsed = time.perf_counter() - start_time
+    similarity = np.einsum("ij,ij->i", store.vectors(), centroids[labels])
+    clusters = []
+    for cluster in range(len(centroids)):
+        members = np.nonzero(labels == cluster)[0]
+        if not len(members):
+            continue
+        # Members closest to the centroid represent the cluster
+        representatives = members[np.argsort(-similarity[members])[:args.representatives]]
+        clusters.append({
+            "cluster": cluster,
+            "size": int(len(members)),
+            "cohesion": round(float(similarity[members].mean()), 4),
+            "representatives": [str(store.session_ids[row]) for row in representatives]
+        })
+    clusters.sort(key=lambda item: -item["size"])
+    return {"profiles": len(store), "elapsed_seconds": round(elapsed, 3), "clusters": clusters}
+
+def synthetic_rows(rows: int, topics: int, seed: int) -> List[Dict[str, Any]]:
+    """Profiles drawn from topic-specific vocabularies plus shared background words."""
+    rng = random.Random(seed)
+    background = [f"common{i}" for i in range(5000)]
+    topic_words = [[f"topic{topic}word{i}" for i in range(60)] for topic in range(topics)]
+    result = []
+    for row in range(rows):
+        topic = rng.randrange(topics)
+        words = rng.choices(topic_words[topic], k=40) + rng.choices(background, k=40)
+        rng.shuffle(words)
+        result.append({
+            "session_id": f"synthetic-{row}",
+            "topic": topic,
+            "summary": " ".join(words[:50]),
+            "evaluation": {"status": "success", "evaluation_text": " ".join(words[50:])}
+        })
+    return result
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Time featurization, persistence, loading, batched top-k and k-means on a synthetic corpus."""
+    timings: Dict[str, float] = {}
+
+    def timed(name, function):
+        start_time = time.perf_counter()
+        result = function()
+        timings[name] = round(time.perf_counter() - start_time, 3)
+        return result
+
+    rows = timed("generate_seconds", lambda: synthetic_rows(args.rows, args.topics, args.seed))
+    topics = np.array([row["topic"] for row in rows])
+    with tempfile.TemporaryDirectory(prefix="profile-vectors-") as directory:
+        store = ProfileVectorStore(directory)
+        batch = args.rows // args.batches
+
+        def add_all():
+            for start in range(0, args.rows, batch):
+                store.add(rows[start:start + batch])
+        timed("featurize_and_store_seconds", add_all)
+        store = timed("load_seconds", lambda: ProfileVectorStore(directory))
+        timed("tfidf_projection_seconds", store.vectors)
+
+        rng = np.random.default_rng(args.seed)
+        query_rows = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+        dense_neighbours, _ = timed(
+            "dense_top_k_seconds",
+            lambda: store.top_k(store.vectors()[query_rows], args.k, exclude_rows=query_rows)
+        )
+        neighbours, _ = timed("top_k_seconds", lambda: store.nearest_rows(query_rows, args.k))
+        # Store rows are in insertion order, which matches the synthetic rows here
+        dense_precision = float((topics[dense_neighbours] == topics[query_rows][:, None]).mean())
+        precision = float((topics[neighbours] == topics[query_rows][:, None]).mean())
+
+        labels, _ = timed("kmeans_seconds", lambda: store.kmeans(args.topics, args.iterations, args.seed))
+        # Purity: share of profiles whose cluster's majority topic is their own
+        majority = np.zeros(args.topics, dtype=np.int64)
+        for cluster in range(args.topics):
+            members = topics[labels == cluster]
+            majority[cluster] = np.bincount(members).max() if len(members) else 0
+        purity = float(majority.sum() / len(topics))
+
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return dict(
+        rows=args.rows,
+        topics=args.topics,
+        queries=len(query_rows),
+        k=args.k,
+        **timings,
+        top_k_queries_per_second=round(len(query_rows) / timings["top_k_seconds"], 1) if timings["top_k_seconds"] else None,
+        dense_neighbour_topic_precision=round(dense_precision, 4),
+        neighbour_topic_precision=round(precision, 4),
+        cluster_purity=round(purity, 4),
+        peak_rss_mb=round(peak_rss / (1024 * 1024) if sys.platform == "darwin" else peak_rss / 1024, 1)
+    )
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Founder profile similarity and clustering.")
+    parser.add_argument("--vector-dir", default=PROFILE_VECTOR_DIR, help="Directory holding the vector store")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-call INFO logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update = commands.add_parser("update", help="Add conversations that ended since the last update")
+    update.add_argument("--full", action="store_true", help="Ignore the watermark and re-add every ended conversation")
+    update.add_argument("--settle-seconds", type=float, default=900.0,
+                        help="Skip conversations that ended more recently than this, so their summary/evaluation is in place")
+    update.add_argument("--page-size", type=int, default=1000, help="Conversations fetched (and stored) per chunk")
+    update.add_argument("--supabase-url", help="Supabase project URL (default: SUPABASE_URL or secrets.toml)")
+    update.add_argument("--supabase-key", help="Supabase key (default: SUPABASE_KEY or secrets.toml)")
+
+    similar = commands.add_parser("similar", help="Closest profiles to the given sessions")
+    similar.add_argument("session_ids", nargs="+")
+    similar.add_argument("--k", type=int, default=10, help="Neighbours per session")
+
+    cluster = commands.add_parser("cluster", help="Group all profiles with k-means")
+    cluster.add_argument("--clusters", type=int, default=20)
+    cluster.add_argument("--iterations", type=int, default=20)
+    cluster.add_argument("--seed", type=int, default=0)
+    cluster.add_argument("--representatives", type=int, default=5, help="Sessions listed per cluster")
+
+    benchmark = commands.add_parser("benchmark", help="Measure every stage on a synthetic corpus")
+    benchmark.add_argument("--rows", type=int, default=100000)
+    benchmark.add_argument("--topics", type=int, default=50, help="Synthetic topics (also the number of clusters)")
+    benchmark.add_argument("--batches", type=int, default=10, help="Incremental additions the corpus is stored in")
+    benchmark.add_argument("--queries", type=int, default=1000, help="Batched top-k queries")
+    benchmark.add_argument("--k", type=int, default=10)
+    benchmark.add_argument("--iterations", type=int, default=20)
+    benchmark.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+    if np is None:
+        parser.error("profile vectors require the numpy package")
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    if not args.verbose:
+        # Per-page INFO logging would drown the report
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    if args.command == "update":
+        secrets = load_secrets()
+        supabase_url = resolve_credential(args.supabase_url, "SUPABASE_URL", "database", secrets)
+        supabase_key = resolve_credential(args.supabase_key, "SUPABASE_KEY", "database", secrets)
+        if not supabase_url or not supabase_key:
+            raise SystemExit("Missing credentials: pass flags, set SUPABASE_URL/SUPABASE_KEY or configure .streamlit/secrets.toml")
+        report = run_update(args, supabase_url, supabase_key)
+    elif args.command == "similar":
+        report = run_similar(args)
+    elif args.command == "cluster":
+        report = run_cluster(args)
+    else:
+        report = run_benchmark(args)
+
+    if args.json or args.command in ("similar", "cluster"):
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"Profile vectors {args.command} report")
+    for key, value in report.items():
+        print(f"  {key:<32} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,273 @@
+"""
+Bulk re-generation of summaries and evaluations for stored conversations.
+
+Pages through the conversations table in (created_at, id) order and regenerates
+the summary and evaluation of every ended conversation whose evaluation was not
+produced by the current prompts (see PROMPT_VERSION). Work is done with bounded
+concurrency that backs off when OpenAI rate limits are hit, results are written
+back one page at a time, and a checkpoint file lets an interrupted run resume
+after the last written page.
+
+Usage:
+    python -m tools.reevaluate --dry-run
+    python -m tools.reevaluate --concurrency 4 --page-size 50 --max-rpm 400
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+from tools.credentials import load_secrets, resolve_credential
+from utils.logger import logger
+from utils.metrics import LLM_COST, RETRIES, observe_db_call
+from utils.openai_client import PROMPT_VERSION, SUMMARY_ERROR_TEXT, estimate_summary_evaluation_cost
+from utils.retry import call_with_retry, get_circuit_breaker
+from utils.supabase_client import (
+    ConversationFilter, get_supabase_client, generate_summary_and_evaluation,
+    iter_conversation_pages, count_conversations, page_cursor
+)
+from config import OPENAI_COMBINED_SUMMARY_EVALUATION
+
+DEFAULT_CHECKPOINT_PATH = ".jobs/reevaluate-checkpoint.json"
+PAGE_COLUMNS = "id,session_id,created_at,messages,summary,evaluation"
+ENDED_CONVERSATIONS = ConversationFilter(ended=True)
+
+def load_credentials(args: argparse.Namespace) -> Tuple[str, str, str]:
+    """Resolve credentials from flags, then environment variables, then .streamlit/secrets.toml."""
+    secrets = load_secrets()
+    supabase_url = resolve_credential(args.supabase_url, "SUPABASE_URL", "database", secrets)
+    supabase_key = resolve_credential(args.supabase_key, "SUPABASE_KEY", "database", secrets)
+    openai_api_key = resolve_credential(args.openai_api_key, "OPENAI_API_KEY", "general", secrets)
+    if not supabase_url or not supabase_key or (not openai_api_key and not args.dry_run):
+        raise SystemExit("Missing credentials: pass flags, set SUPABASE_URL/SUPABASE_KEY/OPENAI_API_KEY or configure .streamlit/secrets.toml")
+    return supabase_url, supabase_key, openai_api_key
+
+def is_current(row: Dict[str, Any]) -> bool:
+    """True if the row already holds a successful evaluation made with the current prompts."""
+    evaluation = row.get("evaluation")
+    return (
+        bool(row.get("summary"))
+        and isinstance(evaluation, dict)
+        and evaluation.get("status") == "success"
+        and evaluation.get("prompt_version") == PROMPT_VERSION
+    )
+
+def write_page(supabase, updates: List[Dict[str, Any]]):
+    """Write a page of regenerated results in a single request."""
+    if not updates:
+        return
+    # Upsert needs every NOT NULL column, so messages are sent back unchanged alongside the new results
+    with observe_db_call("reevaluate_write_page"):
+        call_with_retry(
+            lambda timeout: supabase.table("conversations").upsert(
+                updates, on_conflict="session_id", returning="minimal"
+            ).execute(),
+            "Supabase reevaluate write page",
+            get_circuit_breaker("supabase")
+        )
+
+class RequestPacer:
+    """Spaces LLM requests evenly so a run stays under a requests-per-minute budget."""
+
+    def __init__(self, max_rpm: float):
+        self.interval = 60.0 / max_rpm if max_rpm > 0 else 0.0
+        self._next_slot = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, requests: int = 1):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(self._next_slot, now)
+            self._next_slot = slot + self.interval * requests
+        time.sleep(max(0.0, slot - now))
+
+def load_checkpoint(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except FileNotFoundError:
+        return None
+    if checkpoint.get("prompt_version") != PROMPT_VERSION:
+        logger.info("Checkpoint %s was written for prompt version %s, starting over", path, checkpoint.get('prompt_version'))
+        return None
+    return checkpoint
+
+def save_checkpoint(path: str, checkpoint: Dict[str, Any]):
+    """Atomically persist the checkpoint (written only after a page is stored)."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(tmp_path, path)
+
+def regenerate_row(row: Dict[str, Any], openai_api_key: str, pacer: RequestPacer) -> Optional[Dict[str, Any]]:
+    """Regenerate one row; returns the update to write, or None if either result failed."""
+    pacer.acquire(1 if OPENAI_COMBINED_SUMMARY_EVALUATION else 2)
+    summary, evaluation = generate_summary_and_evaluation(row["session_id"], row["messages"], openai_api_key)
+    if not summary or summary == SUMMARY_ERROR_TEXT or not evaluation or evaluation.get("status") != "success":
+        return None
+    # Results served from the cache may predate version tagging
+    evaluation = dict(evaluation, prompt_version=PROMPT_VERSION)
+    return {"session_id": row["session_id"], "messages": row["messages"], "summary": summary, "evaluation": evaluation}
+
+def _rate_limited_retries() -> float:
+    return RETRIES.total(upstream="openai", error_class="RateLimitError")
+
+def run_reevaluation(args: argparse.Namespace, supabase_url: str, supabase_key: str, openai_api_key: str) -> Dict[str, Any]:
+    """
+    Run (or resume) the re-evaluation and return the report.
+
+    Args:
+        args: Parsed command-line options
+        supabase_url: Supabase project URL
+        supabase_key: Supabase key with write access to conversations
+        openai_api_key: OpenAI API key (unused in dry-run mode)
+
+    Returns:
+        Dict: Report with progress counters, throughput and cost projection
+    """
+    supabase = get_supabase_client(supabase_url, supabase_key)
+    checkpoint = None if args.restart or args.dry_run else load_checkpoint(args.checkpoint)
+    if checkpoint is None:
+        checkpoint = {
+            "prompt_version": PROMPT_VERSION,
+            "cursor": None,
+            "stats": {"scanned": 0, "current": 0, "regenerated": 0, "failed": 0, "cost_usd": 0.0, "elapsed_seconds": 0.0},
+            "failed_session_ids": []
+        }
+    else:
+        logger.info("Resuming re-evaluation after %s (%s rows already scanned)", checkpoint['cursor'], checkpoint['stats']['scanned'])
+    stats = checkpoint["stats"]
+
+    remaining_at_start = count_conversations(supabase_url, supabase_key, ENDED_CONVERSATIONS, checkpoint["cursor"])
+    pacer = RequestPacer(args.max_rpm)
+    concurrency = args.concurrency
+    estimated_cost = 0.0
+    run_scanned = 0
+    run_start = time.perf_counter()
+    cost_start = LLM_COST.total()
+
+    # The next page is prefetched while the current one is regenerated
+    pages = iter_conversation_pages(
+        supabase_url, supabase_key, PAGE_COLUMNS, args.page_size, ENDED_CONVERSATIONS, after=checkpoint["cursor"]
+    )
+    with closing(pages):
+        for page in pages:
+            if args.max_rows > 0 and run_scanned >= args.max_rows:
+                break
+            page_start = time.perf_counter()
+            page_cost_start = LLM_COST.total()
+
+            stale = [row for row in page if not is_current(row)]
+            if args.dry_run:
+                estimated_cost += sum(estimate_summary_evaluation_cost(row["messages"]) for row in stale)
+                updates = []
+            else:
+                rate_limited_before = _rate_limited_retries()
+                with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="reevaluate") as executor:
+                    results = list(executor.map(lambda row: regenerate_row(row, openai_api_key, pacer), stale))
+                updates = [update for update in results if update is not None]
+                failed = [row["session_id"] for row, update in zip(stale, results) if update is None]
+                write_page(supabase, updates)
+
+                # Additive increase / multiplicative decrease on OpenAI rate limiting
+                if _rate_limited_retries() > rate_limited_before:
+                    concurrency = max(1, concurrency // 2)
+                    logger.warning("Rate limited by OpenAI, reducing re-evaluation concurrency to %s", concurrency)
+                elif concurrency < args.concurrency:
+                    concurrency += 1
+
+                stats["regenerated"] += len(updates)
+                stats["failed"] += len(failed)
+                checkpoint["failed_session_ids"].extend(failed)
+
+            run_scanned += len(page)
+            stats["scanned"] += len(page)
+            stats["current"] += len(page) - len(stale)
+            stats["cost_usd"] += LLM_COST.total() - page_cost_start
+            stats["elapsed_seconds"] += time.perf_counter() - page_start
+            checkpoint["cursor"] = page_cursor(page)
+            if not args.dry_run:
+                save_checkpoint(args.checkpoint, checkpoint)
+
+            # Progress goes to stderr so it stays visible when INFO logging is silenced
+            print(
+                f"page done: {len(page)} scanned, {len(stale)} stale, {len(updates)} written "
+                f"in {time.perf_counter() - page_start:.2f}s (concurrency {concurrency}, {stats['scanned']} scanned in total)",
+                file=sys.stderr
+            )
+
+    run_elapsed = time.perf_counter() - run_start
+    run_cost = LLM_COST.total() - cost_start
+    stale_fraction = (stats["scanned"] - stats["current"]) / stats["scanned"] if stats["scanned"] else 0.0
+    remaining_rows = max(0, (remaining_at_start or 0) - run_scanned)
+    report = {
+        "prompt_version": PROMPT_VERSION,
+        "dry_run": args.dry_run,
+        "scanned": stats["scanned"],
+        "already_current": stats["current"],
+        "regenerated": stats["regenerated"],
+        "failed": stats["failed"],
+        "rows_remaining": remaining_rows if remaining_at_start is not None else None,
+        "elapsed_seconds": round(run_elapsed, 3),
+        "rows_per_second": round(run_scanned / run_elapsed, 3) if run_elapsed else 0.0,
+        "cost_usd": round(run_cost, 4),
+        "total_cost_usd": round(stats["cost_usd"], 4)
+    }
+    if args.dry_run:
+        report["estimated_cost_usd"] = round(estimated_cost, 4)
+        per_stale_row = estimated_cost / (stats["scanned"] - stats["current"]) if stats["scanned"] > stats["current"] else 0.0
+    else:
+        per_stale_row = stats["cost_usd"] / stats["regenerated"] if stats["regenerated"] else 0.0
+        report["regenerated_per_second"] = round(stats["regenerated"] / stats["elapsed_seconds"], 3) if stats["elapsed_seconds"] else 0.0
+    report["cost_per_regenerated_row_usd"] = round(per_stale_row, 6)
+    report["projected_remaining_cost_usd"] = round(remaining_rows * stale_fraction * per_stale_row, 4)
+    return report
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Regenerate summaries and evaluations made with outdated prompts.")
+    parser.add_argument("--page-size", type=int, default=50, help="Rows fetched and written per page")
+    parser.add_argument("--concurrency", type=int, default=4, help="Maximum conversations regenerated at once")
+    parser.add_argument("--max-rpm", type=float, default=0.0, help="OpenAI requests per minute budget (0 disables pacing)")
+    parser.add_argument("--max-rows", type=int, default=0, help="Stop after scanning this many rows (0 scans everything)")
+    parser.add_argument("--checkpoint", default=DEFAULT_CHECKPOINT_PATH, help="Checkpoint file used to resume interrupted runs")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint and start from the first row")
+    parser.add_argument("--dry-run", action="store_true", help="Only count stale rows and estimate the cost")
+    parser.add_argument("--supabase-url", help="Supabase project URL (default: SUPABASE_URL or secrets.toml)")
+    parser.add_argument("--supabase-key", help="Supabase key (default: SUPABASE_KEY or secrets.toml)")
+    parser.add_argument("--openai-api-key", help="OpenAI API key (default: OPENAI_API_KEY or secrets.toml)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-call INFO logging")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    supabase_url, supabase_key, openai_api_key = load_credentials(args)
+
+    if not args.verbose:
+        # Per-call INFO logging would drown the page progress
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    report = run_reevaluation(args, supabase_url, supabase_key, openai_api_key)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Re-evaluation report")
+    for key, value in report.items():
+        print(f"  {key:<32} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Local full-text search over stored interviews.
+
+`update` adds conversations that ended since the previous update to the
+index in SEARCH_INDEX_DIR (one new segment per run, or per --segment-docs
+conversations); `query` ranks indexed sessions with BM25 and prints a
+snippet for each hit. Queries only read the local index, so they work
+offline and take milliseconds.
+
+Usage:
+    python -m tools.search update
+    python -m tools.search query "marketplace logistics second-time founder"
+    python -m tools.search update --full    # re-index everything, e.g. after tools.reevaluate
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from contextlib import closing
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from config import SEARCH_INDEX_DIR
+from tools.credentials import load_secrets, resolve_credential
+from utils.search_index import SearchIndex, conversation_document
+from utils.supabase_client import ConversationFilter, iter_conversation_pages
+
+INDEX_COLUMNS = "session_id,created_at,ended_at,summary,evaluation,messages"
+
+def run_update(args: argparse.Namespace, supabase_url: str, supabase_key: str) -> Dict[str, Any]:
+    """
+    Index conversations that ended since the last update.
+
+    Args:
+        args: Parsed command-line options
+        supabase_url: Supabase project URL
+        supabase_key: Supabase key with read access to conversations
+
+    Returns:
+        Dict: Report with the indexed window, counts and index size
+    """
+    index = SearchIndex(args.index_dir)
+    try:
+        # Rows that ended within the settle window may still receive their summary/evaluation
+        ended_after = None if args.full else index.watermark
+        ended_until = (datetime.now(timezone.utc) - timedelta(seconds=args.settle_seconds)).isoformat()
+        run_start = time.perf_counter()
+        indexed = 0
+        batch: List[Dict[str, Any]] = []
+        pages = iter_conversation_pages(
+            supabase_url, supabase_key, INDEX_COLUMNS, args.page_size,
+            ConversationFilter(ended_after=ended_after, ended_until=ended_until)
+        )
+        with closing(pages):
+            for page in pages:
+                batch.extend(conversation_document(row) for row in page)
+                if len(batch) >= args.segment_docs:
+                    # The watermark only moves once the whole window is indexed; a rerun re-indexes idempotently
+                    indexed += index.add_documents(batch)
+                    batch = []
+                    print(f"segment done: {indexed} conversations indexed", file=sys.stderr)
+        indexed += index.add_documents(batch, watermark=ended_until)
+        if args.full and len(index.segments) > 1:
+            index.compact()
+        elapsed = time.perf_counter() - run_start
+        return dict(
+            index.stats(),
+            ended_after=ended_after,
+            indexed=indexed,
+            elapsed_seconds=round(elapsed, 3)
+        )
+    finally:
+        index.close()
+
+def run_query(args: argparse.Namespace) -> Dict[str, Any]:
+    """Search the local index and return the hits with the query time."""
+    index = SearchIndex(args.index_dir)
+    try:
+        start_time = time.perf_counter()
+        hits = index.search(" ".join(args.query), args.limit)
+        return {
+            "query": " ".join(args.query),
+            "documents": index.doc_count,
+            "milliseconds": round((time.perf_counter() - start_time) * 1000, 2),
+            "hits": [asdict(hit) for hit in hits]
+        }
+    finally:
+        index.close()
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Build and query the local interview search index.")
+    parser.add_argument("--index-dir", default=SEARCH_INDEX_DIR, help="Directory holding the index segments")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-call INFO logging")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    update = commands.add_parser("update", help="Index conversations that ended since the last update")
+    update.add_argument("--full", action="store_true", help="Ignore the watermark and re-index every ended conversation")
+    update.add_argument("--settle-seconds", type=float, default=900.0,
+                        help="Skip conversations that ended more recently than this, so their summary/evaluation is in place")
+    update.add_argument("--page-size", type=int, default=200, help="Conversations fetched per request")
+    update.add_argument("--segment-docs", type=int, default=20000, help="Conversations per index segment")
+    update.add_argument("--supabase-url", help="Supabase project URL (default: SUPABASE_URL or secrets.toml)")
+    update.add_argument("--supabase-key", help="Supabase key (default: SUPABASE_KEY or secrets.toml)")
+
+    query = commands.add_parser("query", help="Rank indexed conversations for a free-text query")
+    query.add_argument("query", nargs="+", help="Words to search for")
+    query.add_argument("--limit", type=int, default=10, help="Maximum number of hits")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+
+    if not args.verbose:
+        # Per-page INFO logging would drown the report
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    if args.command == "update":
+        secrets = load_secrets()
+        supabase_url = resolve_credential(args.supabase_url, "SUPABASE_URL", "database", secrets)
+        supabase_key = resolve_credential(args.supabase_key, "SUPABASE_KEY", "database", secrets)
+        if not supabase_url or not supabase_key:
+            raise SystemExit("Missing credentials: pass flags, set SUPABASE_URL/SUPABASE_KEY or configure .streamlit/secrets.toml")
+        report = run_update(args, supabase_url, supabase_key)
+    else:
+        report = run_query(args)
+
+    if args.json:
+        print(json.dumps(report, indent=2, ensure_ascii=False))
+        return
+
+    if args.command == "update":
+        print("Search index update")
+        for key, value in report.items():
+            print(f"  {key:<16} {value}")
+        return
+
+    print(f"{len(report['hits'])} hits in {report['milliseconds']} ms ({report['documents']} indexed conversations)")
+    for rank, hit in enumerate(report["hits"], start=1):
+        print(f"{rank:>3}. {hit['session_id']}  score={hit['score']}  ended_at={hit['ended_at']}")
+        if hit["snippet"]:
+            print(f"     [{hit['field']}] {hit['snippet']}")
+
+if __name__ == "__main__":
+    main()
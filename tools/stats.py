@@ -0,0 +1,64 @@
+"""
+Operational overview of stored interviews from the materialized stats columns.
+
+Reads only the per-conversation stats (turn counts, characters, tokens,
+duration, completion), never the transcripts, so it stays fast on large
+tables.
+
+Usage:
+    python -m tools.stats
+    python -m tools.stats --created-from 2025-01-01 --ended --json
+"""
+
+import argparse
+import json
+import logging
+from typing import List, Optional
+
+from tools.credentials import load_secrets, resolve_credential
+from utils.conversation_stats import summarize_conversation_stats
+from utils.supabase_client import ConversationFilter, iter_conversation_stats
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Summarize interview statistics without loading transcripts.")
+    parser.add_argument("--created-from", help="Only conversations created at or after this ISO timestamp")
+    parser.add_argument("--created-before", help="Only conversations created before this ISO timestamp")
+    parser.add_argument("--ended", action="store_true", help="Only conversations that were ended")
+    parser.add_argument("--page-size", type=int, default=1000, help="Rows fetched per request")
+    parser.add_argument("--supabase-url", help="Supabase project URL (default: SUPABASE_URL or secrets.toml)")
+    parser.add_argument("--supabase-key", help="Supabase key (default: SUPABASE_KEY or secrets.toml)")
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Keep per-call INFO logging")
+    return parser.parse_args(argv)
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    secrets = load_secrets()
+    supabase_url = resolve_credential(args.supabase_url, "SUPABASE_URL", "database", secrets)
+    supabase_key = resolve_credential(args.supabase_key, "SUPABASE_KEY", "database", secrets)
+    if not supabase_url or not supabase_key:
+        raise SystemExit("Missing credentials: pass flags, set SUPABASE_URL/SUPABASE_KEY or configure .streamlit/secrets.toml")
+
+    if not args.verbose:
+        # Per-page INFO logging would drown the report
+        logging.getLogger("utils.logger").setLevel(logging.WARNING)
+
+    conversation_filter = ConversationFilter(
+        created_from=args.created_from,
+        created_before=args.created_before,
+        ended=True if args.ended else None
+    )
+    report = summarize_conversation_stats(
+        iter_conversation_stats(supabase_url, supabase_key, conversation_filter, args.page_size)
+    )
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print("Interview statistics")
+    for key, value in report.items():
+        print(f"  {key:<26} {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+"""
+Local stub servers standing in for OpenAI and Supabase/PostgREST.
+Used by the load-test harness to drive the real client code without external services.
+"""
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import urlparse, parse_qsl
+
+# Stub servers answer hundreds of concurrent simulated sessions
+ThreadingHTTPServer.request_queue_size = 512
+ThreadingHTTPServer.daemon_threads = True
+
+@dataclass
+class LatencyProfile:
+    """Lognormal latency distribution with an injected error rate."""
+    median_ms: float = 800.0
+    sigma: float = 0.5
+    error_rate: float = 0.0
+
+    def sample_seconds(self) -> float:
+        """Draw one latency sample in seconds."""
+        if self.median_ms <= 0:
+            return 0.0
+        return random.lognormvariate(0, self.sigma) * self.median_ms / 1000
+
+    def should_fail(self) -> bool:
+        """Decide whether this request returns an injected error."""
+        return random.random() < self.error_rate
+
+class _StubHandler(BaseHTTPRequestHandler):
+    """Shared helpers for the stub request handlers."""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        # Keep load-test output readable
+        pass
+
+    def parse_request(self) -> bool:
+        # One handler instance serves every request on a keep-alive connection
+        self.__dict__.pop("_body", None)
+        return super().parse_request()
+
+    def _read_json(self) -> Any:
+        # Cached so an injected error can drain the body before responding (keep-alive safety)
+        if not hasattr(self, "_body"):
+            length = int(self.headers.get("content-length") or 0)
+            self._body = self.rfile.read(length) if length else b""
+        return json.loads(self._body) if self._body else None
+
+    def _send_json(self, status: int, payload: Any, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_injected_error(self):
+        if random.random() < 0.5:
+            self._send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_error"}}, {"retry-after-ms": "200"})
+        else:
+            self._send_json(500, {"error": {"message": "Internal server error (stub)", "type": "server_error"}})
+
+class OpenAIStubHandler(_StubHandler):
+    """Minimal /v1/chat/completions endpoint (blocking, streaming and JSON mode)."""
+    profile: LatencyProfile = LatencyProfile()
+    turns_to_complete: int = 7
+
+    def do_POST(self):
+        request = self._read_json() or {}
+        time.sleep(self.profile.sample_seconds())
+
+        if self.profile.should_fail():
+            self._send_injected_error()
+            return
+
+        content = self._reply_for(request)
+        prompt_tokens = sum(len(str(msg.get("content", ""))) for msg in request.get("messages", [])) // 4
+        completion_tokens = len(content) // 4
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+        if request.get("stream"):
+            self._send_stream(request, content, usage)
+            return
+
+        self._send_json(200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "stub"),
+            "choices": [{"index": 0, "finish_reason": "stop", "message": {"role": "assistant", "content": content}}],
+            "usage": usage
+        })
+
+    def _reply_for(self, request: Dict[str, Any]) -> str:
+        messages = request.get("messages", [])
+        if (request.get("response_format") or {}).get("type") == "json_object":
+            return json.dumps({"summary": "Stub summary of the founder interview.", "evaluation": "Stub evaluation of the founder."})
+        if messages and messages[0].get("role") == "system":
+            user_turns = sum(1 for msg in messages if msg.get("role") == "user")
+            if user_turns >= self.turns_to_complete:
+                return "Thank you for your time. INTERVIEW COMPLETE - Please click the 'End Conversation' button to save your interview."
+            return f"Thanks for sharing. Question {user_turns + 1}: " + "tell me more about that experience. " * 8
+        return "Stub generated text for an end-of-interview request. " * 40
+
+    def _send_stream(self, request: Dict[str, Any], content: str, usage: Dict[str, int]):
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        self.end_headers()
+        try:
+            self._stream_words(request, content, usage)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client closed the stream (e.g. a cancelled hedged request)
+            self.close_connection = True
+
+    def _stream_words(self, request: Dict[str, Any], content: str, usage: Dict[str, int]):
+        include_usage = bool((request.get("stream_options") or {}).get("include_usage"))
+        words = content.split(" ")
+        for i, word in enumerate(words):
+            chunk = {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": request.get("model", "stub"),
+                "choices": [{"index": 0, "delta": {"content": word + (" " if i < len(words) - 1 else "")}, "finish_reason": None}]
+            }
+            if include_usage:
+                chunk["usage"] = None
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        if include_usage:
+            # Like the API, a final chunk without choices carries the usage block
+            chunk = {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                     "model": request.get("model", "stub"), "choices": [], "usage": usage}
+            self._write_chunk(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+        self._write_chunk(b"data: [DONE]\n\n")
+        self._write_chunk(b"")
+
+    def _write_chunk(self, data: bytes):
+        self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+class PostgrestStubHandler(_StubHandler):
+    """In-memory /rest/v1/<table> endpoint covering the PostgREST features the app uses."""
+    profile: LatencyProfile = LatencyProfile(median_ms=30.0)
+    tables: Dict[str, List[Dict[str, Any]]] = {}
+    lock = threading.Lock()
+
+    def _table_and_query(self):
+        parsed = urlparse(self.path)
+        table = parsed.path.rsplit("/", 1)[-1]
+        return table, parse_qsl(parsed.query, keep_blank_values=True)
+
+    @staticmethod
+    def _compare(cell: Any, operator: str, value: str) -> bool:
+        if operator == "is":
+            return (cell is None) == (value == "null")
+        if operator in ("eq", "neq"):
+            return (str(cell) == value) == (operator == "eq")
+        if cell is None:
+            return False
+        cell = str(cell)
+        return {"gt": cell > value, "gte": cell >= value, "lt": cell < value, "lte": cell <= value}.get(operator, True)
+
+    @classmethod
+    def _condition(cls, row: Dict[str, Any], column: str, condition: str) -> bool:
+        negate = condition.startswith("not.")
+        if negate:
+            condition = condition[len("not."):]
+        operator, _, value = condition.partition(".")
+        return cls._compare(row.get(column), operator, value.strip('"')) != negate
+
+    @staticmethod
+    def _split_terms(expression: str) -> List[str]:
+        """Split the inside of an or=(...) / and(...) group on top-level commas."""
+        terms, depth, quoted, current = [], 0, False, ""
+        for char in expression:
+            if char == '"':
+                quoted = not quoted
+            elif not quoted and char == "(":
+                depth += 1
+            elif not quoted and char == ")":
+                depth -= 1
+            if char == "," and depth == 0 and not quoted:
+                terms.append(current)
+                current = ""
+                continue
+            current += char
+        terms.append(current)
+        return terms
+
+    @classmethod
+    def _logic(cls, row: Dict[str, Any], operator: str, expression: str) -> bool:
+        results = []
+        for term in cls._split_terms(expression[1:-1]):
+            if term.startswith(("and(", "or(")):
+                name, _, group = term.partition("(")
+                results.append(cls._logic(row, name, "(" + group))
+            else:
+                column, _, condition = term.partition(".")
+                results.append(cls._condition(row, column, condition))
+        return all(results) if operator == "and" else any(results)
+
+    @classmethod
+    def _matches(cls, row: Dict[str, Any], query) -> bool:
+        for column, condition in query:
+            if column in ("select", "order", "limit", "offset", "on_conflict"):
+                continue
+            if column in ("or", "and"):
+                if not cls._logic(row, column, condition):
+                    return False
+            elif not cls._condition(row, column, condition):
+                return False
+        return True
+
+    @staticmethod
+    def _sort_key(value: Any) -> Tuple[int, Any]:
+        # Numbers sort numerically, everything else as text
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            return (0, value)
+        return (1, str(value or ""))
+
+    def _before_request(self) -> bool:
+        self._read_json()
+        time.sleep(self.profile.sample_seconds())
+        if self.profile.should_fail():
+            self._send_json(503, {"message": "Service unavailable (stub)", "code": "PGRST000"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self._before_request():
+            return
+        table, query = self._table_and_query()
+        params = dict(query)
+        with self.lock:
+            rows = [row for row in self.tables.get(table, []) if self._matches(row, query)]
+        if "order" in params:
+            # Stable sorts from the last key to the first give a multi-column order
+            for term in reversed(params["order"].split(",")):
+                column, _, direction = term.partition(".")
+                rows.sort(key=lambda row: self._sort_key(row.get(column)), reverse=direction.startswith("desc"))
+        total = len(rows)
+        offset = int(params.get("offset") or 0)
+        rows = rows[offset:]
+        if "limit" in params:
+            rows = rows[:int(params["limit"])]
+        columns = [column for column in params.get("select", "*").split(",") if column]
+        if "*" not in columns:
+            rows = [{column: row.get(column) for column in columns} for row in rows]
+        headers = None
+        if "count=" in (self.headers.get("prefer") or ""):
+            headers = {"content-range": f"{offset}-{offset + len(rows) - 1}/{total}" if rows else f"*/{total}"}
+        self._send_json(200, rows, headers)
+
+    def do_POST(self):
+        if not self._before_request():
+            return
+        table, query = self._table_and_query()
+        payload = self._read_json()
+        records = payload if isinstance(payload, list) else [payload]
+        prefer = self.headers.get("prefer") or ""
+        merge = "merge-duplicates" in prefer
+        ignore = "ignore-duplicates" in prefer
+        conflict_columns = dict(query).get("on_conflict", "session_id").split(",")
+        stored = []
+        with self.lock:
+            rows = self.tables.setdefault(table, [])
+            for record in records:
+                existing = next((
+                    row for row in rows
+                    if all(column in record and row.get(column) == record[column] for column in conflict_columns)
+                ), None)
+                if existing is not None and ignore:
+                    continue
+                if existing is not None and not merge:
+                    self._send_json(409, {"message": "duplicate key value violates unique constraint", "code": "23505"})
+                    return
+                if existing is not None:
+                    existing.update(record)
+                    stored.append(dict(existing))
+                    continue
+                row = {"id": str(uuid.uuid4()), "created_at": datetime.now(timezone.utc).isoformat()}
+                row.update(record)
+                rows.append(row)
+                stored.append(dict(row))
+        self._send_json(201, stored)
+
+    def do_PATCH(self):
+        if not self._before_request():
+            return
+        table, query = self._table_and_query()
+        changes = self._read_json() or {}
+        updated = []
+        with self.lock:
+            for row in self.tables.get(table, []):
+                if self._matches(row, query):
+                    row.update(changes)
+                    updated.append(dict(row))
+        self._send_json(200, updated)
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    def handle_error(self, request, client_address):
+        # Clients closing streams or idle keep-alive connections are expected, not errors
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+
+class StubServer:
+    """A stub HTTP server running on a background thread."""
+
+    def __init__(self, handler_class):
+        self.httpd = _StubHTTPServer(("127.0.0.1", 0), handler_class)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+def start_openai_stub(profile: LatencyProfile, turns_to_complete: int = 7) -> StubServer:
+    """Start an OpenAI stub; its base URL is server.url + '/v1'."""
+    handler = type("OpenAIStub", (OpenAIStubHandler,), {"profile": profile, "turns_to_complete": turns_to_complete})
+    return StubServer(handler).start()
+
+def start_postgrest_stub(profile: LatencyProfile) -> StubServer:
+    """Start a Supabase/PostgREST stub; pass server.url as the Supabase URL."""
+    handler = type("PostgrestStub", (PostgrestStubHandler,), {"profile": profile, "tables": {}, "lock": threading.Lock()})
+    return StubServer(handler).start()
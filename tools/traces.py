@@ -0,0 +1,165 @@
+"""
+Per-stage latency breakdown from recorded trace spans.
+
+Reads the OTLP JSON lines file written when TRACE_FILE_PATH is set (or by
+`tools.load_test --trace-file`) and groups spans by their path in the trace
+(e.g. chat_turn > openai_call > render). For each stage it reports wall-time
+percentiles, self time (wall time not covered by child spans), CPU time and
+the share of all root-span time spent in the stage itself.
+
+Usage:
+    python -m tools.traces breakdown .traces/spans.jsonl
+    python -m tools.traces breakdown .traces/spans.jsonl --root chat_turn
+    python -m tools.traces breakdown .traces/spans.jsonl --session <session_id> --json
+"""
+
+import argparse
+import json
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import TRACE_FILE_PATH
+from utils.tracing import iter_trace_file
+
+PATH_SEPARATOR = " > "
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of a list of values."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def stage_breakdown(spans: List[Dict[str, Any]], root: Optional[str] = None, session_id: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Aggregate spans into per-stage latency statistics.
+
+    Args:
+        spans: Spans as yielded by utils.tracing.iter_trace_file
+        root: Only include traces whose root span has this name
+        session_id: Only include traces with a span for this session
+
+    Returns:
+        Dict: Totals plus one entry per stage path, in pipeline order
+    """
+    by_id = {span["span_id"]: span for span in spans}
+    traces: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+    for span in spans:
+        traces[span["trace_id"]].append(span)
+
+    def parent_of(span: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        # A parent exported in a lost batch leaves its children as roots
+        return by_id.get(span["parent_span_id"]) if span["parent_span_id"] else None
+
+    paths: Dict[str, Tuple[str, ...]] = {}
+
+    def path_of(span: Dict[str, Any]) -> Tuple[str, ...]:
+        cached = paths.get(span["span_id"])
+        if cached is None:
+            parent = parent_of(span)
+            cached = (path_of(parent) if parent is not None else ()) + (span["name"],)
+            paths[span["span_id"]] = cached
+        return cached
+
+    selected: List[Dict[str, Any]] = []
+    for trace_spans in traces.values():
+        roots = [span for span in trace_spans if parent_of(span) is None]
+        if root and not any(span["name"] == root for span in roots):
+            continue
+        if session_id and not any(span["session_id"] == session_id for span in trace_spans):
+            continue
+        selected.extend(trace_spans)
+
+    child_ns: Dict[str, int] = defaultdict(int)
+    for span in selected:
+        if span["parent_span_id"] in by_id:
+            child_ns[span["parent_span_id"]] += span["end_ns"] - span["start_ns"]
+
+    stages: Dict[Tuple[str, ...], Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+    root_ns = 0
+    for span in selected:
+        wall_ns = span["end_ns"] - span["start_ns"]
+        parent = parent_of(span)
+        if parent is None:
+            root_ns += wall_ns
+        stage = stages[path_of(span)]
+        stage["wall_ms"].append(wall_ns / 1e6)
+        stage["self_ms"].append(max(0, wall_ns - child_ns[span["span_id"]]) / 1e6)
+        stage["cpu_ms"].append(span["cpu_ns"] / 1e6)
+        stage["offset_ms"].append((span["start_ns"] - parent["start_ns"]) / 1e6 if parent is not None else 0.0)
+        stage["errors"].append(1.0 if span["error"] else 0.0)
+
+    mean_offset = {path: sum(values["offset_ms"]) / len(values["offset_ms"]) for path, values in stages.items()}
+
+    def pipeline_order(path: Tuple[str, ...]):
+        # Parents before children; siblings in the order they usually start
+        return [(mean_offset.get(path[:depth], 0.0), path[depth - 1]) for depth in range(1, len(path) + 1)]
+
+    rows = []
+    for path in sorted(stages, key=pipeline_order):
+        values = stages[path]
+        wall = values["wall_ms"]
+        self_total = sum(values["self_ms"])
+        rows.append({
+            "stage": PATH_SEPARATOR.join(path),
+            "depth": len(path) - 1,
+            "name": path[-1],
+            "count": len(wall),
+            "errors": int(sum(values["errors"])),
+            "mean_ms": round(sum(wall) / len(wall), 2),
+            "p50_ms": round(percentile(wall, 50), 2),
+            "p95_ms": round(percentile(wall, 95), 2),
+            "p99_ms": round(percentile(wall, 99), 2),
+            "max_ms": round(max(wall), 2),
+            "self_mean_ms": round(self_total / len(wall), 2),
+            "cpu_mean_ms": round(sum(values["cpu_ms"]) / len(wall), 2),
+            "self_share": round(self_total / (root_ns / 1e6), 4) if root_ns else 0.0
+        })
+
+    return {
+        "traces": len({span["trace_id"] for span in selected}),
+        "spans": len(selected),
+        "sessions": len({span["session_id"] for span in selected if span["session_id"]}),
+        "root_seconds": round(root_ns / 1e9, 3),
+        "stages": rows
+    }
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Inspect recorded trace spans.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    breakdown = commands.add_parser("breakdown", help="Per-stage latency breakdown")
+    breakdown.add_argument("trace_file", nargs="?", default=TRACE_FILE_PATH,
+                           help="OTLP JSON lines file (default: TRACE_FILE_PATH)")
+    breakdown.add_argument("--root", help="Only traces whose root span has this name (e.g. chat_turn, save_conversation_with_summary)")
+    breakdown.add_argument("--session", help="Only traces of this session ID")
+    breakdown.add_argument("--json", action="store_true", help="Print the report as JSON")
+    args = parser.parse_args(argv)
+    if not args.trace_file:
+        parser.error("no trace file given and TRACE_FILE_PATH is not set")
+    return args
+
+def main(argv: Optional[List[str]] = None):
+    args = parse_args(argv)
+    report = stage_breakdown(list(iter_trace_file(args.trace_file)), root=args.root, session_id=args.session)
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"{report['traces']} traces, {report['spans']} spans, {report['sessions']} sessions, "
+          f"{report['root_seconds']}s in root spans")
+    header = f"{'stage':<44} {'count':>7} {'err':>5} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9} {'self ms':>9} {'cpu ms':>8} {'share':>7}"
+    print(header)
+    print("-" * len(header))
+    for row in report["stages"]:
+        label = "  " * row["depth"] + row["name"]
+        print(
+            f"{label:<44} {row['count']:>7} {row['errors']:>5} {row['p50_ms']:>9} {row['p95_ms']:>9} "
+            f"{row['p99_ms']:>9} {row['max_ms']:>9} {row['self_mean_ms']:>9} {row['cpu_mean_ms']:>8} "
+            f"{row['self_share'] * 100:>6.1f}%"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Token-budgeted context window management for long interviews.
+Keeps the prompt sent on each chat turn under a configurable token budget.
+
+Token counts are exact when tiktoken is installed. It is not in
+requirements.txt, so by default counts are estimated as (len(text) + 3) // 4
+and the budget is approximate - leave some headroom below the model limit.
+"""
+
+from functools import lru_cache
+from typing import List, Dict, Any, Tuple
+from .logger import ErrorLogger, logger
+from config import (
+    OPENAI_MODEL, CONTEXT_TOKEN_BUDGET, CONTEXT_KEEP_RECENT_MESSAGES,
+    CONTEXT_CONDENSED_MESSAGE_CHARS, CONTEXT_MIN_CONDENSED_MESSAGE_CHARS
+)
+
+try:
+    import tiktoken
+except ImportError:  # Optional dependency - fall back to a character heuristic
+    tiktoken = None
+
+# Approximate per-message overhead of the chat format (role, separators)
+MESSAGE_TOKEN_OVERHEAD = 4
+CONDENSED_HEADER = (
+    "Condensed record of the earlier part of this interview. "
+    "Use it to keep track of which themes have already been covered; "
+    "do not repeat questions listed here."
+)
+
+_encoding = None
+
+def _get_encoding():
+    """Get the tokenizer for the chat model, or None when tiktoken is unavailable."""
+    global _encoding
+    if _encoding is None and tiktoken is not None:
+        try:
+            _encoding = tiktoken.encoding_for_model(OPENAI_MODEL)
+        except Exception:
+            _encoding = tiktoken.get_encoding("cl100k_base")
+    return _encoding
+
+@lru_cache(maxsize=4096)
+def count_text_tokens(text: str) -> int:
+    """
+    Count tokens in a piece of text (cached, so each message is tokenized once).
+
+    Args:
+        text: Text to count
+
+    Returns:
+        int: Token count (estimated at ~4 characters per token without tiktoken)
+    """
+    encoding = _get_encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+def count_message_tokens(message: Dict[str, str]) -> int:
+    """Count tokens for a single chat message including format overhead."""
+    return count_text_tokens(message.get("content", "")) + MESSAGE_TOKEN_OVERHEAD
+
+def count_messages_tokens(messages: List[Dict[str, str]]) -> int:
+    """Count tokens for a list of chat messages."""
+    return sum(count_message_tokens(msg) for msg in messages)
+
+@lru_cache(maxsize=4096)
+def _condense_text(text: str, max_chars: int) -> str:
+    """Collapse whitespace and truncate text to max_chars on a word boundary."""
+    text = " ".join(text.split())
+    if len(text) <= max_chars:
+        return text
+    cut = text[:max_chars].rsplit(" ", 1)[0]
+    return f"{cut} [...]"
+
+def _condense_messages(messages: List[Dict[str, str]], max_chars: int, questions_asked: int) -> Dict[str, str]:
+    """Fold older turns into a single system message with one short line per turn."""
+    lines = [
+        f"{msg['role'].title()}: {_condense_text(msg['content'], max_chars)}"
+        for msg in messages
+        if msg.get("content", "").strip()
+    ]
+    content = (
+        f"{CONDENSED_HEADER}\n"
+        f"Interviewer messages so far (excluding the recent exchanges below): {questions_asked}\n\n"
+        + "\n".join(lines)
+    )
+    return {"role": "system", "content": content}
+
+def fit_messages_to_budget(
+    messages: List[Dict[str, str]],
+    budget: int = CONTEXT_TOKEN_BUDGET,
+    keep_recent: int = CONTEXT_KEEP_RECENT_MESSAGES
+) -> Tuple[List[Dict[str, str]], Dict[str, Any]]:
+    """
+    Compact a system-prompted message list so it fits within a token budget.
+
+    The leading system prompt and the most recent messages are always kept
+    verbatim. Older turns are folded into a rolling condensed system message;
+    the per-turn excerpt length is reduced step by step and, as a last resort,
+    the oldest condensed turns are dropped until the prompt fits.
+
+    Args:
+        messages: Messages with the system prompt first (as built by create_messages_with_system_prompt)
+        budget: Maximum prompt tokens (approximate unless tiktoken is installed)
+        keep_recent: Number of most recent conversation messages kept verbatim
+
+    Returns:
+        Tuple: (messages to send, stats dict with tokens_before, tokens_after and compacted_messages)
+    """
+    tokens_before = count_messages_tokens(messages)
+    stats = {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_before,
+        "compacted_messages": 0,
+        "budget": budget
+    }
+
+    if budget <= 0 or tokens_before <= budget:
+        return messages, stats
+
+    system_messages = [msg for msg in messages[:1] if msg["role"] == "system"]
+    conversation = messages[len(system_messages):]
+
+    if len(conversation) <= keep_recent:
+        return messages, stats
+
+    older = conversation[:-keep_recent]
+    recent = conversation[-keep_recent:]
+    fixed_tokens = count_messages_tokens(system_messages) + count_messages_tokens(recent)
+
+    # Counted before any condensed turns are dropped so theme progress is never lost
+    questions_asked = sum(1 for msg in older if msg["role"] == "assistant")
+    compacted = None
+    max_chars = CONTEXT_CONDENSED_MESSAGE_CHARS
+    while older:
+        compacted = _condense_messages(older, max_chars, questions_asked)
+        if fixed_tokens + count_message_tokens(compacted) <= budget:
+            break
+        if max_chars > CONTEXT_MIN_CONDENSED_MESSAGE_CHARS:
+            max_chars = max(CONTEXT_MIN_CONDENSED_MESSAGE_CHARS, max_chars // 2)
+        else:
+            older = older[1:]
+            compacted = None
+
+    result = system_messages + ([compacted] if compacted else []) + recent
+    stats["tokens_after"] = count_messages_tokens(result)
+    stats["compacted_messages"] = len(conversation) - len(recent)
+
+    if stats["tokens_after"] > budget:
+        ErrorLogger.log_warning("Prompt still exceeds token budget after compaction", "Context window", stats)
+
+    return result, stats
@@ -0,0 +1,169 @@
+"""
+Read-through cache for conversation lookups by session ID.
+An in-process LRU bounded by entry count and bytes, with a TTL, optional
+negative caching of missing sessions and single-flight loading, so concurrent
+misses for the same session share one database request.
+"""
+
+import copy
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+from .logger import logger
+from .metrics import CACHE_LOOKUPS
+from config import (
+    CONVERSATION_CACHE_MAX_ENTRIES, CONVERSATION_CACHE_MAX_BYTES,
+    CONVERSATION_CACHE_TTL, CONVERSATION_CACHE_NEGATIVE_TTL
+)
+
+class _Load:
+    """A load in progress that concurrent lookups of the same key wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value: Optional[Dict[str, Any]] = None
+        self.error: Optional[Exception] = None
+        self.stale = False  # Set when the key is invalidated while loading
+
+class ConversationCache:
+    """Thread-safe LRU with TTL and single-flight loading; None values are cached as misses."""
+
+    def __init__(
+        self,
+        max_entries: int = CONVERSATION_CACHE_MAX_ENTRIES,
+        max_bytes: int = CONVERSATION_CACHE_MAX_BYTES,
+        ttl: float = CONVERSATION_CACHE_TTL,
+        negative_ttl: float = CONVERSATION_CACHE_NEGATIVE_TTL
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        # key -> (expires_at, value, size in bytes)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._loads: Dict[str, _Load] = {}
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "negative_hits": 0, "misses": 0, "coalesced": 0, "evictions": 0}
+
+    def _drop(self, key: str):
+        """Called with the lock held."""
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+    def _store(self, key: str, value: Optional[Dict[str, Any]]):
+        """Called with the lock held: insert and evict least recently used entries."""
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        size = len(json.dumps(value, ensure_ascii=False, default=str).encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        self._drop(key)
+        self._entries[key] = (time.monotonic() + ttl, value, size)
+        self._bytes += size
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
+            self._stats["evictions"] += 1
+
+    def get_or_load(self, key: str, loader: Callable[[], Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached value for key, or load it once for all concurrent callers.
+
+        Args:
+            key: Cache key (the session ID)
+            loader: Fetches the value; returns None if it does not exist and raises on errors
+                (errors are passed to every waiting caller and never cached)
+
+        Returns:
+            Dict: A copy of the value, or None if it does not exist
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value, _ = entry
+                if time.monotonic() < expires_at:
+                    self._entries.move_to_end(key)
+                    result = "hit" if value is not None else "negative_hit"
+                    self._stats[f"{result}s"] += 1
+                    CACHE_LOOKUPS.inc(cache="conversation", result=result)
+                    return copy.deepcopy(value)
+                self._drop(key)
+
+            load = self._loads.get(key)
+            leader = load is None
+            if leader:
+                load = _Load()
+                self._loads[key] = load
+                self._stats["misses"] += 1
+                CACHE_LOOKUPS.inc(cache="conversation", result="miss")
+            else:
+                self._stats["coalesced"] += 1
+                CACHE_LOOKUPS.inc(cache="conversation", result="coalesced")
+
+        if not leader:
+            load.done.wait()
+        else:
+            try:
+                load.value = loader()
+            except Exception as e:
+                load.error = e
+            with self._lock:
+                self._loads.pop(key, None)
+                if load.error is None and not load.stale:
+                    self._store(key, load.value)
+            load.done.set()
+
+        if load.error is not None:
+            raise load.error
+        return copy.deepcopy(load.value)
+
+    def invalidate(self, key: str):
+        """Forget key, including the result of a load that is still in flight."""
+        with self._lock:
+            self._drop(key)
+            load = self._loads.get(key)
+            if load is not None:
+                load.stale = True
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+            stats["bytes"] = self._bytes
+        lookups = stats["hits"] + stats["negative_hits"] + stats["misses"] + stats["coalesced"]
+        stats["hit_rate"] = (stats["hits"] + stats["negative_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            for load in self._loads.values():
+                load.stale = True
+
+# Module-level variable to store the cache (singleton pattern)
+_conversation_cache = None
+_conversation_cache_lock = threading.Lock()
+
+def get_conversation_cache() -> ConversationCache:
+    """Get or create the process-wide conversation cache (singleton pattern)."""
+    global _conversation_cache
+    with _conversation_cache_lock:
+        if _conversation_cache is None:
+            _conversation_cache = ConversationCache()
+            logger.info(
+                "Conversation cache initialized (max_entries=%s, max_bytes=%s, ttl=%ss)",
+                CONVERSATION_CACHE_MAX_ENTRIES, CONVERSATION_CACHE_MAX_BYTES, CONVERSATION_CACHE_TTL
+            )
+    return _conversation_cache
+
+def get_conversation_cache_stats() -> Dict[str, Any]:
+    """Expose hit/miss counters of the process-wide conversation cache."""
+    return get_conversation_cache().stats()
@@ -0,0 +1,118 @@
+"""
+Per-conversation statistics, computed once when a conversation is saved.
+The values are stored in dedicated columns of the conversations table, so
+operational questions (turns per interview, answer length, completion rate)
+are answered from a few narrow columns instead of every transcript.
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+from .context_manager import count_text_tokens
+
+# The system prompt asks the assistant to close the interview with this phrase
+INTERVIEW_COMPLETE_MARKER = "INTERVIEW COMPLETE"
+
+# Columns written by save_conversation (started_at is stored alongside)
+STATS_COLUMNS = (
+    "started_at", "founder_turns", "assistant_turns", "founder_chars", "assistant_chars",
+    "founder_tokens", "assistant_tokens", "duration_seconds", "completion_detected"
+)
+
+# Message roles counted per stats column prefix
+_ROLE_PREFIXES = {"user": "founder", "assistant": "assistant"}
+
+def is_completion_message(content: str) -> bool:
+    """True if an assistant message signals the end of the interview."""
+    return INTERVIEW_COMPLETE_MARKER in content.upper()
+
+def _parse_timestamp(value: str) -> datetime:
+    # fromisoformat() before Python 3.11 does not accept a trailing Z
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+def compute_conversation_stats(
+    messages: List[Dict[str, str]],
+    started_at: Optional[str] = None,
+    ended_at: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Compute the stats columns for one transcript.
+
+    Args:
+        messages: List of conversation messages
+        started_at: ISO timestamp when the conversation started
+        ended_at: ISO timestamp when the conversation ended
+
+    Returns:
+        Dict: Values for STATS_COLUMNS (duration_seconds is None unless both timestamps are known)
+    """
+    stats: Dict[str, Any] = {}
+    for prefix in _ROLE_PREFIXES.values():
+        stats[f"{prefix}_turns"] = 0
+        stats[f"{prefix}_chars"] = 0
+        stats[f"{prefix}_tokens"] = 0
+    completion_detected = False
+    for message in messages:
+        prefix = _ROLE_PREFIXES.get(message["role"])
+        if prefix is None:
+            continue
+        content = message["content"] or ""
+        stats[f"{prefix}_turns"] += 1
+        stats[f"{prefix}_chars"] += len(content)
+        stats[f"{prefix}_tokens"] += count_text_tokens(content)
+        if message["role"] == "assistant" and is_completion_message(content):
+            completion_detected = True
+
+    duration_seconds = None
+    if started_at and ended_at:
+        duration_seconds = round(max(0.0, (_parse_timestamp(ended_at) - _parse_timestamp(started_at)).total_seconds()), 3)
+
+    stats["started_at"] = started_at
+    stats["duration_seconds"] = duration_seconds
+    stats["completion_detected"] = completion_detected
+    return stats
+
+def _average(total: float, count: int) -> Optional[float]:
+    return round(total / count, 2) if count else None
+
+def summarize_conversation_stats(rows: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Aggregate stats rows (as read by iter_conversation_stats) into an overview.
+
+    Rows saved before the stats columns existed have NULL stats and are only
+    counted in "conversations".
+
+    Args:
+        rows: Rows with the STATS_COLUMNS
+
+    Returns:
+        Dict: Counts, completion rate and averages per conversation and per founder answer
+    """
+    totals = {
+        "conversations": 0, "with_stats": 0, "completed": 0, "founder_turns": 0, "assistant_turns": 0,
+        "founder_chars": 0, "founder_tokens": 0, "assistant_tokens": 0, "timed": 0, "duration_seconds": 0.0
+    }
+    for row in rows:
+        totals["conversations"] += 1
+        if row.get("founder_turns") is None:
+            continue
+        totals["with_stats"] += 1
+        totals["completed"] += 1 if row.get("completion_detected") else 0
+        for column in ("founder_turns", "assistant_turns", "founder_chars", "founder_tokens", "assistant_tokens"):
+            totals[column] += row.get(column) or 0
+        if row.get("duration_seconds") is not None:
+            totals["timed"] += 1
+            totals["duration_seconds"] += float(row["duration_seconds"])
+
+    with_stats = totals["with_stats"]
+    return {
+        "conversations": totals["conversations"],
+        "with_stats": with_stats,
+        "completed": totals["completed"],
+        "completion_rate": _average(totals["completed"], with_stats),
+        "avg_founder_turns": _average(totals["founder_turns"], with_stats),
+        "avg_assistant_turns": _average(totals["assistant_turns"], with_stats),
+        "avg_founder_answer_chars": _average(totals["founder_chars"], totals["founder_turns"]),
+        "avg_founder_answer_tokens": _average(totals["founder_tokens"], totals["founder_turns"]),
+        "total_tokens": totals["founder_tokens"] + totals["assistant_tokens"],
+        "avg_duration_seconds": _average(totals["duration_seconds"], totals["timed"])
+    }
@@ -0,0 +1,176 @@
+"""
+Hedged requests for latency-critical chat calls.
+When the primary request is still pending after a high percentile of recent
+latencies, a duplicate (optionally to a faster fallback model) is sent; the
+first successful result wins. A loser that has not started is cancelled and
+one that returns a stream is closed as soon as it opens; a blocking request
+that already started runs to completion and still costs its tokens.
+"""
+
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Callable, Deque, Dict, Optional, Tuple, TypeVar
+from .logger import logger
+from .tracing import propagate, span
+from .metrics import LLM_HEDGE_OUTCOMES
+from config import (
+    OPENAI_HEDGE_ENABLED, OPENAI_HEDGE_PERCENTILE, OPENAI_HEDGE_MIN_SAMPLES,
+    OPENAI_HEDGE_DEFAULT_DELAY, OPENAI_HEDGE_MIN_DELAY, OPENAI_HEDGE_WINDOW, OPENAI_HEDGE_MAX_THREADS
+)
+
+T = TypeVar("T")
+
+class TurnDeadlineExceeded(TimeoutError):
+    """Raised when no request finished within the per-turn deadline."""
+
+class LatencyTracker:
+    """Sliding window of recent latencies used to pick the hedge delay."""
+
+    def __init__(self, window: int = OPENAI_HEDGE_WINDOW):
+        self._samples: Deque[float] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> Optional[float]:
+        """Nearest-rank percentile, or None while there are fewer than OPENAI_HEDGE_MIN_SAMPLES samples."""
+        with self._lock:
+            samples = sorted(self._samples)
+        if len(samples) < OPENAI_HEDGE_MIN_SAMPLES:
+            return None
+        index = min(len(samples) - 1, max(0, int(round(pct / 100 * len(samples))) - 1))
+        return samples[index]
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for the primary request before sending the hedge."""
+        threshold = self.percentile(OPENAI_HEDGE_PERCENTILE)
+        if threshold is None:
+            return OPENAI_HEDGE_DEFAULT_DELAY
+        return max(OPENAI_HEDGE_MIN_DELAY, threshold)
+
+# Module-level trackers per call type (singleton pattern)
+_latency_trackers: Dict[str, LatencyTracker] = {}
+_latency_trackers_lock = threading.Lock()
+
+def get_latency_tracker(call_type: str) -> LatencyTracker:
+    """Get or create the process-wide latency tracker for a call type."""
+    with _latency_trackers_lock:
+        if call_type not in _latency_trackers:
+            _latency_trackers[call_type] = LatencyTracker()
+        return _latency_trackers[call_type]
+
+# Shared by all hedged calls; threads that lose the race are not joined, so they cannot delay the turn
+_executor = ThreadPoolExecutor(max_workers=OPENAI_HEDGE_MAX_THREADS, thread_name_prefix="hedge")
+
+def _discard(future: Future, cancel: Optional[Callable[[T], None]]):
+    """Cancel a losing request, or release its result as soon as it arrives."""
+    if future.cancel() or cancel is None:
+        return
+
+    def release(done: Future):
+        if not done.cancelled() and done.exception() is None:
+            cancel(done.result())
+
+    future.add_done_callback(release)
+
+def hedged_call(
+    operation: Callable[[str, float], T],
+    call_type: str,
+    primary_model: str,
+    hedge_model: str,
+    deadline: float,
+    cancel: Optional[Callable[[T], None]] = None
+) -> Tuple[T, str]:
+    """
+    Run an operation with a hedged duplicate and a hard deadline.
+
+    Args:
+        operation: Callable taking (model, remaining seconds) and returning the result
+        call_type: Call type used for the latency tracker and metrics (e.g. 'chat')
+        primary_model: Model for the primary request
+        hedge_model: Model for the hedged request
+        deadline: Total seconds allowed for the call
+        cancel: Optional callback releasing a losing result (e.g. closing a stream);
+            without it a loser that cannot be cancelled is left to finish and discarded
+
+    Returns:
+        Tuple: (result of the first successful request, model that produced it)
+
+    Raises:
+        TurnDeadlineExceeded: If no request succeeded before the deadline
+        Exception: The last request error if every request failed
+    """
+    tracker = get_latency_tracker(call_type)
+    start_time = time.monotonic()
+    end_time = start_time + deadline
+
+    if not OPENAI_HEDGE_ENABLED:
+        # Nothing to race: run on the caller's thread, the operation enforces the deadline it is given
+        with span(f"{call_type}_attempt", role="primary", model=primary_model):
+            try:
+                result = operation(primary_model, deadline)
+            except Exception:
+                LLM_HEDGE_OUTCOMES.inc(call_type=call_type, outcome="failed")
+                raise
+        tracker.record(time.monotonic() - start_time)
+        LLM_HEDGE_OUTCOMES.inc(call_type=call_type, outcome="not_hedged")
+        return result, primary_model
+
+    attempts: Dict[Future, Tuple[str, str]] = {}
+
+    def launch(role: str, model: str) -> Future:
+        def attempt(attempt_model: str):
+            # Measured when the attempt starts, so time spent queued for a pool thread is not granted twice
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                raise TurnDeadlineExceeded(f"{call_type} {role} request started after the deadline")
+            with span(f"{call_type}_attempt", role=role, model=attempt_model):
+                return operation(attempt_model, remaining)
+        # propagate: the attempt runs on a pool thread but stays in the caller's trace
+        future = _executor.submit(propagate(attempt), model)
+        attempts[future] = (role, model)
+        return future
+
+    def record_primary(future: Future):
+        # Recorded even when the hedge won, so slow primaries keep shaping the threshold
+        if not future.cancelled() and future.exception() is None:
+            tracker.record(time.monotonic() - start_time)
+
+    primary = launch("primary", primary_model)
+    primary.add_done_callback(record_primary)
+
+    hedge_delay = tracker.hedge_delay()
+    done, _ = wait([primary], timeout=min(hedge_delay, max(0.0, end_time - time.monotonic())))
+    if not done and time.monotonic() < end_time:
+        logger.info("Hedging %s request after %.2fs with model: %s", call_type, hedge_delay, hedge_model)
+        launch("hedge", hedge_model)
+
+    pending = set(attempts)
+    last_error = None
+    while pending:
+        remaining = end_time - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            if future.exception() is not None:
+                last_error = future.exception()
+                continue
+            role, model = attempts[future]
+            for other in attempts:
+                if other is not future:
+                    _discard(other, cancel)
+            outcome = f"{role}_won" if len(attempts) > 1 else "not_hedged"
+            LLM_HEDGE_OUTCOMES.inc(call_type=call_type, outcome=outcome)
+            return future.result(), model
+
+    for future in attempts:
+        _discard(future, cancel)
+    LLM_HEDGE_OUTCOMES.inc(call_type=call_type, outcome="failed")
+    if last_error is not None and not pending:
+        raise last_error
+    raise TurnDeadlineExceeded(f"No {call_type} response within the {deadline:.1f}s deadline")
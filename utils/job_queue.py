@@ -0,0 +1,312 @@
+"""
+Durable background job queue backed by SQLite.
+Jobs survive page reloads and process restarts; a local worker pool claims
+them with a lease, retries failures with backoff and records their status.
+Payloads are cleared when a job succeeds and finished jobs are purged after
+a retention period, so transcripts are not kept on disk indefinitely.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional
+from .logger import ErrorLogger, logger
+from config import (
+    JOB_QUEUE_DB_PATH, JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_RETRY_BASE_DELAY,
+    JOB_POLL_INTERVAL, JOB_LEASE_SECONDS, JOB_SUCCEEDED_RETENTION_SECONDS,
+    JOB_FAILED_RETENTION_SECONDS, JOB_PURGE_INTERVAL
+)
+
+JOB_STATUS_QUEUED = "queued"
+JOB_STATUS_RUNNING = "running"
+JOB_STATUS_SUCCEEDED = "succeeded"
+JOB_STATUS_FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    session_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    available_at REAL NOT NULL,
+    lease_expires_at REAL,
+    last_error TEXT,
+    result TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_claim ON jobs(status, available_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_session_id ON jobs(session_id);
+"""
+
+class JobQueue:
+    """A persistent FIFO of jobs with at-least-once execution."""
+
+    def __init__(self, db_path: str = JOB_QUEUE_DB_PATH):
+        self.db_path = db_path
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the queue safe across threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        # Overwrite cleared payloads and purged jobs instead of leaving transcripts in free pages
+        conn.execute("PRAGMA secure_delete=ON")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _row_to_job(row: Optional[sqlite3.Row]) -> Optional[Dict[str, Any]]:
+        if row is None:
+            return None
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def enqueue(self, kind: str, payload: Dict[str, Any], session_id: Optional[str] = None, max_attempts: int = JOB_MAX_ATTEMPTS) -> str:
+        """
+        Durably add a job to the queue.
+
+        Args:
+            kind: Handler name
+            payload: JSON-serializable job input
+            session_id: Optional session the job belongs to (for status lookups)
+            max_attempts: Attempts before the job is marked failed
+
+        Returns:
+            str: Job ID
+        """
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connection() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, session_id, payload, status, max_attempts, available_at, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, session_id, json.dumps(payload), JOB_STATUS_QUEUED, max_attempts, now, now, now)
+            )
+        logger.info("Enqueued %s job %s for session_id: %s", kind, job_id, session_id)
+        return job_id
+
+    def claim(self, kinds: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Atomically claim the oldest runnable job (queued, or running with an expired lease).
+
+        A job whose lease expired on its final attempt is marked failed instead
+        of being run again. The returned job carries the lease it was claimed
+        with; complete() and fail() only apply while that lease is still held.
+        """
+        now = time.time()
+        lease_expires_at = now + JOB_LEASE_SECONDS
+        placeholders = ",".join("?" for _ in kinds)
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                f"UPDATE jobs SET status = ?, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+                f"WHERE kind IN ({placeholders}) AND status = ? AND lease_expires_at <= ? AND attempts >= max_attempts",
+                (JOB_STATUS_FAILED, "Lease expired on the final attempt", now, *kinds, JOB_STATUS_RUNNING, now)
+            )
+            row = conn.execute(
+                f"SELECT * FROM jobs WHERE kind IN ({placeholders}) AND ("
+                f"(status = ? AND available_at <= ?) OR (status = ? AND lease_expires_at <= ? AND attempts < max_attempts)"
+                f") ORDER BY available_at LIMIT 1",
+                (*kinds, JOB_STATUS_QUEUED, now, JOB_STATUS_RUNNING, now)
+            ).fetchone()
+            if row is None:
+                conn.execute("COMMIT")
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_expires_at = ?, updated_at = ? WHERE id = ?",
+                (JOB_STATUS_RUNNING, lease_expires_at, now, row["id"])
+            )
+            conn.execute("COMMIT")
+            job = self._row_to_job(row)
+            job["attempts"] += 1
+            job["status"] = JOB_STATUS_RUNNING
+            job["lease_expires_at"] = lease_expires_at
+            return job
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def complete(self, job: Dict[str, Any], result: Optional[Dict[str, Any]] = None) -> bool:
+        """
+        Mark a claimed job as succeeded and drop its payload (only the status is kept until purged).
+
+        Returns:
+            bool: False if the lease was lost (the job expired and was claimed again), in which case nothing is changed
+        """
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, payload = ?, result = ?, lease_expires_at = NULL, last_error = NULL, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_expires_at = ?",
+                (JOB_STATUS_SUCCEEDED, json.dumps(None), json.dumps(result) if result is not None else None, time.time(),
+                 job["id"], JOB_STATUS_RUNNING, job["lease_expires_at"])
+            )
+        return cursor.rowcount > 0
+
+    def fail(self, job: Dict[str, Any], error: Exception) -> bool:
+        """
+        Schedule a retry of a claimed job with exponential backoff, or mark it failed after max_attempts.
+
+        Returns:
+            bool: False if the lease was lost (the job expired and was claimed again), in which case nothing is changed
+        """
+        now = time.time()
+        exhausted = job["attempts"] >= job["max_attempts"]
+        status = JOB_STATUS_FAILED if exhausted else JOB_STATUS_QUEUED
+        available_at = now + JOB_RETRY_BASE_DELAY * (2 ** (job["attempts"] - 1))
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = ?, available_at = ?, lease_expires_at = NULL, last_error = ?, updated_at = ? "
+                "WHERE id = ? AND status = ? AND lease_expires_at = ?",
+                (status, available_at, f"{type(error).__name__}: {error}", now, job["id"], JOB_STATUS_RUNNING, job["lease_expires_at"])
+            )
+        return cursor.rowcount > 0
+
+    def purge(
+        self,
+        succeeded_retention: float = JOB_SUCCEEDED_RETENTION_SECONDS,
+        failed_retention: float = JOB_FAILED_RETENTION_SECONDS
+    ) -> int:
+        """
+        Delete finished jobs older than their retention period.
+
+        Args:
+            succeeded_retention: Seconds a succeeded job is kept after finishing
+            failed_retention: Seconds a failed job is kept after its last attempt
+
+        Returns:
+            int: Number of jobs deleted
+        """
+        now = time.time()
+        with self._connection() as conn:
+            cursor = conn.execute(
+                "DELETE FROM jobs WHERE (status = ? AND updated_at <= ?) OR (status = ? AND updated_at <= ?)",
+                (JOB_STATUS_SUCCEEDED, now - succeeded_retention, JOB_STATUS_FAILED, now - failed_retention)
+            )
+        if cursor.rowcount:
+            logger.info("Purged %s finished jobs", cursor.rowcount)
+        return cursor.rowcount
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Look up a job by ID."""
+        with self._connection() as conn:
+            return self._row_to_job(conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone())
+
+    def counts(self) -> Dict[str, int]:
+        """Number of jobs per status."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+class JobWorkerPool:
+    """Threads that claim and run jobs with registered handlers."""
+
+    def __init__(self, queue: JobQueue, workers: int = JOB_WORKERS):
+        self.queue = queue
+        self.workers = workers
+        self._handlers: Dict[str, Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]] = {}
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self._purge_lock = threading.Lock()
+        self._next_purge = 0.0
+
+    def register(self, kind: str, handler: Callable[[Dict[str, Any]], Optional[Dict[str, Any]]]):
+        """Register the handler for a job kind; it receives the payload and returns an optional result dict."""
+        self._handlers[kind] = handler
+
+    def start(self):
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._run, name=f"job-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        logger.info("Started %s job workers for kinds: %s", self.workers, sorted(self._handlers))
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def run_once(self) -> bool:
+        """Claim and run a single job. Returns True if a job was processed."""
+        job = self.queue.claim(list(self._handlers))
+        if job is None:
+            return False
+
+        logger.info("Running %s job %s (attempt %s/%s)", job['kind'], job['id'], job['attempts'], job['max_attempts'])
+        try:
+            result = self._handlers[job["kind"]](job["payload"])
+        except Exception as e:
+            ErrorLogger.log_error(e, f"Background job {job['kind']}", {
+                "job_id": job["id"],
+                "session_id": job["session_id"],
+                "attempt": job["attempts"],
+                "max_attempts": job["max_attempts"]
+            })
+            recorded = self.queue.fail(job, e)
+        else:
+            recorded = self.queue.complete(job, result)
+            if recorded:
+                logger.info("Job %s succeeded", job['id'])
+        if not recorded:
+            ErrorLogger.log_warning("Job lease expired before the job finished; outcome not recorded", "Background job", {
+                "job_id": job["id"],
+                "session_id": job["session_id"],
+                "attempt": job["attempts"]
+            })
+        return True
+
+    def _purge_if_due(self):
+        """Purge expired jobs at most every JOB_PURGE_INTERVAL seconds across all workers."""
+        with self._purge_lock:
+            if time.monotonic() < self._next_purge:
+                return
+            self._next_purge = time.monotonic() + JOB_PURGE_INTERVAL
+        self.queue.purge()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                if not self.run_once():
+                    self._purge_if_due()
+                    self._stop.wait(JOB_POLL_INTERVAL)
+            except Exception as e:
+                ErrorLogger.log_error(e, "Job worker loop")
+                self._stop.wait(JOB_POLL_INTERVAL)
+
+# Module-level variables to store the queue and workers (singleton pattern)
+_job_queue = None
+_job_queue_lock = threading.Lock()
+
+def get_job_queue() -> JobQueue:
+    """Get or create the process-wide job queue (singleton pattern)."""
+    global _job_queue
+    with _job_queue_lock:
+        if _job_queue is None:
+            _job_queue = JobQueue()
+            logger.info("Job queue initialized at %s", JOB_QUEUE_DB_PATH)
+    return _job_queue
@@ -3,29 +3,187 @@ Centralized logging utility for the LLM Chat Agent.
 Provides structured logging with different levels and error tracking.
 """
 
+import asyncio
+import atexit
+import functools
+import json
 import logging
+import logging.handlers
+import queue
+import threading
+import time
 import traceback
 import sys
-from datetime import datetime
-from typing import Optional, Dict, Any
-import json
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Tuple
+from config import LOG_FORMAT, LOG_ASYNC, LOG_QUEUE_MAX_RECORDS, LOG_INFO_RATE_PER_SECOND, LOG_INFO_BURST
+
+# Argument types that cannot change between the logging call and the listener formatting the record
+_IMMUTABLE_ARG_TYPES = (str, int, float, bool, type(None), bytes)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines; structured fields are appended as compact JSON."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        suppressed = getattr(record, "suppressed", 0)
+        if suppressed:
+            line += f" [{suppressed} similar messages suppressed]"
+        dropped = getattr(record, "dropped", 0)
+        if dropped:
+            line += f" [{dropped} log records dropped]"
+        data = getattr(record, "data", None)
+        if data:
+            line += f"\nAdditional data: {json.dumps(data, default=str, ensure_ascii=False)}"
+        error_traceback = getattr(record, "error_traceback", None)
+        if error_traceback:
+            line += f"\nTraceback: {error_traceback.rstrip()}"
+        return line
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, for log pipelines."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "timestamp": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "message": record.getMessage()
+        }
+        for field in ("data", "suppressed", "dropped"):
+            value = getattr(record, field, None)
+            if value:
+                entry[field] = value
+        error_traceback = getattr(record, "error_traceback", None)
+        if error_traceback:
+            entry["traceback"] = error_traceback
+        elif record.exc_info:
+            entry["traceback"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class InfoSampler(logging.Filter):
+    """
+    Rate-limit INFO and DEBUG records per call site with a token bucket.
+
+    A chat turn logs the same few lines for every session, so under load
+    each call site passes at most `rate` records per second (after a burst
+    of `burst`). Warnings and errors always pass. The next record that
+    passes from a call site carries the number suppressed before it.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        super().__init__()
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._lock = threading.Lock()
+        # (pathname, lineno) -> [tokens, updated_at, suppressed]
+        self._sites: Dict[Tuple[str, int], list] = {}
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING or self.rate <= 0:
+            return True
+        now = time.monotonic()
+        key = (record.pathname, record.lineno)
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None:
+                site = self._sites[key] = [self.burst, now, 0]
+            site[0] = min(self.burst, site[0] + (now - site[1]) * self.rate)
+            site[1] = now
+            if site[0] < 1:
+                site[2] += 1
+                return False
+            site[0] -= 1
+            suppressed, site[2] = site[2], 0
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class NonBlockingQueueHandler(logging.handlers.QueueHandler):
+    """
+    Hand records to the listener thread without formatting them.
+
+    The stock QueueHandler formats every record in the calling thread; here
+    the message is only rendered early when an argument is mutable and could
+    change before the listener gets to it. Once `max_records` are waiting,
+    records are dropped instead of growing the queue; the drop count rides on
+    the next record that is queued.
+    """
+
+    def __init__(self, record_queue: "queue.SimpleQueue", max_records: int):
+        super().__init__(record_queue)
+        self.max_records = max_records
+        self._dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args:
+            values = args.values() if isinstance(args, dict) else args
+            if not all(isinstance(value, _IMMUTABLE_ARG_TYPES) for value in values):
+                record.msg = record.getMessage()
+                record.args = None
+        if self._dropped:
+            with self._dropped_lock:
+                record.dropped, self._dropped = self._dropped, 0
+        return record
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self.max_records and self.queue.qsize() >= self.max_records:
+                with self._dropped_lock:
+                    self._dropped += 1
+                return
+            self.enqueue(self.prepare(record))
+        except Exception:
+            self.handleError(record)
+
+_listener: Optional[logging.handlers.QueueListener] = None
+_setup_lock = threading.Lock()
 
 # Configure logging
 def setup_logging():
-    """Setup logging configuration for Streamlit Cloud."""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.StreamHandler(sys.stdout)  # Streamlit Cloud logs to stdout
-        ]
-    )
-    
+    """
+    Setup logging configuration for Streamlit Cloud.
+
+    Records go to stdout as text lines or JSON objects (LOG_FORMAT). With
+    LOG_ASYNC the request threads only enqueue records; formatting and the
+    write happen on a listener thread, which is flushed at exit.
+    """
+    global _listener
+    with _setup_lock:
+        if _listener is not None:
+            return
+        stream_handler = logging.StreamHandler(sys.stdout)  # Streamlit Cloud logs to stdout
+        if LOG_FORMAT == "json":
+            stream_handler.setFormatter(JsonFormatter())
+        else:
+            stream_handler.setFormatter(TextFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+        if LOG_ASYNC:
+            handler: logging.Handler = NonBlockingQueueHandler(queue.SimpleQueue(), LOG_QUEUE_MAX_RECORDS)
+            _listener = logging.handlers.QueueListener(handler.queue, stream_handler, respect_handler_level=True)
+            _listener.start()
+            atexit.register(stop_logging)
+        else:
+            handler = stream_handler
+        handler.addFilter(InfoSampler(LOG_INFO_RATE_PER_SECOND, LOG_INFO_BURST))
+        logging.basicConfig(level=logging.INFO, handlers=[handler])
+
     # Set specific loggers
     logging.getLogger('openai').setLevel(logging.WARNING)
     logging.getLogger('supabase').setLevel(logging.WARNING)
     logging.getLogger('httpx').setLevel(logging.WARNING)
 
+def stop_logging():
+    """Write out the queued records and stop the listener thread."""
+    global _listener
+    with _setup_lock:
+        listener, _listener = _listener, None
+    if listener is not None:
+        listener.stop()
+
 # Initialize logging
 setup_logging()
 logger = logging.getLogger(__name__)
@@ -54,7 +212,7 @@ class ErrorLogger:
             "error_type": type(error).__name__,
             "error_message": str(error),
             "context": context,
-            "traceback": traceback.format_exc()
+            "traceback": "".join(traceback.format_exception(type(error), error, error.__traceback__))
         }
         
         if additional_data:
@@ -63,39 +221,59 @@ class ErrorLogger:
         if user_message:
             error_data["user_message"] = user_message
         
-        # Log to console (Streamlit Cloud logs)
-        logger.error(f"ERROR in {context}: {type(error).__name__}: {str(error)}")
-        logger.error(f"Additional data: {json.dumps(additional_data or {}, indent=2)}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        # Log to console (Streamlit Cloud logs); one record, serialized by the formatter
+        logger.error(
+            "ERROR in %s: %s: %s", context, error_data["error_type"], error_data["error_message"],
+            extra={"data": dict(additional_data or {}), "error_traceback": error_data["traceback"]}
+        )
         
         return error_data
     
     @staticmethod
     def log_warning(message: str, context: str, additional_data: Optional[Dict[str, Any]] = None):
         """Log a warning with context."""
-        logger.warning(f"WARNING in {context}: {message}")
-        if additional_data:
-            logger.warning(f"Additional data: {json.dumps(additional_data, indent=2)}")
+        logger.warning("WARNING in %s: %s", context, message, extra={"data": dict(additional_data or {})})
     
     @staticmethod
     def log_info(message: str, context: str, additional_data: Optional[Dict[str, Any]] = None):
         """Log an info message with context."""
-        logger.info(f"INFO in {context}: {message}")
-        if additional_data:
-            logger.info(f"Additional data: {json.dumps(additional_data, indent=2)}")
+        logger.info("INFO in %s: %s", context, message, extra={"data": dict(additional_data or {})})
 
 def log_function_call(func_name: str, args: Optional[Dict[str, Any]] = None):
-    """Decorator to log function calls for debugging."""
+    """
+    Decorator that traces each call as a span named func_name (see utils.tracing).
+
+    The span nests under the caller's span and records wall and CPU time; a
+    raised exception marks it as failed and is left to the function's own
+    error handling to log. Calls are logged at DEBUG level without their
+    arguments, which may hold whole transcripts or API keys.
+    
+    Args:
+        func_name: Span name, i.e. the pipeline stage
+        args: Static attributes added to every span
+    """
+    attributes = dict(args or {})
+
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            logger.info(f"Calling {func_name} with args: {args}, kwargs: {kwargs}")
-            try:
-                result = func(*args, **kwargs)
-                logger.info(f"Function {func_name} completed successfully")
-                return result
-            except Exception as e:
-                ErrorLogger.log_error(e, f"Function {func_name}", {"args": args, "kwargs": kwargs})
-                raise
+        from .tracing import span, tracing_enabled
+
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*call_args, **call_kwargs):
+                logger.debug("Calling %s", func_name)
+                if not tracing_enabled():
+                    return await func(*call_args, **call_kwargs)
+                with span(func_name, **attributes):
+                    return await func(*call_args, **call_kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*call_args, **call_kwargs):
+            logger.debug("Calling %s", func_name)
+            if not tracing_enabled():
+                return func(*call_args, **call_kwargs)
+            with span(func_name, **attributes):
+                return func(*call_args, **call_kwargs)
         return wrapper
     return decorator
 
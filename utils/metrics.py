@@ -0,0 +1,361 @@
+"""
+In-process metrics for LLM and database calls.
+Records latency histograms, token usage, cost, retries, errors and cache lookups,
+and exports them in Prometheus text format over HTTP or to a file.
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from .logger import ErrorLogger, logger
+from config import (
+    METRICS_HTTP_PORT, METRICS_FILE_PATH, METRICS_FILE_INTERVAL, OPENAI_PRICING_PER_MILLION_TOKENS
+)
+
+# Latency buckets in seconds, from fast DB reads to slow end-of-interview LLM calls
+DEFAULT_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0)
+
+LabelValues = Tuple[str, ...]
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: Tuple[str, ...], values: LabelValues, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{_escape(extra[1])}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[LabelValues, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            return self._values.get(key, 0.0)
+
+    def total(self, **labels) -> float:
+        """Sum over every series whose labels match the given values (all series if none given)."""
+        wanted = {self.label_names.index(name): str(value) for name, value in labels.items()}
+        with self._lock:
+            return sum(value for key, value in self._values.items() if all(key[i] == v for i, v in wanted.items()))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class Histogram:
+    """Cumulative-bucket histogram with labels."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = (), buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._series: Dict[LabelValues, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+                self._series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series["counts"][i] += 1
+                    break
+            series["sum"] += value
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, series in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, series["counts"]):
+                    cumulative += count
+                    labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {cumulative}")
+                labels = _format_labels(self.label_names, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(series['sum'])}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+class Gauge:
+    """Point-in-time value with labels, optionally sampled from a callback at render time."""
+
+    def __init__(self, name: str, documentation: str, label_names: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = label_names
+        self._values: Dict[LabelValues, float] = {}
+        self._function: Optional[Callable[[], Dict[LabelValues, float]]] = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function: Callable[[], Dict[LabelValues, float]]):
+        """Sample values from function (label values -> value) whenever the gauge is rendered."""
+        self._function = function
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge"]
+        with self._lock:
+            values = dict(self._values)
+        if self._function is not None:
+            try:
+                values.update(self._function())
+            except Exception as e:
+                ErrorLogger.log_error(e, f"Gauge {self.name} sampling")
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    """Holds metrics in registration order and renders them together."""
+
+    def __init__(self):
+        self._metrics: List[Any] = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+REGISTRY = MetricsRegistry()
+
+LLM_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "newco_llm_request_duration_seconds", "Latency of LLM calls including retries", ("call_type", "model")))
+LLM_TIME_TO_FIRST_TOKEN = REGISTRY.register(Histogram(
+    "newco_llm_time_to_first_token_seconds", "Time to first streamed token", ("call_type", "model")))
+LLM_REQUESTS = REGISTRY.register(Counter(
+    "newco_llm_requests_total", "LLM calls by outcome", ("call_type", "model", "outcome")))
+LLM_TOKENS = REGISTRY.register(Counter(
+    "newco_llm_tokens_total", "Tokens reported in the usage block", ("call_type", "model", "kind")))
+LLM_COST = REGISTRY.register(Counter(
+    "newco_llm_cost_usd_total", "Estimated LLM spend from token usage", ("call_type", "model")))
+LLM_HEDGE_OUTCOMES = REGISTRY.register(Counter(
+    "newco_llm_hedge_outcomes_total", "Hedging decisions: not_hedged, primary_won, hedge_won or failed", ("call_type", "outcome")))
+LLM_ERRORS = REGISTRY.register(Counter(
+    "newco_llm_errors_total", "Failed LLM calls by error class", ("call_type", "model", "error_class")))
+DB_REQUEST_DURATION = REGISTRY.register(Histogram(
+    "newco_db_request_duration_seconds", "Latency of database calls including retries", ("operation",)))
+DB_REQUESTS = REGISTRY.register(Counter(
+    "newco_db_requests_total", "Database calls by outcome", ("operation", "outcome")))
+DB_ERRORS = REGISTRY.register(Counter(
+    "newco_db_errors_total", "Failed database calls by error class", ("operation", "error_class")))
+RETRIES = REGISTRY.register(Counter(
+    "newco_retries_total", "Retried attempts by upstream, error class, LLM call type and model", ("upstream", "error_class", "call_type", "model")))
+CACHE_LOOKUPS = REGISTRY.register(Counter(
+    "newco_cache_lookups_total", "Cache lookups by cache and result", ("cache", "result")))
+RATE_LIMIT_WAIT = REGISTRY.register(Histogram(
+    "newco_rate_limit_wait_seconds", "Time OpenAI calls waited for rate limiter capacity"))
+RATE_LIMIT_UTILIZATION = REGISTRY.register(Gauge(
+    "newco_rate_limit_utilization_ratio", "Fraction of the per-minute OpenAI budget in use", ("bucket",)))
+SCHEDULER_QUEUE_WAIT = REGISTRY.register(Histogram(
+    "newco_scheduler_queue_wait_seconds", "Time OpenAI calls waited for a scheduler slot", ("priority",)))
+SCHEDULER_IN_FLIGHT = REGISTRY.register(Gauge(
+    "newco_scheduler_calls", "OpenAI calls in flight or queued per priority class", ("priority", "state")))
+OUTBOX_OPERATIONS = REGISTRY.register(Counter(
+    "newco_outbox_operations_total", "Outbox operations pushed upstream: drained, failed (retried) or dead", ("operation", "outcome")))
+OUTBOX_BACKLOG = REGISTRY.register(Gauge(
+    "newco_outbox_backlog", "Operations waiting in the local outbox by status", ("status",)))
+WRITE_BEHIND_RECORDS = REGISTRY.register(Counter(
+    "newco_write_behind_records_total", "Records handled by write-behind buffers: written or dropped", ("buffer", "outcome")))
+WRITE_BEHIND_PENDING = REGISTRY.register(Gauge(
+    "newco_write_behind_pending", "Records queued in write-behind buffers", ("buffer",)))
+
+class CallRecord:
+    """Mutable record handed to the body of an observed call."""
+
+    def __init__(self):
+        self.usage = None
+
+def usage_value(usage: Any, name: str) -> int:
+    """Read a token count from a usage block (an SDK object, or a dict for streamed usage)."""
+    value = usage.get(name) if isinstance(usage, dict) else getattr(usage, name, None)
+    return int(value or 0)
+
+def _cached_tokens(usage: Any) -> int:
+    details = usage.get("prompt_tokens_details") if isinstance(usage, dict) else getattr(usage, "prompt_tokens_details", None)
+    if details is None:
+        return 0
+    return usage_value(details, "cached_tokens")
+
+def record_llm_usage(call_type: str, model: str, usage: Any, estimated: bool = False):
+    """
+    Add prompt, completion and cached token counts (and estimated cost) from an OpenAI usage block.
+
+    Args:
+        call_type: Call type label
+        model: Model label
+        usage: Usage block (SDK object or dict); None records nothing
+        estimated: The counts are a local estimate rather than reported by the API; they are
+            recorded under the kinds 'prompt_estimated' and 'completion_estimated'
+    """
+    if usage is None:
+        return
+    prompt_tokens = usage_value(usage, "prompt_tokens")
+    completion_tokens = usage_value(usage, "completion_tokens")
+    suffix = "_estimated" if estimated else ""
+    LLM_TOKENS.inc(prompt_tokens, call_type=call_type, model=model, kind="prompt" + suffix)
+    LLM_TOKENS.inc(completion_tokens, call_type=call_type, model=model, kind="completion" + suffix)
+    if not estimated:
+        LLM_TOKENS.inc(_cached_tokens(usage), call_type=call_type, model=model, kind="cached")
+
+    pricing = OPENAI_PRICING_PER_MILLION_TOKENS.get(model)
+    if pricing:
+        cost = (prompt_tokens * pricing["prompt"] + completion_tokens * pricing["completion"]) / 1_000_000
+        LLM_COST.inc(cost, call_type=call_type, model=model)
+
+def record_llm_call(
+    call_type: str,
+    model: str,
+    duration: float,
+    error: Optional[Exception] = None,
+    usage: Any = None,
+    time_to_first_token: Optional[float] = None
+):
+    """Record one finished LLM call (used directly by streaming calls)."""
+    LLM_REQUEST_DURATION.observe(duration, call_type=call_type, model=model)
+    LLM_REQUESTS.inc(call_type=call_type, model=model, outcome="error" if error else "success")
+    if error is not None:
+        LLM_ERRORS.inc(call_type=call_type, model=model, error_class=type(error).__name__)
+    if time_to_first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN.observe(time_to_first_token, call_type=call_type, model=model)
+    record_llm_usage(call_type, model, usage)
+
+@contextmanager
+def observe_llm_call(call_type: str, model: str) -> Iterator[CallRecord]:
+    """
+    Time an LLM call and record its outcome and token usage.
+
+    Usage:
+        with observe_llm_call("chat", model) as call:
+            response = ...
+            call.usage = response.usage
+    """
+    record = CallRecord()
+    start_time = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        record_llm_call(call_type, model, time.perf_counter() - start_time, error=e, usage=record.usage)
+        raise
+    record_llm_call(call_type, model, time.perf_counter() - start_time, usage=record.usage)
+
+@contextmanager
+def observe_db_call(operation: str) -> Iterator[CallRecord]:
+    """Time a database call and record its outcome."""
+    record = CallRecord()
+    start_time = time.perf_counter()
+    try:
+        yield record
+    except Exception as e:
+        DB_REQUEST_DURATION.observe(time.perf_counter() - start_time, operation=operation)
+        DB_REQUESTS.inc(operation=operation, outcome="error")
+        DB_ERRORS.inc(operation=operation, error_class=type(e).__name__)
+        raise
+    DB_REQUEST_DURATION.observe(time.perf_counter() - start_time, operation=operation)
+    DB_REQUESTS.inc(operation=operation, outcome="success")
+
+def render_metrics() -> str:
+    """Render all metrics in Prometheus text exposition format."""
+    return REGISTRY.render()
+
+def write_metrics_file(path: str = METRICS_FILE_PATH):
+    """Atomically write the current metrics to a file (e.g. for the node_exporter textfile collector)."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render_metrics())
+    os.replace(tmp_path, path)
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?", 1)[0] not in ("/metrics", "/"):
+            self.send_error(404)
+            return
+        body = render_metrics().encode("utf-8")
+        self.send_response(200)
+        self.send_header("content-type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("content-length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+_exporter_started = False
+_exporter_lock = threading.Lock()
+
+def start_metrics_exporter(port: Optional[int] = METRICS_HTTP_PORT, file_path: Optional[str] = METRICS_FILE_PATH):
+    """
+    Start the configured exporters once per process (safe to call on every Streamlit rerun).
+
+    Args:
+        port: Serve /metrics on this local port (None disables the HTTP endpoint)
+        file_path: Periodically write metrics to this file (None disables the file export)
+    """
+    global _exporter_started
+    with _exporter_lock:
+        if _exporter_started:
+            return
+        _exporter_started = True
+
+    if port:
+        try:
+            server = ThreadingHTTPServer(("127.0.0.1", port), _MetricsHandler)
+            server.daemon_threads = True
+            threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+            logger.info("Metrics endpoint listening on http://127.0.0.1:%s/metrics", port)
+        except OSError as e:
+            ErrorLogger.log_error(e, "Metrics HTTP exporter startup", {"port": port})
+
+    if file_path:
+        def write_periodically():
+            while True:
+                try:
+                    write_metrics_file(file_path)
+                except Exception as e:
+                    ErrorLogger.log_error(e, "Metrics file export", {"path": file_path})
+                time.sleep(METRICS_FILE_INTERVAL)
+
+        threading.Thread(target=write_periodically, name="metrics-file", daemon=True).start()
+        logger.info("Writing metrics to %s every %ss", file_path, METRICS_FILE_INTERVAL)
@@ -2,96 +2,509 @@
 OpenAI API client for chat functionality and summarization.
 """
 
+import asyncio
+import dataclasses
+import hashlib
+import importlib.util
 import json
 import os
+import threading
 import time
-from typing import List, Dict, Any, Optional
-from openai import OpenAI, RateLimitError, APITimeoutError, APIConnectionError, AuthenticationError
-from .prompts import SYSTEM_PROMPT, SUMMARY_PROMPT, EVALUATION_PROMPT, TEST_SYSTEM_PROMPT
-from .logger import ErrorLogger, logger
+import weakref
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+import httpx
+from openai import OpenAI, AsyncOpenAI
+from .prompts import (
+    SYSTEM_PROMPT, SUMMARY_PROMPT, EVALUATION_PROMPT, TEST_SYSTEM_PROMPT,
+    COMBINED_SUMMARY_EVALUATION_PROMPT
+)
+from .logger import ErrorLogger, logger, log_function_call
+from .context_manager import fit_messages_to_budget, count_text_tokens, count_messages_tokens
+from .scheduler import get_scheduler, PRIORITY_INTERACTIVE, PRIORITY_BATCH
+from .retry import call_with_retry, call_with_retry_async, get_circuit_breaker, DEFAULT_RETRY_POLICY
+from .hedging import hedged_call
+from .result_cache import get_result_cache, make_cache_key
+from .metrics import observe_llm_call, record_llm_call, record_llm_usage, usage_value
 from config import (
     OPENAI_MODEL, OPENAI_TEMPERATURE, OPENAI_MAX_TOKENS,
     OPENAI_TOP_P, OPENAI_PRESENCE_PENALTY, OPENAI_FREQUENCY_PENALTY,
+    OPENAI_CHAT_TURN_DEADLINE, OPENAI_HEDGE_FALLBACK_MODEL, OPENAI_RATE_LIMIT_MAX_WAIT,
     OPENAI_SUMMARY_MODEL, OPENAI_SUMMARY_TEMPERATURE, OPENAI_SUMMARY_MAX_TOKENS,
     OPENAI_SUMMARY_TOP_P, OPENAI_SUMMARY_PRESENCE_PENALTY, OPENAI_SUMMARY_FREQUENCY_PENALTY,
     OPENAI_EVALUATION_MODEL, OPENAI_EVALUATION_TEMPERATURE, OPENAI_EVALUATION_MAX_TOKENS,
-    OPENAI_EVALUATION_TOP_P, OPENAI_EVALUATION_PRESENCE_PENALTY, OPENAI_EVALUATION_FREQUENCY_PENALTY
+    OPENAI_EVALUATION_TOP_P, OPENAI_EVALUATION_PRESENCE_PENALTY, OPENAI_EVALUATION_FREQUENCY_PENALTY,
+    OPENAI_COMBINED_MODEL, OPENAI_COMBINED_TEMPERATURE, OPENAI_COMBINED_MAX_TOKENS,
+    OPENAI_COMBINED_TOP_P, OPENAI_COMBINED_PRESENCE_PENALTY, OPENAI_COMBINED_FREQUENCY_PENALTY,
+    OPENAI_COMBINED_SUMMARY_EVALUATION, OPENAI_PRICING_PER_MILLION_TOKENS,
+    OPENAI_BASE_URL, OPENAI_POOL_MAX_CONNECTIONS, OPENAI_POOL_MAX_KEEPALIVE_CONNECTIONS,
+    OPENAI_POOL_KEEPALIVE_EXPIRY, OPENAI_CONNECT_TIMEOUT, OPENAI_READ_TIMEOUT, OPENAI_HTTP2
+)
+
+# Process-wide client registries keyed by credentials (async clients are grouped per event loop)
+_client_registry: Dict[Tuple[str, Optional[str]], OpenAI] = {}
+_async_client_registry: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[Tuple[str, Optional[str]], AsyncOpenAI]]" = (
+    weakref.WeakKeyDictionary()
 )
+_client_registry_lock = threading.Lock()
 
-# Module-level variable to store the client (singleton pattern)
-_openai_client = None
+# Model parameters per call type (also part of the result cache key)
+_SUMMARY_PARAMS = {
+    "model": OPENAI_SUMMARY_MODEL,
+    "temperature": OPENAI_SUMMARY_TEMPERATURE,
+    "max_tokens": OPENAI_SUMMARY_MAX_TOKENS,
+    "top_p": OPENAI_SUMMARY_TOP_P,
+    "presence_penalty": OPENAI_SUMMARY_PRESENCE_PENALTY,
+    "frequency_penalty": OPENAI_SUMMARY_FREQUENCY_PENALTY
+}
+_EVALUATION_PARAMS = {
+    "model": OPENAI_EVALUATION_MODEL,
+    "temperature": OPENAI_EVALUATION_TEMPERATURE,
+    "max_tokens": OPENAI_EVALUATION_MAX_TOKENS,
+    "top_p": OPENAI_EVALUATION_TOP_P,
+    "presence_penalty": OPENAI_EVALUATION_PRESENCE_PENALTY,
+    "frequency_penalty": OPENAI_EVALUATION_FREQUENCY_PENALTY
+}
+_COMBINED_PARAMS = {
+    "model": OPENAI_COMBINED_MODEL,
+    "temperature": OPENAI_COMBINED_TEMPERATURE,
+    "max_tokens": OPENAI_COMBINED_MAX_TOKENS,
+    "top_p": OPENAI_COMBINED_TOP_P,
+    "presence_penalty": OPENAI_COMBINED_PRESENCE_PENALTY,
+    "frequency_penalty": OPENAI_COMBINED_FREQUENCY_PENALTY,
+    "response_format": {"type": "json_object"}
+}
 
-def get_openai_client(api_key: str):
-    """Get or create OpenAI client (singleton pattern)."""
-    global _openai_client
-    if _openai_client is None:
-        try:
-            if not api_key:
-                raise ValueError("OpenAI API key is required")
-            
-            _openai_client = OpenAI(api_key=api_key)
-            logger.info("OpenAI client initialized successfully")
-        except Exception as e:
-            ErrorLogger.log_error(e, "OpenAI client initialization")
-            raise
-    return _openai_client
+def _compute_prompt_version() -> str:
+    """Short hash of the active summary/evaluation prompts and model parameters."""
+    if OPENAI_COMBINED_SUMMARY_EVALUATION:
+        material = {"combined": [COMBINED_SUMMARY_EVALUATION_PROMPT, _COMBINED_PARAMS]}
+    else:
+        material = {"summary": [SUMMARY_PROMPT, _SUMMARY_PARAMS], "evaluation": [EVALUATION_PROMPT, _EVALUATION_PARAMS]}
+    return hashlib.sha256(json.dumps(material, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+# Returned by generate_summary when the LLM call fails
+SUMMARY_ERROR_TEXT = "Unable to generate summary due to technical difficulties."
+
+# Stored with each evaluation so stale rows can be found after a prompt change
+PROMPT_VERSION = _compute_prompt_version()
+
+def _registry_key(api_key: str, base_url: Optional[str]) -> Tuple[str, Optional[str]]:
+    """Registry key for a credential pair (the API key is hashed so it is never held as a dict key)."""
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest(), base_url
+
+def _http_client_settings() -> Dict[str, Any]:
+    """Connection pool, timeout and protocol settings shared by the sync and async transports."""
+    return {
+        "limits": httpx.Limits(
+            max_connections=OPENAI_POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=OPENAI_POOL_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=OPENAI_POOL_KEEPALIVE_EXPIRY
+        ),
+        "timeout": httpx.Timeout(OPENAI_READ_TIMEOUT, connect=OPENAI_CONNECT_TIMEOUT),
+        # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+        "http2": OPENAI_HTTP2 and importlib.util.find_spec("h2") is not None,
+        "follow_redirects": True
+    }
+
+def get_openai_client(api_key: str, base_url: Optional[str] = OPENAI_BASE_URL) -> OpenAI:
+    """
+    Get or create the pooled OpenAI client for a credential pair.
+    
+    Clients are kept in a process-wide registry keyed by API key and base URL,
+    and every Streamlit session using the same credentials shares one tuned
+    httpx connection pool.
+    
+    Args:
+        api_key: OpenAI API key
+        base_url: Optional API base URL (defaults to OPENAI_BASE_URL)
+        
+    Returns:
+        OpenAI: Synchronous client
+    """
+    try:
+        if not api_key:
+            raise ValueError("OpenAI API key is required")
+        
+        key = _registry_key(api_key, base_url)
+        with _client_registry_lock:
+            client = _client_registry.get(key)
+            if client is None:
+                # Retries are handled by utils.retry so they share one policy and circuit breaker
+                client = OpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=0,
+                    http_client=httpx.Client(**_http_client_settings())
+                )
+                _client_registry[key] = client
+                logger.info("OpenAI client initialized successfully (base_url=%s)", base_url or "default")
+        return client
+    except Exception as e:
+        ErrorLogger.log_error(e, "OpenAI client initialization")
+        raise
+
+def get_async_openai_client(api_key: str, base_url: Optional[str] = OPENAI_BASE_URL) -> AsyncOpenAI:
+    """
+    Get or create the pooled AsyncOpenAI client for a credential pair.
+    
+    httpx async pools are bound to the event loop that created them, so the
+    registry holds one set of clients per running loop. They are closed when
+    the loop shuts down (asyncio.run cancels leftover tasks before closing the
+    loop) or by close_async_openai_clients.
+    
+    Args:
+        api_key: OpenAI API key
+        base_url: Optional API base URL (defaults to OPENAI_BASE_URL)
+        
+    Returns:
+        AsyncOpenAI: Asynchronous client
+    """
+    try:
+        if not api_key:
+            raise ValueError("OpenAI API key is required")
+        
+        loop = asyncio.get_running_loop()
+        key = _registry_key(api_key, base_url)
+        with _client_registry_lock:
+            _drop_clients_of_closed_loops()
+            clients = _async_client_registry.get(loop)
+            if clients is None:
+                clients = _async_client_registry[loop] = {}
+                loop.create_task(_close_clients_at_loop_shutdown())
+            client = clients.get(key)
+            if client is None:
+                client = AsyncOpenAI(
+                    api_key=api_key,
+                    base_url=base_url,
+                    max_retries=0,
+                    http_client=httpx.AsyncClient(**_http_client_settings())
+                )
+                clients[key] = client
+                logger.info("Async OpenAI client initialized successfully (base_url=%s)", base_url or "default")
+        return client
+    except Exception as e:
+        ErrorLogger.log_error(e, "Async OpenAI client initialization")
+        raise
+
+async def close_async_openai_clients():
+    """Close the async clients created on the running event loop."""
+    with _client_registry_lock:
+        clients = _async_client_registry.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.close()
+
+async def _close_clients_at_loop_shutdown():
+    """Wait until this task is cancelled at loop shutdown, then close the loop's async clients."""
+    try:
+        await asyncio.get_running_loop().create_future()
+    finally:
+        await close_async_openai_clients()
+
+def _drop_clients_of_closed_loops():
+    """
+    Forget clients whose loop was closed without shutting down its tasks.
+
+    They can no longer be closed cleanly, and their connections hold the loop,
+    so dropping them is what lets both be garbage collected. Caller holds
+    _client_registry_lock.
+    """
+    closed_loops = [loop for loop in _async_client_registry if loop.is_closed()]
+    for loop in closed_loops:
+        del _async_client_registry[loop]
+    if closed_loops:
+        logger.warning("Dropped async OpenAI clients of %d closed event loop(s)", len(closed_loops))
+
+def _chat_completion_kwargs(messages: List[Dict[str, str]], model: str = OPENAI_MODEL) -> Dict[str, Any]:
+    """Build the agent request parameters shared by the blocking and streaming chat calls."""
+    # Agent configuration - optimized for conversational interaction
+    return {
+        "model": model,
+        "messages": messages,
+        "temperature": OPENAI_TEMPERATURE,
+        "max_tokens": OPENAI_MAX_TOKENS,
+        "top_p": OPENAI_TOP_P,
+        "presence_penalty": OPENAI_PRESENCE_PENALTY,
+        "frequency_penalty": OPENAI_FREQUENCY_PENALTY
+    }
+
+def _usage_total_tokens(response: Any) -> Optional[int]:
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", None) if usage is not None else None
+
+@log_function_call("openai_request")
+def _create_completion(client: OpenAI, timeout: float, priority: str, **params) -> Any:
+    """Create a chat completion once the scheduler admits it (priority slot plus rate limit capacity)."""
+    scheduler = get_scheduler()
+    admission = scheduler.admit(
+        priority, count_messages_tokens(params["messages"]), params.get("max_tokens") or 0,
+        max_wait=min(OPENAI_RATE_LIMIT_MAX_WAIT, timeout)
+    )
+    try:
+        response = client.chat.completions.create(timeout=max(0.1, timeout - admission.reservation.waited), **params)
+    except Exception:
+        scheduler.finish(admission, admission.reservation.prompt_tokens)
+        raise
+    scheduler.finish(admission, _usage_total_tokens(response))
+    return response
+
+@log_function_call("openai_request")
+async def _create_completion_async(client: AsyncOpenAI, timeout: float, priority: str, **params) -> Any:
+    """Async variant of _create_completion."""
+    scheduler = get_scheduler()
+    admission = await scheduler.admit_async(
+        priority, count_messages_tokens(params["messages"]), params.get("max_tokens") or 0,
+        max_wait=min(OPENAI_RATE_LIMIT_MAX_WAIT, timeout)
+    )
+    try:
+        response = await client.chat.completions.create(timeout=max(0.1, timeout - admission.reservation.waited), **params)
+    except Exception:
+        scheduler.finish(admission, admission.reservation.prompt_tokens)
+        raise
+    scheduler.finish(admission, _usage_total_tokens(response))
+    return response
 
+def _turn_retry_policy(remaining: float):
+    """Retry policy whose deadline is what is left of the chat turn."""
+    return dataclasses.replace(DEFAULT_RETRY_POLICY, deadline=max(0.0, remaining))
+
+def _chat_attempt(client: OpenAI, messages: List[Dict[str, str]], model: str, remaining: float):
+    """One (primary or hedged) blocking chat request, retried within the turn deadline."""
+    with observe_llm_call("chat", model) as call:
+        response = call_with_retry(
+            lambda timeout: _create_completion(client, timeout, PRIORITY_INTERACTIVE, **_chat_completion_kwargs(messages, model)),
+            "OpenAI chat completion",
+            get_circuit_breaker("openai"),
+            _turn_retry_policy(remaining),
+            call_type="chat",
+            model=model
+        )
+        call.usage = response.usage
+    return response
+
+@log_function_call("openai_call")
 def get_chat_response(messages: List[Dict[str, str]], api_key: str) -> str:
     """
     Get complete response from OpenAI for chat.
     
+    The turn is bounded by OPENAI_CHAT_TURN_DEADLINE. If the request is slower
+    than the configured percentile of recent turns, a hedged request is sent
+    (to OPENAI_HEDGE_FALLBACK_MODEL when set) and the first reply wins.
+    
     Args:
         messages: List of message dictionaries with 'role' and 'content' keys
         
     Returns:
         str: Complete response from OpenAI
     """
-    max_retries = 3
+    try:
+        client = get_openai_client(api_key)
+        
+        logger.info("Starting OpenAI chat completion with model: %s", OPENAI_MODEL)
+        
+        start_time = time.perf_counter()
+        response, model = hedged_call(
+            lambda model, remaining: _chat_attempt(client, messages, model, remaining),
+            "chat",
+            OPENAI_MODEL,
+            OPENAI_HEDGE_FALLBACK_MODEL or OPENAI_MODEL,
+            OPENAI_CHAT_TURN_DEADLINE
+        )
+        total_latency = time.perf_counter() - start_time
+        
+        content = response.choices[0].message.content
+        logger.info("OpenAI response received successfully from %s: %d characters, total latency %.3fs", model, len(content), total_latency)
+        return content
+        
+    except Exception as e:
+        ErrorLogger.log_error(e, "OpenAI API failed after all retries")
+        raise Exception("Unable to get response. Please try again.")
+
+def _open_chat_stream(client: OpenAI, messages: List[Dict[str, str]], model: str, timeout: float) -> Tuple[Any, Optional[str], Any]:
+    """Open a streaming completion (once the scheduler admits it) and read up to the first content delta."""
+    scheduler = get_scheduler()
+    admission = scheduler.admit(
+        PRIORITY_INTERACTIVE, count_messages_tokens(messages), OPENAI_MAX_TOKENS,
+        max_wait=min(OPENAI_RATE_LIMIT_MAX_WAIT, timeout)
+    )
+    try:
+        # include_usage makes the final chunk carry the usage block (the 1.x SDK keeps it as an extra field)
+        stream = client.chat.completions.create(
+            stream=True, extra_body={"stream_options": {"include_usage": True}},
+            timeout=max(0.1, timeout - admission.reservation.waited), **_chat_completion_kwargs(messages, model)
+        )
+    except Exception:
+        scheduler.finish(admission, admission.reservation.prompt_tokens)
+        raise
+    try:
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                return stream, chunk.choices[0].delta.content, admission
+    except Exception:
+        _release_stream((stream, None, admission))
+        raise
+    return stream, None, admission
+
+def _release_stream(result: Tuple[Any, Optional[str], Any], completion_tokens: int = 0):
+    """Close a stream, settle its rate limit reservation and free its scheduler slot."""
+    stream, _, admission = result
+    stream.response.close()
+    get_scheduler().finish(admission, admission.reservation.prompt_tokens + completion_tokens)
+
+def _stream_attempt(client: OpenAI, messages: List[Dict[str, str]], model: str, remaining: float) -> Tuple[Any, Optional[str], Any]:
+    """One (primary or hedged) streaming request, retried until its first token within the turn deadline."""
+    return call_with_retry(
+        lambda timeout: _open_chat_stream(client, messages, model, timeout),
+        "OpenAI streaming chat completion",
+        get_circuit_breaker("openai"),
+        _turn_retry_policy(remaining),
+        call_type="chat",
+        model=model
+    )
+
+def stream_chat_response(
+    messages: List[Dict[str, str]],
+    api_key: str,
+    timings: Optional[Dict[str, float]] = None
+) -> Iterator[str]:
+    """
+    Stream a chat response from OpenAI, yielding content deltas as they arrive.
     
-    for attempt in range(max_retries):
-        try:
-            client = get_openai_client(api_key)
-            
-            # Agent configuration - optimized for conversational interaction
-            model = OPENAI_MODEL
-            temperature = OPENAI_TEMPERATURE
-            max_tokens = OPENAI_MAX_TOKENS
-            top_p = OPENAI_TOP_P
-            presence_penalty = OPENAI_PRESENCE_PENALTY
-            frequency_penalty = OPENAI_FREQUENCY_PENALTY
-            
-            logger.info(f"Starting OpenAI chat completion with model: {model} (attempt {attempt + 1})")
-            
-            response = client.chat.completions.create(
-                model=model,
-                messages=messages,
-                temperature=temperature,
-                max_tokens=max_tokens,
-                top_p=top_p,
-                presence_penalty=presence_penalty,
-                frequency_penalty=frequency_penalty
-            )
-            
-            content = response.choices[0].message.content
-            logger.info(f"OpenAI response received successfully: {len(content)} characters")
-            return content
-            
-        except Exception as e:
-            logger.error(f"OpenAI API error (attempt {attempt + 1}/{max_retries}): {str(e)}")
-            
-            if attempt == max_retries - 1:
-                ErrorLogger.log_error(e, "OpenAI API failed after all retries", {
-                    "attempt": attempt + 1,
-                    "max_retries": max_retries
-                })
-                raise Exception("Unable to get response. Please try again.")
-            
-            # Simple retry - wait 1 second
-            time.sleep(1)
+    Failures before the first token are retried under the shared retry policy.
+    Once content has been yielded the caller has already rendered it, so a
+    failure mid-stream is raised instead of silently restarting the reply.
+    
+    Time to first token is hedged like get_chat_response: a slow primary stream
+    races a second one and the stream that produces content first is kept,
+    while the other is closed. The whole turn is bounded by OPENAI_CHAT_TURN_DEADLINE.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        api_key: OpenAI API key
+        timings: Optional dict filled with 'time_to_first_token' and 'total_latency' (seconds)
+        
+    Yields:
+        str: Content deltas of the assistant response
+    """
+    model = OPENAI_MODEL
+    start_time = time.perf_counter()
+    try:
+        client = get_openai_client(api_key)
+        
+        logger.info("Starting OpenAI streaming chat completion with model: %s", OPENAI_MODEL)
+        
+        result, model = hedged_call(
+            lambda model, remaining: _stream_attempt(client, messages, model, remaining),
+            "chat_stream",
+            OPENAI_MODEL,
+            OPENAI_HEDGE_FALLBACK_MODEL or OPENAI_MODEL,
+            OPENAI_CHAT_TURN_DEADLINE,
+            cancel=_release_stream
+        )
+        stream, first_delta, _ = result
+    except Exception as e:
+        record_llm_call("chat", model, time.perf_counter() - start_time, error=e)
+        ErrorLogger.log_error(e, "OpenAI streaming API failed after all retries")
+        raise Exception("Unable to get response. Please try again.")
+    
+    if first_delta is None:
+        # An empty stream is treated like an empty non-streaming reply
+        total_latency = time.perf_counter() - start_time
+        if timings is not None:
+            timings["total_latency"] = total_latency
+        _release_stream(result)
+        record_llm_call("chat", model, total_latency)
+        logger.warning("OpenAI stream finished without content, total latency %.3fs", total_latency)
+        return
+    
+    time_to_first_token = time.perf_counter() - start_time
+    if timings is not None:
+        timings["time_to_first_token"] = time_to_first_token
+    response_length = len(first_delta)
+    # Each content chunk carries about one token; used when the stream ends without a usage block
+    completion_chunks = 1
+    usage = None
+    yield first_delta
+    
+    try:
+        for chunk in stream:
+            usage = getattr(chunk, "usage", None) or usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if not delta:
+                continue
+            response_length += len(delta)
+            completion_chunks += 1
+            yield delta
+    except Exception as e:
+        record_llm_call("chat", model, time.perf_counter() - start_time, error=e, time_to_first_token=time_to_first_token)
+        ErrorLogger.log_error(e, "OpenAI stream interrupted after first token", {
+            "characters_received": response_length
+        })
+        raise Exception("Response was interrupted. Please try again.")
+    finally:
+        # Also runs when the caller stops iterating early
+        _release_stream(result, usage_value(usage, "completion_tokens") if usage else completion_chunks)
+    
+    total_latency = time.perf_counter() - start_time
+    if timings is not None:
+        timings["total_latency"] = total_latency
+    record_llm_call("chat", model, total_latency, usage=usage, time_to_first_token=time_to_first_token)
+    if usage is None:
+        record_llm_usage("chat", model, {
+            "prompt_tokens": count_messages_tokens(messages),
+            "completion_tokens": completion_chunks
+        }, estimated=True)
+    logger.info(
+        "OpenAI stream received successfully from %s: %d characters, time to first token %.3fs, total latency %.3fs",
+        model, response_length, time_to_first_token, total_latency
+    )
+
+def format_conversation_text(messages: List[Dict[str, str]]) -> str:
+    """
+    Format a conversation as plain "Role: content" lines for summary/evaluation prompts.
     
-    # This should never be reached, but just in case
-    raise Exception("Maximum retry attempts exceeded.")
+    Args:
+        messages: List of message dictionaries
+        
+    Returns:
+        str: Transcript text with empty and non-chat messages skipped
+    """
+    return "\n".join([
+        f"{msg['role'].title()}: {msg['content']}" 
+        for msg in messages 
+        if msg['role'] in ['user', 'assistant'] and msg.get('content', '').strip()
+    ])
 
+def estimate_summary_evaluation_cost(messages: List[Dict[str, str]]) -> float:
+    """
+    Upper-bound cost of generating the summary and evaluation for a transcript.
+    
+    Prompt tokens are counted locally and completions are assumed to use the
+    full max_tokens, so the estimate never undershoots the actual spend.
+    
+    Args:
+        messages: List of message dictionaries
+        
+    Returns:
+        float: Estimated cost in USD (0.0 for models without configured pricing)
+    """
+    conversation_text = format_conversation_text(messages)
+    if OPENAI_COMBINED_SUMMARY_EVALUATION:
+        calls = [(COMBINED_SUMMARY_EVALUATION_PROMPT, _COMBINED_PARAMS)]
+    else:
+        calls = [(SUMMARY_PROMPT, _SUMMARY_PARAMS), (EVALUATION_PROMPT, _EVALUATION_PARAMS)]
+    
+    cost = 0.0
+    for prompt, params in calls:
+        pricing = OPENAI_PRICING_PER_MILLION_TOKENS.get(params["model"])
+        if not pricing:
+            continue
+        prompt_tokens = count_text_tokens(prompt.format(conversation=conversation_text))
+        cost += (prompt_tokens * pricing["prompt"] + params["max_tokens"] * pricing["completion"]) / 1_000_000
+    return cost
+
+@log_function_call("summary")
 def generate_summary(messages: List[Dict[str, str]], api_key: str) -> str:
     """
     Generate a summary of the conversation.
@@ -110,34 +523,43 @@ def generate_summary(messages: List[Dict[str, str]], api_key: str) -> str:
         client = get_openai_client(api_key)
         
         # Format conversation for summary
-        conversation_text = "\n".join([
-            f"{msg['role'].title()}: {msg['content']}" 
-            for msg in messages 
-            if msg['role'] in ['user', 'assistant'] and msg.get('content', '').strip()
-        ])
+        conversation_text = format_conversation_text(messages)
         
         if not conversation_text.strip():
             ErrorLogger.log_warning("No valid conversation content found for summary")
             return "No meaningful conversation content to summarize."
         
-        logger.info(f"Generating summary for conversation with {len(messages)} messages")
-        
-        response = client.chat.completions.create(
-            model=OPENAI_SUMMARY_MODEL,
-            messages=[
-                {"role": "user", "content": SUMMARY_PROMPT.format(conversation=conversation_text)}
-            ],
-            temperature=OPENAI_SUMMARY_TEMPERATURE,
-            max_tokens=OPENAI_SUMMARY_MAX_TOKENS,
-            top_p=OPENAI_SUMMARY_TOP_P,
-            presence_penalty=OPENAI_SUMMARY_PRESENCE_PENALTY,
-            frequency_penalty=OPENAI_SUMMARY_FREQUENCY_PENALTY,
-            stream=False,
-            timeout=30
-        )
+        cache = get_result_cache()
+        cache_key = make_cache_key("summary", conversation_text, SUMMARY_PROMPT, _SUMMARY_PARAMS)
+        cached_summary = cache.get(cache_key)
+        if cached_summary is not None:
+            logger.info("Summary served from result cache")
+            return cached_summary
+        
+        logger.info("Generating summary for conversation with %s messages", len(messages))
+        
+        with observe_llm_call("summary", _SUMMARY_PARAMS["model"]) as call:
+            response = call_with_retry(
+                lambda timeout: _create_completion(
+                    client,
+                    min(30, timeout),
+                    PRIORITY_BATCH,
+                    messages=[
+                        {"role": "user", "content": SUMMARY_PROMPT.format(conversation=conversation_text)}
+                    ],
+                    **_SUMMARY_PARAMS,
+                    stream=False
+                ),
+                "OpenAI summary generation",
+                get_circuit_breaker("openai"),
+                call_type="summary",
+                model=_SUMMARY_PARAMS["model"]
+            )
+            call.usage = response.usage
         
         summary = response.choices[0].message.content.strip()
         logger.info("Summary generated successfully")
+        cache.set(cache_key, summary)
         return summary
         
     except Exception as e:
@@ -145,8 +567,9 @@ def generate_summary(messages: List[Dict[str, str]], api_key: str) -> str:
             "messages_count": len(messages),
             "conversation_length": len(conversation_text) if 'conversation_text' in locals() else 0
         })
-        return "Unable to generate summary due to technical difficulties."
+        return SUMMARY_ERROR_TEXT
 
+@log_function_call("evaluation")
 def generate_evaluation(messages: List[Dict[str, str]], api_key: str) -> Dict[str, Any]:
     """
     Generate structured evaluation of the conversation.
@@ -170,11 +593,7 @@ def generate_evaluation(messages: List[Dict[str, str]], api_key: str) -> Dict[st
         client = get_openai_client(api_key)
         
         # Format conversation for evaluation
-        conversation_text = "\n".join([
-            f"{msg['role'].title()}: {msg['content']}" 
-            for msg in messages 
-            if msg['role'] in ['user', 'assistant'] and msg.get('content', '').strip()
-        ])
+        conversation_text = format_conversation_text(messages)
         
         if not conversation_text.strip():
             ErrorLogger.log_warning("No valid conversation content found for evaluation")
@@ -185,32 +604,47 @@ def generate_evaluation(messages: List[Dict[str, str]], api_key: str) -> Dict[st
                 "error_details": "No meaningful conversation content to evaluate"
             }
         
-        logger.info(f"Generating evaluation for conversation with {len(messages)} messages")
-        
-        response = client.chat.completions.create(
-            model=OPENAI_EVALUATION_MODEL,
-            messages=[
-                {"role": "user", "content": EVALUATION_PROMPT.format(conversation=conversation_text)}
-            ],
-            temperature=OPENAI_EVALUATION_TEMPERATURE,
-            max_tokens=OPENAI_EVALUATION_MAX_TOKENS,
-            top_p=OPENAI_EVALUATION_TOP_P,
-            presence_penalty=OPENAI_EVALUATION_PRESENCE_PENALTY,
-            frequency_penalty=OPENAI_EVALUATION_FREQUENCY_PENALTY,
-            stream=False,
-            timeout=30
-        )
+        cache = get_result_cache()
+        cache_key = make_cache_key("evaluation", conversation_text, EVALUATION_PROMPT, _EVALUATION_PARAMS)
+        cached_evaluation = cache.get(cache_key)
+        if cached_evaluation is not None:
+            logger.info("Evaluation served from result cache")
+            return cached_evaluation
+        
+        logger.info("Generating evaluation for conversation with %s messages", len(messages))
+        
+        with observe_llm_call("evaluation", _EVALUATION_PARAMS["model"]) as call:
+            response = call_with_retry(
+                lambda timeout: _create_completion(
+                    client,
+                    min(30, timeout),
+                    PRIORITY_BATCH,
+                    messages=[
+                        {"role": "user", "content": EVALUATION_PROMPT.format(conversation=conversation_text)}
+                    ],
+                    **_EVALUATION_PARAMS,
+                    stream=False
+                ),
+                "OpenAI evaluation generation",
+                get_circuit_breaker("openai"),
+                call_type="evaluation",
+                model=_EVALUATION_PARAMS["model"]
+            )
+            call.usage = response.usage
         
         # Get evaluation text response
         evaluation_text = response.choices[0].message.content.strip()
         logger.info("Evaluation generated successfully")
         
         # Return the evaluation as text instead of JSON
-        return {
+        evaluation = {
             "evaluation_text": evaluation_text,
             "type": "text_evaluation",
-            "status": "success"
+            "status": "success",
+            "prompt_version": PROMPT_VERSION
         }
+        cache.set(cache_key, evaluation)
+        return evaluation
         
     except Exception as e:
         ErrorLogger.log_error(e, "Evaluation generation", {
@@ -224,6 +658,285 @@ def generate_evaluation(messages: List[Dict[str, str]], api_key: str) -> Dict[st
             "error_details": str(e)
         }
 
+@log_function_call("summary_evaluation")
+def generate_combined_summary_evaluation(
+    messages: List[Dict[str, str]],
+    api_key: str
+) -> Optional[Tuple[str, Dict[str, Any]]]:
+    """
+    Generate summary and evaluation from a single structured (JSON mode) call.
+    
+    Args:
+        messages: List of message dictionaries
+        
+    Returns:
+        Tuple: (summary, evaluation) in the same shapes as generate_summary and
+        generate_evaluation, or None if the call fails or the response cannot
+        be parsed (callers should fall back to the separate calls)
+    """
+    try:
+        conversation_text = format_conversation_text(messages) if messages else ""
+        
+        if not conversation_text.strip():
+            ErrorLogger.log_warning("No valid conversation content found for combined summary/evaluation", "Combined generation")
+            return None
+        
+        cache = get_result_cache()
+        cache_key = make_cache_key("combined", conversation_text, COMBINED_SUMMARY_EVALUATION_PROMPT, _COMBINED_PARAMS)
+        cached_result = cache.get(cache_key)
+        if cached_result is not None:
+            logger.info("Combined summary/evaluation served from result cache")
+            return cached_result["summary"], cached_result["evaluation"]
+        
+        client = get_openai_client(api_key)
+        
+        logger.info("Generating combined summary/evaluation for conversation with %s messages", len(messages))
+        
+        start_time = time.perf_counter()
+        with observe_llm_call("combined", _COMBINED_PARAMS["model"]) as call:
+            response = call_with_retry(
+                lambda timeout: _create_completion(
+                    client,
+                    timeout,
+                    PRIORITY_BATCH,
+                    messages=[
+                        {"role": "user", "content": COMBINED_SUMMARY_EVALUATION_PROMPT.format(conversation=conversation_text)}
+                    ],
+                    **_COMBINED_PARAMS,
+                    stream=False
+                ),
+                "OpenAI combined summary/evaluation generation",
+                get_circuit_breaker("openai"),
+                call_type="combined",
+                model=_COMBINED_PARAMS["model"]
+            )
+            call.usage = response.usage
+        total_latency = time.perf_counter() - start_time
+        
+        usage = response.usage
+        logger.info(
+            "Combined summary/evaluation received: total latency %.3fs, prompt_tokens=%s, completion_tokens=%s",
+            total_latency, usage.prompt_tokens if usage else "n/a", usage.completion_tokens if usage else "n/a"
+        )
+        
+        if response.choices[0].finish_reason == "length":
+            ErrorLogger.log_warning("Combined response truncated at max_tokens", "Combined generation")
+            return None
+        
+        parsed = json.loads(response.choices[0].message.content)
+        summary = parsed.get("summary") if isinstance(parsed, dict) else None
+        evaluation_text = parsed.get("evaluation") if isinstance(parsed, dict) else None
+        
+        if not isinstance(summary, str) or not summary.strip() or not isinstance(evaluation_text, str) or not evaluation_text.strip():
+            ErrorLogger.log_warning("Combined response missing summary or evaluation", "Combined generation", {
+                "keys": list(parsed.keys()) if isinstance(parsed, dict) else type(parsed).__name__
+            })
+            return None
+        
+        logger.info("Combined summary/evaluation generated successfully")
+        evaluation = {
+            "evaluation_text": evaluation_text.strip(),
+            "type": "text_evaluation",
+            "status": "success",
+            "prompt_version": PROMPT_VERSION
+        }
+        cache.set(cache_key, {"summary": summary.strip(), "evaluation": evaluation})
+        return summary.strip(), evaluation
+        
+    except Exception as e:
+        ErrorLogger.log_error(e, "Combined summary/evaluation generation", {
+            "messages_count": len(messages) if messages else 0,
+            "conversation_length": len(conversation_text) if 'conversation_text' in locals() else 0
+        })
+        return None
+
+@log_function_call("openai_call")
+async def get_chat_response_async(messages: List[Dict[str, str]], api_key: str) -> str:
+    """
+    Async variant of get_chat_response for running many sessions on one event loop.
+    
+    Args:
+        messages: List of message dictionaries with 'role' and 'content' keys
+        
+    Returns:
+        str: Complete response from OpenAI
+    """
+    try:
+        client = get_async_openai_client(api_key)
+        
+        logger.info("Starting async OpenAI chat completion with model: %s", OPENAI_MODEL)
+        
+        start_time = time.perf_counter()
+        with observe_llm_call("chat", OPENAI_MODEL) as call:
+            response = await call_with_retry_async(
+                lambda timeout: _create_completion_async(client, timeout, PRIORITY_INTERACTIVE, **_chat_completion_kwargs(messages)),
+                "Async OpenAI chat completion",
+                get_circuit_breaker("openai"),
+                call_type="chat",
+                model=OPENAI_MODEL
+            )
+            call.usage = response.usage
+        total_latency = time.perf_counter() - start_time
+        
+        content = response.choices[0].message.content
+        logger.info("Async OpenAI response received successfully: %s characters, total latency %.3fs", len(content), total_latency)
+        return content
+        
+    except Exception as e:
+        ErrorLogger.log_error(e, "Async OpenAI API failed after all retries")
+        raise Exception("Unable to get response. Please try again.")
+
+@log_function_call("summary")
+async def generate_summary_async(messages: List[Dict[str, str]], api_key: str) -> str:
+    """
+    Async variant of generate_summary.
+    
+    Args:
+        messages: List of message dictionaries
+        
+    Returns:
+        str: Generated summary
+    """
+    try:
+        if not messages:
+            ErrorLogger.log_warning("Empty messages list provided for summary generation", "Async summary generation")
+            return "No conversation to summarize."
+        
+        conversation_text = format_conversation_text(messages)
+        
+        if not conversation_text.strip():
+            ErrorLogger.log_warning("No valid conversation content found for summary", "Async summary generation")
+            return "No meaningful conversation content to summarize."
+        
+        cache = get_result_cache()
+        cache_key = make_cache_key("summary", conversation_text, SUMMARY_PROMPT, _SUMMARY_PARAMS)
+        cached_summary = cache.get(cache_key)
+        if cached_summary is not None:
+            logger.info("Summary served from result cache")
+            return cached_summary
+        
+        client = get_async_openai_client(api_key)
+        
+        logger.info("Generating summary (async) for conversation with %s messages", len(messages))
+        
+        with observe_llm_call("summary", _SUMMARY_PARAMS["model"]) as call:
+            response = await call_with_retry_async(
+                lambda timeout: _create_completion_async(
+                    client,
+                    min(30, timeout),
+                    PRIORITY_BATCH,
+                    messages=[
+                        {"role": "user", "content": SUMMARY_PROMPT.format(conversation=conversation_text)}
+                    ],
+                    **_SUMMARY_PARAMS,
+                    stream=False
+                ),
+                "Async OpenAI summary generation",
+                get_circuit_breaker("openai"),
+                call_type="summary",
+                model=_SUMMARY_PARAMS["model"]
+            )
+            call.usage = response.usage
+        
+        summary = response.choices[0].message.content.strip()
+        logger.info("Summary generated successfully")
+        cache.set(cache_key, summary)
+        return summary
+        
+    except Exception as e:
+        ErrorLogger.log_error(e, "Async summary generation", {
+            "messages_count": len(messages) if messages else 0,
+            "conversation_length": len(conversation_text) if 'conversation_text' in locals() else 0
+        })
+        return SUMMARY_ERROR_TEXT
+
+@log_function_call("evaluation")
+async def generate_evaluation_async(messages: List[Dict[str, str]], api_key: str) -> Dict[str, Any]:
+    """
+    Async variant of generate_evaluation.
+    
+    Args:
+        messages: List of message dictionaries
+        
+    Returns:
+        Dict: Structured evaluation data
+    """
+    try:
+        if not messages:
+            ErrorLogger.log_warning("Empty messages list provided for evaluation generation", "Async evaluation generation")
+            return {
+                "evaluation_text": "No conversation to evaluate",
+                "type": "text_evaluation",
+                "status": "error",
+                "error_details": "No conversation to evaluate"
+            }
+        
+        conversation_text = format_conversation_text(messages)
+        
+        if not conversation_text.strip():
+            ErrorLogger.log_warning("No valid conversation content found for evaluation", "Async evaluation generation")
+            return {
+                "evaluation_text": "No meaningful conversation content to evaluate",
+                "type": "text_evaluation",
+                "status": "error",
+                "error_details": "No meaningful conversation content to evaluate"
+            }
+        
+        cache = get_result_cache()
+        cache_key = make_cache_key("evaluation", conversation_text, EVALUATION_PROMPT, _EVALUATION_PARAMS)
+        cached_evaluation = cache.get(cache_key)
+        if cached_evaluation is not None:
+            logger.info("Evaluation served from result cache")
+            return cached_evaluation
+        
+        client = get_async_openai_client(api_key)
+        
+        logger.info("Generating evaluation (async) for conversation with %s messages", len(messages))
+        
+        with observe_llm_call("evaluation", _EVALUATION_PARAMS["model"]) as call:
+            response = await call_with_retry_async(
+                lambda timeout: _create_completion_async(
+                    client,
+                    min(30, timeout),
+                    PRIORITY_BATCH,
+                    messages=[
+                        {"role": "user", "content": EVALUATION_PROMPT.format(conversation=conversation_text)}
+                    ],
+                    **_EVALUATION_PARAMS,
+                    stream=False
+                ),
+                "Async OpenAI evaluation generation",
+                get_circuit_breaker("openai"),
+                call_type="evaluation",
+                model=_EVALUATION_PARAMS["model"]
+            )
+            call.usage = response.usage
+        
+        evaluation_text = response.choices[0].message.content.strip()
+        logger.info("Evaluation generated successfully")
+        
+        evaluation = {
+            "evaluation_text": evaluation_text,
+            "type": "text_evaluation",
+            "status": "success",
+            "prompt_version": PROMPT_VERSION
+        }
+        cache.set(cache_key, evaluation)
+        return evaluation
+        
+    except Exception as e:
+        ErrorLogger.log_error(e, "Async evaluation generation", {
+            "messages_count": len(messages) if messages else 0,
+            "conversation_length": len(conversation_text) if 'conversation_text' in locals() else 0
+        })
+        return {
+            "evaluation_text": f"Error generating evaluation: {str(e)}",
+            "type": "text_evaluation",
+            "status": "error",
+            "error_details": str(e)
+        }
+
+@log_function_call("message_assembly")
 def create_messages_with_system_prompt(conversation_messages: List[Dict[str, str]], test_mode: bool = False) -> List[Dict[str, str]]:
     """
     Create message list with system prompt for OpenAI API.
@@ -232,7 +945,8 @@ def create_messages_with_system_prompt(conversation_messages: List[Dict[str, str
         conversation_messages: List of user/assistant messages
         
     Returns:
-        List[Dict]: Messages with system prompt prepended
+        List[Dict]: Messages with system prompt prepended, with older turns
+        condensed when the prompt exceeds CONTEXT_TOKEN_BUDGET
         
     Raises:
         ValueError: If input validation fails
@@ -262,21 +976,28 @@ def create_messages_with_system_prompt(conversation_messages: List[Dict[str, str
             if not msg['content'].strip():
                 ErrorLogger.log_warning(f"Empty content in message {i}", "Message validation")
         
-        logger.info(f"Creating messages with system prompt for {len(conversation_messages)} conversation messages")
+        logger.info("Creating messages with system prompt for %d conversation messages", len(conversation_messages))
         
         # Choose system prompt based on test mode
         system_prompt = TEST_SYSTEM_PROMPT if test_mode else SYSTEM_PROMPT
         if test_mode:
             logger.info("Using TEST_SYSTEM_PROMPT for test mode")
-            print(f"DEBUG: Using TEST_SYSTEM_PROMPT - test_mode={test_mode}")
         else:
             logger.info("Using SYSTEM_PROMPT for normal mode")
-            print(f"DEBUG: Using SYSTEM_PROMPT - test_mode={test_mode}")
         
-        return [
+        messages = [
             {"role": "system", "content": system_prompt}
         ] + conversation_messages
         
+        # Keep the prompt within the configured token budget
+        messages, context_stats = fit_messages_to_budget(messages)
+        logger.info(
+            "Prompt tokens: %d before compaction, %d after (%d messages condensed)",
+            context_stats['tokens_before'], context_stats['tokens_after'], context_stats['compacted_messages']
+        )
+        
+        return messages
+        
     except Exception as e:
         ErrorLogger.log_error(e, "Message validation and system prompt creation", {
             "conversation_messages_count": len(conversation_messages) if conversation_messages else 0,
@@ -0,0 +1,419 @@
+"""
+Vector representations of founder profiles for similarity search and clustering.
+Each conversation's summary and evaluation text become a hashed TF-IDF
+vector (unigrams and bigrams). The raw hashed term counts are persisted in
+append-only chunks; IDF weighting and a signed random projection to a small
+dense space are applied when the store is loaded, so nearest-neighbour
+queries and k-means run as NumPy matrix operations. Neighbour candidates from
+the dense space are re-ranked with the exact sparse TF-IDF cosine.
+"""
+
+import json
+import math
+import os
+import uuid
+import zlib
+from typing import Any, Dict, List, Optional, Tuple
+from .logger import logger
+from .search_index import tokenize
+from config import PROFILE_VECTOR_FEATURES, PROFILE_VECTOR_DIM, PROFILE_VECTOR_MAX_CHUNKS, PROFILE_VECTOR_RERANK_FACTOR
+
+try:
+    import numpy as np
+except ImportError:  # Optional dependency - installed with streamlit
+    np = None
+
+STATE_FILE = "state.json"
+# Corpus rows per block of similarity/projection work (bounds temporary memory)
+_BLOCK_ROWS = 16384
+# Query rows per block of exact re-ranking
+_RERANK_BLOCK_QUERIES = 256
+# Hashed features remembered between texts (bigrams make the vocabulary large)
+_HASH_CACHE_MAX_ENTRIES = 500000
+
+def profile_text(row: Dict[str, Any]) -> str:
+    """Summary and successful evaluation text of a conversation row."""
+    evaluation = row.get("evaluation") if isinstance(row.get("evaluation"), dict) else {}
+    evaluation_text = (evaluation.get("evaluation_text") or "") if evaluation.get("status") == "success" else ""
+    return f"{row.get('summary') or ''}\n{evaluation_text}"
+
+def _feature_hash(feature: str, features: int) -> Tuple[int, float]:
+    value = zlib.crc32(feature.encode("utf-8"))
+    # Low bits pick the column, the top bit the sign (signed hashing keeps inner products unbiased)
+    return value & (features - 1), -1.0 if value >> 31 else 1.0
+
+def hash_features(text: str, features: int = PROFILE_VECTOR_FEATURES, cache: Optional[Dict[str, Tuple[int, float]]] = None):
+    """
+    Hashed term frequencies of the unigrams and bigrams of text.
+
+    Args:
+        text: Text to featurize
+        features: Size of the hashed feature space (a power of two)
+        cache: Optional dict reused across calls to skip hashing repeated features
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Sorted int32 columns and float32 signed, sublinear (1 + log tf) weights
+    """
+    tokens = tokenize(text)
+    counts: Dict[int, float] = {}
+    cache = cache if cache is not None else {}
+    for feature in tokens + [f"{first} {second}" for first, second in zip(tokens, tokens[1:])]:
+        hashed = cache.get(feature)
+        if hashed is None:
+            hashed = cache[feature] = _feature_hash(feature, features)
+        counts[hashed[0]] = counts.get(hashed[0], 0.0) + hashed[1]
+    columns = np.fromiter((column for column, count in counts.items() if count != 0), dtype=np.int32)
+    values = np.fromiter((math.copysign(1 + math.log(abs(count)), count) for count in counts.values() if count != 0), dtype=np.float32)
+    order = np.argsort(columns)
+    return columns[order], values[order]
+
+def _projection(features: int, dim: int):
+    """Signed bucket of every hashed feature in the dense space (a sparse random projection)."""
+    columns = np.arange(features, dtype=np.uint64)
+    # Multiplicative hashing, deterministic across runs and machines
+    mixed = (columns * np.uint64(0x9E3779B97F4A7C15)) >> np.uint64(32)
+    buckets = (mixed % np.uint64(dim)).astype(np.int64)
+    signs = np.where((mixed >> np.uint64(31)) & np.uint64(1), -1.0, 1.0).astype(np.float32)
+    return buckets, signs
+
+def _gather(indptr, rows):
+    """Positions of the CSR entries of rows, and the entry count of each row."""
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    ends = np.cumsum(lengths)
+    return np.repeat(starts - (ends - lengths), lengths) + np.arange(ends[-1] if len(ends) else 0), lengths
+
+class ProfileVectorStore:
+    """
+    Persistent hashed TF-IDF vectors keyed by session_id.
+
+    Usage:
+        store = ProfileVectorStore(".vectors")
+        store.add(rows, watermark=ended_until)
+        store.nearest(["session-a", "session-b"], k=10)
+        labels, centroids = store.kmeans(20)
+    """
+
+    def __init__(self, directory: str, features: int = PROFILE_VECTOR_FEATURES, dim: int = PROFILE_VECTOR_DIM):
+        if np is None:
+            raise RuntimeError("Profile vectors require the numpy package")
+        if features & (features - 1):
+            raise ValueError("features must be a power of two")
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.state = self._load_state(features, dim)
+        self.features = self.state["features"]
+        self.dim = self.state["dim"]
+        self._buckets, self._signs = _projection(self.features, self.dim)
+        self._hash_cache: Dict[str, Tuple[int, float]] = {}
+        self._load_chunks()
+
+    def _load_state(self, features: int, dim: int) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, STATE_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"features": features, "dim": dim, "chunks": [], "watermark": None}
+
+    def _save_state(self):
+        """Atomically replace the state file; it is the commit point of every change."""
+        path = os.path.join(self.directory, STATE_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _load_chunks(self):
+        session_ids, indptrs, indices, data = [], [], [], []
+        offset = 0
+        for name in self.state["chunks"]:
+            with np.load(os.path.join(self.directory, name), allow_pickle=False) as chunk:
+                session_ids.append(chunk["session_ids"])
+                indptrs.append(chunk["indptr"][:-1] + offset)
+                indices.append(chunk["indices"])
+                data.append(chunk["data"])
+                offset += len(chunk["indices"])
+        all_ids = np.concatenate(session_ids) if session_ids else np.array([], dtype=str)
+        indptr = np.concatenate(indptrs + [np.array([offset], dtype=np.int64)]) if indptrs else np.zeros(1, dtype=np.int64)
+
+        # A session added again supersedes its earlier rows: keep the last occurrence
+        _, last_from_end = np.unique(all_ids[::-1], return_index=True)
+        live = np.sort(len(all_ids) - 1 - last_from_end)
+        positions, lengths = _gather(indptr, live)
+        self.session_ids = all_ids[live]
+        self.indptr = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+        self.indices = np.concatenate(indices)[positions] if indices else np.zeros(0, dtype=np.int32)
+        self.data = np.concatenate(data)[positions] if data else np.zeros(0, dtype=np.float32)
+        self._row_of = {session_id: row for row, session_id in enumerate(self.session_ids.tolist())}
+        self._vectors = None
+        self._weights = None
+
+    def __len__(self) -> int:
+        return len(self.session_ids)
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """ended_at up to which conversations have been added."""
+        return self.state.get("watermark")
+
+    def add(self, rows: List[Dict[str, Any]], watermark: Optional[str] = None) -> int:
+        """
+        Featurize and persist rows as a new chunk; sessions already stored are replaced.
+
+        Args:
+            rows: Conversation rows with session_id, summary and evaluation
+            watermark: New watermark to record with the chunk (kept if None)
+
+        Returns:
+            int: Number of rows added
+        """
+        if rows:
+            indptr = [0]
+            indices, data = [], []
+            for row in rows:
+                if len(self._hash_cache) > _HASH_CACHE_MAX_ENTRIES:
+                    self._hash_cache.clear()
+                columns, values = hash_features(profile_text(row), self.features, self._hash_cache)
+                indices.append(columns)
+                data.append(values)
+                indptr.append(indptr[-1] + len(columns))
+            self._write_chunk(
+                np.array([row["session_id"] for row in rows], dtype=str),
+                np.array(indptr, dtype=np.int64),
+                np.concatenate(indices),
+                np.concatenate(data)
+            )
+        if watermark is not None:
+            self.state["watermark"] = watermark
+        self._save_state()
+        self._load_chunks()
+        if len(self.state["chunks"]) > PROFILE_VECTOR_MAX_CHUNKS:
+            self.compact()
+        return len(rows)
+
+    def _write_chunk(self, session_ids, indptr, indices, data):
+        name = f"chunk-{uuid.uuid4().hex[:12]}.npz"
+        path = os.path.join(self.directory, name)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, session_ids=session_ids, indptr=indptr, indices=indices, data=data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(f"{path}.tmp", path)
+        self.state["chunks"].append(name)
+
+    def compact(self):
+        """Rewrite the live rows as a single chunk."""
+        old_names = list(self.state["chunks"])
+        self.state["chunks"] = []
+        self._write_chunk(self.session_ids, self.indptr, self.indices, self.data)
+        self._save_state()
+        for name in old_names:
+            os.remove(os.path.join(self.directory, name))
+        logger.info("Profile vectors compacted: %s chunks into one with %s rows", len(old_names), len(self))
+
+    def idf(self):
+        """Smoothed inverse document frequency per hashed feature over the live rows."""
+        document_frequency = np.bincount(self.indices, minlength=self.features)
+        return (np.log((1 + len(self)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    def _project(self, indptr, indices, data, idf):
+        """TF-IDF weight CSR rows, project them to the dense space and L2-normalize."""
+        rows = len(indptr) - 1
+        vectors = np.zeros((rows, self.dim), dtype=np.float32)
+        for start in range(0, rows, _BLOCK_ROWS):
+            end = min(rows, start + _BLOCK_ROWS)
+            low, high = indptr[start], indptr[end]
+            row_ids = np.repeat(np.arange(end - start), np.diff(indptr[start:end + 1]))
+            columns = indices[low:high]
+            weights = data[low:high] * idf[columns] * self._signs[columns]
+            flat = row_ids * self.dim + self._buckets[columns]
+            vectors[start:end] = np.bincount(flat, weights=weights, minlength=(end - start) * self.dim).reshape(-1, self.dim)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    def vectors(self):
+        """Dense unit vectors of all live rows, in session_ids order (cached until the next add)."""
+        if self._vectors is None:
+            self._vectors = self._project(self.indptr, self.indices, self.data, self.idf())
+        return self._vectors
+
+    def weights(self):
+        """TF-IDF weights of the CSR entries, L2-normalized per row (cached until the next add)."""
+        if self._weights is None:
+            weights = self.data * self.idf()[self.indices]
+            row_ids = np.repeat(np.arange(len(self)), np.diff(self.indptr))
+            norms = np.sqrt(np.bincount(row_ids, weights=weights.astype(np.float64) ** 2, minlength=len(self)))
+            self._weights = (weights / np.where(norms > 0, norms, 1.0)[row_ids]).astype(np.float32)
+        return self._weights
+
+    def sparse_cosine(self, query_rows, candidate_rows):
+        """
+        Exact TF-IDF cosine of row pairs (query_rows[i], candidate_rows[i]).
+
+        Both rows' columns are sorted, so matches are found with one
+        searchsorted over (pair, column) keys instead of a loop.
+        """
+        weights = self.weights()
+        query_positions, query_lengths = _gather(self.indptr, query_rows)
+        candidate_positions, candidate_lengths = _gather(self.indptr, candidate_rows)
+        query_pairs = np.repeat(np.arange(len(query_rows), dtype=np.int64), query_lengths)
+        candidate_pairs = np.repeat(np.arange(len(candidate_rows), dtype=np.int64), candidate_lengths)
+        query_keys = query_pairs * self.features + self.indices[query_positions]
+        candidate_keys = candidate_pairs * self.features + self.indices[candidate_positions]
+        if not len(query_keys):
+            return np.zeros(len(query_rows), dtype=np.float32)
+        found = np.minimum(np.searchsorted(query_keys, candidate_keys), len(query_keys) - 1)
+        match = query_keys[found] == candidate_keys
+        products = weights[candidate_positions[match]] * weights[query_positions[found[match]]]
+        return np.bincount(candidate_pairs[match], weights=products, minlength=len(query_rows)).astype(np.float32)
+
+    def embed_texts(self, texts: List[str]):
+        """Dense unit vectors for free texts, weighted with the stored corpus' IDF."""
+        indptr = [0]
+        indices, data = [], []
+        for text in texts:
+            columns, values = hash_features(text, self.features, self._hash_cache)
+            indices.append(columns)
+            data.append(values)
+            indptr.append(indptr[-1] + len(columns))
+        return self._project(
+            np.array(indptr, dtype=np.int64),
+            np.concatenate(indices) if indices else np.zeros(0, dtype=np.int32),
+            np.concatenate(data) if data else np.zeros(0, dtype=np.float32),
+            self.idf()
+        )
+
+    def top_k(self, queries, k: int = 10, exclude_rows=None) -> Tuple[Any, Any]:
+        """
+        Batched cosine top-k over the corpus.
+
+        Args:
+            queries: (q, dim) unit vectors
+            k: Neighbours per query
+            exclude_rows: Optional corpus row per query to leave out (the query itself), -1 for none
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (q, k) row indices and scores, best first
+        """
+        corpus = self.vectors()
+        k = min(k, len(corpus))
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        best_scores = np.zeros((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(corpus), _BLOCK_ROWS):
+            scores = queries @ corpus[start:start + _BLOCK_ROWS].T
+            if exclude_rows is not None:
+                local = np.asarray(exclude_rows) - start
+                mask = (local >= 0) & (local < scores.shape[1])
+                scores[np.nonzero(mask)[0], local[mask]] = -np.inf
+            block_k = min(k, scores.shape[1])
+            candidates = np.argpartition(scores, scores.shape[1] - block_k, axis=1)[:, -block_k:]
+            best_rows = np.concatenate([best_rows, candidates + start], axis=1)
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, candidates, axis=1)], axis=1)
+            # Keep only the running top k
+            if best_rows.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def nearest_rows(self, rows, k: int = 10) -> Tuple[Any, Any]:
+        """
+        Most similar stored rows for each given row (excluding itself).
+
+        Candidates come from the dense projection (PROFILE_VECTOR_RERANK_FACTOR
+        times k) and are re-ranked with the exact sparse TF-IDF cosine.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (len(rows), k) row indices and cosine similarities, best first
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        k = min(k, len(self) - 1)
+        all_neighbours, all_scores = [], []
+        for start in range(0, len(rows), _RERANK_BLOCK_QUERIES):
+            block = rows[start:start + _RERANK_BLOCK_QUERIES]
+            candidates, dense_scores = self.top_k(self.vectors()[block], k * PROFILE_VECTOR_RERANK_FACTOR, exclude_rows=block)
+            scores = self.sparse_cosine(np.repeat(block, candidates.shape[1]), candidates.ravel()).reshape(candidates.shape)
+            scores[~np.isfinite(dense_scores)] = -np.inf
+            order = np.argsort(-scores, axis=1)[:, :k]
+            all_neighbours.append(np.take_along_axis(candidates, order, axis=1))
+            all_scores.append(np.take_along_axis(scores, order, axis=1))
+        return np.concatenate(all_neighbours), np.concatenate(all_scores)
+
+    def nearest(self, session_ids: List[str], k: int = 10) -> Dict[str, List[Tuple[str, float]]]:
+        """
+        Most similar stored profiles for each given session (excluding itself).
+
+        Returns:
+            Dict: session_id -> [(session_id, cosine similarity)], unknown sessions are omitted
+        """
+        rows = [self._row_of[session_id] for session_id in session_ids if session_id in self._row_of]
+        if not rows or len(self) < 2:
+            return {}
+        neighbours, scores = self.nearest_rows(rows, k)
+        return {
+            self.session_ids[row]: [
+                (self.session_ids[neighbour], round(float(score), 4))
+                for neighbour, score in zip(neighbours[i][:k], scores[i][:k]) if np.isfinite(score)
+            ]
+            for i, row in enumerate(rows)
+        }
+
+    def kmeans(self, clusters: int, iterations: int = 20, seed: int = 0, tolerance: float = 1e-3) -> Tuple[Any, Any]:
+        """
+        Spherical k-means (cosine) with k-means++ seeding.
+
+        Assignments are one matrix product per block and centroids one
+        one-hot product per iteration.
+
+        Args:
+            clusters: Number of clusters
+            iterations: Maximum Lloyd iterations
+            seed: Random seed for the initialization
+            tolerance: Stop once fewer than this fraction of rows change cluster
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Cluster label per row (session_ids order) and unit centroids
+        """
+        vectors = self.vectors()
+        rows = len(vectors)
+        clusters = min(clusters, rows)
+        rng = np.random.default_rng(seed)
+
+        # k-means++: sample each next centre proportionally to its squared distance from the nearest one
+        centroids = np.zeros((clusters, self.dim), dtype=np.float32)
+        centroids[0] = vectors[rng.integers(rows)]
+        closest = np.maximum(0.0, 2 - 2 * (vectors @ centroids[0]))
+        for index in range(1, clusters):
+            total = closest.sum()
+            choice = rng.choice(rows, p=closest / total) if total > 0 else rng.integers(rows)
+            centroids[index] = vectors[choice]
+            closest = np.minimum(closest, np.maximum(0.0, 2 - 2 * (vectors @ centroids[index])))
+
+        labels = np.full(rows, -1, dtype=np.int64)
+        for iteration in range(iterations):
+            new_labels = np.empty(rows, dtype=np.int64)
+            best = np.empty(rows, dtype=np.float32)
+            for start in range(0, rows, _BLOCK_ROWS):
+                similarity = vectors[start:start + _BLOCK_ROWS] @ centroids.T
+                new_labels[start:start + _BLOCK_ROWS] = similarity.argmax(axis=1)
+                best[start:start + _BLOCK_ROWS] = similarity.max(axis=1)
+            changed = np.count_nonzero(new_labels != labels)
+            labels = new_labels
+
+            one_hot = np.zeros((rows, clusters), dtype=np.float32)
+            one_hot[np.arange(rows), labels] = 1.0
+            sums = one_hot.T @ vectors
+            empty = np.nonzero(one_hot.sum(axis=0) == 0)[0]
+            if len(empty):
+                # Re-seed empty clusters with the rows farthest from their centroid
+                sums[empty] = vectors[np.argsort(best)[:len(empty)]]
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            centroids = np.divide(sums, norms, out=np.zeros_like(sums), where=norms > 0)
+            if changed <= tolerance * rows:
+                break
+        logger.info("k-means with %s clusters over %s profiles stopped after %s iterations", clusters, rows, iteration + 1)
+        return labels, centroids
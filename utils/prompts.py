@@ -82,3 +82,29 @@ INTERVIEW COMPLETED - Please click the 'End Conversation' button to save your in
 Keep responses very brief (1-2 sentences max) and guide them to end the conversation quickly.
 
 Do not conduct the full 6-theme interview. This is for testing the app flow only."""
+
+
+COMBINED_SUMMARY_EVALUATION_PROMPT = """You are "The Unfair Advantage Scout," an expert interviewer and evaluator of startup founders.
+
+Read the founder's interview once and produce two separate outputs.
+
+1. "summary": Summarize the founder's responses. Focus on capturing what they said, not interpreting it.
+   - Clearly outline their background, motivations, and key experiences.
+   - Concisely restate the main points for each question or topic covered.
+   - Avoid any judgment, evaluation, or advice.
+   - Use a factual, neutral, and professional tone.
+   - Keep it under 400 words unless more detail is necessary for clarity.
+
+2. "evaluation": Analyze their potential as a startup co-founder.
+   - Identify the founder's core strengths and possible "unfair advantages."
+   - Assess evidence of motivation, drive, and resilience.
+   - Highlight signs of creativity, problem-solving, or strategic insight.
+   - Note any skill or perspective gaps that might limit their effectiveness.
+   - Provide an overall assessment of their potential as a co-founder.
+   - Keep the tone analytical and professional. Do not flatter or criticize — remain factual and balanced.
+   - Limit it to about 500 words.
+
+Respond with a single JSON object with exactly two string fields, "summary" and "evaluation", and nothing else.
+
+Conversation:
+{conversation}"""
@@ -0,0 +1,234 @@
+"""
+Process-wide rate limiter for OpenAI calls.
+Requests-per-minute and tokens-per-minute token buckets shared by every session
+in the process, so callers queue for capacity instead of collecting 429s together.
+"""
+
+import asyncio
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from .logger import logger
+from .metrics import RATE_LIMIT_WAIT, RATE_LIMIT_UTILIZATION
+from config import OPENAI_RATE_LIMIT_RPM, OPENAI_RATE_LIMIT_TPM, OPENAI_RATE_LIMIT_MAX_WAIT
+
+class RateLimitWaitExceeded(Exception):
+    """Raised when capacity would not free up within the caller's wait budget."""
+
+class TokenBucket:
+    """
+    Token bucket that refills continuously up to one minute's worth of capacity.
+
+    Reservations are taken immediately and may drive the level negative; the
+    caller then waits until the debt is repaid, which serves callers in
+    arrival order without a separate queue.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated_at = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, amount: float) -> float:
+        """Reserve amount and return the seconds until the bucket is out of debt."""
+        self.level -= amount
+        return max(0.0, -self.level / self.rate)
+
+    def give_back(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def utilization(self) -> float:
+        """Fraction of the per-minute capacity currently in use (above 1.0 while callers wait)."""
+        return (self.capacity - self.level) / self.capacity
+
+@dataclass
+class Reservation:
+    """Capacity reserved for one request, reconciled once the real usage is known."""
+    tokens: int
+    prompt_tokens: int
+    waited: float = 0.0
+
+class RateLimiter:
+    """Requests-per-minute and tokens-per-minute limiter (a limit of 0 disables that bucket)."""
+
+    def __init__(self, requests_per_minute: float = OPENAI_RATE_LIMIT_RPM, tokens_per_minute: float = OPENAI_RATE_LIMIT_TPM):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._lock = threading.Lock()
+        self._waiting = 0
+
+    def _reserve(self, tokens: int, max_wait: float, headroom: float) -> Tuple[Optional[float], float]:
+        """
+        Try to reserve capacity for one request.
+
+        Returns (wait, 0.0) once reserved, where wait is how long the caller must
+        sleep, or (None, retry_in) if the request needs headroom that is not free yet.
+        """
+        with self._lock:
+            now = time.monotonic()
+            buckets = [(bucket, amount) for bucket, amount in ((self.requests, 1), (self.tokens, tokens)) if bucket is not None]
+            for bucket, _ in buckets:
+                bucket.refill(now)
+
+            if headroom > 0:
+                # Low-priority calls only take capacity that leaves the headroom free
+                shortfall = max((amount + headroom * bucket.capacity - bucket.level) / bucket.rate for bucket, amount in buckets) if buckets else 0.0
+                if shortfall > 0:
+                    return None, shortfall
+
+            wait = max((bucket.take(amount) for bucket, amount in buckets), default=0.0)
+            if wait > max_wait:
+                # Undo the reservation so later callers are not delayed by a request that never ran
+                for bucket, amount in buckets:
+                    bucket.give_back(amount)
+                raise RateLimitWaitExceeded(f"OpenAI rate limit capacity not available within {max_wait:.1f}s (needs {wait:.1f}s)")
+            if wait > 0:
+                self._waiting += 1
+            return wait, 0.0
+
+    def _finish_wait(self, wait: float):
+        with self._lock:
+            if wait > 0:
+                self._waiting -= 1
+
+    def _next_step(self, tokens: int, max_wait: float, headroom: float, headroom_timeout: float, started: float) -> Tuple[Optional[float], float]:
+        """One reservation attempt; returns (wait, None) when reserved or (None, seconds to sleep before retrying)."""
+        elapsed = time.monotonic() - started
+        if elapsed > max_wait:
+            raise RateLimitWaitExceeded(f"OpenAI rate limit headroom not available within {max_wait:.1f}s")
+        # Starvation protection: after headroom_timeout the headroom no longer applies
+        active_headroom = headroom if elapsed < headroom_timeout else 0.0
+        wait, retry_in = self._reserve(tokens, max_wait - elapsed, active_headroom)
+        if wait is not None:
+            return wait, None
+        return None, max(0.01, min(retry_in, headroom_timeout - elapsed, max_wait - elapsed))
+
+    def acquire(
+        self,
+        prompt_tokens: int,
+        max_completion_tokens: int,
+        max_wait: float = OPENAI_RATE_LIMIT_MAX_WAIT,
+        headroom: float = 0.0,
+        headroom_timeout: float = 0.0
+    ) -> Reservation:
+        """
+        Block until there is capacity for one request of the estimated token cost.
+
+        The estimate is the prompt plus max_tokens, which is also how OpenAI
+        counts a request against the limit before it runs.
+
+        Args:
+            prompt_tokens: Locally counted prompt tokens
+            max_completion_tokens: The request's max_tokens
+            max_wait: Longest acceptable wait in seconds
+            headroom: Fraction of each bucket that must stay free after this request
+                (used to keep capacity for higher-priority calls)
+            headroom_timeout: Seconds after which the headroom requirement is dropped
+
+        Returns:
+            Reservation: To be passed to reconcile() with the actual usage
+
+        Raises:
+            RateLimitWaitExceeded: If the wait would exceed max_wait
+        """
+        tokens = prompt_tokens + max_completion_tokens
+        started = time.monotonic()
+        while True:
+            wait, retry_in = self._next_step(tokens, max_wait, headroom, headroom_timeout, started)
+            if wait is not None:
+                break
+            time.sleep(retry_in)
+        if wait > 0:
+            logger.info("Waiting %.2fs for OpenAI rate limit capacity (%s tokens)", wait, tokens)
+            time.sleep(wait)
+            self._finish_wait(wait)
+        waited = time.monotonic() - started
+        RATE_LIMIT_WAIT.observe(waited)
+        return Reservation(tokens, prompt_tokens, waited)
+
+    async def acquire_async(
+        self,
+        prompt_tokens: int,
+        max_completion_tokens: int,
+        max_wait: float = OPENAI_RATE_LIMIT_MAX_WAIT,
+        headroom: float = 0.0,
+        headroom_timeout: float = 0.0
+    ) -> Reservation:
+        """Async variant of acquire() that waits without blocking the event loop."""
+        tokens = prompt_tokens + max_completion_tokens
+        started = time.monotonic()
+        while True:
+            wait, retry_in = self._next_step(tokens, max_wait, headroom, headroom_timeout, started)
+            if wait is not None:
+                break
+            await asyncio.sleep(retry_in)
+        if wait > 0:
+            logger.info("Waiting %.2fs for OpenAI rate limit capacity (%s tokens)", wait, tokens)
+            await asyncio.sleep(wait)
+            self._finish_wait(wait)
+        waited = time.monotonic() - started
+        RATE_LIMIT_WAIT.observe(waited)
+        return Reservation(tokens, prompt_tokens, waited)
+
+    def reconcile(self, reservation: Reservation, actual_tokens: Optional[int]):
+        """
+        Return over-estimated tokens (or charge the shortfall) once the real usage is known.
+
+        Args:
+            reservation: Reservation returned by acquire()
+            actual_tokens: Total tokens from the usage block (a failed request passes
+                reservation.prompt_tokens; None keeps the estimate)
+        """
+        if self.tokens is None or actual_tokens is None:
+            return
+        with self._lock:
+            self.tokens.refill(time.monotonic())
+            self.tokens.give_back(reservation.tokens - actual_tokens)
+
+    def utilization(self) -> Dict[str, float]:
+        """Current bucket utilization (fraction of per-minute capacity) and number of waiting callers."""
+        with self._lock:
+            now = time.monotonic()
+            stats: Dict[str, float] = {"waiting": self._waiting}
+            for name, bucket in (("requests", self.requests), ("tokens", self.tokens)):
+                if bucket is not None:
+                    bucket.refill(now)
+                    stats[name] = round(bucket.utilization(), 4)
+            return stats
+
+# Module-level variable to store the limiter (singleton pattern)
+_rate_limiter = None
+_rate_limiter_lock = threading.Lock()
+
+def get_rate_limiter() -> RateLimiter:
+    """Get or create the process-wide OpenAI rate limiter (singleton pattern)."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        if _rate_limiter is None:
+            _rate_limiter = RateLimiter()
+            logger.info("OpenAI rate limiter initialized (rpm=%s, tpm=%s)", OPENAI_RATE_LIMIT_RPM, OPENAI_RATE_LIMIT_TPM)
+    return _rate_limiter
+
+def configure_rate_limiter(requests_per_minute: float, tokens_per_minute: float) -> RateLimiter:
+    """Replace the process-wide limiter with new limits (e.g. for load tests against stubs)."""
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        logger.info("OpenAI rate limiter reconfigured (rpm=%s, tpm=%s)", requests_per_minute, tokens_per_minute)
+    return _rate_limiter
+
+def get_rate_limiter_utilization() -> Dict[str, float]:
+    """Expose the current utilization of the process-wide rate limiter."""
+    return get_rate_limiter().utilization()
+
+def _utilization_samples() -> Dict[Tuple[str, ...], float]:
+    stats = get_rate_limiter_utilization()
+    return {(name,): stats[name] for name in ("requests", "tokens") if name in stats}
+
+RATE_LIMIT_UTILIZATION.set_function(_utilization_samples)
@@ -0,0 +1,162 @@
+"""
+Content-addressed cache for summary and evaluation results.
+Keys hash the transcript, prompt template and model parameters, so a retried
+save or a re-run over unchanged data never pays for the same LLM call twice.
+"""
+
+import copy
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+from .logger import ErrorLogger, logger
+from .metrics import CACHE_LOOKUPS
+from config import RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_DIR
+
+def make_cache_key(kind: str, conversation_text: str, prompt_template: str, params: Dict[str, Any]) -> str:
+    """
+    Build a content-addressed cache key.
+
+    Args:
+        kind: Result type (e.g. 'summary', 'evaluation')
+        conversation_text: Formatted transcript
+        prompt_template: Prompt template the transcript is inserted into
+        params: Model parameters (model, temperature, max_tokens, ...)
+
+    Returns:
+        str: Hex SHA-256 digest
+    """
+    payload = json.dumps({
+        "kind": kind,
+        "conversation": conversation_text,
+        "prompt": prompt_template,
+        "params": params
+    }, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ResultCache:
+    """Thread-safe in-memory LRU with TTL, backed by an optional on-disk tier."""
+
+    def __init__(self, max_entries: int = RESULT_CACHE_MAX_ENTRIES, ttl: float = RESULT_CACHE_TTL, disk_dir: Optional[str] = RESULT_CACHE_DIR):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.disk_dir = disk_dir
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _remember(self, key: str, value: Any, stored_at: float):
+        """Insert into the memory tier and evict the least recently used entries."""
+        self._entries[key] = (stored_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def _read_disk(self, key: str) -> Optional[tuple]:
+        if not self.disk_dir:
+            return None
+        path = self._disk_path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                record = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            ErrorLogger.log_error(e, "Result cache disk read", {"key": key})
+            return None
+        if time.time() - record["stored_at"] > self.ttl:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            return None
+        return record["stored_at"], record["value"]
+
+    def _write_disk(self, key: str, value: Any, stored_at: float):
+        if not self.disk_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"stored_at": stored_at, "value": value}, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except Exception as e:
+            ErrorLogger.log_error(e, "Result cache disk write", {"key": key})
+
+    def get(self, key: str) -> Optional[Any]:
+        """
+        Return the cached value for key, or None on a miss or expired entry.
+
+        Values are returned as deep copies, so callers can annotate the result
+        (e.g. add fields to an evaluation dict) without corrupting the cache.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if time.time() - stored_at <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self._stats["memory_hits"] += 1
+                    CACHE_LOOKUPS.inc(cache="result", result="memory_hit")
+                    return copy.deepcopy(value)
+                del self._entries[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is not None:
+                self._remember(key, entry[1], entry[0])
+                self._stats["disk_hits"] += 1
+                CACHE_LOOKUPS.inc(cache="result", result="disk_hit")
+                return copy.deepcopy(entry[1])
+            self._stats["misses"] += 1
+            CACHE_LOOKUPS.inc(cache="result", result="miss")
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value under key in both tiers (the memory tier keeps a copy)."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, copy.deepcopy(value), stored_at)
+        self._write_disk(key, value, stored_at)
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss counters and current size."""
+        with self._lock:
+            stats = dict(self._stats)
+            stats["size"] = len(self._entries)
+        lookups = stats["memory_hits"] + stats["disk_hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["memory_hits"] + stats["disk_hits"]) / lookups if lookups else 0.0
+        return stats
+
+    def clear(self):
+        """Drop all in-memory entries (the disk tier is left in place)."""
+        with self._lock:
+            self._entries.clear()
+
+# Module-level variable to store the cache (singleton pattern)
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> ResultCache:
+    """Get or create the process-wide result cache (singleton pattern)."""
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache()
+            logger.info("Result cache initialized (max_entries=%s, ttl=%ss, disk_dir=%s)", RESULT_CACHE_MAX_ENTRIES, RESULT_CACHE_TTL, RESULT_CACHE_DIR)
+    return _result_cache
+
+def get_result_cache_stats() -> Dict[str, Any]:
+    """Expose hit/miss counters of the process-wide result cache."""
+    return get_result_cache().stats()
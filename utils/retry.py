@@ -0,0 +1,324 @@
+"""
+Shared retry policy for OpenAI and Supabase calls.
+Classifies errors, applies jittered exponential backoff with Retry-After support,
+enforces a total deadline per call and fails fast through per-upstream circuit breakers.
+"""
+
+import asyncio
+import random
+import threading
+import time
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+import httpx
+import openai
+from postgrest.exceptions import APIError as PostgrestAPIError
+from .logger import logger
+from .metrics import RETRIES
+from config import (
+    RETRY_MAX_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY, RETRY_DEADLINE,
+    CIRCUIT_BREAKER_FAILURE_THRESHOLD, CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+)
+
+T = TypeVar("T")
+
+# HTTP statuses worth retrying (timeouts, conflicts, rate limits, server errors)
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+# PostgreSQL / PostgREST error code prefixes that indicate a transient condition
+RETRYABLE_POSTGRES_CODE_PREFIXES = ("08", "40001", "40P01", "53", "57", "PGRST000", "PGRST001", "PGRST002", "PGRST003")
+
+class CircuitOpenError(Exception):
+    """Raised when a call is rejected because the upstream circuit is open."""
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry limits for a class of calls."""
+    max_attempts: int = RETRY_MAX_ATTEMPTS
+    base_delay: float = RETRY_BASE_DELAY
+    max_delay: float = RETRY_MAX_DELAY
+    deadline: float = RETRY_DEADLINE
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+class CircuitBreaker:
+    """
+    Per-process circuit breaker for one upstream service.
+
+    Closed: calls go through. After failure_threshold consecutive retryable
+    failures (rate limits excluded - they mean the upstream is up but busy,
+    and are handled by backoff and Retry-After) the circuit opens and calls fail immediately. Once
+    recovery_timeout has passed a single trial call is let through
+    (half-open); its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_BREAKER_FAILURE_THRESHOLD,
+        recovery_timeout: float = CIRCUIT_BREAKER_RECOVERY_TIMEOUT
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._lock = threading.Lock()
+        self._consecutive_failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+
+    @property
+    def state(self) -> str:
+        """Current state: 'closed', 'open' or 'half_open'."""
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.recovery_timeout:
+                return "half_open"
+            return "open"
+
+    def before_call(self):
+        """Raise CircuitOpenError if the call should not be attempted."""
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.recovery_timeout or self._trial_in_flight:
+                raise CircuitOpenError(f"Circuit '{self.name}' is open; failing fast")
+            self._trial_in_flight = True
+
+    def record_success(self):
+        """Close the circuit after a successful call."""
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info("Circuit '%s' closed after successful trial call", self.name)
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a retryable failure and open the circuit at the threshold."""
+        with self._lock:
+            self._consecutive_failures += 1
+            # Only the closed -> open and trial -> open transitions (re)start the recovery
+            # timer; stragglers failing while the circuit is already open must not extend it
+            opening = self._opened_at is None and self._consecutive_failures >= self.failure_threshold
+            if opening or self._trial_in_flight:
+                logger.warning("Circuit '%s' opened after %s consecutive failures", self.name, self._consecutive_failures)
+                self._opened_at = time.monotonic()
+            self._trial_in_flight = False
+
+    def release(self):
+        """Release a half-open trial slot without changing the circuit state (fatal errors)."""
+        with self._lock:
+            self._trial_in_flight = False
+
+_circuit_breakers: Dict[str, CircuitBreaker] = {}
+_circuit_breakers_lock = threading.Lock()
+
+def get_circuit_breaker(name: str) -> CircuitBreaker:
+    """Get or create the process-wide circuit breaker for an upstream."""
+    with _circuit_breakers_lock:
+        if name not in _circuit_breakers:
+            _circuit_breakers[name] = CircuitBreaker(name)
+        return _circuit_breakers[name]
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Classify an error as retryable (transient) or fatal.
+
+    Args:
+        error: The exception raised by an OpenAI or Supabase call
+
+    Returns:
+        bool: True if retrying may succeed
+    """
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)):
+        return True
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code in RETRYABLE_STATUS_CODES
+    if isinstance(error, PostgrestAPIError):
+        return bool(error.code) and str(error.code).startswith(RETRYABLE_POSTGRES_CODE_PREFIXES)
+    if isinstance(error, (TimeoutError, ConnectionError)):
+        return True
+    return False
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """True for 429 responses, which are retried but not counted against the circuit breaker."""
+    if isinstance(error, openai.RateLimitError):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code == 429
+    if isinstance(error, httpx.HTTPStatusError):
+        return error.response.status_code == 429
+    return False
+
+def get_retry_after(error: Exception) -> Optional[float]:
+    """
+    Read the server-requested delay from Retry-After / retry-after-ms headers.
+
+    Returns:
+        float: Delay in seconds, or None if the error carries no such header
+    """
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+
+    retry_after_ms = headers.get("retry-after-ms")
+    if retry_after_ms:
+        try:
+            return max(0.0, float(retry_after_ms) / 1000)
+        except ValueError:
+            pass
+
+    retry_after = headers.get("retry-after")
+    if not retry_after:
+        return None
+    try:
+        return max(0.0, float(retry_after))
+    except ValueError:
+        pass
+    try:
+        retry_at = parsedate_to_datetime(retry_after)
+        return max(0.0, (retry_at - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def compute_backoff(attempt: int, policy: RetryPolicy) -> float:
+    """Full-jitter exponential backoff for a zero-based attempt number."""
+    return random.uniform(0, min(policy.max_delay, policy.base_delay * (2 ** attempt)))
+
+def _next_delay(
+    error: Exception,
+    attempt: int,
+    context: str,
+    breaker: Optional[CircuitBreaker],
+    policy: RetryPolicy,
+    deadline: float,
+    call_type: str = "",
+    model: str = ""
+) -> float:
+    """Record a failed attempt and return the delay before the next one, or re-raise the error."""
+    retryable = is_retryable_error(error)
+    if breaker is not None:
+        if retryable and not is_rate_limit_error(error):
+            breaker.record_failure()
+        else:
+            breaker.release()
+
+    if not retryable:
+        logger.error("%s: fatal %s, not retrying: %s", context, type(error).__name__, error)
+        raise error
+    if attempt == policy.max_attempts - 1:
+        logger.error("%s: %s on final attempt %d/%d", context, type(error).__name__, attempt + 1, policy.max_attempts)
+        raise error
+
+    retry_after = get_retry_after(error)
+    delay = retry_after if retry_after is not None else compute_backoff(attempt, policy)
+    if time.monotonic() + delay >= deadline:
+        logger.error("%s: retry deadline of %ss reached after attempt %s", context, policy.deadline, attempt + 1)
+        raise error
+
+    RETRIES.inc(
+        upstream=breaker.name if breaker is not None else "unknown", error_class=type(error).__name__,
+        call_type=call_type, model=model
+    )
+    logger.warning(
+        "%s: %s on attempt %d/%d, retrying in %.2fs%s",
+        context, type(error).__name__, attempt + 1, policy.max_attempts, delay, " (Retry-After)" if retry_after is not None else ""
+    )
+    return delay
+
+def call_with_retry(
+    operation: Callable[[float], T],
+    context: str,
+    breaker: Optional[CircuitBreaker] = None,
+    policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    call_type: str = "",
+    model: str = ""
+) -> T:
+    """
+    Run an operation under the shared retry policy.
+
+    The operation receives the seconds remaining until the call deadline, so
+    it can pass them on as a per-request timeout.
+
+    Args:
+        operation: Callable taking the remaining time budget in seconds
+        context: Description used in log messages
+        breaker: Optional circuit breaker for the upstream being called
+        policy: Retry limits
+        call_type: LLM call type for the retry metric labels (empty for database calls)
+        model: Model for the retry metric labels (empty for database calls)
+
+    Returns:
+        The operation's result
+
+    Raises:
+        CircuitOpenError: If the circuit is open
+        Exception: The last error once it is fatal, attempts are exhausted or the deadline passes
+    """
+    deadline = time.monotonic() + policy.deadline
+
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            breaker.before_call()
+
+        try:
+            result = operation(deadline - time.monotonic())
+        except Exception as e:
+            time.sleep(_next_delay(e, attempt, context, breaker, policy, deadline, call_type, model))
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    # This should never be reached, but just in case
+    raise Exception("Maximum retry attempts exceeded.")
+
+async def call_with_retry_async(
+    operation: Callable[[float], Awaitable[T]],
+    context: str,
+    breaker: Optional[CircuitBreaker] = None,
+    policy: RetryPolicy = DEFAULT_RETRY_POLICY,
+    call_type: str = "",
+    model: str = ""
+) -> T:
+    """
+    Async counterpart of call_with_retry; backoff sleeps yield to the event loop.
+
+    Args:
+        operation: Coroutine function taking the remaining time budget in seconds
+        context: Description used in log messages
+        breaker: Optional circuit breaker for the upstream being called
+        policy: Retry limits
+        call_type: LLM call type for the retry metric labels (empty for database calls)
+        model: Model for the retry metric labels (empty for database calls)
+
+    Returns:
+        The operation's result
+    """
+    deadline = time.monotonic() + policy.deadline
+
+    for attempt in range(policy.max_attempts):
+        if breaker is not None:
+            breaker.before_call()
+
+        try:
+            result = await operation(deadline - time.monotonic())
+        except Exception as e:
+            await asyncio.sleep(_next_delay(e, attempt, context, breaker, policy, deadline, call_type, model))
+            continue
+
+        if breaker is not None:
+            breaker.record_success()
+        return result
+
+    # This should never be reached, but just in case
+    raise Exception("Maximum retry attempts exceeded.")
@@ -0,0 +1,210 @@
+"""
+Priority scheduler for OpenAI calls.
+Interactive chat turns are admitted ahead of batch work (summaries and
+evaluations): batch calls get their own concurrency cap, yield to waiting
+interactive calls and leave part of the rate-limit budget free, but are
+admitted regardless once they have waited SCHEDULER_BATCH_MAX_WAIT.
+"""
+
+import asyncio
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Tuple
+from .logger import logger
+from .metrics import SCHEDULER_QUEUE_WAIT, SCHEDULER_IN_FLIGHT
+from .rate_limiter import Reservation, get_rate_limiter
+from config import (
+    SCHEDULER_MAX_IN_FLIGHT, SCHEDULER_INTERACTIVE_CONCURRENCY, SCHEDULER_BATCH_CONCURRENCY,
+    SCHEDULER_BATCH_RESERVED_FRACTION, SCHEDULER_BATCH_MAX_WAIT
+)
+
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_BATCH = "batch"
+
+class SchedulerWaitExceeded(Exception):
+    """Raised when no slot became free within the caller's wait budget."""
+
+@dataclass
+class Admission:
+    """A granted slot plus its rate limiter reservation."""
+    priority: str
+    reservation: Optional[Reservation] = None
+    released: bool = False
+
+class PriorityScheduler:
+    """Admits OpenAI calls by priority class under global and per-class concurrency limits."""
+
+    def __init__(
+        self,
+        max_in_flight: int = SCHEDULER_MAX_IN_FLIGHT,
+        interactive_concurrency: int = SCHEDULER_INTERACTIVE_CONCURRENCY,
+        batch_concurrency: int = SCHEDULER_BATCH_CONCURRENCY
+    ):
+        self.max_in_flight = max_in_flight
+        self.limits = {PRIORITY_INTERACTIVE: interactive_concurrency, PRIORITY_BATCH: batch_concurrency}
+        self._in_flight = {priority: 0 for priority in self.limits}
+        self._queues: Dict[str, Deque[Tuple[object, float]]] = {priority: deque() for priority in self.limits}
+        self._cond = threading.Condition()
+
+    def _can_start(self, priority: str, ticket: object, now: float) -> bool:
+        """Called with the lock held: FIFO within a class, interactive ahead of batch."""
+        queue = self._queues[priority]
+        if not queue or queue[0][0] is not ticket:
+            return False
+        if self._in_flight[priority] >= self.limits[priority] or sum(self._in_flight.values()) >= self.max_in_flight:
+            return False
+        if priority == PRIORITY_BATCH and self._queues[PRIORITY_INTERACTIVE]:
+            # Starvation protection: a batch call that waited long enough no longer yields
+            return now - queue[0][1] >= SCHEDULER_BATCH_MAX_WAIT
+        return True
+
+    def _start(self, priority: str):
+        self._queues[priority].popleft()
+        self._in_flight[priority] += 1
+        # The next waiter in this class may now be at the head of the queue
+        self._cond.notify_all()
+
+    def _leave(self, priority: str, ticket: object):
+        queue = self._queues[priority]
+        for entry in list(queue):
+            if entry[0] is ticket:
+                queue.remove(entry)
+        self._cond.notify_all()
+
+    def _acquire_slot(self, priority: str, max_wait: float) -> float:
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queues[priority].append((ticket, started))
+            while True:
+                now = time.monotonic()
+                if self._can_start(priority, ticket, now):
+                    self._start(priority)
+                    return now - started
+                remaining = max_wait - (now - started)
+                if remaining <= 0:
+                    self._leave(priority, ticket)
+                    raise SchedulerWaitExceeded(f"No {priority} OpenAI slot free within {max_wait:.1f}s")
+                # Wake up at least when a waiting batch call crosses the starvation threshold
+                self._cond.wait(min(remaining, SCHEDULER_BATCH_MAX_WAIT))
+
+    async def _acquire_slot_async(self, priority: str, max_wait: float) -> float:
+        ticket = object()
+        started = time.monotonic()
+        with self._cond:
+            self._queues[priority].append((ticket, started))
+        while True:
+            with self._cond:
+                now = time.monotonic()
+                if self._can_start(priority, ticket, now):
+                    self._start(priority)
+                    return now - started
+                if now - started >= max_wait:
+                    self._leave(priority, ticket)
+                    raise SchedulerWaitExceeded(f"No {priority} OpenAI slot free within {max_wait:.1f}s")
+            # Polling keeps the event loop free; slots turn over on the scale of seconds
+            await asyncio.sleep(0.02)
+
+    def _release_slot(self, priority: str):
+        with self._cond:
+            self._in_flight[priority] -= 1
+            self._cond.notify_all()
+
+    def _limiter_options(self, priority: str, max_wait: float, slot_wait: float) -> Dict[str, float]:
+        options = {"max_wait": max(0.0, max_wait - slot_wait)}
+        if priority == PRIORITY_BATCH:
+            options["headroom"] = SCHEDULER_BATCH_RESERVED_FRACTION
+            options["headroom_timeout"] = max(0.0, SCHEDULER_BATCH_MAX_WAIT - slot_wait)
+        return options
+
+    def admit(self, priority: str, prompt_tokens: int, max_completion_tokens: int, max_wait: float) -> Admission:
+        """
+        Wait for a slot in the priority class and for rate limiter capacity.
+
+        Args:
+            priority: PRIORITY_INTERACTIVE or PRIORITY_BATCH
+            prompt_tokens: Locally counted prompt tokens
+            max_completion_tokens: The request's max_tokens
+            max_wait: Longest acceptable total wait in seconds
+
+        Returns:
+            Admission: To be passed to finish() once the call is done
+
+        Raises:
+            SchedulerWaitExceeded: If no slot became free within max_wait
+            RateLimitWaitExceeded: If rate limiter capacity did not free up in time
+        """
+        slot_wait = self._acquire_slot(priority, max_wait)
+        SCHEDULER_QUEUE_WAIT.observe(slot_wait, priority=priority)
+        try:
+            reservation = get_rate_limiter().acquire(
+                prompt_tokens, max_completion_tokens, **self._limiter_options(priority, max_wait, slot_wait)
+            )
+        except Exception:
+            self._release_slot(priority)
+            raise
+        reservation.waited += slot_wait
+        return Admission(priority, reservation)
+
+    async def admit_async(self, priority: str, prompt_tokens: int, max_completion_tokens: int, max_wait: float) -> Admission:
+        """Async variant of admit() that waits without blocking the event loop."""
+        slot_wait = await self._acquire_slot_async(priority, max_wait)
+        SCHEDULER_QUEUE_WAIT.observe(slot_wait, priority=priority)
+        try:
+            reservation = await get_rate_limiter().acquire_async(
+                prompt_tokens, max_completion_tokens, **self._limiter_options(priority, max_wait, slot_wait)
+            )
+        except Exception:
+            self._release_slot(priority)
+            raise
+        reservation.waited += slot_wait
+        return Admission(priority, reservation)
+
+    def finish(self, admission: Admission, actual_tokens: Optional[int]):
+        """Settle the reservation with the actual token usage and free the slot (idempotent)."""
+        with self._cond:
+            if admission.released:
+                return
+            admission.released = True
+        get_rate_limiter().reconcile(admission.reservation, actual_tokens)
+        self._release_slot(admission.priority)
+
+    def stats(self) -> Dict[str, Any]:
+        """In-flight and queued calls per priority class."""
+        with self._cond:
+            return {
+                priority: {"in_flight": self._in_flight[priority], "queued": len(self._queues[priority]), "limit": self.limits[priority]}
+                for priority in self.limits
+            }
+
+# Module-level variable to store the scheduler (singleton pattern)
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> PriorityScheduler:
+    """Get or create the process-wide OpenAI scheduler (singleton pattern)."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = PriorityScheduler()
+            logger.info(
+                "OpenAI scheduler initialized (max_in_flight=%s, interactive=%s, batch=%s)",
+                SCHEDULER_MAX_IN_FLIGHT, SCHEDULER_INTERACTIVE_CONCURRENCY, SCHEDULER_BATCH_CONCURRENCY
+            )
+    return _scheduler
+
+def get_scheduler_stats() -> Dict[str, Any]:
+    """Expose in-flight and queued calls of the process-wide scheduler."""
+    return get_scheduler().stats()
+
+def _in_flight_samples() -> Dict[Tuple[str, ...], float]:
+    stats = get_scheduler_stats()
+    samples = {}
+    for priority, values in stats.items():
+        samples[(priority, "in_flight")] = values["in_flight"]
+        samples[(priority, "queued")] = values["queued"]
+    return samples
+
+SCHEDULER_IN_FLIGHT.set_function(_in_flight_samples)
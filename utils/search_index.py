@@ -0,0 +1,401 @@
+"""
+Local full-text search over stored interviews.
+An inverted index with BM25 ranking over the summary, the evaluation text and
+the founder's messages. The index is a directory of immutable segment files,
+memory-mapped when opened, plus a small manifest. Each incremental build adds
+a segment; a session indexed again supersedes its copies in older segments,
+and segments are merged once there are too many of them.
+"""
+
+import heapq
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import uuid
+import zlib
+from array import array
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Set, Tuple
+from .logger import logger
+from config import SEARCH_BM25_K1, SEARCH_BM25_B, SEARCH_INDEX_MAX_SEGMENTS, SEARCH_SNIPPET_CHARS
+
+SEARCH_FIELDS = ("summary", "evaluation", "founder")
+MANIFEST_FILE = "manifest.json"
+
+SEGMENT_MAGIC = b"NCBM25\x00\x01"
+# Written in native byte order; a segment copied to a machine with the other order is rejected
+_BYTE_ORDER_MARK = 0x01020304
+_SECTIONS = (
+    "doc_lengths", "session_ids", "session_offsets", "terms", "term_offsets",
+    "posting_offsets", "posting_docs", "posting_tfs", "stored", "stored_offsets"
+)
+# magic, byte-order mark, documents, terms, then (offset, length) per section
+_HEADER = struct.Struct("<8sIII" + "QQ" * len(_SECTIONS))
+_MAX_TF = 65535  # Term frequencies are stored as uint16
+
+_TOKEN_PATTERN = re.compile(r"\w+")
+_STOPWORDS = frozenset(
+    "a an and are as at be but by can do for from had has have he her his i if in into is it its me my "
+    "no not of on or our she so than that the their them then there they this to us was we were what "
+    "when which who will with would you your".split()
+)
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens without stopwords and single characters."""
+    return [token for token in _TOKEN_PATTERN.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+def conversation_document(row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Build the searchable document of a conversation row.
+
+    Args:
+        row: Conversation row with session_id, summary, evaluation and messages
+
+    Returns:
+        Dict: session_id, created_at, ended_at and one text per SEARCH_FIELDS entry
+    """
+    evaluation = row.get("evaluation") if isinstance(row.get("evaluation"), dict) else {}
+    messages = row.get("messages") or []
+    return {
+        "session_id": row["session_id"],
+        "created_at": row.get("created_at"),
+        "ended_at": row.get("ended_at"),
+        "summary": row.get("summary") or "",
+        # Failed evaluations only hold an error message
+        "evaluation": (evaluation.get("evaluation_text") or "") if evaluation.get("status") == "success" else "",
+        "founder": "\n".join(message.get("content") or "" for message in messages if message.get("role") == "user")
+    }
+
+def _pack_strings(values: List[bytes]) -> Tuple[bytes, array]:
+    offsets = array("Q", [0])
+    for value in values:
+        offsets.append(offsets[-1] + len(value))
+    return b"".join(values), offsets
+
+def write_segment(path: str, documents: List[Dict[str, Any]]):
+    """
+    Write an immutable segment file for documents (as built by conversation_document).
+
+    The file is written under a temporary name and renamed, so readers never
+    see a partial segment.
+    """
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    doc_lengths = array("I")
+    for doc_id, document in enumerate(documents):
+        counts: Dict[str, int] = {}
+        for field in SEARCH_FIELDS:
+            for token in tokenize(document.get(field) or ""):
+                counts[token] = counts.get(token, 0) + 1
+        doc_lengths.append(sum(counts.values()))
+        for token, count in counts.items():
+            postings.setdefault(token, []).append((doc_id, min(count, _MAX_TF)))
+
+    # Terms are sorted by their UTF-8 bytes, the order the binary search compares in
+    encoded_terms = sorted(term.encode("utf-8") for term in postings)
+    posting_offsets = array("Q", [0])
+    posting_docs = array("I")
+    posting_tfs = array("H")
+    for encoded in encoded_terms:
+        for doc_id, count in postings[encoded.decode("utf-8")]:
+            posting_docs.append(doc_id)
+            posting_tfs.append(count)
+        posting_offsets.append(len(posting_docs))
+
+    session_ids, session_offsets = _pack_strings([document["session_id"].encode("utf-8") for document in documents])
+    terms, term_offsets = _pack_strings(encoded_terms)
+    # Stored texts are only read for the hits of a query, so they are compressed per document
+    stored, stored_offsets = _pack_strings([
+        zlib.compress(json.dumps({key: document.get(key) for key in ("session_id", "created_at", "ended_at") + SEARCH_FIELDS},
+                                 ensure_ascii=False).encode("utf-8"))
+        for document in documents
+    ])
+    sections = {
+        "doc_lengths": doc_lengths.tobytes(), "session_ids": session_ids, "session_offsets": session_offsets.tobytes(),
+        "terms": terms, "term_offsets": term_offsets.tobytes(), "posting_offsets": posting_offsets.tobytes(),
+        "posting_docs": posting_docs.tobytes(), "posting_tfs": posting_tfs.tobytes(),
+        "stored": stored, "stored_offsets": stored_offsets.tobytes()
+    }
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(b"\0" * _HEADER.size)
+        locations: List[int] = []
+        for name in _SECTIONS:
+            # 8-byte alignment keeps every typed section aligned for its memoryview
+            f.write(b"\0" * (-f.tell() % 8))
+            locations.extend((f.tell(), len(sections[name])))
+            f.write(sections[name])
+        f.seek(0)
+        f.write(_HEADER.pack(SEGMENT_MAGIC, _BYTE_ORDER_MARK, len(documents), len(encoded_terms), *locations))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+class Segment:
+    """A memory-mapped segment file; postings are read in place without copying."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        header = _HEADER.unpack_from(self._mmap, 0)
+        magic, byte_order_mark, self.doc_count, self.term_count = header[:4]
+        if magic != SEGMENT_MAGIC or byte_order_mark != _BYTE_ORDER_MARK:
+            self._mmap.close()
+            raise ValueError(f"Not a search segment or written with another byte order: {path}")
+        self._view = memoryview(self._mmap)
+        self._sections = {}
+        for index, name in enumerate(_SECTIONS):
+            offset, length = header[4 + 2 * index], header[5 + 2 * index]
+            self._sections[name] = self._view[offset:offset + length]
+        self.doc_lengths = self._sections["doc_lengths"].cast("I")
+        self._session_offsets = self._sections["session_offsets"].cast("Q")
+        self._term_offsets = self._sections["term_offsets"].cast("Q")
+        self._posting_offsets = self._sections["posting_offsets"].cast("Q")
+        self._posting_docs = self._sections["posting_docs"].cast("I")
+        self._posting_tfs = self._sections["posting_tfs"].cast("H")
+        self._stored_offsets = self._sections["stored_offsets"].cast("Q")
+
+    def session_ids(self) -> List[str]:
+        blob = self._sections["session_ids"]
+        offsets = self._session_offsets
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in range(self.doc_count)]
+
+    def _term(self, index: int) -> bytes:
+        return bytes(self._sections["terms"][self._term_offsets[index]:self._term_offsets[index + 1]])
+
+    def postings(self, term: str) -> Tuple[memoryview, memoryview]:
+        """Document ids and term frequencies of a term (empty views if it does not occur)."""
+        encoded = term.encode("utf-8")
+        low, high = 0, self.term_count
+        while low < high:
+            middle = (low + high) // 2
+            if self._term(middle) < encoded:
+                low = middle + 1
+            else:
+                high = middle
+        if low == self.term_count or self._term(low) != encoded:
+            return self._posting_docs[0:0], self._posting_tfs[0:0]
+        start, end = self._posting_offsets[low], self._posting_offsets[low + 1]
+        return self._posting_docs[start:end], self._posting_tfs[start:end]
+
+    def stored(self, doc_id: int) -> Dict[str, Any]:
+        start, end = self._stored_offsets[doc_id], self._stored_offsets[doc_id + 1]
+        return json.loads(zlib.decompress(self._sections["stored"][start:end]).decode("utf-8"))
+
+    def close(self):
+        # Every view has to be released before the map can be closed
+        for view in (self.doc_lengths, self._session_offsets, self._term_offsets, self._posting_offsets,
+                     self._posting_docs, self._posting_tfs, self._stored_offsets, *self._sections.values()):
+            view.release()
+        self._view.release()
+        self._mmap.close()
+
+@dataclass
+class SearchHit:
+    """One ranked result."""
+    session_id: str
+    score: float
+    field: str  # Field the snippet was taken from
+    snippet: str
+    created_at: Optional[str] = None
+    ended_at: Optional[str] = None
+
+def make_snippet(text: str, terms: Set[str], width: int = SEARCH_SNIPPET_CHARS) -> Tuple[str, int]:
+    """
+    Pick the window of text with the most query terms, with matches marked as **term**.
+
+    Returns:
+        Tuple[str, int]: The snippet and the number of matches it contains
+    """
+    matches = [match for match in _TOKEN_PATTERN.finditer(text) if match.group().lower() in terms]
+    if not matches:
+        return "", 0
+    best_start, best_count, last = 0, 0, 0
+    for first in range(len(matches)):
+        last = max(last, first + 1)
+        while last < len(matches) and matches[last].end() - matches[first].start() <= width:
+            last += 1
+        if last - first > best_count:
+            best_start, best_count = first, last - first
+    window = matches[best_start:best_start + best_count]
+    # Center the matches in the window
+    slack = max(0, width - (window[-1].end() - window[0].start()))
+    start = max(0, window[0].start() - slack // 2)
+    end = min(len(text), start + width)
+    pieces, position = [], start
+    for match in window:
+        pieces.extend((text[position:match.start()], f"**{match.group()}**"))
+        position = match.end()
+    pieces.append(text[position:end])
+    snippet = " ".join("".join(pieces).split())
+    return ("…" if start > 0 else "") + snippet + ("…" if end < len(text) else ""), best_count
+
+class SearchIndex:
+    """
+    BM25 search over the segments of an index directory.
+
+    Usage:
+        index = SearchIndex(".search")
+        index.add_documents([conversation_document(row) for row in rows])
+        hits = index.search("fintech payments founder", limit=10)
+        index.close()
+    """
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.manifest = self._load_manifest()
+        self.segments: List[Segment] = []
+        self._deleted: List[Set[int]] = []
+        self._open_segments()
+
+    def _load_manifest(self) -> Dict[str, Any]:
+        try:
+            with open(os.path.join(self.directory, MANIFEST_FILE), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"segments": [], "watermark": None}
+
+    def _save_manifest(self):
+        """Atomically replace the manifest; it is the commit point of every change."""
+        path = os.path.join(self.directory, MANIFEST_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    def _open_segments(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = [Segment(os.path.join(self.directory, name)) for name in self.manifest["segments"]]
+        # A session present in a newer segment hides its copies in older ones
+        seen: Set[str] = set()
+        self._deleted = [set() for _ in self.segments]
+        self.doc_count = 0
+        self.total_length = 0
+        for position in range(len(self.segments) - 1, -1, -1):
+            segment = self.segments[position]
+            for doc_id, session_id in enumerate(segment.session_ids()):
+                if session_id in seen:
+                    self._deleted[position].add(doc_id)
+                else:
+                    seen.add(session_id)
+                    self.doc_count += 1
+                    self.total_length += segment.doc_lengths[doc_id]
+
+    @property
+    def watermark(self) -> Optional[str]:
+        """ended_at up to which conversations have been indexed."""
+        return self.manifest.get("watermark")
+
+    def add_documents(self, documents: List[Dict[str, Any]], watermark: Optional[str] = None) -> int:
+        """
+        Index documents as a new segment and advance the watermark.
+
+        Args:
+            documents: Documents from conversation_document(); re-indexed sessions replace older copies
+            watermark: New watermark to record with the segment (kept if None)
+
+        Returns:
+            int: Number of documents indexed
+        """
+        if documents:
+            name = f"segment-{uuid.uuid4().hex[:12]}.bm25"
+            write_segment(os.path.join(self.directory, name), documents)
+            self.manifest["segments"].append(name)
+        if watermark is not None:
+            self.manifest["watermark"] = watermark
+        self._save_manifest()
+        self._open_segments()
+        if len(self.segments) > SEARCH_INDEX_MAX_SEGMENTS:
+            self.compact()
+        return len(documents)
+
+    def compact(self):
+        """Merge all segments into one, dropping superseded copies."""
+        documents = [
+            segment.stored(doc_id)
+            for position, segment in enumerate(self.segments)
+            for doc_id in range(segment.doc_count)
+            if doc_id not in self._deleted[position]
+        ]
+        old_names = list(self.manifest["segments"])
+        name = f"segment-{uuid.uuid4().hex[:12]}.bm25"
+        write_segment(os.path.join(self.directory, name), documents)
+        self.manifest["segments"] = [name]
+        self._save_manifest()
+        self._open_segments()
+        for old_name in old_names:
+            os.remove(os.path.join(self.directory, old_name))
+        logger.info("Search index compacted: %s segments into one with %s documents", len(old_names), len(documents))
+
+    def search(self, query: str, limit: int = 10) -> List[SearchHit]:
+        """
+        Rank documents for a free-text query with BM25.
+
+        Args:
+            query: Words to search for (all are optional; more matches rank higher)
+            limit: Maximum number of hits
+
+        Returns:
+            List[SearchHit]: Best matches first, each with a snippet
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or self.doc_count == 0:
+            return []
+        average_length = self.total_length / self.doc_count
+        k1, b = SEARCH_BM25_K1, SEARCH_BM25_B
+        scores: Dict[Tuple[int, int], float] = {}
+        for term in terms:
+            lists = [segment.postings(term) for segment in self.segments]
+            document_frequency = sum(
+                len(docs) - (sum(1 for doc_id in docs if doc_id in deleted) if deleted else 0)
+                for (docs, _), deleted in zip(lists, self._deleted)
+            )
+            if document_frequency == 0:
+                continue
+            idf = math.log(1 + (self.doc_count - document_frequency + 0.5) / (document_frequency + 0.5))
+            for position, ((docs, tfs), deleted) in enumerate(zip(lists, self._deleted)):
+                lengths = self.segments[position].doc_lengths
+                for doc_id, tf in zip(docs, tfs):
+                    if deleted and doc_id in deleted:
+                        continue
+                    norm = k1 * (1 - b + b * lengths[doc_id] / average_length)
+                    key = (position, doc_id)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        term_set = set(terms)
+        hits = []
+        for (position, doc_id), score in heapq.nlargest(limit, scores.items(), key=lambda item: item[1]):
+            document = self.segments[position].stored(doc_id)
+            field, snippet = SEARCH_FIELDS[0], ""
+            best = 0
+            for candidate in SEARCH_FIELDS:
+                text, count = make_snippet(document.get(candidate) or "", term_set)
+                if count > best:
+                    field, snippet, best = candidate, text, count
+            hits.append(SearchHit(
+                session_id=document["session_id"], score=round(score, 4), field=field, snippet=snippet,
+                created_at=document.get("created_at"), ended_at=document.get("ended_at")
+            ))
+        return hits
+
+    def stats(self) -> Dict[str, Any]:
+        """Document and segment counts and on-disk size."""
+        return {
+            "documents": self.doc_count,
+            "segments": len(self.segments),
+            "bytes": sum(os.path.getsize(segment.path) for segment in self.segments),
+            "watermark": self.watermark
+        }
+
+    def close(self):
+        for segment in self.segments:
+            segment.close()
+        self.segments = []
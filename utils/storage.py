@@ -0,0 +1,687 @@
+"""
+Storage backends for conversations.
+StorageBackend is the interface behind the supabase_client functions, with a
+Supabase implementation and a SQLite implementation using the same schema.
+Given an upstream backend, the SQLite backend also acts as a durable outbox:
+writes are committed (and fsynced) locally first and a background drainer
+pushes them upstream in order, in batches.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from .logger import ErrorLogger, logger
+from .metrics import OUTBOX_OPERATIONS, OUTBOX_BACKLOG, observe_db_call
+from postgrest.exceptions import APIError as PostgrestAPIError
+from .retry import CircuitOpenError, call_with_retry, get_circuit_breaker, is_retryable_error
+from .conversation_stats import STATS_COLUMNS
+from config import (
+    OUTBOX_DRAIN_BATCH_SIZE, OUTBOX_DRAIN_INTERVAL, OUTBOX_MAX_BACKOFF, OUTBOX_MAX_FATAL_ATTEMPTS
+)
+
+CONVERSATION_COLUMNS = ("id", "session_id", "created_at", "messages", "summary", "evaluation", "ended_at") + STATS_COLUMNS
+JSON_COLUMNS = {"messages", "evaluation"}
+BOOLEAN_COLUMNS = {"completion_detected"}
+# Columns that make up the keyset cursor of paged reads
+KEYSET_COLUMNS = ("created_at", "id")
+# PostgREST schema cache / PostgreSQL codes for a column the table does not have
+UNKNOWN_COLUMN_ERROR_CODES = ("PGRST204", "42703")
+
+@dataclass(frozen=True)
+class ConversationFilter:
+    """Row filters for paged conversation reads (None leaves a filter off)."""
+    created_from: Optional[str] = None  # Inclusive ISO timestamp
+    created_before: Optional[str] = None  # Exclusive ISO timestamp
+    has_summary: Optional[bool] = None
+    has_evaluation: Optional[bool] = None
+    ended: Optional[bool] = None
+    ended_after: Optional[str] = None  # Exclusive ISO timestamp
+    ended_until: Optional[str] = None  # Inclusive ISO timestamp
+
+def with_keyset_columns(columns: str) -> str:
+    """Add the cursor columns to a column projection if they are missing."""
+    names = [name.strip() for name in columns.split(",") if name.strip()]
+    if "*" in names:
+        return columns
+    return ",".join(names + [name for name in KEYSET_COLUMNS if name not in names])
+
+class StorageBackend(ABC):
+    """Interface for conversation storage; rows use the column names of the conversations table."""
+
+    name = "base"
+
+    @abstractmethod
+    def upsert_conversations(self, rows: List[Dict[str, Any]]) -> int:
+        """Insert or update rows keyed by session_id, touching only the given columns; returns rows written."""
+
+    @abstractmethod
+    def update_conversation(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        """Patch columns of an existing row; returns False if no row matched."""
+
+    @abstractmethod
+    def get_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return one row, or None if it does not exist."""
+
+    @abstractmethod
+    def fetch_conversations_page(
+        self,
+        columns: str,
+        page_size: int,
+        conversation_filter: Optional[ConversationFilter],
+        after: Optional[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Return up to page_size rows after the keyset cursor, in (created_at, id) order."""
+
+    @abstractmethod
+    def count_conversations(self, conversation_filter: Optional[ConversationFilter], after: Optional[Dict[str, str]]) -> Optional[int]:
+        """Count the rows a paged read would return."""
+
+    @abstractmethod
+    def list_conversations(self, limit: int) -> List[Dict[str, Any]]:
+        """Return the newest rows first."""
+
+    @abstractmethod
+    def upsert_messages(self, rows: List[Dict[str, Any]]):
+        """Insert per-turn message rows, ignoring (session_id, seq) pairs that already exist."""
+
+    @abstractmethod
+    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        """Return the per-turn messages of a session in order."""
+
+def _without_stats_columns(rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Copies of the rows without the STATS_COLUMNS."""
+    return [{column: value for column, value in row.items() if column not in STATS_COLUMNS} for row in rows]
+
+class SupabaseBackend(StorageBackend):
+    """Conversations stored in Supabase through PostgREST, with the shared retry policy."""
+
+    name = "supabase"
+
+    def __init__(self, client):
+        self.client = client
+        # Set once an upsert is rejected for unknown stats columns (see CONVERSATION_STATS_ENABLED)
+        self.stats_columns_missing = False
+
+    def _execute(self, build, context: str):
+        return call_with_retry(lambda timeout: build().execute(), context, get_circuit_breaker("supabase"))
+
+    def _conversations_query(self, columns: str, conversation_filter: Optional[ConversationFilter], after: Optional[Dict[str, str]], count: Optional[str] = None):
+        conversation_filter = conversation_filter or ConversationFilter()
+        query = self.client.table("conversations").select(columns, count=count)
+        if conversation_filter.created_from:
+            query = query.gte("created_at", conversation_filter.created_from)
+        if conversation_filter.created_before:
+            query = query.lt("created_at", conversation_filter.created_before)
+        if conversation_filter.ended_after:
+            query = query.gt("ended_at", conversation_filter.ended_after)
+        if conversation_filter.ended_until:
+            query = query.lte("ended_at", conversation_filter.ended_until)
+        for column, present in (
+            ("summary", conversation_filter.has_summary),
+            ("evaluation", conversation_filter.has_evaluation),
+            ("ended_at", conversation_filter.ended)
+        ):
+            if present is not None:
+                query = query.not_.is_(column, "null") if present else query.is_(column, "null")
+        # postgrest-py has no or_() helper and repeats order= per column, so both are added as raw parameters
+        if after:
+            created_at = after["created_at"]
+            query.params = query.params.add(
+                "or", f'(created_at.gt."{created_at}",and(created_at.eq."{created_at}",id.gt.{after["id"]}))'
+            )
+        query.params = query.params.add("order", "created_at.asc,id.asc")
+        return query
+
+    def upsert_conversations(self, rows: List[Dict[str, Any]]) -> int:
+        if self.stats_columns_missing:
+            rows = _without_stats_columns(rows)
+        try:
+            result = self._execute(
+                lambda: self.client.table("conversations").upsert(rows, on_conflict="session_id"),
+                "Supabase upsert conversation"
+            )
+        except PostgrestAPIError as e:
+            # A table created before the stats columns rejects the whole row; save it without them
+            if str(e.code) not in UNKNOWN_COLUMN_ERROR_CODES or not any(column in row for row in rows for column in STATS_COLUMNS):
+                raise
+            ErrorLogger.log_warning("Stats columns missing in Supabase, saving conversations without them", "Supabase upsert conversation", {
+                "error_code": e.code,
+                "error_message": e.message
+            })
+            self.stats_columns_missing = True
+            rows = _without_stats_columns(rows)
+            result = self._execute(
+                lambda: self.client.table("conversations").upsert(rows, on_conflict="session_id"),
+                "Supabase upsert conversation"
+            )
+        return len(result.data or [])
+
+    def update_conversation(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        result = self._execute(
+            lambda: self.client.table("conversations").update(fields).eq("session_id", session_id),
+            "Supabase update conversation fields"
+        )
+        return bool(result.data)
+
+    def get_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        result = self._execute(
+            lambda: self.client.table("conversations").select("*").eq("session_id", session_id),
+            "Supabase get conversation"
+        )
+        return result.data[0] if result.data else None
+
+    def fetch_conversations_page(self, columns, page_size, conversation_filter, after):
+        result = self._execute(
+            lambda: self._conversations_query(columns, conversation_filter, after).limit(page_size),
+            "Supabase fetch conversations page"
+        )
+        return result.data or []
+
+    def count_conversations(self, conversation_filter, after):
+        result = self._execute(
+            lambda: self._conversations_query("id", conversation_filter, after, count="exact").limit(1),
+            "Supabase count conversations"
+        )
+        return result.count
+
+    def list_conversations(self, limit: int) -> List[Dict[str, Any]]:
+        result = self._execute(
+            lambda: self.client.table("conversations").select("*").order("created_at", desc=True).limit(limit),
+            "Supabase get all conversations"
+        )
+        return result.data or []
+
+    def upsert_messages(self, rows: List[Dict[str, Any]]):
+        self._execute(
+            lambda: self.client.table("conversation_messages").upsert(
+                rows, on_conflict="session_id,seq", returning="minimal", ignore_duplicates=True
+            ),
+            "Supabase upsert conversation messages"
+        )
+
+    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        result = self._execute(
+            lambda: self.client.table("conversation_messages").select("role,content").eq("session_id", session_id).order("seq"),
+            "Supabase get conversation messages"
+        )
+        return [{"role": row["role"], "content": row["content"]} for row in result.data or []]
+
+_SQLITE_SCHEMA = """
+CREATE TABLE IF NOT EXISTS conversations (
+    id TEXT PRIMARY KEY,
+    session_id TEXT UNIQUE NOT NULL,
+    created_at TEXT NOT NULL,
+    messages TEXT NOT NULL,
+    summary TEXT,
+    evaluation TEXT,
+    ended_at TEXT,
+    started_at TEXT,
+    founder_turns INTEGER,
+    assistant_turns INTEGER,
+    founder_chars INTEGER,
+    assistant_chars INTEGER,
+    founder_tokens INTEGER,
+    assistant_tokens INTEGER,
+    duration_seconds REAL,
+    completion_detected INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_conversations_created_at_id ON conversations(created_at, id);
+CREATE TABLE IF NOT EXISTS conversation_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    session_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    role TEXT NOT NULL,
+    content TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    UNIQUE (session_id, seq)
+);
+CREATE TABLE IF NOT EXISTS outbox (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    operation TEXT NOT NULL,
+    session_id TEXT,
+    payload TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    available_at REAL NOT NULL,
+    last_error TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_outbox_status ON outbox(status, id);
+CREATE INDEX IF NOT EXISTS idx_outbox_session_id ON outbox(session_id, status);
+"""
+
+# Columns added after the first release of the SQLite schema: (name, type)
+_SQLITE_ADDED_COLUMNS = (
+    ("started_at", "TEXT"), ("founder_turns", "INTEGER"), ("assistant_turns", "INTEGER"),
+    ("founder_chars", "INTEGER"), ("assistant_chars", "INTEGER"), ("founder_tokens", "INTEGER"),
+    ("assistant_tokens", "INTEGER"), ("duration_seconds", "REAL"), ("completion_detected", "INTEGER")
+)
+_SQLITE_POST_MIGRATION = """
+CREATE INDEX IF NOT EXISTS idx_conversations_completion ON conversations(completion_detected, ended_at);
+"""
+
+OUTBOX_STATUS_PENDING = "pending"
+OUTBOX_STATUS_DEAD = "dead"
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+class SQLiteBackend(StorageBackend):
+    """
+    Conversations stored in a local SQLite file with the Supabase schema.
+
+    Without an upstream it is a complete offline store. With one, every write
+    is also recorded in an outbox table in the same transaction and drained
+    upstream by a background thread; reads of analytics-style queries go
+    upstream, and single-session reads are served locally while that session
+    still has operations waiting in the outbox.
+    """
+
+    def __init__(self, db_path: str, upstream: Optional[StorageBackend] = None):
+        self.db_path = db_path
+        self.upstream = upstream
+        self.name = "outbox" if upstream is not None else "sqlite"
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        # Concurrent drains could re-send an older write after a newer one
+        self._drain_lock = threading.Lock()
+        self._drainer = None
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(_SQLITE_SCHEMA)
+            existing = {row["name"] for row in conn.execute("PRAGMA table_info(conversations)")}
+            for column, column_type in _SQLITE_ADDED_COLUMNS:
+                if column not in existing:
+                    conn.execute(f"ALTER TABLE conversations ADD COLUMN {column} {column_type}")
+            conn.executescript(_SQLITE_POST_MIGRATION)
+
+    def _connect(self) -> sqlite3.Connection:
+        # One short-lived connection per operation keeps the backend safe across threads
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        # FULL fsyncs the WAL on every commit, so an acknowledged write survives a power loss
+        conn.execute("PRAGMA synchronous=FULL")
+        return conn
+
+    @contextmanager
+    def _connection(self) -> Iterator[sqlite3.Connection]:
+        conn = self._connect()
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self._connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def _enqueue(self, conn: sqlite3.Connection, operation: str, session_id: Optional[str], payload: Any):
+        """Record an upstream write in the outbox (inside the caller's transaction)."""
+        if self.upstream is None:
+            return
+        now = time.time()
+        conn.execute(
+            "INSERT INTO outbox (operation, session_id, payload, status, available_at, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (operation, session_id, json.dumps(payload, ensure_ascii=False), OUTBOX_STATUS_PENDING, now, now)
+        )
+
+    @staticmethod
+    def _encode(column: str, value: Any) -> Any:
+        return json.dumps(value, ensure_ascii=False) if column in JSON_COLUMNS and value is not None else value
+
+    @staticmethod
+    def _decode(row: sqlite3.Row) -> Dict[str, Any]:
+        record = dict(row)
+        for column in JSON_COLUMNS:
+            if record.get(column) is not None:
+                record[column] = json.loads(record[column])
+        for column in BOOLEAN_COLUMNS:
+            if record.get(column) is not None:
+                record[column] = bool(record[column])
+        return record
+
+    @staticmethod
+    def _projection(columns: str) -> str:
+        names = [name.strip() for name in columns.split(",") if name.strip()]
+        if "*" in names:
+            return "*"
+        unknown = [name for name in names if name not in CONVERSATION_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown conversation columns: {unknown}")
+        return ", ".join(names)
+
+    @staticmethod
+    def _where(conversation_filter: Optional[ConversationFilter], after: Optional[Dict[str, str]]) -> Tuple[str, List[Any]]:
+        conversation_filter = conversation_filter or ConversationFilter()
+        clauses: List[str] = []
+        params: List[Any] = []
+        for clause, value in (
+            ("created_at >= ?", conversation_filter.created_from),
+            ("created_at < ?", conversation_filter.created_before),
+            ("ended_at > ?", conversation_filter.ended_after),
+            ("ended_at <= ?", conversation_filter.ended_until)
+        ):
+            if value:
+                clauses.append(clause)
+                params.append(value)
+        for column, present in (
+            ("summary", conversation_filter.has_summary),
+            ("evaluation", conversation_filter.has_evaluation),
+            ("ended_at", conversation_filter.ended)
+        ):
+            if present is not None:
+                clauses.append(f"{column} IS {'NOT ' if present else ''}NULL")
+        if after:
+            clauses.append("(created_at > ? OR (created_at = ? AND id > ?))")
+            params.extend([after["created_at"], after["created_at"], after["id"]])
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def upsert_conversations(self, rows: List[Dict[str, Any]]) -> int:
+        with self._transaction() as conn:
+            for row in rows:
+                columns = [column for column in CONVERSATION_COLUMNS if column in row and column not in ("id", "created_at")]
+                updates = ", ".join(f"{column} = excluded.{column}" for column in columns if column != "session_id")
+                conn.execute(
+                    f"INSERT INTO conversations (id, created_at, {', '.join(columns)}) VALUES (?, ?, {', '.join('?' for _ in columns)}) "
+                    f"ON CONFLICT(session_id) DO " + (f"UPDATE SET {updates}" if updates else "NOTHING"),
+                    [str(uuid.uuid4()), _now_iso()] + [self._encode(column, row[column]) for column in columns]
+                )
+                self._enqueue(conn, "upsert_conversation", row["session_id"], row)
+        self._wake.set()
+        return len(rows)
+
+    def update_conversation(self, session_id: str, fields: Dict[str, Any]) -> bool:
+        columns = [column for column in fields if column in CONVERSATION_COLUMNS and column not in ("id", "session_id")]
+        if not columns:
+            raise ValueError("No updatable conversation columns given")
+        with self._transaction() as conn:
+            cursor = conn.execute(
+                f"UPDATE conversations SET {', '.join(f'{column} = ?' for column in columns)} WHERE session_id = ?",
+                [self._encode(column, fields[column]) for column in columns] + [session_id]
+            )
+            if cursor.rowcount > 0:
+                self._enqueue(conn, "update_conversation", session_id, {"session_id": session_id, "fields": fields})
+        if cursor.rowcount > 0:
+            self._wake.set()
+            return True
+        if self.upstream is None:
+            return False
+        # Not in this store (e.g. saved before its disk was replaced), so nothing of the session is
+        # queued and the patch can go upstream directly; its result is the only honest answer
+        return self.upstream.update_conversation(session_id, fields)
+
+    def _get_local_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._connection() as conn:
+            row = conn.execute("SELECT * FROM conversations WHERE session_id = ?", (session_id,)).fetchone()
+        return self._decode(row) if row is not None else None
+
+    def has_pending(self, session_id: str) -> bool:
+        """True if the session still has writes waiting in the outbox."""
+        with self._connection() as conn:
+            row = conn.execute(
+                "SELECT 1 FROM outbox WHERE session_id = ? AND status = ? LIMIT 1", (session_id, OUTBOX_STATUS_PENDING)
+            ).fetchone()
+        return row is not None
+
+    def get_conversation(self, session_id: str) -> Optional[Dict[str, Any]]:
+        if self.upstream is None or self.has_pending(session_id):
+            return self._get_local_conversation(session_id)
+        try:
+            row = self.upstream.get_conversation(session_id)
+        except Exception as e:
+            ErrorLogger.log_warning(f"Upstream read failed, serving local copy: {e}", "Outbox get conversation", {"session_id": session_id})
+            return self._get_local_conversation(session_id)
+        return row if row is not None else self._get_local_conversation(session_id)
+
+    def fetch_conversations_page(self, columns, page_size, conversation_filter, after):
+        if self.upstream is not None:
+            return self.upstream.fetch_conversations_page(columns, page_size, conversation_filter, after)
+        where, params = self._where(conversation_filter, after)
+        with self._connection() as conn:
+            rows = conn.execute(
+                f"SELECT {self._projection(columns)} FROM conversations{where} ORDER BY created_at, id LIMIT ?",
+                params + [page_size]
+            ).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def count_conversations(self, conversation_filter, after):
+        if self.upstream is not None:
+            return self.upstream.count_conversations(conversation_filter, after)
+        where, params = self._where(conversation_filter, after)
+        with self._connection() as conn:
+            return conn.execute(f"SELECT COUNT(*) FROM conversations{where}", params).fetchone()[0]
+
+    def list_conversations(self, limit: int) -> List[Dict[str, Any]]:
+        if self.upstream is not None:
+            return self.upstream.list_conversations(limit)
+        with self._connection() as conn:
+            rows = conn.execute("SELECT * FROM conversations ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [self._decode(row) for row in rows]
+
+    def upsert_messages(self, rows: List[Dict[str, Any]]):
+        with self._transaction() as conn:
+            conn.executemany(
+                "INSERT OR IGNORE INTO conversation_messages (session_id, seq, role, content, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(row["session_id"], row["seq"], row["role"], row["content"], _now_iso()) for row in rows]
+            )
+            self._enqueue(conn, "upsert_messages", None, rows)
+        self._wake.set()
+
+    def get_messages(self, session_id: str) -> List[Dict[str, str]]:
+        if self.upstream is not None and not self.has_pending(session_id):
+            try:
+                return self.upstream.get_messages(session_id)
+            except Exception as e:
+                ErrorLogger.log_warning(f"Upstream read failed, serving local copy: {e}", "Outbox get messages", {"session_id": session_id})
+        with self._connection() as conn:
+            rows = conn.execute(
+                "SELECT role, content FROM conversation_messages WHERE session_id = ? ORDER BY seq", (session_id,)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # Outbox draining
+
+    @staticmethod
+    def _group(operations: List[sqlite3.Row]) -> List[List[sqlite3.Row]]:
+        """Split operations into consecutive runs that can be sent as one upstream request."""
+        groups: List[List[sqlite3.Row]] = []
+        previous_key = None
+        for operation in operations:
+            payload = json.loads(operation["payload"])
+            if operation["operation"] == "upsert_conversation":
+                # PostgREST bulk upserts need identical keys in every row
+                key = ("upsert_conversation", tuple(sorted(payload)))
+            elif operation["operation"] == "upsert_messages":
+                key = ("upsert_messages",)
+            else:
+                key = None
+            if key is not None and key == previous_key:
+                groups[-1].append(operation)
+            else:
+                groups.append([operation])
+            previous_key = key
+        return groups
+
+    def _apply(self, group: List[sqlite3.Row]):
+        operation = group[0]["operation"]
+        payloads = [json.loads(row["payload"]) for row in group]
+        if operation == "upsert_conversation":
+            # One statement may not touch a row twice, so only the latest write per session is sent
+            latest = {payload["session_id"]: payload for payload in payloads}
+            self.upstream.upsert_conversations(list(latest.values()))
+        elif operation == "upsert_messages":
+            rows = {(row["session_id"], row["seq"]): row for payload in payloads for row in payload}
+            self.upstream.upsert_messages(list(rows.values()))
+        elif operation == "update_conversation":
+            payload = payloads[0]
+            if not self.upstream.update_conversation(payload["session_id"], payload["fields"]):
+                ErrorLogger.log_warning("Outbox update matched no upstream row", "Outbox drain", {"session_id": payload["session_id"]})
+        else:
+            raise ValueError(f"Unknown outbox operation: {operation}")
+
+    def drain_once(self, batch_size: int = OUTBOX_DRAIN_BATCH_SIZE) -> int:
+        """
+        Push the oldest pending operations upstream, in order per session.
+
+        Operations of one session are applied in the order they were written:
+        once one of them is waiting for a retry, its later operations wait too.
+        Other sessions are not held up by it. A retryable error (upstream down
+        or overloaded) ends the pass; the failed operations are retried with
+        backoff. Operations failing with a non-retryable error are parked as
+        dead after OUTBOX_MAX_FATAL_ATTEMPTS, together with the later pending
+        operations of the same session. Per-turn message rows carry no
+        ordering and are drained independently.
+
+        Returns:
+            int: Number of operations drained
+        """
+        with self._drain_lock:
+            return self._drain_batch(batch_size)
+
+    def _drain_batch(self, batch_size: int) -> int:
+        now = time.time()
+        with self._connection() as conn:
+            operations = conn.execute(
+                "SELECT * FROM outbox WHERE status = ? ORDER BY id LIMIT ?", (OUTBOX_STATUS_PENDING, batch_size)
+            ).fetchall()
+
+        # A session whose earliest pending operation is backing off is blocked for this pass
+        blocked = set()
+        ready = []
+        for operation in operations:
+            session_id = operation["session_id"]
+            if session_id is not None and session_id in blocked:
+                continue
+            if operation["available_at"] > now:
+                if session_id is not None:
+                    blocked.add(session_id)
+                continue
+            ready.append(operation)
+
+        drained = 0
+        groups = self._group(ready)
+        while groups:
+            group = [row for row in groups.pop(0) if row["session_id"] is None or row["session_id"] not in blocked]
+            if not group:
+                continue
+            ids = [row["id"] for row in group]
+            placeholders = ", ".join("?" for _ in ids)
+            try:
+                with observe_db_call("outbox_drain"):
+                    self._apply(group)
+            except Exception as e:
+                retryable = isinstance(e, CircuitOpenError) or is_retryable_error(e)
+                if not retryable and len(group) > 1:
+                    # Retry a rejected bulk request one operation at a time so one bad row does not sink the rest
+                    groups[:0] = [[row] for row in group]
+                    continue
+                self._record_failure(group, e, retryable)
+                if retryable:
+                    break
+                blocked.update(row["session_id"] for row in group if row["session_id"] is not None)
+                continue
+            with self._transaction() as conn:
+                conn.execute(f"DELETE FROM outbox WHERE id IN ({placeholders})", ids)
+            OUTBOX_OPERATIONS.inc(len(group), operation=group[0]["operation"], outcome="drained")
+            drained += len(group)
+        return drained
+
+    def _record_failure(self, group: List[sqlite3.Row], error: Exception, retryable: bool):
+        """Schedule a failed group for retry, or park it (and what follows it in its session) as dead."""
+        ids = [row["id"] for row in group]
+        placeholders = ", ".join("?" for _ in ids)
+        attempts = group[0]["attempts"] + 1
+        dead = not retryable and attempts >= OUTBOX_MAX_FATAL_ATTEMPTS
+        cascaded = 0
+        with self._transaction() as conn:
+            if dead:
+                conn.execute(
+                    f"UPDATE outbox SET status = ?, attempts = ?, last_error = ? WHERE id IN ({placeholders})",
+                    [OUTBOX_STATUS_DEAD, attempts, repr(error)] + ids
+                )
+                # Later writes of the session would be applied on top of the missing one
+                for row in group:
+                    if row["session_id"] is not None:
+                        cascaded += conn.execute(
+                            "UPDATE outbox SET status = ?, last_error = ? WHERE session_id = ? AND status = ? AND id > ?",
+                            [OUTBOX_STATUS_DEAD, f"Earlier outbox operation {row['id']} is dead", row["session_id"], OUTBOX_STATUS_PENDING, row["id"]]
+                        ).rowcount
+            else:
+                delay = min(OUTBOX_MAX_BACKOFF, OUTBOX_DRAIN_INTERVAL * (2 ** attempts))
+                conn.execute(
+                    f"UPDATE outbox SET attempts = ?, available_at = ?, last_error = ? WHERE id IN ({placeholders})",
+                    [attempts, time.time() + delay, repr(error)] + ids
+                )
+        if dead:
+            OUTBOX_OPERATIONS.inc(len(group) + cascaded, operation=group[0]["operation"], outcome="dead")
+            ErrorLogger.log_error(error, "Outbox operation parked as dead", {
+                "outbox_ids": ids, "attempts": attempts, "later_operations_parked": cascaded
+            })
+        else:
+            OUTBOX_OPERATIONS.inc(len(group), operation=group[0]["operation"], outcome="failed")
+            ErrorLogger.log_warning(f"Outbox drain failed, retrying: {error}", "Outbox drain", {"outbox_ids": ids, "attempts": attempts})
+
+    def flush(self, timeout: float) -> bool:
+        """Drain until the outbox is empty or timeout passes; True if nothing is pending."""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.drain_once() == 0:
+                if self.backlog().get(OUTBOX_STATUS_PENDING, 0) == 0:
+                    return True
+                time.sleep(min(OUTBOX_DRAIN_INTERVAL, max(0.0, deadline - time.monotonic())))
+        return self.backlog().get(OUTBOX_STATUS_PENDING, 0) == 0
+
+    def backlog(self) -> Dict[str, int]:
+        """Number of outbox operations per status."""
+        with self._connection() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM outbox GROUP BY status").fetchall()
+        return {row["status"]: row["n"] for row in rows}
+
+    def start_drainer(self):
+        """Start the background thread that drains the outbox (idempotent)."""
+        if self.upstream is None or self._drainer is not None:
+            return
+
+        self._stopped.clear()
+
+        def run():
+            while not self._stopped.is_set():
+                try:
+                    if self.drain_once() > 0:
+                        continue
+                except Exception as e:
+                    ErrorLogger.log_error(e, "Outbox drainer")
+                self._wake.wait(OUTBOX_DRAIN_INTERVAL)
+                self._wake.clear()
+
+        self._drainer = threading.Thread(target=run, name="outbox-drainer", daemon=True)
+        self._drainer.start()
+        OUTBOX_BACKLOG.set_function(lambda: {(status,): count for status, count in self.backlog().items()})
+        logger.info("Outbox drainer started for %s", self.db_path)
+
+    def stop_drainer(self, timeout: float = 5.0):
+        """Stop the background drainer; pending operations stay in the outbox for the next start."""
+        if self._drainer is None:
+            return
+        self._stopped.set()
+        self._wake.set()
+        self._drainer.join(timeout)
+        self._drainer = None
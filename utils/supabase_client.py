@@ -3,18 +3,46 @@ Supabase client for storing conversations and summaries.
 """
 
 import os
+import queue
+import threading
 import uuid
 import time
 from datetime import datetime, timezone
-from typing import List, Dict, Any, Optional
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import List, Dict, Any, Iterator, Optional, Tuple
 from supabase import create_client, Client
 from supabase.lib.client_options import ClientOptions
-from .openai_client import generate_summary, generate_evaluation
-from .logger import ErrorLogger, logger
+from .openai_client import generate_summary, generate_evaluation, generate_combined_summary_evaluation, SUMMARY_ERROR_TEXT
+from .logger import ErrorLogger, logger, log_function_call
+from .tracing import propagate, session_context
+from .metrics import observe_db_call
+from .job_queue import get_job_queue, JobWorkerPool
+from .write_behind import WriteBehindBuffer
+from .conversation_cache import get_conversation_cache
+from .conversation_stats import STATS_COLUMNS, compute_conversation_stats
+from .storage import StorageBackend, SupabaseBackend, SQLiteBackend, ConversationFilter, with_keyset_columns
+from config import (
+    END_CONVERSATION_LLM_TIMEOUT, OPENAI_COMBINED_SUMMARY_EVALUATION, JOB_WORKERS,
+    WRITE_BEHIND_SESSION_END_TIMEOUT, CONVERSATION_PAGE_SIZE, CONVERSATION_PREFETCH_PAGES,
+    CONVERSATION_CACHE_ENABLED, STORAGE_BACKEND, STORAGE_SQLITE_PATH, CONVERSATION_STATS_ENABLED
+)
 
 # Module-level variable to store the client (singleton pattern)
 _supabase_client = None
 
+# Background workers for end-of-interview processing (started once per process)
+FINALIZE_CONVERSATION_JOB = "finalize_conversation"
+_conversation_workers = None
+_conversation_workers_lock = threading.Lock()
+
+# Storage backend behind the read/write functions below (created once per process)
+_storage_backend = None
+_storage_backend_lock = threading.Lock()
+
+# Write-behind buffer for per-turn message rows (started once per process)
+_message_writer = None
+_message_writer_lock = threading.Lock()
+
 def get_supabase_client(supabase_url: str, supabase_key: str):
     """Get or create Supabase client (singleton pattern)."""
     global _supabase_client
@@ -36,100 +64,340 @@ def get_supabase_client(supabase_url: str, supabase_key: str):
             raise
     return _supabase_client
 
+def get_storage_backend(supabase_url: str, supabase_key: str) -> StorageBackend:
+    """
+    Get or create the storage backend selected by STORAGE_BACKEND (singleton pattern).
+    
+    Args:
+        supabase_url: Supabase project URL (unused by the "sqlite" backend)
+        supabase_key: Supabase anon key (unused by the "sqlite" backend)
+        
+    Returns:
+        StorageBackend: The process-wide backend
+    """
+    global _storage_backend
+    with _storage_backend_lock:
+        if _storage_backend is None:
+            if STORAGE_BACKEND == "supabase":
+                backend = SupabaseBackend(get_supabase_client(supabase_url, supabase_key))
+            elif STORAGE_BACKEND == "sqlite":
+                backend = SQLiteBackend(STORAGE_SQLITE_PATH)
+            elif STORAGE_BACKEND == "outbox":
+                backend = SQLiteBackend(STORAGE_SQLITE_PATH, upstream=SupabaseBackend(get_supabase_client(supabase_url, supabase_key)))
+                backend.start_drainer()
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {STORAGE_BACKEND}")
+            _storage_backend = backend
+            logger.info("Storage backend initialized: %s", backend.name)
+    return _storage_backend
+
+def configure_storage_backend(backend: Optional[StorageBackend]):
+    """Replace the process-wide storage backend (e.g. a SQLiteBackend for tools and tests); None resets it."""
+    global _storage_backend
+    with _storage_backend_lock:
+        _storage_backend = backend
+
+def _invalidate_cached_conversation(session_id: str):
+    """Drop a session from the read cache after it was written."""
+    if CONVERSATION_CACHE_ENABLED:
+        get_conversation_cache().invalidate(session_id)
+
+@log_function_call("db_write")
 def save_conversation(
     session_id: str, 
     messages: List[Dict[str, str]], 
     supabase_url: str,
     supabase_key: str,
     summary: Optional[str] = None,
-    evaluation: Optional[Dict[str, Any]] = None
+    evaluation: Optional[Dict[str, Any]] = None,
+    ended_at: Optional[str] = None,
+    started_at: Optional[str] = None
 ) -> bool:
     """
     Save conversation to Supabase.
     
+    The row is upserted on session_id, so saving the same session again (a
+    repeated "End Conversation" or a retry after a write that did succeed)
+    updates it instead of failing on the unique key. created_at is left to the
+    database default and is not overwritten by later saves. The stats columns
+    (turns, characters and tokens per role, duration, completion) are computed
+    from the transcript here, once per save.
+    
     Args:
         session_id: Unique session identifier
         messages: List of conversation messages
         summary: Optional conversation summary
         evaluation: Optional structured evaluation
+        ended_at: ISO timestamp when the conversation ended (defaults to now)
+        started_at: Optional ISO timestamp when the conversation started (for duration_seconds)
         
     Returns:
         bool: True if successful, False otherwise
     """
-    max_retries = 3
-    retry_delay = 1
-    
-    for attempt in range(max_retries):
+    try:
+        # Validate inputs
+        if not session_id or not isinstance(session_id, str):
+            raise ValueError("Session ID must be a non-empty string")
+        
+        if not messages or not isinstance(messages, list):
+            raise ValueError("Messages must be a non-empty list")
+        
+        # Validate message structure
+        for i, msg in enumerate(messages):
+            if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
+                raise ValueError(f"Message {i} must have 'role' and 'content' keys")
+        
+        backend = get_storage_backend(supabase_url, supabase_key)
+        
+        data = {
+            "session_id": session_id,
+            "messages": messages,
+            "ended_at": ended_at or datetime.now(timezone.utc).isoformat()
+        }
+        
+        if summary:
+            data["summary"] = summary
+        if evaluation:
+            data["evaluation"] = evaluation
+        if CONVERSATION_STATS_ENABLED:
+            data.update(compute_conversation_stats(messages, started_at, data["ended_at"]))
+        
+        logger.info("Saving conversation with session_id: %s, messages_count: %d", session_id, len(messages))
+        
         try:
-            # Validate inputs
-            if not session_id or not isinstance(session_id, str):
-                raise ValueError("Session ID must be a non-empty string")
-            
-            if not messages or not isinstance(messages, list):
-                raise ValueError("Messages must be a non-empty list")
-            
-            # Validate message structure
-            for i, msg in enumerate(messages):
-                if not isinstance(msg, dict) or 'role' not in msg or 'content' not in msg:
-                    raise ValueError(f"Message {i} must have 'role' and 'content' keys")
-            
-            supabase = get_supabase_client(supabase_url, supabase_key)
-            
-            data = {
-                "session_id": session_id,
-                "messages": messages,
-                "created_at": datetime.now(timezone.utc).isoformat(),
-                "ended_at": datetime.now(timezone.utc).isoformat()
-            }
-            
-            if summary:
-                data["summary"] = summary
-            if evaluation:
-                data["evaluation"] = evaluation
-            
-            logger.info(f"Saving conversation with session_id: {session_id}, messages_count: {len(messages)}")
-            
-            result = supabase.table("conversations").insert(data).execute()
+            with observe_db_call("save_conversation"):
+                written = backend.upsert_conversations([data])
+        finally:
+            # Also after a failure: a timed-out write may still have been applied
+            _invalidate_cached_conversation(session_id)
+        
+        if written > 0:
+            logger.info("Conversation saved successfully with session_id: %s", session_id)
+            return True
+        else:
+            ErrorLogger.log_warning("No row written by conversation upsert", "Save conversation", {
+                "session_id": session_id
+            })
+            return False
             
-            if result.data and len(result.data) > 0:
-                logger.info(f"Conversation saved successfully with session_id: {session_id}")
-                return True
-            else:
-                ErrorLogger.log_warning("No data returned from Supabase insert", "Save conversation", {
+    except Exception as e:
+        ErrorLogger.log_error(e, "Save conversation", {
+            "session_id": session_id,
+            "messages_count": len(messages) if messages else 0,
+            "has_summary": summary is not None,
+            "has_evaluation": evaluation is not None
+        })
+        return False
+
+@log_function_call("db_update")
+def update_conversation_fields(
+    session_id: str,
+    supabase_url: str,
+    supabase_key: str,
+    summary: Optional[str] = None,
+    evaluation: Optional[Dict[str, Any]] = None,
+    ended_at: Optional[str] = None
+) -> bool:
+    """
+    Patch only the given columns of an existing conversation row.
+    
+    Unlike save_conversation, the messages JSONB is not sent again. Fields left
+    as None are not touched.
+    
+    Args:
+        session_id: Unique session identifier
+        summary: Optional conversation summary
+        evaluation: Optional structured evaluation
+        ended_at: Optional ISO timestamp when the conversation ended
+        
+    Returns:
+        bool: True if a row was updated, False otherwise
+    """
+    fields = {"summary": summary, "evaluation": evaluation, "ended_at": ended_at}
+    fields = {name: value for name, value in fields.items() if value is not None}
+    try:
+        if not session_id or not isinstance(session_id, str):
+            raise ValueError("Session ID must be a non-empty string")
+        if not fields:
+            ErrorLogger.log_warning("No conversation fields to update", "Update conversation fields", {"session_id": session_id})
+            return False
+        
+        backend = get_storage_backend(supabase_url, supabase_key)
+        logger.info("Updating conversation fields %s for session_id: %s", sorted(fields), session_id)
+        
+        try:
+            with observe_db_call("update_conversation_fields"):
+                updated = backend.update_conversation(session_id, fields)
+        finally:
+            # Also after a failure: a timed-out write may still have been applied
+            _invalidate_cached_conversation(session_id)
+        
+        if updated:
+            return True
+        ErrorLogger.log_warning("No conversation row matched the update", "Update conversation fields", {
+            "session_id": session_id,
+            "fields": sorted(fields)
+        })
+        return False
+    
+    except Exception as e:
+        ErrorLogger.log_error(e, "Update conversation fields", {
+            "session_id": session_id,
+            "fields": sorted(fields)
+        })
+        return False
+
+@log_function_call("summary_and_evaluation")
+def generate_summary_and_evaluation(
+    session_id: str,
+    messages: List[Dict[str, str]],
+    openai_api_key: str
+) -> Tuple[Optional[str], Optional[Dict[str, Any]]]:
+    """
+    Generate summary and evaluation in parallel.
+    
+    Both LLM calls run on their own worker thread, so the total wait is close to
+    the slower of the two. A failure or timeout in one call is logged and leaves
+    that result as None without cancelling or delaying the other.
+    
+    When OPENAI_COMBINED_SUMMARY_EVALUATION is enabled, a single structured call
+    is tried first and the parallel calls are only used as a fallback.
+    
+    Args:
+        session_id: Unique session identifier (for logging)
+        messages: List of conversation messages
+        openai_api_key: OpenAI API key
+        
+    Returns:
+        Tuple: (summary, evaluation), either of which may be None
+    """
+    if OPENAI_COMBINED_SUMMARY_EVALUATION:
+        start_time = time.perf_counter()
+        combined = generate_combined_summary_evaluation(messages, openai_api_key)
+        if combined is not None:
+            logger.info("Used combined summary/evaluation mode in %.3fs for session_id: %s", time.perf_counter() - start_time, session_id)
+            return combined
+        logger.warning("Combined summary/evaluation failed, falling back to separate calls for session_id: %s", session_id)
+    
+    start_time = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="end_conversation")
+    try:
+        futures = {
+            # propagate: the calls' spans nest under this one and keep the session ID
+            "summary": executor.submit(propagate(generate_summary), messages, openai_api_key),
+            "evaluation": executor.submit(propagate(generate_evaluation), messages, openai_api_key)
+        }
+        deadline = time.monotonic() + END_CONVERSATION_LLM_TIMEOUT
+        results = {}
+        
+        for name, future in futures.items():
+            try:
+                results[name] = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                logger.info("%s generated successfully", name.title())
+            except FuturesTimeoutError as e:
+                results[name] = None
+                ErrorLogger.log_error(e, f"{name.title()} generation timed out in save_conversation_with_summary", {
                     "session_id": session_id,
-                    "attempt": attempt + 1
+                    "messages_count": len(messages),
+                    "timeout": END_CONVERSATION_LLM_TIMEOUT
                 })
-                return False
-                
-        except Exception as e:
-            ErrorLogger.log_error(e, "Save conversation", {
-                "session_id": session_id,
-                "messages_count": len(messages),
-                "attempt": attempt + 1,
-                "max_retries": max_retries,
-                "has_summary": summary is not None,
-                "has_evaluation": evaluation is not None
-            })
-            
-            if attempt < max_retries - 1:
-                time.sleep(retry_delay * (2 ** attempt))  # Exponential backoff
-                continue
-            else:
-                return False
+                # Continue without this result
+            except Exception as e:
+                results[name] = None
+                ErrorLogger.log_error(e, f"{name.title()} generation in save_conversation_with_summary", {
+                    "session_id": session_id,
+                    "messages_count": len(messages)
+                })
+                # Continue without this result
+        
+        logger.info("Used separate summary/evaluation calls in %.3fs for session_id: %s", time.perf_counter() - start_time, session_id)
+        return results["summary"], results["evaluation"]
+    finally:
+        # Never block on a straggler that already missed the deadline
+        executor.shutdown(wait=False)
+
+def add_summary_and_evaluation(
+    session_id: str,
+    messages: List[Dict[str, str]],
+    supabase_url: str,
+    supabase_key: str,
+    openai_api_key: str,
+    require_complete: bool = False
+) -> bool:
+    """
+    Generate the summary and evaluation and patch them onto a saved conversation.
+    
+    The transcript must already be stored; only the generated columns are sent.
+    Safe to repeat on a retry. Without require_complete, missing LLM results
+    are not a failure: the transcript is what has to be saved.
+    
+    Args:
+        session_id: Unique session identifier
+        messages: List of conversation messages
+        require_complete: Report failure unless both summary and evaluation were generated,
+            so a retried caller (the finalize job) tries the LLM calls again
+        
+    Returns:
+        bool: True if successful, False otherwise
+    """
+    # Generate summary and evaluation concurrently, each with its own error handling
+    summary, evaluation = generate_summary_and_evaluation(session_id, messages, openai_api_key)
+    
+    if summary is None and evaluation is None and not require_complete:
+        # Nothing to patch (both calls failed or timed out), but the saved transcript is what the user needs
+        ErrorLogger.log_warning("No summary or evaluation generated, transcript saved without them", "Add summary and evaluation", {
+            "session_id": session_id,
+            "messages_count": len(messages)
+        })
+        return True
+    
+    # Patch only the generated columns
+    success = update_conversation_fields(session_id, supabase_url, supabase_key, summary=summary, evaluation=evaluation)
+    
+    summary_generated = summary is not None and summary != SUMMARY_ERROR_TEXT
+    evaluation_generated = evaluation is not None and evaluation.get("status") == "success"
+    if success and require_complete and not (summary_generated and evaluation_generated):
+        # Whatever was generated is stored; the rest is retried
+        ErrorLogger.log_warning("Summary or evaluation missing, conversation not finalized", "Add summary and evaluation", {
+            "session_id": session_id,
+            "summary_generated": summary_generated,
+            "evaluation_generated": evaluation_generated
+        })
+        success = False
+    elif success:
+        logger.info("Summary and evaluation saved successfully for session_id: %s", session_id)
+    else:
+        ErrorLogger.log_warning("Failed to save summary and evaluation", "Add summary and evaluation", {
+            "session_id": session_id,
+            "messages_count": len(messages),
+            "summary_generated": summary is not None,
+            "evaluation_generated": evaluation is not None
+        })
+    
+    return success
 
+@log_function_call("save_conversation_with_summary")
 def save_conversation_with_summary(
     session_id: str, 
     messages: List[Dict[str, str]],
     supabase_url: str,
     supabase_key: str,
-    openai_api_key: str
+    openai_api_key: str,
+    ended_at: Optional[str] = None,
+    started_at: Optional[str] = None
 ) -> bool:
     """
     Save conversation and generate summary/evaluation.
     
+    The transcript is upserted first, so it is stored even if the LLM calls
+    fail; the summary and evaluation are then patched onto the row without
+    re-sending the messages. Every step is safe to repeat on a retry.
+    
     Args:
         session_id: Unique session identifier
         messages: List of conversation messages
+        ended_at: ISO timestamp when the conversation ended (defaults to now)
+        started_at: Optional ISO timestamp when the conversation started
         
     Returns:
         bool: True if successful, False otherwise
@@ -139,58 +407,249 @@ def save_conversation_with_summary(
             ErrorLogger.log_warning("Empty messages list provided for conversation saving")
             return False
         
-        logger.info(f"Starting conversation save with summary for session_id: {session_id}")
-        
-        # Generate summary and evaluation with error handling
-        summary = None
-        evaluation = None
+        logger.info("Starting conversation save with summary for session_id: %s", session_id)
         
-        try:
-            summary = generate_summary(messages, openai_api_key)
-            logger.info("Summary generated successfully")
-        except Exception as e:
-            ErrorLogger.log_error(e, "Summary generation in save_conversation_with_summary", {
+        # Store the transcript before the slow LLM calls
+        if not save_conversation(session_id, messages, supabase_url, supabase_key, ended_at=ended_at, started_at=started_at):
+            ErrorLogger.log_warning("Failed to save conversation transcript", "Save conversation with summary", {
                 "session_id": session_id,
                 "messages_count": len(messages)
             })
-            # Continue without summary
+            return False
         
-        try:
-            evaluation = generate_evaluation(messages, openai_api_key)
-            logger.info("Evaluation generated successfully")
-        except Exception as e:
-            ErrorLogger.log_error(e, "Evaluation generation in save_conversation_with_summary", {
-                "session_id": session_id,
-                "messages_count": len(messages)
-            })
-            # Continue without evaluation
+        return add_summary_and_evaluation(session_id, messages, supabase_url, supabase_key, openai_api_key)
         
-        # Save to database
-        success = save_conversation(session_id, messages, supabase_url, supabase_key, summary, evaluation)
+    except Exception as e:
+        ErrorLogger.log_error(e, "Save conversation with summary", {
+            "session_id": session_id,
+            "messages_count": len(messages) if messages else 0
+        })
+        return False
+
+def start_conversation_workers(supabase_url: str, supabase_key: str, openai_api_key: str):
+    """
+    Start the background workers that finalize ended conversations (idempotent).
+    
+    Credentials are held by the workers in memory only; queued jobs store just
+    the session ID and transcript.
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        openai_api_key: OpenAI API key
+    """
+    global _conversation_workers
+    with _conversation_workers_lock:
+        if _conversation_workers is not None:
+            return
         
-        if success:
-            logger.info(f"Conversation with summary saved successfully for session_id: {session_id}")
-        else:
-            ErrorLogger.log_warning("Failed to save conversation with summary", "Save conversation with summary", {
-                "session_id": session_id,
-                "messages_count": len(messages),
-                "summary_generated": summary is not None,
-                "evaluation_generated": evaluation is not None
-            })
+        def finalize_conversation(payload: Dict[str, Any]) -> Dict[str, Any]:
+            # The transcript was saved before the job was queued; only the LLM results are added here
+            with session_context(payload["session_id"]):
+                success = add_summary_and_evaluation(
+                    payload["session_id"],
+                    payload["messages"],
+                    supabase_url,
+                    supabase_key,
+                    openai_api_key,
+                    require_complete=True
+                )
+            if not success:
+                raise RuntimeError("Failed to add summary and evaluation")
+            return {"saved": True}
         
-        return success
+        workers = JobWorkerPool(get_job_queue(), JOB_WORKERS)
+        workers.register(FINALIZE_CONVERSATION_JOB, finalize_conversation)
+        workers.start()
+        _conversation_workers = workers
+
+def enqueue_conversation_with_summary(
+    session_id: str,
+    messages: List[Dict[str, str]]
+) -> Optional[str]:
+    """
+    Durably queue summary/evaluation generation for a saved conversation.
+    
+    Call this only after save_conversation has stored the transcript: the job
+    just generates the summary and evaluation and patches them onto that row.
+    The job input is committed to the local job queue before this returns, so
+    it survives a closed tab or a process restart.
+    
+    Args:
+        session_id: Unique session identifier
+        messages: List of conversation messages (the input for the LLM calls)
         
+    Returns:
+        str: Job ID to poll with get_conversation_job_status, or None on failure
+    """
+    try:
+        if not messages:
+            ErrorLogger.log_warning("Empty messages list provided for conversation queueing", "Enqueue conversation")
+            return None
+        
+        return get_job_queue().enqueue(
+            FINALIZE_CONVERSATION_JOB,
+            {"session_id": session_id, "messages": messages},
+            session_id=session_id
+        )
     except Exception as e:
-        ErrorLogger.log_error(e, "Save conversation with summary", {
+        ErrorLogger.log_error(e, "Enqueue conversation", {
             "session_id": session_id,
             "messages_count": len(messages) if messages else 0
         })
+        return None
+
+def get_conversation_job_status(job_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Get the status of a queued end-of-interview job.
+    
+    Args:
+        job_id: Job ID returned by enqueue_conversation_with_summary
+        
+    Returns:
+        Dict: status ('queued', 'running', 'succeeded' or 'failed'), attempts and last_error, or None if unknown
+    """
+    try:
+        job = get_job_queue().get(job_id)
+        if job is None:
+            return None
+        return {
+            "status": job["status"],
+            "attempts": job["attempts"],
+            "max_attempts": job["max_attempts"],
+            "last_error": job["last_error"]
+        }
+    except Exception as e:
+        ErrorLogger.log_error(e, "Get conversation job status", {"job_id": job_id})
+        return None
+
+def save_conversation_messages(rows: List[Dict[str, Any]], supabase_url: str, supabase_key: str):
+    """
+    Write a batch of per-turn message rows to the conversation_messages table.
+    
+    Rows are keyed by (session_id, seq), so a batch re-sent after a timeout
+    does not create duplicates.
+    
+    Args:
+        rows: Rows with session_id, seq, role and content
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        
+    Raises:
+        Exception: If the write failed after retries (the caller keeps the rows)
+    """
+    backend = get_storage_backend(supabase_url, supabase_key)
+    with observe_db_call("save_conversation_messages"):
+        backend.upsert_messages(rows)
+
+def start_message_writer(supabase_url: str, supabase_key: str):
+    """
+    Start the background writer for per-turn message rows (idempotent).
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+    """
+    global _message_writer
+    with _message_writer_lock:
+        if _message_writer is not None:
+            return
+        _message_writer = WriteBehindBuffer(
+            "conversation_messages",
+            lambda rows: save_conversation_messages(rows, supabase_url, supabase_key)
+        ).start()
+
+def persist_message(session_id: str, seq: int, message: Dict[str, str]) -> bool:
+    """
+    Queue one message for writing without blocking the turn.
+    
+    Args:
+        session_id: Unique session identifier
+        seq: Position of the message in the conversation
+        message: Message with 'role' and 'content'
+        
+    Returns:
+        bool: True if queued, False if the writer is not running or its buffer is full
+    """
+    if _message_writer is None:
         return False
+    queued = _message_writer.put({
+        "session_id": session_id,
+        "seq": seq,
+        "role": message["role"],
+        "content": message["content"]
+    })
+    if not queued:
+        ErrorLogger.log_warning("Message write-behind buffer full, dropping row", "Persist message", {
+            "session_id": session_id,
+            "seq": seq
+        })
+    return queued
+
+def flush_conversation_messages(session_id: str, timeout: float = WRITE_BEHIND_SESSION_END_TIMEOUT) -> bool:
+    """
+    Wait until the queued message rows are written, e.g. when a conversation ends.
+    
+    Args:
+        session_id: Unique session identifier (for logging)
+        timeout: Longest time to wait in seconds
+        
+    Returns:
+        bool: True if everything queued so far was written or settled in time
+    """
+    if _message_writer is None:
+        return True
+    flushed = _message_writer.flush(timeout)
+    if not flushed:
+        ErrorLogger.log_warning("Timed out flushing queued message rows", "Flush conversation messages", {
+            "session_id": session_id,
+            "timeout": timeout
+        })
+    return flushed
+
+def get_conversation_messages(session_id: str, supabase_url: str, supabase_key: str) -> List[Dict[str, str]]:
+    """
+    Rebuild a transcript from its per-turn rows (e.g. for a session that never ended cleanly).
+    
+    Args:
+        session_id: Unique session identifier
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        
+    Returns:
+        List[Dict]: Messages in conversation order, empty if none were found
+    """
+    try:
+        backend = get_storage_backend(supabase_url, supabase_key)
+        with observe_db_call("get_conversation_messages"):
+            return backend.get_messages(session_id)
+    except Exception as e:
+        ErrorLogger.log_error(e, "Get conversation messages", {"session_id": session_id})
+        return []
 
+def _fetch_conversation(session_id: str, supabase_url: str, supabase_key: str) -> Optional[Dict[str, Any]]:
+    """Read one conversation row from the storage backend; None if it does not exist, raises on errors."""
+    backend = get_storage_backend(supabase_url, supabase_key)
+    logger.info("Retrieving conversation for session_id: %s", session_id)
+    
+    with observe_db_call("get_conversation"):
+        row = backend.get_conversation(session_id)
+    
+    if row is not None:
+        logger.info("Conversation retrieved successfully for session_id: %s", session_id)
+        return row
+    logger.info("No conversation found for session_id: %s", session_id)
+    return None
+
+@log_function_call("db_read")
 def get_conversation(session_id: str, supabase_url: str, supabase_key: str) -> Optional[Dict[str, Any]]:
     """
     Retrieve conversation by session ID.
     
+    Reads go through the process-wide conversation cache: repeated lookups are
+    served from memory until CONVERSATION_CACHE_TTL expires or the session is
+    saved again, and concurrent misses for one session share a single request.
+    
     Args:
         session_id: Unique session identifier
         supabase_url: Supabase project URL
@@ -204,17 +663,12 @@ def get_conversation(session_id: str, supabase_url: str, supabase_key: str) -> O
             ErrorLogger.log_warning("Invalid session_id provided for conversation retrieval", "Get conversation")
             return None
         
-        supabase = get_supabase_client(supabase_url, supabase_key)
-        logger.info(f"Retrieving conversation for session_id: {session_id}")
-        
-        result = supabase.table("conversations").select("*").eq("session_id", session_id).execute()
-        
-        if result.data and len(result.data) > 0:
-            logger.info(f"Conversation retrieved successfully for session_id: {session_id}")
-            return result.data[0]
-        else:
-            logger.info(f"No conversation found for session_id: {session_id}")
-            return None
+        if not CONVERSATION_CACHE_ENABLED:
+            return _fetch_conversation(session_id, supabase_url, supabase_key)
+        return get_conversation_cache().get_or_load(
+            session_id,
+            lambda: _fetch_conversation(session_id, supabase_url, supabase_key)
+        )
         
     except Exception as e:
         ErrorLogger.log_error(e, "Get conversation", {
@@ -222,10 +676,194 @@ def get_conversation(session_id: str, supabase_url: str, supabase_key: str) -> O
         })
         return None
 
+def page_cursor(page: List[Dict[str, Any]]) -> Optional[Dict[str, str]]:
+    """Keyset cursor after the last row of a page (None for an empty page)."""
+    if not page:
+        return None
+    return {"created_at": page[-1]["created_at"], "id": page[-1]["id"]}
+
+def fetch_conversations_page(
+    supabase_url: str,
+    supabase_key: str,
+    columns: str = "*",
+    page_size: int = CONVERSATION_PAGE_SIZE,
+    conversation_filter: Optional[ConversationFilter] = None,
+    after: Optional[Dict[str, str]] = None
+) -> List[Dict[str, Any]]:
+    """
+    Fetch one page of conversations in (created_at, id) order.
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        columns: Comma-separated columns to fetch (created_at and id are always included)
+        page_size: Maximum rows in the page
+        conversation_filter: Optional row filters
+        after: Keyset cursor from page_cursor(), or None for the first page
+        
+    Returns:
+        List[Dict]: Rows of the page, empty once the end is reached
+        
+    Raises:
+        Exception: If the read failed after retries
+    """
+    backend = get_storage_backend(supabase_url, supabase_key)
+    columns = with_keyset_columns(columns)
+    with observe_db_call("fetch_conversations_page"):
+        return backend.fetch_conversations_page(columns, page_size, conversation_filter, after)
+
+def count_conversations(
+    supabase_url: str,
+    supabase_key: str,
+    conversation_filter: Optional[ConversationFilter] = None,
+    after: Optional[Dict[str, str]] = None
+) -> Optional[int]:
+    """
+    Count the conversations a paged read would return.
+    
+    Returns:
+        int: Number of matching rows after the cursor, or None if the count is unavailable
+    """
+    try:
+        backend = get_storage_backend(supabase_url, supabase_key)
+        with observe_db_call("count_conversations"):
+            return backend.count_conversations(conversation_filter, after)
+    except Exception as e:
+        ErrorLogger.log_error(e, "Count conversations", {"after": after})
+        return None
+
+def iter_conversation_pages(
+    supabase_url: str,
+    supabase_key: str,
+    columns: str = "*",
+    page_size: int = CONVERSATION_PAGE_SIZE,
+    conversation_filter: Optional[ConversationFilter] = None,
+    after: Optional[Dict[str, str]] = None,
+    prefetch: int = CONVERSATION_PREFETCH_PAGES
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Stream conversations page by page using keyset pagination on (created_at, id).
+    
+    Each request continues after the last row of the previous page, so the
+    cost per page stays flat however deep the walk goes. With prefetch > 0 a
+    background thread fetches up to that many pages ahead while the caller
+    works on the current one; memory stays bounded by prefetch + 2 pages.
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        columns: Comma-separated columns to fetch (created_at and id are always included)
+        page_size: Rows per request
+        conversation_filter: Optional row filters
+        after: Keyset cursor to resume from (see page_cursor())
+        prefetch: Pages fetched ahead in the background (0 fetches on demand)
+        
+    Yields:
+        List[Dict]: Non-empty pages of rows
+        
+    Raises:
+        Exception: If a page could not be read after retries
+    """
+    def pages_from(cursor: Optional[Dict[str, str]]) -> Iterator[List[Dict[str, Any]]]:
+        while True:
+            page = fetch_conversations_page(supabase_url, supabase_key, columns, page_size, conversation_filter, cursor)
+            if not page:
+                return
+            yield page
+            if len(page) < page_size:
+                return
+            cursor = page_cursor(page)
+    
+    if prefetch <= 0:
+        yield from pages_from(after)
+        return
+    
+    ready: "queue.Queue[Tuple[str, Any]]" = queue.Queue(maxsize=prefetch)
+    stop = threading.Event()
+    
+    def offer(item: Tuple[str, Any]) -> bool:
+        # Waits for room, giving up once the consumer has gone away
+        while not stop.is_set():
+            try:
+                ready.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+    
+    def produce():
+        try:
+            for page in pages_from(after):
+                if not offer(("page", page)):
+                    return
+            offer(("done", None))
+        except Exception as e:
+            offer(("error", e))
+    
+    threading.Thread(target=produce, name="conversation-prefetch", daemon=True).start()
+    try:
+        while True:
+            kind, value = ready.get()
+            if kind == "error":
+                raise value
+            if kind == "done":
+                return
+            yield value
+    finally:
+        stop.set()
+
+def iter_conversations(
+    supabase_url: str,
+    supabase_key: str,
+    columns: str = "*",
+    page_size: int = CONVERSATION_PAGE_SIZE,
+    conversation_filter: Optional[ConversationFilter] = None,
+    after: Optional[Dict[str, str]] = None,
+    prefetch: int = CONVERSATION_PREFETCH_PAGES
+) -> Iterator[Dict[str, Any]]:
+    """
+    Stream conversations one row at a time with constant memory.
+    
+    Usage:
+        for row in iter_conversations(url, key, columns="session_id,summary",
+                                      conversation_filter=ConversationFilter(has_summary=True)):
+            ...
+    
+    See iter_conversation_pages() for the arguments.
+    """
+    for page in iter_conversation_pages(supabase_url, supabase_key, columns, page_size, conversation_filter, after, prefetch):
+        yield from page
+
+def iter_conversation_stats(
+    supabase_url: str,
+    supabase_key: str,
+    conversation_filter: Optional[ConversationFilter] = None,
+    page_size: int = CONVERSATION_PAGE_SIZE
+) -> Iterator[Dict[str, Any]]:
+    """
+    Yield the stats columns of matching conversations without reading any transcript.
+    
+    Pass the rows to summarize_conversation_stats() for averages and rates.
+    
+    Args:
+        supabase_url: Supabase project URL
+        supabase_key: Supabase anon key
+        conversation_filter: Optional row filters
+        page_size: Rows per request
+        
+    Yields:
+        Dict: session_id, created_at, ended_at and the STATS_COLUMNS of one conversation
+    """
+    columns = ",".join(("session_id", "ended_at") + STATS_COLUMNS)
+    yield from iter_conversations(supabase_url, supabase_key, columns, page_size, conversation_filter)
+
 def get_all_conversations(limit: int, supabase_url: str, supabase_key: str) -> List[Dict[str, Any]]:
     """
     Retrieve all conversations.
     
+    Loads up to limit full rows at once; use iter_conversations() to walk the
+    whole table with selected columns and constant memory.
+    
     Args:
         limit: Maximum number of conversations to retrieve
         supabase_url: Supabase project URL
@@ -239,14 +877,15 @@ def get_all_conversations(limit: int, supabase_url: str, supabase_key: str) -> L
             ErrorLogger.log_warning(f"Invalid limit provided: {limit}", "Get all conversations")
             limit = 100
         
-        supabase = get_supabase_client(supabase_url, supabase_key)
-        logger.info(f"Retrieving all conversations with limit: {limit}")
+        backend = get_storage_backend(supabase_url, supabase_key)
+        logger.info("Retrieving all conversations with limit: %s", limit)
         
-        result = supabase.table("conversations").select("*").order("created_at", desc=True).limit(limit).execute()
+        with observe_db_call("get_all_conversations"):
+            rows = backend.list_conversations(limit)
         
-        if result.data:
-            logger.info(f"Retrieved {len(result.data)} conversations successfully")
-            return result.data
+        if rows:
+            logger.info("Retrieved %s conversations successfully", len(rows))
+            return rows
         else:
             logger.info("No conversations found")
             return []
@@ -266,11 +905,11 @@ def generate_session_id() -> str:
     """
     try:
         session_id = str(uuid.uuid4())
-        logger.info(f"Generated new session ID: {session_id}")
+        logger.info("Generated new session ID: %s", session_id)
         return session_id
     except Exception as e:
         ErrorLogger.log_error(e, "Session ID generation")
         # Fallback to timestamp-based ID
         fallback_id = f"session_{int(time.time())}"
-        logger.warning(f"Using fallback session ID: {fallback_id}")
+        logger.warning("Using fallback session ID: %s", fallback_id)
         return fallback_id
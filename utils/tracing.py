@@ -0,0 +1,390 @@
+"""
+Lightweight tracing for the interview pipeline.
+
+Spans nest through context variables: a span opened while another is active
+becomes its child, and the session ID bound for a turn or job is attached to
+every span under it. Work handed to another thread keeps both when the
+callable is wrapped with `propagate`. Each span records wall time and the CPU
+time of the thread it ran on.
+
+Finished spans are batched and exported as OTLP JSON (one
+ExportTraceServiceRequest per line) to a file and/or an OTLP/HTTP collector.
+Until start_trace_exporter has a target, `span` is a no-op.
+"""
+
+import atexit
+import contextvars
+import json
+import os
+import random
+import threading
+import time
+import urllib.request
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional
+from .logger import logger, ErrorLogger
+from config import (
+    TRACE_FILE_PATH, TRACE_OTLP_ENDPOINT, TRACE_EXPORT_INTERVAL, TRACE_MAX_PENDING_SPANS, TRACE_SERVICE_NAME
+)
+
+# OTLP enum values
+SPAN_KIND_INTERNAL = 1
+STATUS_CODE_UNSET = 0
+STATUS_CODE_ERROR = 2
+
+SESSION_ATTRIBUTE = "session.id"
+CPU_TIME_ATTRIBUTE = "cpu_time_ns"
+
+_current_span: "contextvars.ContextVar[Optional[Span]]" = contextvars.ContextVar("current_span", default=None)
+_session_id: "contextvars.ContextVar[Optional[str]]" = contextvars.ContextVar("trace_session_id", default=None)
+
+class Span:
+    """A timed operation; children share its trace ID."""
+
+    __slots__ = (
+        "name", "trace_id", "span_id", "parent_span_id", "attributes", "thread_name",
+        "start_ns", "end_ns", "cpu_ns", "status_code", "status_message", "_start_perf_ns", "_start_cpu_ns"
+    )
+
+    def __init__(self, name: str, parent: Optional["Span"], attributes: Dict[str, Any]):
+        self.name = name
+        # IDs only need to be unique, not unpredictable
+        self.trace_id = parent.trace_id if parent is not None else f"{random.getrandbits(128):032x}"
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.parent_span_id = parent.span_id if parent is not None else None
+        self.attributes = attributes
+        self.thread_name = threading.current_thread().name
+        self.start_ns = time.time_ns()
+        self.end_ns = self.start_ns
+        self.cpu_ns = 0
+        self.status_code = STATUS_CODE_UNSET
+        self.status_message: Optional[str] = None
+        self._start_perf_ns = time.perf_counter_ns()
+        self._start_cpu_ns = time.thread_time_ns()
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException):
+        self.status_code = STATUS_CODE_ERROR
+        self.status_message = f"{type(error).__name__}: {error}"
+
+    def finish(self):
+        # Durations come from the monotonic clock; the wall clock only anchors the start
+        self.end_ns = self.start_ns + (time.perf_counter_ns() - self._start_perf_ns)
+        self.cpu_ns = time.thread_time_ns() - self._start_cpu_ns
+        if SESSION_ATTRIBUTE not in self.attributes:
+            session_id = _session_id.get()
+            if session_id:
+                self.attributes[SESSION_ATTRIBUTE] = session_id
+
+    def to_otlp(self) -> Dict[str, Any]:
+        attributes = dict(self.attributes)
+        attributes[CPU_TIME_ATTRIBUTE] = self.cpu_ns
+        attributes["thread.name"] = self.thread_name
+        otlp_span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": SPAN_KIND_INTERNAL,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in attributes.items()],
+            "status": {"code": self.status_code}
+        }
+        if self.parent_span_id:
+            otlp_span["parentSpanId"] = self.parent_span_id
+        if self.status_message:
+            otlp_span["status"]["message"] = self.status_message
+        return otlp_span
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    # proto3 JSON mapping: 64-bit integers are strings
+    if isinstance(value, bool):
+        encoded = {"boolValue": value}
+    elif isinstance(value, int):
+        encoded = {"intValue": str(value)}
+    elif isinstance(value, float):
+        encoded = {"doubleValue": value}
+    else:
+        encoded = {"stringValue": str(value)}
+    return {"key": key, "value": encoded}
+
+def _attribute_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for kind in ("stringValue", "doubleValue", "boolValue"):
+        if kind in value:
+            return value[kind]
+    return None
+
+def export_request(spans: List[Span], service_name: str = TRACE_SERVICE_NAME) -> Dict[str, Any]:
+    """Build an OTLP ExportTraceServiceRequest body for a batch of finished spans."""
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [
+                _otlp_attribute("service.name", service_name),
+                _otlp_attribute("process.pid", os.getpid())
+            ]},
+            "scopeSpans": [{
+                "scope": {"name": "utils.tracing"},
+                "spans": [span.to_otlp() for span in spans]
+            }]
+        }]
+    }
+
+class TraceExporter:
+    """
+    Batch finished spans and write them out on a background thread.
+
+    Recording a span only appends it to a bounded buffer; serialization, the
+    file write and the collector request happen in flush(). A collector that
+    is down costs one failed request per interval, and spans beyond
+    `max_pending` are dropped rather than growing the buffer.
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        endpoint: Optional[str] = None,
+        interval: float = TRACE_EXPORT_INTERVAL,
+        max_pending: int = TRACE_MAX_PENDING_SPANS,
+        service_name: str = TRACE_SERVICE_NAME
+    ):
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.interval = interval
+        self.max_pending = max_pending
+        self.service_name = service_name
+        self.dropped = 0
+        self.exported = 0
+        self._pending: Deque[Span] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, span: Span):
+        with self._lock:
+            if len(self._pending) >= self.max_pending:
+                self.dropped += 1
+                return
+            self._pending.append(span)
+
+    def flush(self) -> int:
+        """Export every pending span; returns how many were exported."""
+        with self._flush_lock:
+            with self._lock:
+                batch = list(self._pending)
+                self._pending.clear()
+            if not batch:
+                return 0
+            body = json.dumps(export_request(batch, self.service_name), separators=(",", ":"))
+            if self.file_path:
+                directory = os.path.dirname(self.file_path)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                with open(self.file_path, "a", encoding="utf-8") as f:
+                    f.write(body + "\n")
+            if self.endpoint:
+                request = urllib.request.Request(
+                    self.endpoint, data=body.encode("utf-8"), headers={"Content-Type": "application/json"}, method="POST"
+                )
+                with urllib.request.urlopen(request, timeout=10) as response:
+                    response.read()
+            self.exported += len(batch)
+            return len(batch)
+
+    def start(self):
+        def export_periodically():
+            while not self._stopped.wait(self.interval):
+                try:
+                    self.flush()
+                except Exception as e:
+                    ErrorLogger.log_error(e, "Trace export", {"file_path": self.file_path, "endpoint": self.endpoint})
+
+        self._thread = threading.Thread(target=export_periodically, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the export thread and export what is still pending."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+        try:
+            self.flush()
+        except Exception as e:
+            ErrorLogger.log_error(e, "Trace export", {"file_path": self.file_path, "endpoint": self.endpoint})
+
+_exporter: Optional[TraceExporter] = None
+_exporter_lock = threading.Lock()
+
+def start_trace_exporter(file_path: Optional[str] = TRACE_FILE_PATH, endpoint: Optional[str] = TRACE_OTLP_ENDPOINT) -> bool:
+    """
+    Start recording and exporting spans once per process (safe to call on every Streamlit rerun).
+
+    Args:
+        file_path: Append OTLP JSON batches to this file (None disables the file export)
+        endpoint: POST OTLP JSON batches to this collector URL (None disables the collector export)
+
+    Returns:
+        bool: True if tracing is active
+    """
+    global _exporter
+    with _exporter_lock:
+        if _exporter is not None:
+            return True
+        if not file_path and not endpoint:
+            return False
+        exporter = TraceExporter(file_path, endpoint)
+        exporter.start()
+        atexit.register(exporter.stop)
+        _exporter = exporter
+    logger.info("Exporting trace spans every %ss (file=%s, endpoint=%s)", exporter.interval, file_path, endpoint)
+    return True
+
+def stop_trace_exporter():
+    """Export pending spans and stop recording (used by tools between runs)."""
+    global _exporter
+    with _exporter_lock:
+        exporter, _exporter = _exporter, None
+    if exporter is not None:
+        exporter.stop()
+        if exporter.dropped:
+            ErrorLogger.log_warning(f"{exporter.dropped} spans dropped while the export buffer was full", "Trace export")
+
+def tracing_enabled() -> bool:
+    return _exporter is not None
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Time the enclosed block as a child of the current span.
+
+    Yields the Span (None while tracing is off) so the block can add
+    attributes. An exception marks the span as failed and propagates;
+    BaseExceptions used for control flow (e.g. Streamlit's rerun) do not.
+    """
+    exporter = _exporter
+    if exporter is None:
+        yield None
+        return
+    current = Span(name, _current_span.get(), attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.finish()
+        exporter.add(current)
+
+def record_span(name: str, start_ns: int, duration_ns: int, cpu_ns: int = 0, **attributes: Any):
+    """
+    Record an already measured interval as a child of the current span.
+
+    For work that is interleaved with other work (e.g. rendering between
+    streamed chunks), where the total is measured piecewise by the caller.
+    """
+    exporter = _exporter
+    if exporter is None:
+        return
+    recorded = Span(name, _current_span.get(), attributes)
+    recorded.finish()
+    recorded.start_ns = start_ns
+    recorded.end_ns = start_ns + duration_ns
+    recorded.cpu_ns = cpu_ns
+    exporter.add(recorded)
+
+class SpanAccumulator:
+    """
+    Sum many short blocks interleaved with other work and record them as one span.
+
+    Used as a context manager around each block; record() then adds a child of
+    the current span that starts at the first block and lasts for their total.
+    """
+
+    def __init__(self, name: str, **attributes: Any):
+        self.name = name
+        self.attributes = attributes
+        self.start_ns: Optional[int] = None
+        self.duration_ns = 0
+        self.cpu_ns = 0
+        self.blocks = 0
+        self._block_perf_ns = 0
+        self._block_cpu_ns = 0
+
+    def __enter__(self) -> "SpanAccumulator":
+        if self.start_ns is None:
+            self.start_ns = time.time_ns()
+        self._block_perf_ns = time.perf_counter_ns()
+        self._block_cpu_ns = time.thread_time_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        self.duration_ns += time.perf_counter_ns() - self._block_perf_ns
+        self.cpu_ns += time.thread_time_ns() - self._block_cpu_ns
+        self.blocks += 1
+        return False
+
+    def record(self):
+        if self.blocks:
+            record_span(self.name, self.start_ns, self.duration_ns, self.cpu_ns, blocks=self.blocks, **self.attributes)
+
+def bind_session_id(session_id: Optional[str]):
+    """Attach session_id to the spans recorded from now on in this context (one Streamlit script run)."""
+    _session_id.set(session_id)
+
+@contextmanager
+def session_context(session_id: Optional[str]) -> Iterator[None]:
+    """Attach session_id to the spans recorded inside the block (e.g. a background job)."""
+    token = _session_id.set(session_id)
+    try:
+        yield
+    finally:
+        _session_id.reset(token)
+
+def propagate(func: Callable) -> Callable:
+    """Wrap func so it runs in a copy of the caller's context (current span and session) on another thread."""
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.run(func, *args, **kwargs)
+    return run
+
+def iter_trace_file(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Read spans back from an OTLP JSON lines file written by TraceExporter.
+
+    Yields:
+        Dict: name, trace_id, span_id, parent_span_id, start_ns, end_ns, cpu_ns,
+        session_id, error and the remaining attributes
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            for resource_spans in request.get("resourceSpans", []):
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for otlp_span in scope_spans.get("spans", []):
+                        attributes = {
+                            attribute["key"]: _attribute_value(attribute["value"])
+                            for attribute in otlp_span.get("attributes", [])
+                        }
+                        status = otlp_span.get("status", {})
+                        yield {
+                            "name": otlp_span["name"],
+                            "trace_id": otlp_span["traceId"],
+                            "span_id": otlp_span["spanId"],
+                            "parent_span_id": otlp_span.get("parentSpanId") or None,
+                            "start_ns": int(otlp_span["startTimeUnixNano"]),
+                            "end_ns": int(otlp_span["endTimeUnixNano"]),
+                            "cpu_ns": attributes.pop(CPU_TIME_ATTRIBUTE, 0) or 0,
+                            "session_id": attributes.pop(SESSION_ATTRIBUTE, None),
+                            "error": status.get("message") if status.get("code") == STATUS_CODE_ERROR else None,
+                            "attributes": attributes
+                        }
@@ -0,0 +1,164 @@
+"""
+Write-behind buffer for small, frequent database writes.
+Records are queued in memory without blocking the caller and written in
+batches by a background thread; a bounded queue caps memory when the
+database is slow or unreachable. Transient errors are retried with backoff,
+while a batch that keeps failing with a fatal error is dropped.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List
+from .logger import ErrorLogger, logger
+from .metrics import WRITE_BEHIND_RECORDS, WRITE_BEHIND_PENDING
+from .retry import is_retryable_error
+from config import (
+    WRITE_BEHIND_MAX_PENDING, WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_FATAL_ATTEMPTS
+)
+
+class WriteBehindBuffer:
+    """Bounded in-memory queue flushed in batches by a background thread."""
+
+    def __init__(
+        self,
+        name: str,
+        writer: Callable[[List[Dict[str, Any]]], None],
+        max_pending: int = WRITE_BEHIND_MAX_PENDING,
+        batch_size: int = WRITE_BEHIND_BATCH_SIZE,
+        flush_interval: float = WRITE_BEHIND_FLUSH_INTERVAL,
+        max_fatal_attempts: int = WRITE_BEHIND_MAX_FATAL_ATTEMPTS
+    ):
+        self.name = name
+        self.writer = writer
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_fatal_attempts = max_fatal_attempts
+        self._pending: Deque[Dict[str, Any]] = deque()
+        self._cond = threading.Condition()
+        self._enqueued = 0  # Records accepted so far
+        self._settled = 0  # Records written or given up on
+        self._flush_requested = False
+        self._stopped = False
+        self._thread = None
+
+    def start(self) -> "WriteBehindBuffer":
+        self._thread = threading.Thread(target=self._run, name=f"write-behind-{self.name}", daemon=True)
+        self._thread.start()
+        logger.info("Write-behind buffer '%s' started (max_pending=%s, batch_size=%s)", self.name, self.max_pending, self.batch_size)
+        return self
+
+    def put(self, record: Dict[str, Any]) -> bool:
+        """
+        Queue a record without blocking.
+
+        Returns:
+            bool: False if the buffer is full and the record was dropped
+        """
+        with self._cond:
+            if len(self._pending) >= self.max_pending:
+                WRITE_BEHIND_RECORDS.inc(buffer=self.name, outcome="dropped")
+                return False
+            self._pending.append(record)
+            self._enqueued += 1
+            WRITE_BEHIND_PENDING.set(len(self._pending), buffer=self.name)
+            if len(self._pending) >= self.batch_size:
+                self._cond.notify_all()
+        return True
+
+    def flush(self, timeout: float) -> bool:
+        """
+        Write out everything queued so far.
+
+        Args:
+            timeout: Longest time to wait in seconds
+
+        Returns:
+            bool: True if every record queued before the call was settled in time
+        """
+        deadline = time.monotonic() + timeout
+        with self._cond:
+            target = self._enqueued
+            self._flush_requested = True
+            self._cond.notify_all()
+            while self._settled < target:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def stop(self, timeout: float):
+        """Flush pending records and stop the background thread."""
+        self.flush(timeout)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Block until a batch is due, then take it from the queue."""
+        with self._cond:
+            deadline = time.monotonic() + self.flush_interval
+            while not self._stopped and len(self._pending) < self.batch_size and not self._flush_requested:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            batch = [self._pending.popleft() for _ in range(min(self.batch_size, len(self._pending)))]
+            if not self._pending:
+                self._flush_requested = False
+            return batch
+
+    def _settle(self, count: int):
+        with self._cond:
+            self._settled += count
+            WRITE_BEHIND_PENDING.set(len(self._pending), buffer=self.name)
+            self._cond.notify_all()
+
+    def _run(self):
+        failures = 0
+        fatal_failures = 0
+        while True:
+            with self._cond:
+                if self._stopped and not self._pending:
+                    return
+            batch = self._next_batch()
+            if not batch:
+                continue
+            try:
+                self.writer(batch)
+                failures = fatal_failures = 0
+                WRITE_BEHIND_RECORDS.inc(len(batch), buffer=self.name, outcome="written")
+                self._settle(len(batch))
+                continue
+            except Exception as e:
+                failures += 1
+                context = f"Write-behind flush ({self.name})"
+                details = {"batch_size": len(batch), "consecutive_failures": failures}
+                if is_retryable_error(e):
+                    fatal_failures = 0
+                    ErrorLogger.log_warning(f"Transient {type(e).__name__}, retrying: {e}", context, details)
+                else:
+                    fatal_failures += 1
+                    if fatal_failures >= self.max_fatal_attempts:
+                        # A missing table or bad row will not fix itself; stop retrying the batch
+                        ErrorLogger.log_error(e, context, dict(details, dropped=len(batch)))
+                        WRITE_BEHIND_RECORDS.inc(len(batch), buffer=self.name, outcome="dropped")
+                        self._settle(len(batch))
+                        fatal_failures = 0
+                        continue
+                    ErrorLogger.log_warning(f"Fatal {type(e).__name__} ({fatal_failures}/{self.max_fatal_attempts}): {e}", context, details)
+            with self._cond:
+                # Put the batch back in order for the next attempt; whatever no longer
+                # fits (or anything at all once stopped) is given up on
+                room = 0 if self._stopped else self.max_pending - len(self._pending)
+                kept = batch[:max(0, room)]
+                self._pending.extendleft(reversed(kept))
+            dropped = len(batch) - len(kept)
+            if dropped:
+                WRITE_BEHIND_RECORDS.inc(dropped, buffer=self.name, outcome="dropped")
+                self._settle(dropped)
+            if kept:
+                # Fatal errors are not load related, so they are retried without growing backoff
+                time.sleep(self.flush_interval if fatal_failures else min(30.0, self.flush_interval * (2 ** failures)))